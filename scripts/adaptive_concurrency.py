@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Adaptive concurrency and retry budget for the parallel loaders.
+
+- AIMDLimiter: caps concurrent backend calls. The limit grows additively
+  (+1 per limit's worth of successes) and is cut multiplicatively on
+  throttling (429 / rateLimitExceeded / 5xx) or when latency exceeds the
+  target, so loaders settle near the highest concurrency the backend
+  tolerates without hand-tuning MAX_WORKERS.
+- RetryBudget: token bucket shared by all workers. Each call earns a
+  fraction of a retry token; each retry spends one. When the backend is
+  unhealthy, retries stop instead of amplifying the overload.
+- call_with_retries: runs a call inside a limiter slot, with full-jitter
+  exponential backoff under the budget. Dropped connections and truncated
+  responses are retried like 5xx: the google clients surface them as
+  requests' ConnectionError / ChunkedEncodingError, which are not the
+  builtin ConnectionError.
+
+start_fake_endpoint serves a local endpoint that injects latency and
+throttles above a fixed capacity; tests/test_adaptive_concurrency.py drives
+the limiter against it.
+"""
+
+import random
+import threading
+import time
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RETRYABLE_REASONS = {"rateLimitExceeded", "quotaExceeded", "backendError", "internalError"}
+
+try:  # installed with the google-cloud clients
+    from requests.exceptions import ChunkedEncodingError
+    from requests.exceptions import ConnectionError as RequestsConnectionError
+    TRANSPORT_ERRORS = (ConnectionError, TimeoutError, RequestsConnectionError, ChunkedEncodingError)
+except ImportError:
+    TRANSPORT_ERRORS = (ConnectionError, TimeoutError)
+
+
+class AIMDLimiter:
+    """Additive-increase / multiplicative-decrease concurrency limit."""
+
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 64,
+                 decrease_factor: float = 0.5, latency_target_s: float | None = None):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_target_s = latency_target_s
+        self.rtt_s = 0.0  # EWMA of call latency
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self, latency_s: float):
+        self.rtt_s = latency_s if not self.rtt_s else 0.9 * self.rtt_s + 0.1 * latency_s
+        if self.latency_target_s and latency_s > self.latency_target_s:
+            self.on_throttle()
+            return
+        with self._cond:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def on_throttle(self):
+        with self._cond:
+            # One cut per round trip: a burst of 429s is one congestion signal
+            now = time.monotonic()
+            if now - self._last_decrease < self.rtt_s:
+                return
+            self._last_decrease = now
+            self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class RetryBudget:
+    """Token bucket limiting retries to a fraction of overall traffic."""
+
+    def __init__(self, ratio: float = 0.2, initial_tokens: float = 10.0,
+                 max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.tokens = initial_tokens
+        self.max_tokens = max_tokens
+        self.spent = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                self.spent += 1
+                return True
+            self.denied += 1
+            return False
+
+
+def _status_and_reason(exc: Exception) -> tuple[int | None, str | None]:
+    """Extract an HTTP status and API error reason from google / urllib errors."""
+    status = getattr(exc, "code", None)
+    if not isinstance(status, int):
+        status = None
+    reason = None
+    errors = getattr(exc, "errors", None)
+    if errors and isinstance(errors, list) and isinstance(errors[0], dict):
+        reason = errors[0].get("reason")
+    return status, reason
+
+
+def is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, TRANSPORT_ERRORS):
+        return True
+    status, reason = _status_and_reason(exc)
+    return status in RETRYABLE_STATUS or reason in RETRYABLE_REASONS
+
+
+def call_with_retries(fn, limiter: AIMDLimiter, budget: RetryBudget,
+                      max_attempts: int = 6, base_delay_s: float = 0.5,
+                      max_delay_s: float = 30.0, retryable=is_retryable):
+    """Call fn() under the limiter, retrying transient errors (retryable(exc)) with full jitter."""
+    for attempt in range(1, max_attempts + 1):
+        budget.deposit()
+        with limiter:
+            started = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                error = e
+            else:
+                limiter.on_success(time.monotonic() - started)
+                return result
+
+        if not retryable(error):
+            raise error
+        # Throttling and server errors are both congestion signals
+        limiter.on_throttle()
+        if attempt == max_attempts or not budget.try_spend():
+            raise error
+        time.sleep(random.uniform(0, min(max_delay_s, base_delay_s * 2 ** attempt)))
+
+
+# -- local fake endpoint -----------------------------------------------------
+
+def start_fake_endpoint(capacity: int, base_latency_s: float, error_rate: float):
+    """Serve a local HTTP endpoint that slows down and 429s above `capacity`."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    state = {"active": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                state["active"] += 1
+                active = state["active"]
+            try:
+                if active > capacity:
+                    self.send_response(429)
+                elif random.random() < error_rate:
+                    self.send_response(503)
+                else:
+                    # Latency climbs as we approach capacity (queueing)
+                    time.sleep(base_latency_s * (1 + active / capacity))
+                    self.send_response(200)
+                self.end_headers()
+            finally:
+                with lock:
+                    state["active"] -= 1
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
@@ -0,0 +1,710 @@
+#!/usr/bin/env python3
+"""
+Typed columnar bronze layer: raw source records -> Parquet with an explicit schema.
+
+Source 1 used to be an external table over the 11GB JSONL and Source 2 one
+json_line STRING column, so 02, 03 and 04 re-parsed every record's JSON on
+every run with no column pruning. Here each record is parsed once at ingest
+and coerced to an explicit schema taken from the profiling output
+(docs/part-1-data-profiling); downstream SQL reads only the columns it uses.
+
+Coercion never fails a load:
+- A value that does not fit its column (e.g. education[].end_year = "2022-05"
+  for INT64) is written as NULL and recorded in a quarantine table with the
+  record's lineage (_source_file, _record_index), field path, expected type
+  and raw JSON value. 03/04 turn these into COERCION_FAILED normalization errors.
+- Keys the schema does not know, at any depth, are kept in _extra_json
+  (path -> value), so nothing is lost; `check-schema` reports them.
+- Rarely populated or deeply nested values (Source 2 activity/posts, Source 1
+  company and school objects, ...) are JSON text columns.
+
+Source 2 (one part per input file, written in a spawn process pool):
+    <dest>/source_2/part-<file>.parquet
+    <dest>/source_2_quarantine/part-<file>.parquet
+With --cache, files unchanged since the last run (same checksum and schema
+version) keep their existing parts. load_bronze_source_2.py loads the parts
+file by file into bronze_source_2 / bronze_source_2_quarantine.
+
+Source 1 (one part per byte range of the JSONL; each worker streams its range
+in BATCH_ROWS batches, so memory stays bounded whatever the file size):
+    <dest>/source_1/snapshot_date=<date>/part-NNNNN.parquet
+    <dest>/source_1_quarantine/snapshot_date=<date>/part-NNNNN.parquet
+Every row, quarantined values included, carries snapshot_date, the BigQuery
+partitioning column of bronze_source_1 (clustered by linkedinID) and of
+bronze_source_1_quarantine, so converting one snapshot never replaces
+another's quarantine. _record_index is the line's byte offset in the
+source, the same key source_1_index.py uses. With --cache, a
+JSONL unchanged since the last conversion into the same dest keeps its parts
+(and their snapshot_date) instead of being converted again.
+
+Usage:
+    python3 scripts/bronze.py source-2 --source gs://coffeespace-sandbox-source-2/ \\
+        --dest gs://coffeespace-sandbox-bronze/current/ --cache snapshot_cache.sqlite
+    python3 scripts/bronze.py source-2 --source ./source2 --dest ./bronze
+    python3 scripts/bronze.py source-1 --dest gs://coffeespace-sandbox-bronze/current/ \
+        --snapshot-date 2025-10-01
+    python3 scripts/bronze.py source-1 --source ./s1.jsonl --dest ./bronze --cache snapshot_cache.sqlite
+    python3 scripts/bronze.py check-schema --profile docs/part-1-data-profiling/profiles-raw.json
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from json_stream import iter_json_records, split_byte_ranges
+from object_store import delete_object, join_uri, list_objects, open_stream, open_write
+from snapshot_cache import SnapshotCache
+
+SOURCE_1_URI = "gs://coffeespace-sandbox-source-1/CoffeeSpaceTestDatav4.jsonl"
+SOURCE_2_URI = "gs://coffeespace-sandbox-source-2/"
+SOURCE_1_RANGE_MB = 256  # Source 1: bytes of JSONL per worker task / Parquet part
+SCHEMA_VERSION = 2  # bump when a schema changes: cached parts are rebuilt
+BATCH_ROWS = 5000
+COMPRESSION = "zstd"
+
+_JSON = {"bronze": "json"}  # field metadata: store the value as JSON text
+_LOAD = {"bronze": "load"}  # field metadata: set by the converter, not read from the record
+_TS = pa.timestamp("us", tz="UTC")
+
+
+def json_field(name: str) -> pa.Field:
+    return pa.field(name, pa.string(), metadata=_JSON)
+
+
+def _lineage() -> list[pa.Field]:
+    return [
+        pa.field("_extra_json", pa.string()),
+        pa.field("_source_file", pa.string()),
+        pa.field("_record_index", pa.int64()),
+    ]
+
+
+# Types follow the profiled value types; ids stay STRING, counts and years
+# are INT64, and `linkedin_num_id` (digits in a string) is INT64.
+SOURCE_2_SCHEMA = pa.schema([
+    ("linkedin_id", pa.string()),
+    ("linkedin_num_id", pa.int64()),
+    ("id", pa.string()),
+    ("name", pa.string()),
+    ("first_name", pa.string()),
+    ("last_name", pa.string()),
+    ("position", pa.string()),
+    ("about", pa.string()),
+    ("location", pa.string()),
+    ("city", pa.string()),
+    ("country_code", pa.string()),
+    ("url", pa.string()),
+    ("input_url", pa.string()),
+    ("avatar", pa.string()),
+    ("banner_image", pa.string()),
+    ("default_avatar", pa.bool_()),
+    ("memorialized_account", pa.bool_()),
+    ("connections", pa.int64()),
+    ("followers", pa.int64()),
+    ("recommendations_count", pa.int64()),
+    ("current_company", pa.struct([
+        ("company_id", pa.string()), ("link", pa.string()), ("location", pa.string()),
+        ("name", pa.string()), ("title", pa.string()),
+    ])),
+    ("current_company_company_id", pa.string()),
+    ("current_company_name", pa.string()),
+    ("educations_details", pa.string()),
+    ("experience", pa.list_(pa.struct([
+        ("company", pa.string()), ("company_id", pa.string()), ("company_logo_url", pa.string()),
+        ("title", pa.string()), ("start_date", pa.string()), ("end_date", pa.string()),
+        ("duration", pa.string()), ("duration_short", pa.string()), ("location", pa.string()),
+        ("description", pa.string()), ("description_html", pa.string()), ("url", pa.string()),
+        json_field("positions"),
+    ]))),
+    ("education", pa.list_(pa.struct([
+        ("title", pa.string()), ("degree", pa.string()), ("field", pa.string()),
+        ("start_year", pa.int64()), ("end_year", pa.int64()), ("description", pa.string()),
+        ("description_html", pa.string()), ("institute_logo_url", pa.string()), ("url", pa.string()),
+    ]))),
+    ("certifications", pa.list_(pa.struct([
+        ("title", pa.string()), ("subtitle", pa.string()), ("meta", pa.string()),
+        ("credential_id", pa.string()), ("credential_url", pa.string()),
+    ]))),
+    json_field("activity"),
+    json_field("bio_links"),
+    json_field("courses"),
+    json_field("honors_and_awards"),
+    json_field("languages"),
+    json_field("organizations"),
+    json_field("patents"),
+    json_field("people_also_viewed"),
+    json_field("posts"),
+    json_field("projects"),
+    json_field("publications"),
+    json_field("recommendations"),
+    json_field("similar_profiles"),
+    json_field("volunteer_experience"),
+    *_lineage(),
+])
+
+_PLACE = pa.struct([
+    ("id", pa.int64()), ("name", pa.string()), ("placeType", pa.string()),
+    ("geometry", pa.struct([
+        ("area_square_degrees", pa.float64()), ("area_square_m", pa.float64()),
+        ("bbox", pa.string()), ("lat", pa.float64()), ("lon", pa.float64()),
+    ])),
+])
+
+# ISO date strings are TIMESTAMP, as BigQuery autodetect typed them for the
+# external table 03 was written against.
+SOURCE_1_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("linkedinID", pa.string()),
+    ("linkedinEntityID", pa.string()),
+    ("fullName", pa.string()),
+    ("firstName", pa.string()),
+    ("lastName", pa.string()),
+    ("headline", pa.string()),
+    ("about", pa.string()),
+    ("gender", pa.string()),
+    ("imageURL", pa.string()),
+    ("location", pa.string()),
+    ("linkedinLaborStatus", pa.string()),
+    ("linkedinConnections", pa.int64()),
+    ("linkedinFollowers", pa.int64()),
+    ("lastUpdated", _TS),
+    ("computed_likelyToExplore", pa.bool_()),
+    ("computed_recentlyLeftCompany", pa.bool_()),
+    ("computed_potentialToLeave", pa.bool_()),
+    ("computed_priorBackedFounder", pa.bool_()),
+    ("computed_unicornEarlyEngineer", pa.bool_()),
+    ("computed_bigTechAlumPrivate", pa.bool_()),
+    ("computed_bigTechAlumPublic", pa.bool_()),
+    ("locationIDList", pa.list_(pa.int64())),
+    ("locationDetails", pa.struct([
+        (level, _PLACE) for level in ("continent", "empire", "country", "region", "county",
+                                      "localadmin", "locality", "borough", "neighbourhood")
+    ])),
+    ("skills", pa.list_(pa.string())),
+    ("experienceList", pa.list_(pa.struct([
+        ("id", pa.string()), ("companyID", pa.string()), ("companyName", pa.string()),
+        ("description", pa.string()), ("entityType", pa.string()), ("linkedinNumID", pa.int64()),
+        ("startDate", _TS), ("endDate", _TS),
+        ("positionList", pa.list_(pa.struct([
+            ("title", pa.string()), ("description", pa.string()), ("location", pa.string()),
+            ("department", pa.string()), ("seniorityScore", pa.int64()),
+            ("startDate", _TS), ("endDate", _TS),
+        ]))),
+        json_field("company"),
+    ]))),
+    ("educationList", pa.list_(pa.struct([
+        ("id", pa.string()), ("name", pa.string()), ("subject", pa.string()),
+        ("activities", pa.string()), ("description", pa.string()), ("grade", pa.string()),
+        ("linkedinNumID", pa.int64()), ("schoolID", pa.string()),
+        ("startDate", _TS), ("endDate", _TS),
+        json_field("school"),
+    ]))),
+    json_field("degreeList"),
+    json_field("languageList"),
+    json_field("companiesFoundedList"),
+    pa.field("snapshot_date", pa.date32(), metadata=_LOAD),
+    *_lineage(),
+])
+
+QUARANTINE_SCHEMA = pa.schema([
+    ("linkedin_id", pa.string()),
+    ("_source_file", pa.string()),
+    ("_record_index", pa.int64()),
+    ("field", pa.string()),
+    ("expected_type", pa.string()),
+    ("raw_value", pa.string()),
+])
+# Source 1 quarantine parts carry their snapshot, the partitioning column like bronze_source_1's
+SOURCE_1_QUARANTINE_SCHEMA = QUARANTINE_SCHEMA.append(pa.field("snapshot_date", pa.date32()))
+
+_INT = re.compile(r"\s*[+-]?\d+\s*")
+_INT64_MIN, _INT64_MAX = -2**63, 2**63 - 1
+
+
+class CoercionError(ValueError):
+    pass
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _is_json(field: pa.Field) -> bool:
+    return bool(field.metadata) and field.metadata.get(b"bronze") == b"json"
+
+
+def _is_load(field: pa.Field) -> bool:
+    return bool(field.metadata) and field.metadata.get(b"bronze") == b"load"
+
+
+def _coerce_scalar(value, type_: pa.DataType):
+    if pa.types.is_string(type_):
+        if isinstance(value, str):
+            return value
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if isinstance(value, (int, float)):
+            return _dumps(value)  # as JSON_VALUE would render it
+    elif pa.types.is_int64(type_):
+        if isinstance(value, int) and not isinstance(value, bool):
+            n = value
+        elif isinstance(value, float) and value.is_integer():
+            n = int(value)
+        elif isinstance(value, str) and _INT.fullmatch(value):
+            n = int(value)
+        else:
+            raise CoercionError
+        if _INT64_MIN <= n <= _INT64_MAX:
+            return n
+    elif pa.types.is_float64(type_):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                f = float(value)
+            except ValueError:
+                raise CoercionError from None
+            if math.isfinite(f):
+                return f
+    elif pa.types.is_timestamp(type_):
+        if isinstance(value, str):
+            try:
+                ts = datetime.fromisoformat(value)
+            except ValueError:
+                raise CoercionError from None
+            return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+    elif pa.types.is_boolean(type_):
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.lower() in ("true", "false"):
+            return value.lower() == "true"
+    raise CoercionError
+
+
+class Coercer:
+    """Coerces one record to a schema, collecting quarantined values and unknown keys."""
+
+    def __init__(self, schema: pa.Schema):
+        self.schema = schema
+        self.fields = [f for f in schema if not f.name.startswith("_") and not _is_load(f)]
+        self.known = {f.name for f in schema}
+
+    def coerce(self, record: dict) -> tuple[dict, dict, list]:
+        """Returns (row, extras, errors); errors are (path, expected type, raw JSON)."""
+        extras: dict = {}
+        errors: list = []
+        row = {f.name: self._value(record.get(f.name), f, f.name, extras, errors)
+               for f in self.fields}
+        for key, value in record.items():
+            if key not in self.known:
+                extras[key] = value
+        return row, extras, errors
+
+    def _value(self, value, field: pa.Field, path: str, extras: dict, errors: list):
+        if value is None:
+            return None
+        if _is_json(field):
+            return _dumps(value)
+        type_ = field.type
+        try:
+            if pa.types.is_list(type_):
+                if not isinstance(value, list):
+                    raise CoercionError
+                item = type_.value_field
+                return [self._value(v, item, f"{path}[{i}]", extras, errors)
+                        for i, v in enumerate(value)]
+            if pa.types.is_struct(type_):
+                if not isinstance(value, dict):
+                    raise CoercionError
+                children = {type_.field(i).name: type_.field(i) for i in range(type_.num_fields)}
+                for key in value.keys() - children.keys():
+                    extras[f"{path}.{key}"] = value[key]
+                return {name: self._value(value.get(name), child, f"{path}.{name}", extras, errors)
+                        for name, child in children.items()}
+            return _coerce_scalar(value, type_)
+        except CoercionError:
+            errors.append((path, str(type_), _dumps(value)))
+            return None
+
+
+class BronzeWriter:
+    """Buffers coerced rows and writes a bronze part plus its quarantine part."""
+
+    def __init__(self, schema: pa.Schema, uri: str, quarantine_uri: str, id_field: str,
+                 quarantine_schema: pa.Schema = QUARANTINE_SCHEMA):
+        self.schema = schema
+        self.quarantine_schema = quarantine_schema
+        self.coercer = Coercer(schema)
+        self.id_field = id_field
+        self.uris = [uri, quarantine_uri]
+        self._files = [open_write(uri), open_write(quarantine_uri)]
+        self._writers = [pq.ParquetWriter(self._files[0], schema, compression=COMPRESSION),
+                         pq.ParquetWriter(self._files[1], quarantine_schema, compression=COMPRESSION)]
+        self._rows: list[dict] = []
+        self._quarantine: list[dict] = []
+        self.rows = 0
+        self.quarantined = 0
+
+    def add(self, record: dict, source_file: str, index: int, **columns):
+        row, extras, errors = self.coercer.coerce(record)
+        row.update(columns)
+        row["_extra_json"] = _dumps(extras) if extras else None
+        row["_source_file"] = source_file
+        row["_record_index"] = index
+        self._rows.append(row)
+        record_id = record.get(self.id_field)
+        for path, expected, raw in errors:
+            self._quarantine.append({
+                "linkedin_id": record_id if isinstance(record_id, str) else None,
+                "_source_file": source_file, "_record_index": index,
+                "field": path, "expected_type": expected, "raw_value": raw,
+                **columns,
+            })
+        if len(self._rows) >= BATCH_ROWS:
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            self._writers[0].write_table(pa.Table.from_pylist(self._rows, schema=self.schema))
+            self.rows += len(self._rows)
+            self._rows = []
+        if self._quarantine:
+            self._writers[1].write_table(pa.Table.from_pylist(self._quarantine, schema=self.quarantine_schema))
+            self.quarantined += len(self._quarantine)
+            self._quarantine = []
+
+    def close(self):
+        self.flush()
+        for writer in self._writers:
+            writer.close()
+        for f in self._files:
+            f.close()
+
+
+# -- Source 2 ----------------------------------------------------------------
+
+def source_2_parts(dest: str, name: str) -> list[str]:
+    """Bronze and quarantine part URIs for one Source 2 file."""
+    stem = name.rsplit(".json", 1)[0]
+    return [join_uri(dest, f"source_2/part-{stem}.parquet"),
+            join_uri(dest, f"source_2_quarantine/part-{stem}.parquet")]
+
+
+def convert_source_2_file(uri: str, name: str, dest: str) -> dict:
+    """One Source 2 JSON array file -> bronze + quarantine parts (worker process)."""
+    parts = source_2_parts(dest, name)
+    writer = BronzeWriter(SOURCE_2_SCHEMA, *parts, id_field="linkedin_id")
+    try:
+        with open_stream(uri) as f:
+            for i, record in enumerate(iter_json_records(f)):
+                writer.add(record if isinstance(record, dict) else {}, name, i)
+        writer.close()
+        return {"name": name, "rows": writer.rows, "quarantined": writer.quarantined,
+                "parts": parts, "error": None}
+    except Exception as e:
+        writer.close()
+        return {"name": name, "rows": writer.rows, "quarantined": writer.quarantined,
+                "parts": parts, "error": str(e)}
+
+
+def convert_source_2(source: str, dest: str, workers: int, pattern: str = "*.json",
+                     cache: SnapshotCache | None = None) -> dict:
+    """Convert every Source 2 file under `source` into bronze parts under `dest`."""
+    objects = list_objects(source, pattern)
+    print(f"Found {len(objects)} files under {source}")
+
+    reused = []
+    stage = f"bronze:source_2:{dest.rstrip('/')}:v{SCHEMA_VERSION}"
+    if cache is not None:
+        reused, objects, removed = cache.partition(stage, objects)
+        print(f"  Cache: {len(reused)} unchanged, {len(objects)} new/changed, "
+              f"{len(removed)} removed")
+        for name in removed:
+            for part in (cache.previous(stage, name) or {}).get("parts", []):
+                delete_object(part)
+        cache.forget(stage, removed)
+
+    results = []
+    started = time.time()
+    # spawn: never fork a process that already holds a GCS client
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = [pool.submit(convert_source_2_file, o.uri, o.name, dest) for o in objects]
+        for i, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            if result["error"]:
+                print(f"  WARN: {result['name']}: {result['error']}")
+            if i % 50 == 0 or i == len(objects):
+                print(f"  Progress: {i}/{len(objects)} files, "
+                      f"{sum(r['rows'] for r in results):,} rows")
+
+    if cache is not None:
+        by_name = {o.name: o for o in objects}
+        for r in results:
+            if not r["error"]:
+                cache.put(stage, r["name"], by_name[r["name"]].checksum,
+                          {"rows": r["rows"], "quarantined": r["quarantined"], "parts": r["parts"]})
+
+    outputs = results + [output for _, output in reused]
+    return {
+        "files": len(outputs),
+        "converted_files": len(objects),
+        "reused_files": len(reused),
+        "rows": sum(o["rows"] for o in outputs),
+        "quarantined": sum(o["quarantined"] for o in outputs),
+        "failed": [(r["name"], r["error"]) for r in results if r["error"]],
+        "elapsed_s": time.time() - started,
+    }
+
+
+# -- Source 1 ----------------------------------------------------------------
+
+def source_1_parts(dest: str, snapshot_date: str) -> tuple[str, str]:
+    """Bronze and quarantine prefixes for one Source 1 snapshot."""
+    return (join_uri(dest, f"source_1/snapshot_date={snapshot_date}"),
+            join_uri(dest, f"source_1_quarantine/snapshot_date={snapshot_date}"))
+
+
+def convert_source_1_range(uri: str, name: str, start: int, end: int, part: int,
+                           dest: str, snapshot_date: str) -> dict:
+    """JSONL lines starting in [start, end) -> one bronze part (worker process)."""
+    prefix, quarantine_prefix = source_1_parts(dest, snapshot_date)
+    parts = [join_uri(prefix, f"part-{part:05d}.parquet"),
+             join_uri(quarantine_prefix, f"part-{part:05d}.parquet")]
+    writer = BronzeWriter(SOURCE_1_SCHEMA, *parts, id_field="linkedinID",
+                          quarantine_schema=SOURCE_1_QUARANTINE_SCHEMA)
+    snapshot = date.fromisoformat(snapshot_date)
+    error = None
+    try:
+        with open_stream(uri, end_hint=end) as f:
+            if start > 0:
+                f.seek(start - 1)
+                f.readline()  # finish the line that began before `start`
+            pos = f.tell()
+            while pos < end:
+                line = f.readline()
+                if not line:
+                    break
+                if line.strip():
+                    record = json.loads(line)
+                    writer.add(record if isinstance(record, dict) else {}, name, pos,
+                               snapshot_date=snapshot)
+                pos += len(line)
+    except Exception as e:
+        error = str(e)
+    writer.close()
+    return {"part": part, "rows": writer.rows, "quarantined": writer.quarantined,
+            "parts": parts, "error": error}
+
+
+def _clear_parts(prefix: str):
+    """Delete Parquet parts left under a prefix by an earlier conversion."""
+    try:
+        stale = list_objects(prefix.rstrip("/") + "/", "*.parquet")
+    except FileNotFoundError:
+        return
+    for obj in stale:
+        delete_object(obj.uri)
+
+
+def convert_source_1(source: str, dest: str, workers: int, snapshot_date: str,
+                     cache: SnapshotCache | None = None) -> dict:
+    """Convert the Source 1 JSONL into one snapshot_date partition of bronze parts."""
+    obj = list_objects(source)[0]
+    stage = f"bronze:source_1:{dest.rstrip('/')}:v{SCHEMA_VERSION}"
+    cached = cache.get(stage, obj.name, obj.checksum) if cache is not None else None
+    if cached is not None:
+        print(f"  Cache: {obj.uri} unchanged, keeping snapshot_date={cached['snapshot_date']}")
+        return {
+            "files": cached["ranges"],
+            "converted_files": 0,
+            "reused_files": cached["ranges"],
+            "rows": cached["rows"],
+            "quarantined": cached["quarantined"],
+            "failed": [],
+            "elapsed_s": 0.0,
+        }
+
+    parts = max(workers, -(-obj.size // (SOURCE_1_RANGE_MB * 1024 * 1024)))
+    ranges = split_byte_ranges(obj.size, parts)
+    print(f"Converting {obj.uri} ({obj.size / 1e9:.2f} GB) in {len(ranges)} ranges, "
+          f"{workers} workers, snapshot_date={snapshot_date}")
+    for prefix in source_1_parts(dest, snapshot_date):
+        _clear_parts(prefix)
+    if cache is not None:
+        cache.forget(stage)  # dest now holds this JSONL, whichever file an entry recorded
+
+    results = []
+    started = time.time()
+    # spawn: never fork a process that already holds a GCS client
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = [pool.submit(convert_source_1_range, obj.uri, obj.name, start, end, i,
+                               dest, snapshot_date)
+                   for i, (start, end) in enumerate(ranges)]
+        for i, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            if result["error"]:
+                print(f"  WARN: range {result['part']}: {result['error']}")
+            print(f"  Progress: {i}/{len(ranges)} ranges, "
+                  f"{sum(r['rows'] for r in results):,} rows")
+
+    failed = [(f"range {r['part']}", r["error"]) for r in results if r["error"]]
+    if cache is not None and not failed:
+        cache.put(stage, obj.name, obj.checksum,
+                  {"snapshot_date": snapshot_date, "ranges": len(ranges),
+                   "rows": sum(r["rows"] for r in results),
+                   "quarantined": sum(r["quarantined"] for r in results),
+                   "parts": [part for r in results for part in r["parts"]]})
+
+    return {
+        "files": len(ranges),
+        "converted_files": len(ranges),
+        "reused_files": 0,
+        "rows": sum(r["rows"] for r in results),
+        "quarantined": sum(r["quarantined"] for r in results),
+        "failed": failed,
+        "elapsed_s": time.time() - started,
+    }
+
+
+# -- Schema drift ------------------------------------------------------------
+
+_PROFILE_TYPES = {
+    "string": {"str"}, "int64": {"int"}, "double": {"int", "float"}, "bool": {"bool"},
+    "timestamp[us, tz=UTC]": {"str"}, "list": {"list"}, "struct": {"dict"},
+}
+
+
+def schema_paths(schema: pa.Schema) -> dict[str, str]:
+    """Profile-style paths (a, a.b, a[].b) -> column kind ('json' covers everything below)."""
+    paths = {}
+
+    def walk(field: pa.Field, path: str):
+        type_ = field.type
+        if _is_json(field):
+            paths[path] = "json"
+        elif pa.types.is_list(type_):
+            paths[path] = "list"
+            item = type_.value_type
+            if pa.types.is_struct(item):
+                for i in range(item.num_fields):
+                    walk(item.field(i), f"{path}[].{item.field(i).name}")
+        elif pa.types.is_struct(type_):
+            paths[path] = "struct"
+            for i in range(type_.num_fields):
+                walk(type_.field(i), f"{path}.{type_.field(i).name}")
+        else:
+            paths[path] = str(type_)
+
+    for field in schema:
+        if not field.name.startswith("_") and not _is_load(field):
+            walk(field, field.name)
+    return paths
+
+
+def check_schema(schema: pa.Schema, profile_fields: dict) -> list[str]:
+    """Compare a DataProfiler field profile with a bronze schema."""
+    paths = schema_paths(schema)
+    json_roots = [p for p, kind in paths.items() if kind == "json"]
+    findings = []
+    for path, stats in sorted(profile_fields.items()):
+        if any(path == root or path.startswith(root + ".") or path.startswith(root + "[]")
+               for root in json_roots):
+            continue
+        kind = paths.get(path)
+        if kind is None:
+            findings.append(f"UNMAPPED   {path}: kept in _extra_json")
+            continue
+        types = {t: n for t, n in (stats.get("types") or {}).items() if t != "NoneType"}
+        accepted = _PROFILE_TYPES.get(kind, set())
+        other = {t: n for t, n in types.items() if t not in accepted}
+        if other:
+            total = sum(types.values())
+            share = sum(other.values()) / total if total else 0
+            findings.append(f"COERCED    {path} ({kind}): {share:.1%} of values are "
+                            f"{', '.join(sorted(other))}; unparseable ones are quarantined")
+    return findings
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Typed columnar bronze layer")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    s1 = sub.add_parser("source-1", help="Source 1 JSONL -> one snapshot_date partition of Parquet")
+    s1.add_argument("--source", default=SOURCE_1_URI, help="gs:// URI or local JSONL path")
+    s1.add_argument("--dest", required=True, help="gs:// prefix or local directory for parts")
+    s1.add_argument("--snapshot-date", default=datetime.now(timezone.utc).date().isoformat(),
+                    help="Snapshot date (YYYY-MM-DD) stamped on every row (default: today, UTC)")
+    s1.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    s1.add_argument("--cache", default=None,
+                    help="Snapshot cache path; skip the conversion if the JSONL is unchanged")
+
+    s2 = sub.add_parser("source-2", help="Source 2 JSON arrays -> bronze Parquet")
+    s2.add_argument("--source", default=SOURCE_2_URI, help="gs:// prefix or local directory")
+    s2.add_argument("--dest", required=True, help="gs:// prefix or local directory for parts")
+    s2.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    s2.add_argument("--pattern", default="*.json")
+    s2.add_argument("--cache", default=None,
+                    help="Snapshot cache path; skip files unchanged since the last run")
+
+    check = sub.add_parser("check-schema", help="Compare a profiling output with the bronze schemas")
+    check.add_argument("--profile", required=True, help="profiles-raw.json from profile_sources.py")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.command == "check-schema":
+        with open(args.profile) as f:
+            profiles = json.load(f)
+        for key, schema in (("source1", SOURCE_1_SCHEMA), ("source2", SOURCE_2_SCHEMA)):
+            if key not in profiles:
+                continue
+            findings = check_schema(schema, profiles[key]["fields"])
+            print(f"{key} bronze schema v{SCHEMA_VERSION}: {len(findings)} findings")
+            for line in findings:
+                print(f"  {line}")
+        return 0
+
+    print("=" * 60)
+    if args.command == "source-1":
+        print("Source 1 -> Bronze Parquet")
+        print("=" * 60)
+        date.fromisoformat(args.snapshot_date)  # fail before starting workers
+        cache = SnapshotCache(args.cache) if args.cache else None
+        summary = convert_source_1(args.source, args.dest, args.workers, args.snapshot_date, cache)
+    else:
+        print("Source 2 -> Bronze Parquet")
+        print("=" * 60)
+        cache = SnapshotCache(args.cache) if args.cache else None
+        summary = convert_source_2(args.source, args.dest, args.workers, args.pattern, cache)
+
+    print("\n" + "=" * 60)
+    print("Summary")
+    print("=" * 60)
+    print(f"Files converted: {summary['converted_files']} (reused from cache: {summary['reused_files']})")
+    print(f"Rows (including reused): {summary['rows']:,}")
+    print(f"Quarantined values: {summary['quarantined']:,}")
+    print(f"Elapsed: {summary['elapsed_s']:.1f}s")
+    print(f"Failed files: {len(summary['failed'])}")
+    for name, err in summary["failed"][:10]:
+        print(f"  {name}: {err}")
+    return 0 if not summary["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
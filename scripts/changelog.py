@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Snapshot-to-snapshot changelog (CDC) for people_canonical.
+
+05's FULL OUTER JOIN only sees the current inputs: a person who drops out
+of both sources stays in people_canonical as a tombstone (provenance.deleted_at
+set), and nothing records what changed between quarters. This module diffs
+two promoted snapshots instead (their firestore_export_<snapshot_id> views,
+see snapshot_versions.py), which leave tombstones out. It joins them with a
+FULL OUTER JOIN on linkedin_id and compares sync_hash:
+
+    only in the new snapshot    insert
+    only in the old snapshot    delete
+    sync_hash differs           update, with the field groups that differ
+
+The field groups (sql/field_groups.json, field_groups.py) split 05's
+sync_hash inputs. 05 stores one hash per group in sync_metadata.field_hashes
+and the export views expose it as field_hashes, so the diff compares the
+stored o.field_hashes.<group> with n.field_hashes.<group>: changed_groups
+says which part of a profile moved (e.g. ["experience", "social_metrics"])
+without rehashing either version. Both snapshots must carry the current
+groups (a snapshot merged before a group was added has no hash for it).
+
+Events go to people_changelog, partitioned by DATE(changed_at) and clustered
+by to_snapshot, change_type. Each diff is then exported for downstream
+consumers with EXPORT DATA to <uri>/to_snapshot=<id>/from_snapshot=<id>/,
+as Parquet or NDJSON. people_changelog_runs records one row per diff with
+its counts, and its latest to_snapshot is the head of the stream. Pipeline
+step 08 diffs the head against the promoted snapshot, so a run that only
+holds a snapshot (--hold) emits nothing, and a rollback emits the reverse
+changes. The first diff has no old snapshot and every row is an insert. A
+diff is idempotent: rerunning it replaces its events.
+
+`local` runs the same diff out of core over two local_merge.py outputs. Both
+sides are streamed into narrow rows (linkedin_id, the stored sync_hash and
+group hashes) and hash-partitioned into Arrow IPC spill files, as
+local_merge.py partitions its inputs. Each partition is diffed on its own in a process pool: its old
+rows go in a dict, its new rows stream past it, and the old rows left over
+are the deletes. Memory per worker is bounded by one partition's narrow old
+side, so two 1.3M-row snapshots need a few hundred MB per worker at most.
+local_merge.py hashes with JSON, not TO_JSON_STRING, so local outputs are
+only comparable with other local output.
+
+Usage:
+    python3 scripts/changelog.py runs
+    python3 scripts/changelog.py diff                       # head -> promoted snapshot
+    python3 scripts/changelog.py diff --from 20260601_120000 --to 20260901_120000 --format json
+    python3 scripts/changelog.py --backend duckdb --database ./pipeline.duckdb runs
+    python3 scripts/changelog.py local --old ./canonical_q2/people_canonical \\
+        --new ./canonical_q3/people_canonical --out ./people_changelog
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from field_groups import DEFAULT_GROUPS_PATH, load_field_groups
+from snapshot_versions import SERVING_VIEW, SnapshotStore, _check_id
+
+CHANGELOG_TABLE = "people_changelog"
+RUNS_TABLE = "people_changelog_runs"
+DEFAULT_URI = "gs://coffeespace-sandbox-exports/people_changelog"
+DEFAULT_LOCAL_URI = "people_changelog"
+FORMATS = {"parquet": "PARQUET", "json": "JSON"}
+
+INSERT, UPDATE, DELETE = "insert", "update", "delete"
+
+def export_uri(base: str, from_snapshot: str | None, to_snapshot: str, fmt: str) -> str:
+    """EXPORT DATA uri of one diff (hive-style partitions)."""
+    return (f"{base.rstrip('/')}/to_snapshot={to_snapshot}/from_snapshot={from_snapshot or 'none'}"
+            f"/part-*.{fmt}")
+
+
+def diff_sql(dataset: str, from_snapshot: str | None, to_snapshot: str, groups: dict[str, dict]) -> str:
+    """INSERT the events between two snapshots' export views into CHANGELOG_TABLE."""
+    new_view = f"`{dataset}.{SERVING_VIEW}_{_check_id(to_snapshot)}`"
+    # No old snapshot: an empty old side, so every row is an insert
+    old_from = (f"`{dataset}.{SERVING_VIEW}_{_check_id(from_snapshot)}` AS v" if from_snapshot
+                else f"{new_view} AS v WHERE FALSE")
+    changed = ",\n      ".join(
+        f"IF(o.field_hashes.{name} IS DISTINCT FROM n.field_hashes.{name}, '{name}', NULL)" for name in groups)
+    from_value = f"'{from_snapshot}'" if from_snapshot else "CAST(NULL AS STRING)"
+    return f"""INSERT INTO `{dataset}.{CHANGELOG_TABLE}`
+  (linkedin_id, change_type, changed_groups, old_sync_hash, new_sync_hash, from_snapshot, to_snapshot,
+   changed_at)
+SELECT
+  COALESCE(n.linkedin_id, o.linkedin_id),
+  CASE WHEN o.linkedin_id IS NULL THEN '{INSERT}' WHEN n.linkedin_id IS NULL THEN '{DELETE}'
+    ELSE '{UPDATE}' END,
+  ARRAY(
+    SELECT g FROM UNNEST([
+      {changed}
+    ]) AS g
+    WHERE g IS NOT NULL
+  ),
+  o.sync_hash,
+  n.sync_hash,
+  {from_value},
+  '{to_snapshot}',
+  CURRENT_TIMESTAMP()
+FROM (
+  SELECT v.linkedin_id, v.sync_hash, v.field_hashes
+  FROM {old_from}
+) AS o
+FULL OUTER JOIN (
+  SELECT v.linkedin_id, v.sync_hash, v.field_hashes
+  FROM {new_view} AS v
+) AS n
+ON o.linkedin_id = n.linkedin_id
+WHERE o.linkedin_id IS NULL OR n.linkedin_id IS NULL OR o.sync_hash != n.sync_hash"""
+
+
+class Changelog:
+    """people_changelog and its runs in one dataset ("project.dataset").
+
+    run(statement) -> finished job executes each statement, as in
+    snapshot_versions.SnapshotStore.
+    """
+
+    def __init__(self, client, dataset: str, run=None):
+        self.client = client
+        self.dataset = dataset
+        self._run = run or self._query
+
+    def _query(self, statement: str):
+        job = self.client.query(statement)
+        job.result()
+        return job
+
+    def _ref(self, name: str) -> str:
+        return f"`{self.dataset}.{name}`"
+
+    def _rows(self, statement: str) -> list:
+        return list(self._run(statement).result())
+
+    def ensure_tables(self):
+        # CTAS over typed NULLs: column-list DDL with ARRAY<STRING> has no DuckDB translation
+        self._run(f"""CREATE TABLE IF NOT EXISTS {self._ref(CHANGELOG_TABLE)}
+PARTITION BY DATE(changed_at)
+CLUSTER BY to_snapshot, change_type
+AS SELECT
+  CAST(NULL AS STRING) AS linkedin_id,
+  CAST(NULL AS STRING) AS change_type,
+  ARRAY<STRING>[] AS changed_groups,
+  CAST(NULL AS STRING) AS old_sync_hash,
+  CAST(NULL AS STRING) AS new_sync_hash,
+  CAST(NULL AS STRING) AS from_snapshot,
+  CAST(NULL AS STRING) AS to_snapshot,
+  CAST(NULL AS TIMESTAMP) AS changed_at
+LIMIT 0""")
+        self._run(f"""CREATE TABLE IF NOT EXISTS {self._ref(RUNS_TABLE)} (
+  from_snapshot STRING,
+  to_snapshot STRING NOT NULL,
+  diffed_at TIMESTAMP NOT NULL,
+  inserts INT64,
+  updates INT64,
+  deletes INT64,
+  export_uri STRING
+)""")
+
+    def head(self) -> str | None:
+        """to_snapshot of the last diff: where the stream stands."""
+        rows = self._rows(f"SELECT to_snapshot FROM {self._ref(RUNS_TABLE)} ORDER BY diffed_at DESC LIMIT 1")
+        return rows[0].to_snapshot if rows else None
+
+    def runs(self) -> list:
+        return self._rows(f"""SELECT from_snapshot, to_snapshot, CAST(diffed_at AS STRING) AS diffed_at,
+  inserts, updates, deletes, export_uri
+FROM {self._ref(RUNS_TABLE)}
+ORDER BY diffed_at DESC""")
+
+    def diff(self, from_snapshot: str | None, to_snapshot: str, groups: dict[str, dict],
+             uri: str, fmt: str = "parquet") -> dict:
+        """Write the events from_snapshot -> to_snapshot, export them and log the run. Returns the counts."""
+        self.ensure_tables()
+        pair = (f"to_snapshot = '{_check_id(to_snapshot)}' AND from_snapshot "
+                + (f"= '{_check_id(from_snapshot)}'" if from_snapshot else "IS NULL"))
+        self._run(f"DELETE FROM {self._ref(CHANGELOG_TABLE)} WHERE {pair}")
+        self._run(diff_sql(self.dataset, from_snapshot, to_snapshot, groups))
+
+        target = export_uri(uri, from_snapshot, to_snapshot, fmt)
+        self._run(f"""EXPORT DATA OPTIONS(uri='{target}', format='{FORMATS[fmt]}', overwrite=true) AS
+SELECT linkedin_id, change_type, changed_groups, old_sync_hash, new_sync_hash, changed_at
+FROM {self._ref(CHANGELOG_TABLE)}
+WHERE {pair}""")
+
+        self._run(f"DELETE FROM {self._ref(RUNS_TABLE)} WHERE {pair}")
+        self._run(f"""INSERT INTO {self._ref(RUNS_TABLE)}
+  (from_snapshot, to_snapshot, diffed_at, inserts, updates, deletes, export_uri)
+SELECT {f"'{from_snapshot}'" if from_snapshot else "CAST(NULL AS STRING)"}, '{to_snapshot}', CURRENT_TIMESTAMP(),
+  COUNTIF(change_type = '{INSERT}'), COUNTIF(change_type = '{UPDATE}'), COUNTIF(change_type = '{DELETE}'),
+  '{target}'
+FROM {self._ref(CHANGELOG_TABLE)}
+WHERE {pair}""")
+        row = self._rows(f"SELECT inserts, updates, deletes FROM {self._ref(RUNS_TABLE)} WHERE {pair}")[0]
+        return {INSERT: row.inserts, UPDATE: row.updates, DELETE: row.deletes, "uri": target}
+
+
+def print_runs(rows: list):
+    print(f"  {'from_snapshot':<16} {'to_snapshot':<16} {'inserts':>10} {'updates':>10} {'deletes':>10}  "
+          f"{'diffed_at':<26} export")
+    for r in rows:
+        print(f"  {r.from_snapshot or '-':<16} {r.to_snapshot:<16} {r.inserts:>10,} {r.updates:>10,} "
+              f"{r.deletes:>10,}  {(r.diffed_at or '')[:26]:<26} {r.export_uri}")
+
+
+# -- Local: out-of-core diff over local_merge.py output ----------------------
+
+OLD, NEW = "old", "new"
+
+
+def _narrow_schema(groups: dict[str, dict]) -> pa.Schema:
+    return pa.schema([("linkedin_id", pa.string()), ("sync_hash", pa.string())]
+                     + [(f"g_{name}", pa.string()) for name in groups])
+
+
+CHANGELOG_SCHEMA = pa.schema([
+    ("linkedin_id", pa.string()),
+    ("change_type", pa.string()),
+    ("changed_groups", pa.list_(pa.string())),
+    ("old_sync_hash", pa.string()),
+    ("new_sync_hash", pa.string()),
+    ("changed_at", pa.timestamp("us", tz="UTC")),
+])
+
+
+def narrow_rows(rows: list[dict], groups: dict[str, dict]) -> dict[str, list]:
+    """people_canonical rows -> linkedin_id and the stored sync_hash and group hashes."""
+    columns: dict[str, list] = {"linkedin_id": [], "sync_hash": [], **{f"g_{name}": [] for name in groups}}
+    for row in rows:
+        sync = row["sync_metadata"]
+        columns["linkedin_id"].append(row["linkedin_id"])
+        columns["sync_hash"].append(sync["sync_hash"])
+        for name in groups:
+            columns[f"g_{name}"].append(sync["field_hashes"][name])
+    return columns
+
+
+def partition_snapshot(side: str, path: str, part: int, spill_dir: str, partitions: int,
+                       groups: dict[str, dict]) -> int:
+    """Narrow one people_canonical part and split it into per-partition spill files (worker process)."""
+    from local_merge import BATCH_ROWS, partition_of, spill_path
+
+    schema = _narrow_schema(groups)
+    writers: dict[int, pa.ipc.RecordBatchStreamWriter] = {}
+    rows = 0
+    try:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=BATCH_ROWS, columns=["linkedin_id", "sync_metadata"]):
+            narrow = pa.RecordBatch.from_pydict(narrow_rows(batch.to_pylist(), groups), schema=schema)
+            keys = [partition_of(k, partitions) for k in narrow.column("linkedin_id").to_pylist()]
+            by_partition: dict[int, list[int]] = {}
+            for i, p in enumerate(keys):
+                by_partition.setdefault(p, []).append(i)
+            for p, indices in by_partition.items():
+                if p not in writers:
+                    out = spill_path(spill_dir, side, p, part)
+                    out.parent.mkdir(parents=True, exist_ok=True)
+                    writers[p] = pa.ipc.new_stream(str(out), schema)
+                writers[p].write_batch(narrow.take(pa.array(indices, pa.int32())))
+            rows += batch.num_rows
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return rows
+
+
+def _spilled_batches(spill_dir: str, side: str, partition: int):
+    for path in sorted((Path(spill_dir) / side / f"p{partition:05d}").glob("*.arrow")):
+        with pa.ipc.open_stream(str(path)) as reader:
+            yield from reader
+
+
+def diff_partition(spill_dir: str, partition: int, out_path: str, fmt: str, changed_at: datetime,
+                   groups: list[str]) -> dict:
+    """Diff one partition of both snapshots and write its events (worker process)."""
+    old: dict[str, dict] = {}
+    for batch in _spilled_batches(spill_dir, OLD, partition):
+        for row in batch.to_pylist():
+            old[row["linkedin_id"]] = row
+
+    events = []
+    for batch in _spilled_batches(spill_dir, NEW, partition):
+        for new in batch.to_pylist():
+            before = old.pop(new["linkedin_id"], None)
+            if before is None:
+                events.append((new["linkedin_id"], INSERT, groups, None, new["sync_hash"]))
+            elif before["sync_hash"] != new["sync_hash"]:
+                changed = [g for g in groups if before[f"g_{g}"] != new[f"g_{g}"]]
+                events.append((new["linkedin_id"], UPDATE, changed, before["sync_hash"], new["sync_hash"]))
+    events.extend((linkedin_id, DELETE, groups, before["sync_hash"], None) for linkedin_id, before in old.items())
+
+    counts = {INSERT: 0, UPDATE: 0, DELETE: 0}
+    for event in events:
+        counts[event[1]] += 1
+    if events:
+        events.sort()
+        table = pa.Table.from_pylist([dict(zip(CHANGELOG_SCHEMA.names, (*e, changed_at))) for e in events],
+                                     schema=CHANGELOG_SCHEMA)
+        if fmt == "parquet":
+            pq.write_table(table, out_path, compression="zstd")
+        else:
+            with open(out_path, "w") as f:
+                for row in table.to_pylist():
+                    f.write(json.dumps(row, default=str) + "\n")
+    return counts
+
+
+def local_diff(old_dir: str | None, new_dir: str, out_dir: str, from_snapshot: str | None, to_snapshot: str,
+               fmt: str, workers: int, partitions: int | None = None, groups_path: str = DEFAULT_GROUPS_PATH,
+               keep_spill: bool = False) -> dict:
+    from local_merge import MIN_PARTITIONS_PER_WORKER, PARTITION_MB
+
+    groups = load_field_groups(groups_path)
+    inputs = [(side, str(path)) for side, directory in ((OLD, old_dir), (NEW, new_dir)) if directory
+              for path in sorted(Path(directory).glob("*.parquet"))]
+    if partitions is None:
+        size = sum(Path(path).stat().st_size for _, path in inputs)
+        partitions = max(workers * MIN_PARTITIONS_PER_WORKER, -(-size // (PARTITION_MB * 1024 * 1024)))
+    target = Path(export_uri(out_dir, from_snapshot, to_snapshot, fmt)).parent
+    spill_dir = Path(out_dir) / "_spill"
+    shutil.rmtree(spill_dir, ignore_errors=True)
+    shutil.rmtree(target, ignore_errors=True)
+    target.mkdir(parents=True)
+
+    changed_at = datetime.now(timezone.utc)
+    stats = {"partitions": partitions, "input_rows": 0, INSERT: 0, UPDATE: 0, DELETE: 0, "out": str(target)}
+    started = time.time()
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        print(f"Partitioning {len(inputs)} snapshot parts into {partitions} partitions")
+        futures = [pool.submit(partition_snapshot, side, path, i, str(spill_dir), partitions, groups)
+                   for i, (side, path) in enumerate(inputs)]
+        for future in as_completed(futures):
+            stats["input_rows"] += future.result()
+        stats["partition_s"] = time.time() - started
+        print(f"  {stats['input_rows']:,} rows spilled in {stats['partition_s']:.1f}s")
+
+        print(f"Diffing {partitions} partitions with {workers} workers")
+        futures = [pool.submit(diff_partition, str(spill_dir), p, str(target / f"part-{p:05d}.{fmt}"), fmt,
+                               changed_at, list(groups))
+                   for p in range(partitions)]
+        for future in as_completed(futures):
+            for change_type, n in future.result().items():
+                stats[change_type] += n
+
+    if not keep_spill:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+    stats["elapsed_s"] = time.time() - started
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="people_canonical changelog: snapshot-to-snapshot diffs")
+    parser.add_argument("--backend", choices=["bigquery", "duckdb"], default="bigquery")
+    parser.add_argument("--database", default=None, help="DuckDB database file (duckdb backend)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("runs", help="Diffs so far, newest first")
+    diff = sub.add_parser("diff", help="Diff two snapshots (default: the head to the promoted snapshot)")
+    diff.add_argument("--from", dest="from_snapshot", default=None, metavar="SNAPSHOT_ID")
+    diff.add_argument("--to", dest="to_snapshot", default=None, metavar="SNAPSHOT_ID")
+    local = sub.add_parser("local", help="Out-of-core diff of two local_merge.py outputs")
+    local.add_argument("--old", default=None, help="Old people_canonical Parquet directory (omit: all inserts)")
+    local.add_argument("--new", required=True, help="New people_canonical Parquet directory")
+    local.add_argument("--out", default=DEFAULT_LOCAL_URI)
+    local.add_argument("--from-snapshot", default=None, help="Label of the old side (default: its directory)")
+    local.add_argument("--to-snapshot", default=None, help="Label of the new side (default: its directory)")
+    local.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    local.add_argument("--partitions", type=int, default=None)
+    local.add_argument("--keep-spill", action="store_true")
+    for command in (diff, local):
+        command.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    diff.add_argument("--uri", default=None,
+                      help=f"Export prefix (default {DEFAULT_URI}, ./{DEFAULT_LOCAL_URI} for duckdb)")
+    parser.add_argument("--groups", default=str(DEFAULT_GROUPS_PATH), help="Field groups JSON")
+    args = parser.parse_args(argv)
+    if args.backend == "duckdb" and args.command != "local" and not args.database:
+        parser.error("--backend duckdb needs --database")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "local":
+        print("=" * 60)
+        print("Local Changelog")
+        print("=" * 60)
+        stats = local_diff(args.old, args.new, args.out,
+                           args.from_snapshot or (Path(args.old).parent.name if args.old else None),
+                           args.to_snapshot or Path(args.new).parent.name, args.format, args.workers,
+                           args.partitions, args.groups, args.keep_spill)
+        print("\n" + "=" * 60)
+        print("Summary")
+        print("=" * 60)
+        print(f"Snapshot rows in: {stats['input_rows']:,}")
+        print(f"Events out:       {stats[INSERT]:,} inserts, {stats[UPDATE]:,} updates, {stats[DELETE]:,} deletes")
+        print(f"Written to:       {stats['out']}")
+        print(f"Elapsed:          {stats['elapsed_s']:.1f}s (partition {stats['partition_s']:.1f}s, "
+              f"{stats['partitions']} partitions)")
+        return 0
+
+    from part3_pipeline import DATASET_ID, PROJECT_ID
+
+    if args.backend == "duckdb":
+        from duckdb_backend import DuckDBClient
+        client = DuckDBClient(args.database)
+    else:
+        from google.cloud import bigquery
+        client = bigquery.Client(project=PROJECT_ID)
+    dataset = f"{PROJECT_ID}.{DATASET_ID}"
+    changelog = Changelog(client, dataset)
+    changelog.ensure_tables()
+
+    if args.command == "diff":
+        from_snapshot = args.from_snapshot or changelog.head()
+        to_snapshot = args.to_snapshot or SnapshotStore(client, dataset).promoted()
+        if to_snapshot is None:
+            print("ERROR: No promoted snapshot to diff to", file=sys.stderr)
+            return 1
+        if to_snapshot == from_snapshot:
+            print(f"Nothing to diff: the changelog is at {to_snapshot}")
+        else:
+            uri = args.uri or (DEFAULT_LOCAL_URI if args.backend == "duckdb" else DEFAULT_URI)
+            counts = changelog.diff(from_snapshot, to_snapshot, load_field_groups(args.groups), uri, args.format)
+            print(f"{from_snapshot or 'nothing'} -> {to_snapshot}: {counts[INSERT]:,} inserts, "
+                  f"{counts[UPDATE]:,} updates, {counts[DELETE]:,} deletes, exported to {counts['uri']}")
+    print_runs(changelog.runs())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
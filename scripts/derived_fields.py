@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Derived fields: the primary_portfolio keyword taxonomy, compiled for SQL and Python.
+
+primary_portfolio comes from portfolio_taxonomy.json, an ordered list of
+categories, each with keywords matched anywhere in LOWER(headline). The
+first category with a match wins, and a headline that matches nothing gets
+the default category. Each category compiles to one regular expression (an
+alternation of its escaped keywords), so a headline is lowercased once and
+scanned by one automaton per category. The old cascade evaluated one
+LOWER() + LIKE per keyword. BigQuery (REGEXP_CONTAINS) and pyarrow
+(match_substring_regex) both use RE2, so 05_merge_canonical.sql and
+local_merge.py classify identically. Adding a keyword does not add a
+predicate.
+
+05 carries the rendered derived_fields STRUCT between marker comments and
+computes it in the same pass as the canonical row. The taxonomy version is
+part of computation_method. The MERGE rewrites stored rows whose
+computation_method differs, so bump the version on every edit and run
+`render`. `check` fails when 05 is stale. It also lists keywords that can
+never decide a category, because they contain a keyword of the same or an
+earlier category.
+
+years_of_experience is the sum of (end_date, or today) - start_date over
+experience entries with a start_date, in days / 365.25, rounded to one
+decimal. It is NULL when there are none.
+
+`bench` runs the LIKE cascade and the compiled matcher on the same headlines
+in DuckDB and in Python, checks that they agree row for row, and reports
+timings. With no --input it uses a synthetic corpus built from the taxonomy.
+
+Usage:
+    python3 scripts/derived_fields.py render
+    python3 scripts/derived_fields.py check
+    python3 scripts/derived_fields.py bench --rows 1000000
+    python3 scripts/derived_fields.py bench --input ./canonical/people_canonical --rows 1000000
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+TAXONOMY_PATH = Path(__file__).parent / "portfolio_taxonomy.json"
+MERGE_SQL_PATH = Path(__file__).parent / "sql" / "05_merge_canonical.sql"
+METHOD_SUFFIX = "headline_keywords + experience_date_math"
+BEGIN_MARKER = "-- BEGIN derived_fields"
+END_MARKER = "-- END derived_fields"
+
+_REGEX_SPECIAL = set(r"\.^$|?*+()[]{}")
+# Quotes and newlines would break the SQL literal, ';' the pipeline's statement split
+_FORBIDDEN = set("'\\\n;")
+
+
+# -- Taxonomy ----------------------------------------------------------------
+
+def load_taxonomy(path: Path | str = TAXONOMY_PATH) -> dict:
+    """Read and validate a taxonomy file. Raises ValueError on a malformed one."""
+    taxonomy = json.loads(Path(path).read_text())
+    version = taxonomy.get("version")
+    if not isinstance(version, str) or not version or _FORBIDDEN & set(version):
+        raise ValueError(f"{path}: 'version' must be a non-empty string")
+    categories = taxonomy.get("categories")
+    if not isinstance(categories, list) or not categories:
+        raise ValueError(f"{path}: 'categories' must be a non-empty list")
+    names = [c.get("name") for c in categories] + [taxonomy.get("default", "Other")]
+    if len(set(names)) != len(names):
+        raise ValueError(f"{path}: category names must be unique: {names}")
+    for category in categories:
+        keywords = category.get("keywords")
+        if not keywords:
+            raise ValueError(f"{path}: category {category.get('name')!r} has no keywords")
+        for text in [category["name"], *keywords]:
+            if not isinstance(text, str) or not text or _FORBIDDEN & set(text):
+                raise ValueError(f"{path}: invalid name or keyword {text!r}")
+        for keyword in keywords:
+            if keyword != keyword.lower():
+                raise ValueError(f"{path}: keyword {keyword!r} must be lowercase")
+    taxonomy.setdefault("default", "Other")
+    return taxonomy
+
+
+def computation_method(taxonomy: dict) -> str:
+    return f"{taxonomy['version']}: {METHOD_SUFFIX}"
+
+
+def _escape(keyword: str) -> str:
+    """Escape for both RE2 and Python re (only the characters both treat as syntax)."""
+    return "".join("\\" + ch if ch in _REGEX_SPECIAL else ch for ch in keyword)
+
+
+def category_patterns(taxonomy: dict) -> list[tuple[str, str]]:
+    """(category, RE2 alternation of its keywords), in precedence order."""
+    return [(c["name"], "|".join(_escape(k) for k in c["keywords"])) for c in taxonomy["categories"]]
+
+
+def shadowed_keywords(taxonomy: dict) -> list[tuple[str, str, str]]:
+    """(category, keyword, shadowing keyword) for keywords that can never decide a category."""
+    shadowed = []
+    earlier: list[str] = []
+    for category in taxonomy["categories"]:
+        keywords = category["keywords"]
+        for keyword in keywords:
+            for other in earlier + keywords:
+                if other != keyword and other in keyword:
+                    shadowed.append((category["name"], keyword, other))
+                    break
+        earlier.extend(keywords)
+    return shadowed
+
+
+# -- Python matcher ----------------------------------------------------------
+
+class PortfolioClassifier:
+    """Vectorized primary_portfolio over an Arrow array of headlines (RE2, as in SQL)."""
+
+    def __init__(self, taxonomy: dict):
+        self.patterns = category_patterns(taxonomy)
+        self.default = taxonomy["default"]
+        self.computation_method = computation_method(taxonomy)
+
+    def classify(self, headlines) -> pa.Array:
+        lowered = pc.utf8_lower(pa.array(headlines, pa.string()))
+        # NULL headline: every condition is NULL, which case_when treats as false
+        matches = [pc.match_substring_regex(lowered, pattern) for _, pattern in self.patterns]
+        conditions = pc.make_struct(*matches, field_names=[name for name, _ in self.patterns])
+        return pc.case_when(conditions, *[name for name, _ in self.patterns], self.default)
+
+
+def cascade_classify(taxonomy: dict, headline: str | None) -> str:
+    """The 06 LIKE cascade, one LOWER(headline) LIKE '%keyword%' per keyword (reference)."""
+    for category in taxonomy["categories"]:
+        for keyword in category["keywords"]:
+            if headline is not None and keyword in headline.lower():
+                return category["name"]
+    return taxonomy["default"]
+
+
+def _round_half_away(value: float, digits: int) -> float:
+    """BigQuery ROUND(): halves round away from zero (Python's round() does not)."""
+    scale = 10 ** digits
+    return math.copysign(math.floor(abs(value) * scale + 0.5) / scale, value)
+
+
+def years_of_experience(experience: list[dict], today: date | None = None) -> float | None:
+    """ROUND(SUM(DATE_DIFF(COALESCE(end_date, CURRENT_DATE()), start_date, DAY) / 365.25), 1)."""
+    today = today or datetime.now(timezone.utc).date()
+    spans = [((e["end_date"] or today) - e["start_date"]).days
+             for e in experience or [] if e["start_date"] is not None]
+    if not spans:
+        return None
+    return _round_half_away(sum(days / 365.25 for days in spans), 1)
+
+
+# -- SQL ---------------------------------------------------------------------
+
+def portfolio_sql(taxonomy: dict, headline: str, indent: str = "") -> str:
+    """CASE expression over an already-lowercased headline expression."""
+    lines = ["CASE"]
+    for name, pattern in category_patterns(taxonomy):
+        lines.append(f"  WHEN REGEXP_CONTAINS({headline}, r'{pattern}') THEN '{name}'")
+    lines += [f"  ELSE '{taxonomy['default']}'", "END"]
+    return "\n".join(indent + line for line in lines)
+
+
+def like_cascade_sql(taxonomy: dict, headline: str) -> str:
+    """The 06 cascade: one LOWER(headline) LIKE per keyword (benchmark baseline)."""
+    lines = ["CASE"]
+    for category in taxonomy["categories"]:
+        predicates = [f"LOWER({headline}) LIKE '%{k}%'" for k in category["keywords"]]
+        lines.append(f"  WHEN {' OR '.join(predicates)} THEN '{category['name']}'")
+    lines += [f"  ELSE '{taxonomy['default']}'", "END"]
+    return "\n".join(lines)
+
+
+def derived_fields_sql(taxonomy: dict, indent: str = "  ") -> str:
+    """The marked derived_fields block of 05's final SELECT (reads headline_lc and experience)."""
+    body = [
+        f"{BEGIN_MARKER} (rendered by scripts/derived_fields.py from "
+        f"portfolio_taxonomy.json {taxonomy['version']}, do not edit by hand)",
+        "STRUCT(",
+        portfolio_sql(taxonomy, "headline_lc", indent="  ") + " AS primary_portfolio,",
+        "  (",
+        "    SELECT ROUND(SUM(",
+        "      DATE_DIFF(COALESCE(exp.end_date, CURRENT_DATE()), exp.start_date, DAY) / 365.25",
+        "    ), 1)",
+        "    FROM UNNEST(experience) AS exp",
+        "    WHERE exp.start_date IS NOT NULL",
+        "  ) AS years_of_experience,",
+        f"  '{computation_method(taxonomy)}' AS computation_method",
+        ") AS derived_fields,",
+        END_MARKER,
+    ]
+    return "\n".join(indent + line for line in "\n".join(body).split("\n"))
+
+
+def render(taxonomy: dict, sql: str) -> str:
+    """05's SQL with the derived_fields block replaced by the current rendering."""
+    pattern = re.compile(rf"^([ \t]*){re.escape(BEGIN_MARKER)}.*?^[ \t]*{re.escape(END_MARKER)}[^\n]*",
+                         re.MULTILINE | re.DOTALL)
+    if not pattern.search(sql):
+        raise ValueError(f"{MERGE_SQL_PATH.name}: no '{BEGIN_MARKER}' ... '{END_MARKER}' block")
+    # Keep the block's indentation: it sits in a CTE of the candidates view
+    return pattern.sub(lambda m: derived_fields_sql(taxonomy, indent=m.group(1)), sql, count=1)
+
+
+# -- Benchmark ---------------------------------------------------------------
+
+_FILLER = ("senior staff lead principal at inc corp the of and for | @ - manager specialist "
+           "consultant associate project account nurse teacher student intern architect partner").split()
+
+
+def synthetic_headlines(taxonomy: dict, rows: int, seed: int = 1) -> list[str]:
+    """Filler words, 70% of headlines with one taxonomy keyword dropped in."""
+    rng = random.Random(seed)
+    keywords = [k.strip() for c in taxonomy["categories"] for k in c["keywords"]]
+    headlines = []
+    for _ in range(rows):
+        words = rng.choices(_FILLER, k=rng.randint(3, 9))
+        if rng.random() < 0.7:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords).title())
+        headlines.append(" ".join(words))
+    return headlines
+
+
+def read_headlines(path: str) -> list[str | None]:
+    """identity.headline from a people_canonical or staged Parquet file or directory."""
+    import pyarrow.parquet as pq
+
+    files = sorted(Path(path).rglob("*.parquet")) if Path(path).is_dir() else [Path(path)]
+    headlines = []
+    for file in files:
+        identity = pq.read_table(file, columns=["identity"]).column("identity")
+        headlines.extend(pc.struct_field(identity, "headline").to_pylist())
+    return headlines
+
+
+def _best_of(repeat: int, fn):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench(taxonomy: dict, headlines: list[str | None], repeat: int) -> int:
+    import duckdb
+
+    from duckdb_backend import translate
+
+    con = duckdb.connect()
+    con.register("headlines", pa.table({"headline": pa.array(headlines, pa.string())}))
+    con.execute("CREATE TABLE bench AS SELECT row_number() OVER () AS i, headline FROM headlines")
+    cascade_sql = like_cascade_sql(taxonomy, "headline")
+    compiled_sql = portfolio_sql(taxonomy, "headline_lc")
+    queries = {
+        "SQL LIKE cascade (06)": translate(f"SELECT i, {cascade_sql} AS p FROM bench"),
+        "SQL compiled (05)": translate(
+            f"SELECT i, {compiled_sql} AS p FROM (SELECT i, LOWER(headline) AS headline_lc FROM bench)"),
+    }
+    results = {}
+    for label, query in queries.items():
+        results[label] = _best_of(repeat, lambda: con.execute(
+            f"SELECT p FROM ({query}) ORDER BY i").fetchall())
+
+    classifier = PortfolioClassifier(taxonomy)
+    results["Python cascade"] = _best_of(
+        repeat, lambda: [(cascade_classify(taxonomy, h),) for h in headlines])
+    results["Python compiled"] = _best_of(
+        repeat, lambda: [(p,) for p in classifier.classify(headlines).to_pylist()])
+
+    baseline = results["SQL LIKE cascade (06)"][1]
+    print(f"{len(headlines):,} headlines, taxonomy {taxonomy['version']}, best of {repeat}")
+    print(f"  {'matcher':<24} {'seconds':>8} {'rows/s':>12}  agrees with 06")
+    ok = True
+    for label, (elapsed, rows) in results.items():
+        agrees = rows == baseline
+        ok &= agrees
+        print(f"  {label:<24} {elapsed:>8.3f} {len(headlines) / elapsed:>12,.0f}  {'yes' if agrees else 'NO'}")
+    counts: dict[str, int] = {}
+    for (category,) in baseline:
+        counts[category] = counts.get(category, 0) + 1
+    print("  " + ", ".join(f"{name}: {n:,}" for name, n in sorted(counts.items())))
+    return 0 if ok else 1
+
+
+# -- CLI ---------------------------------------------------------------------
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="primary_portfolio taxonomy compiler")
+    parser.add_argument("--taxonomy", default=str(TAXONOMY_PATH))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("render", help=f"Rewrite the derived_fields block in {MERGE_SQL_PATH.name}")
+    sub.add_parser("check", help=f"Fail if {MERGE_SQL_PATH.name} is stale, list shadowed keywords")
+    b = sub.add_parser("bench", help="LIKE cascade vs compiled matcher, SQL (DuckDB) and Python")
+    b.add_argument("--input", default=None,
+                   help="people_canonical or staged Parquet (default: synthetic headlines)")
+    b.add_argument("--rows", type=int, default=1_000_000, help="Headlines (input is cycled)")
+    b.add_argument("--repeat", type=int, default=3)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    taxonomy = load_taxonomy(args.taxonomy)
+
+    if args.command == "bench":
+        if args.input:
+            source = read_headlines(args.input)
+            headlines = [source[i % len(source)] for i in range(args.rows)] if source else []
+        else:
+            headlines = synthetic_headlines(taxonomy, args.rows)
+        if not headlines:
+            print(f"No headlines in {args.input}", file=sys.stderr)
+            return 1
+        return bench(taxonomy, headlines, args.repeat)
+
+    current = MERGE_SQL_PATH.read_text()
+    rendered = render(taxonomy, current)
+    if args.command == "render":
+        if rendered != current:
+            MERGE_SQL_PATH.write_text(rendered)
+            print(f"Rendered taxonomy {taxonomy['version']} into {MERGE_SQL_PATH}")
+        else:
+            print(f"{MERGE_SQL_PATH.name} already up to date")
+        return 0
+
+    for name, keyword, other in shadowed_keywords(taxonomy):
+        print(f"WARNING: {name}: {keyword!r} never decides a category ({other!r} matches first)")
+    if rendered != current:
+        print(f"STALE: {MERGE_SQL_PATH.name} does not match taxonomy {taxonomy['version']}, "
+              f"run derived_fields.py render")
+        return 1
+    print(f"OK: {MERGE_SQL_PATH.name} matches taxonomy {taxonomy['version']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,745 @@
+"""
+DuckDB execution backend for the scripts/sql pipeline.
+
+Runs the BigQuery SQL in scripts/sql unchanged, end to end, on a laptop:
+each statement is translated from the BigQuery dialect to DuckDB and
+executed against an embedded database over local JSONL and bronze Parquet
+files. DuckDBClient implements the slice of bigquery.Client that
+part3_pipeline.py uses (query().result(), errors, total_rows,
+get_table().modified), so run_sql_file(), the step scheduler and the
+verification checks work with either client.
+
+Translation covers what scripts/sql uses:
+- `project.dataset.table` references -> local table names
+- CREATE EXTERNAL TABLE ... OPTIONS(uris=[...]) -> a table read from the
+  local file configured for that table (TIMESTAMPs as TIMESTAMPTZ, as
+  BigQuery autodetect types them)
+- JSON_VALUE / JSON_QUERY / JSON_QUERY_ARRAY (scalars only / JSON / array
+  elements), SAFE.PARSE_DATE, SAFE_CAST, TO_HEX(MD5()), TO_JSON_STRING,
+  REGEXP_*, COUNTIF, IF, DATE_DIFF, CONCAT (NULL if any argument is NULL)
+- STRUCT(...), STRUCT<...> / ARRAY<...> types and typed array literals,
+  ARRAY(SELECT [AS STRUCT] ...), ARRAY_AGG, ARRAY_CONCAT
+- FROM UNNEST(x) AS e -> the element bound to column `e`
+- NULL arrays in CREATE TABLE / INSERT / MERGE results become [] (BigQuery
+  cannot store NULL arrays)
+- CREATE TABLE ... PARTITION BY / CLUSTER BY: the storage options are
+  dropped; MERGE INTO runs natively
+- CREATE SNAPSHOT TABLE ... CLONE -> a full copy (BigQuery's snapshot is
+  zero-copy); DROP SNAPSHOT TABLE -> DROP TABLE
+- EXPORT DATA OPTIONS(uri='<dir>/part-*.<ext>', format=...) AS query ->
+  COPY into the local directory <dir> (one file per thread)
+- SELECT [alias.]* EXCEPT (...) -> * EXCLUDE (...)
+
+get_table().modified comes from the _table_versions table. Re-creating a
+view with the same definition over tables that did not change keeps its
+modified time, so a step that only (re)defines a view does not make the
+steps reading it look changed.
+
+Known gaps: GREATEST/LEAST skip NULLs in DuckDB (BigQuery returns NULL), and
+ARRAY_AGG / SELECT DISTINCT ordering is unspecified in both engines.
+
+Usage:
+    python3 scripts/part3_pipeline.py --backend duckdb \\
+        --source-1 ./s1.jsonl --source-2 ./source2/ --database ./pipeline.duckdb
+    python3 scripts/duckdb_backend.py scripts/sql/04_staging_source_2.sql   # print translation
+"""
+
+import hashlib
+import json
+import re
+import sys
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+SOURCE_1_TABLE = "bronze_source_1"
+SOURCE_2_TABLE = "bronze_source_2"
+SOURCE_2_QUARANTINE_TABLE = "bronze_source_2_quarantine"
+VERSIONS_TABLE = "_table_versions"  # ISO last-modified time per table/view (get_table)
+
+_TYPES = {
+    "STRING": "VARCHAR", "INT64": "BIGINT", "FLOAT64": "DOUBLE", "NUMERIC": "DECIMAL(38, 9)",
+    "BOOL": "BOOLEAN", "BOOLEAN": "BOOLEAN", "TIMESTAMP": "TIMESTAMPTZ", "DATE": "DATE",
+    "DATETIME": "TIMESTAMP", "BYTES": "BLOB", "JSON": "JSON",
+}
+
+_MACROS = [
+    # JSON_VALUE: scalars as strings; objects and arrays give NULL
+    """CREATE OR REPLACE MACRO bq_json_value(j, p) AS
+       CASE WHEN json_type(j, p) IN ('OBJECT', 'ARRAY') THEN NULL ELSE json_extract_string(j, p) END""",
+    """CREATE OR REPLACE MACRO bq_json_query_array(j) AS
+       CASE WHEN json_type(j) = 'ARRAY' THEN CAST(j AS JSON[]) END""",
+]
+
+_IDENT = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*")
+
+
+class TranslationError(ValueError):
+    pass
+
+
+# -- Lexical helpers ---------------------------------------------------------
+
+def _skip_string(sql: str, i: int) -> int:
+    """Index just past the quoted literal or identifier starting at sql[i]."""
+    quote = sql[i]
+    i += 1
+    while i < len(sql):
+        if sql[i] == "\\" and quote != "`":
+            i += 2
+            continue
+        if sql[i] == quote:
+            return i + 1
+        i += 1
+    raise TranslationError("Unterminated quote")
+
+
+def _normalize_lexemes(sql: str) -> str:
+    """Drop comments; BigQuery strings, raw strings and `paths` to DuckDB form."""
+    out = []
+    i = 0
+    while i < len(sql):
+        c = sql[i]
+        if sql.startswith("--", i) or c == "#":
+            while i < len(sql) and sql[i] != "\n":
+                i += 1
+            continue
+        raw = c in "rR" and i + 1 < len(sql) and sql[i + 1] in "'\"" and \
+            (i == 0 or not (sql[i - 1].isalnum() or sql[i - 1] == "_"))
+        if raw or c in "'\"":
+            start = i + 1 if raw else i
+            end = _skip_string(sql, start)
+            body = sql[start + 1:end - 1]
+            if not raw:
+                body = re.sub(r"\\(.)", lambda m: {"n": "\n", "t": "\t"}.get(m.group(1), m.group(1)),
+                              body)
+            out.append("'" + body.replace("'", "''") + "'")
+            i = end
+            continue
+        if c == "`":
+            end = _skip_string(sql, i)
+            out.append('"' + sql[i + 1:end - 1].split(".")[-1] + '"')
+            i = end
+            continue
+        out.append(c)
+        i += 1
+    return "".join(out)
+
+
+def _match_paren(sql: str, i: int) -> int:
+    """Index of the bracket closing the one at sql[i]."""
+    pairs = {"(": ")", "[": "]", "<": ">"}
+    opening, closing = sql[i], pairs[sql[i]]
+    depth = 0
+    while i < len(sql):
+        c = sql[i]
+        if c == "'" or c == '"':
+            i = _skip_string(sql, i)
+            continue
+        if c == opening:
+            depth += 1
+        elif c == closing:
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise TranslationError(f"Unbalanced {opening}")
+
+
+def _split_top(text: str, sep: str = ",", angle: bool = False) -> list[str]:
+    """Split at top-level separators (outside brackets and strings; <> too in types)."""
+    opening, closing = ("([<", ")]>") if angle else ("([", ")]")
+    parts, depth, start, i = [], 0, 0, 0
+    while i < len(text):
+        c = text[i]
+        if c in "'\"":
+            i = _skip_string(text, i)
+            continue
+        if c in opening:
+            depth += 1
+        elif c in closing:
+            depth -= 1
+        elif c == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+        i += 1
+    parts.append(text[start:])
+    return [p.strip() for p in parts]
+
+
+def _find_keyword(text: str, keyword: str) -> int:
+    """Position of a top-level keyword (case-insensitive, whole word), or -1."""
+    depth, i = 0, 0
+    pattern = re.compile(rf"\b{keyword}\b", re.IGNORECASE)
+    while i < len(text):
+        c = text[i]
+        if c in "'\"":
+            i = _skip_string(text, i)
+            continue
+        if c == "(" or c == "[":
+            depth += 1
+        elif c == ")" or c == "]":
+            depth -= 1
+        elif depth == 0 and pattern.match(text, i) and (i == 0 or not (text[i - 1].isalnum() or text[i - 1] == "_")):
+            return i
+        i += 1
+    return -1
+
+
+def _split_alias(item: str) -> tuple[str, str | None]:
+    """'expr AS name' -> (expr, name); a bare column path is named after its last part."""
+    pos = -1
+    while (nxt := _find_keyword(item[pos + 1:], "AS")) >= 0:
+        pos += nxt + 1
+    if pos >= 0:
+        return item[:pos].strip(), item[pos + 2:].strip().strip('"')
+    if _IDENT.fullmatch(item):
+        return item, item.split(".")[-1]
+    return item, None
+
+
+# -- Types -------------------------------------------------------------------
+
+def translate_type(bq_type: str) -> str:
+    """BigQuery type -> DuckDB type (ARRAY<T> -> T[], STRUCT<a T> -> STRUCT(a T))."""
+    t = bq_type.strip()
+    upper = t.upper()
+    if upper.startswith("ARRAY<") and t.endswith(">"):
+        return translate_type(t[6:-1]) + "[]"
+    if upper.startswith("STRUCT<") and t.endswith(">"):
+        fields = []
+        for field in _split_top(t[7:-1], angle=True):
+            name, _, ftype = field.partition(" ")
+            fields.append(f'"{name.strip(chr(34))}" {translate_type(ftype)}')
+        return f"STRUCT({', '.join(fields)})"
+    return _TYPES.get(upper, t)
+
+
+def _rewrite_typed_literals(sql: str) -> str:
+    """ARRAY<T>[...] -> CAST([...] AS T[]) (untyped STRUCT<...>/ARRAY<...> only appear in CAST)."""
+    pattern = re.compile(r"\bARRAY\s*<", re.IGNORECASE)
+    while True:
+        m = pattern.search(sql)
+        while m and not _outside_strings(sql, m.start()):
+            m = pattern.search(sql, m.end())
+        if not m:
+            return sql
+        close = _match_paren(sql, m.end() - 1)
+        rest = sql[close + 1:].lstrip()
+        if not rest.startswith("["):
+            # A type inside CAST(... AS ARRAY<...>); leave for the CAST handler
+            sql = sql[:m.start()] + "ARRAY\0" + sql[m.end() - 1:]  # "ARRAY\0<...>"
+            continue
+        lit_start = close + 1 + (len(sql[close + 1:]) - len(rest))
+        lit_end = _match_paren(sql, lit_start)
+        bq_type = "ARRAY\0" + sql[m.end() - 1:close + 1]  # translated by the CAST handler
+        sql = sql[:m.start()] + f"CAST({sql[lit_start:lit_end + 1]} AS {bq_type})" + sql[lit_end + 1:]
+
+
+def _outside_strings(sql: str, pos: int) -> bool:
+    i = 0
+    while i < pos:
+        if sql[i] in "'\"":
+            end = _skip_string(sql, i)
+            if end > pos:
+                return False
+            i = end
+        else:
+            i += 1
+    return True
+
+
+# -- Function calls ----------------------------------------------------------
+
+def _concat(args):
+    # BigQuery CONCAT is NULL if any argument is; DuckDB concat() skips NULLs, || does not
+    return "(" + " || ".join(f"({a})" for a in args) + ")"
+
+
+def _array_concat(args):
+    out = args[0]
+    for a in args[1:]:
+        out = f"list_concat({out}, {a})"
+    return out
+
+
+def _cast(func):
+    def handler(args):
+        inner = ", ".join(args)  # a STRUCT<...> type may hold commas
+        pos = -1
+        while (nxt := _find_keyword(inner[pos + 1:], "AS")) >= 0:
+            pos += nxt + 1
+        if pos < 0:
+            raise TranslationError(f"Cannot parse {func}({inner})")
+        bq_type = inner[pos + 2:].strip().replace("ARRAY\0", "ARRAY")
+        return f"{func}({inner[:pos].strip()} AS {translate_type(bq_type)})"
+    return handler
+
+
+def _struct(args):
+    fields = []
+    for arg in args:
+        expr, name = _split_alias(arg)
+        if name is None:
+            raise TranslationError(f"STRUCT field needs a name: {arg}")
+        fields.append(f'"{name}" := {expr}')
+    return f"struct_pack({', '.join(fields)})"
+
+
+def _array_subquery(args):
+    """ARRAY(SELECT [AS STRUCT] items FROM ...) -> COALESCE((SELECT list(...) FROM ...), [])."""
+    body = ",".join(args).strip()
+    m = re.match(r"SELECT\s+(AS\s+STRUCT\s+)?", body, re.IGNORECASE)
+    if not m:
+        raise TranslationError(f"Unsupported ARRAY(...): {body[:60]}")
+    rest = body[m.end():]
+    from_at = _find_keyword(rest, "FROM")
+    items, tail = (rest, "") if from_at < 0 else (rest[:from_at], rest[from_at:])
+    if m.group(1):
+        element = _struct(_split_top(items))
+    else:
+        element = _split_alias(items.strip())[0]
+    return f"COALESCE((SELECT list({element}) {tail}), [])"
+
+
+def _date_diff(args):
+    return f"date_diff('{args[2].strip().lower()}', {args[1]}, {args[0]})"
+
+
+def _to_hex(args):
+    return args[0] if args[0].lower().startswith("md5(") else f"to_hex({args[0]})"
+
+
+def _trim(args):
+    if len(args) > 1:
+        return f"trim({args[0]}, {args[1]})"
+    return f"regexp_replace({args[0]}, '^\\s+|\\s+$', '', 'g')"
+
+
+_CALLS = {
+    "JSON_VALUE": lambda a: f"bq_json_value({a[0]}, {a[1] if len(a) > 1 else repr('$')})",
+    "JSON_QUERY": lambda a: f"json_extract({a[0]}, {a[1] if len(a) > 1 else repr('$')})",
+    "JSON_QUERY_ARRAY": lambda a: f"bq_json_query_array({a[0]})" if len(a) == 1
+    else f"bq_json_query_array(json_extract({a[0]}, {a[1]}))",
+    "TO_JSON_STRING": lambda a: f"CAST(to_json({a[0]}) AS VARCHAR)",
+    "SAFE.PARSE_DATE": lambda a: f"CAST(try_strptime({a[1]}, {a[0]}) AS DATE)",
+    "PARSE_DATE": lambda a: f"CAST(strptime({a[1]}, {a[0]}) AS DATE)",
+    "SAFE.PARSE_TIMESTAMP": lambda a: f"try_strptime({a[1]}, {a[0]})",
+    "PARSE_TIMESTAMP": lambda a: f"strptime({a[1]}, {a[0]})",
+    "TIMESTAMP": lambda a: f"CAST({a[0]} AS TIMESTAMPTZ)",
+    "CAST": _cast("CAST"),
+    "SAFE_CAST": _cast("TRY_CAST"),
+    "MD5": lambda a: f"md5({a[0]})",
+    "TO_HEX": _to_hex,
+    "CONCAT": _concat,
+    "ARRAY_CONCAT": _array_concat,
+    "ARRAY_LENGTH": lambda a: f"len({a[0]})",
+    "ARRAY_TO_STRING": lambda a: f"array_to_string({', '.join(a)})",
+    "ARRAY_AGG": lambda a: f"list({', '.join(a)})",
+    "ARRAY": _array_subquery,
+    "STRUCT": _struct,
+    "COUNTIF": lambda a: f"count(*) FILTER (WHERE {a[0]})",  # count_if() is NULL over no rows
+    "IF": lambda a: f"if({', '.join(a)})",
+    "REGEXP_CONTAINS": lambda a: f"regexp_matches({a[0]}, {a[1]})",
+    "REGEXP_REPLACE": lambda a: f"regexp_replace({a[0]}, {a[1]}, {a[2]}, 'g')",
+    "REGEXP_EXTRACT": lambda a: f"regexp_extract({', '.join(a)})",
+    "DATE_DIFF": _date_diff,
+    "TRIM": _trim,
+    "CURRENT_TIMESTAMP": lambda a: "current_timestamp",
+    "CURRENT_DATE": lambda a: "current_date",
+}
+
+_CALL = re.compile(r"(?<![A-Za-z0-9_.\"])(SAFE\.[A-Za-z_]+|[A-Za-z_][A-Za-z0-9_]*)\s*\(")
+
+
+def _rewrite_calls(sql: str) -> str:
+    out = []
+    i = 0
+    while i < len(sql):
+        c = sql[i]
+        if c in "'\"":
+            end = _skip_string(sql, i)
+            out.append(sql[i:end])
+            i = end
+            continue
+        m = _CALL.match(sql, i) if (c.isalpha() or c == "_") and (i == 0 or not (
+            sql[i - 1].isalnum() or sql[i - 1] in "_.\"")) else None
+        if not m:
+            out.append(c)
+            i += 1
+            continue
+        name = m.group(1).upper()
+        open_at = m.end() - 1
+        close = _match_paren(sql, open_at)
+        inner = _rewrite_calls(sql[open_at + 1:close])
+        if name in _CALLS:
+            args = _split_top(inner) if inner.strip() else []
+            out.append(_CALLS[name](args))
+        elif name == "UNNEST":
+            replacement, close = _unnest(inner, sql, close)
+            out.append(replacement)
+        else:
+            out.append(sql[i:open_at + 1] + inner + ")")
+        i = close + 1
+    return "".join(out)
+
+
+_unnest_counter = [0]
+
+
+def _unnest(inner: str, sql: str, close: int) -> tuple[str, int]:
+    """FROM UNNEST(x) AS e -> FROM UNNEST(x) AS _uN(e): BigQuery binds the element itself to e."""
+    m = re.match(r"\s+(?:AS\s+)?(\"?[A-Za-z_][A-Za-z0-9_]*\"?)", sql[close + 1:], re.IGNORECASE)
+    reserved = {"WHERE", "GROUP", "ORDER", "LIMIT", "JOIN", "ON", "UNION", "WITH"}
+    if m and m.group(1).strip('"').upper() not in reserved:
+        _unnest_counter[0] += 1
+        return f"UNNEST({inner}) AS _u{_unnest_counter[0]}({m.group(1)})", close + m.end()
+    return f"UNNEST({inner})", close
+
+
+# -- Statements --------------------------------------------------------------
+
+_EXTERNAL = re.compile(
+    r"CREATE\s+(OR\s+REPLACE\s+)?EXTERNAL\s+TABLE\s+(\"?[\w]+\"?)\s*(?:OPTIONS\s*\((.*)\))?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# Zero-copy table snapshots have no DuckDB equivalent: the snapshot is a copy
+_SNAPSHOT = re.compile(
+    r"CREATE\s+SNAPSHOT\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?(\"?\w+\"?)\s+CLONE\s+(\"?\w+\"?)"
+    r"(?:\s+OPTIONS\s*\(.*\))?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+_DROP_SNAPSHOT = re.compile(r"^DROP\s+SNAPSHOT\s+TABLE\b", re.IGNORECASE)
+
+_STAR_EXCEPT = re.compile(r"\*\s+EXCEPT\s*\(", re.IGNORECASE)
+
+_EXPORT = re.compile(r"EXPORT\s+DATA\s+OPTIONS\s*\(", re.IGNORECASE)
+_EXPORT_FORMATS = {"PARQUET": "PARQUET", "JSON": "JSON", "CSV": "CSV"}
+
+# PARTITION BY / CLUSTER BY between CREATE TABLE name and AS: storage layout only
+_TABLE_OPTIONS = re.compile(
+    r"\s+(?:PARTITION\s+BY\s+[\w.]+(?:\([\w.]*\))?|CLUSTER\s+BY\s+[\w.]+(?:\s*,\s*[\w.]+)*)"
+    r"(?=\s+(?:PARTITION|CLUSTER|AS)\b)",
+    re.IGNORECASE,
+)
+
+
+def translate(sql: str, external_sources: dict[str, str] | None = None) -> str:
+    """One BigQuery statement -> DuckDB."""
+    return _translate_normalized(_normalize_lexemes(sql).strip().rstrip(";"), external_sources)
+
+
+def _translate_normalized(sql: str, external_sources: dict[str, str] | None) -> str:
+    m = _EXTERNAL.match(sql)
+    if m:
+        table = m.group(2).strip('"')
+        options = m.group(3) or ""
+        path = (external_sources or {}).get(table)
+        if path is None:
+            uris = re.findall(r"'([^']+)'", options.split("uris", 1)[-1]) if "uris" in options else []
+            raise TranslationError(f"No local file configured for external table {table} ({uris})")
+        return _external_table_sql(table, path)
+    m = _SNAPSHOT.match(sql)
+    if m:
+        return f"CREATE TABLE {m.group(1) or ''}{m.group(2)} AS SELECT * FROM {m.group(3)}"
+    m = _EXPORT.match(sql)
+    if m:
+        return _export_sql(sql, m.end() - 1, external_sources)
+    sql = _DROP_SNAPSHOT.sub("DROP TABLE", sql)
+    sql = _STAR_EXCEPT.sub("* EXCLUDE (", sql)
+    sql = _TABLE_OPTIONS.sub("", sql)
+    sql = _rewrite_typed_literals(sql)
+    return _rewrite_calls(sql).replace("ARRAY\0", "ARRAY")
+
+
+def _export_sql(sql: str, options_start: int, external_sources: dict[str, str] | None) -> str:
+    """EXPORT DATA OPTIONS(uri='dir/part-*.ext', format=...) AS query -> COPY into dir/."""
+    close = _match_paren(sql, options_start)
+    options = sql[options_start + 1:close]
+    uri = re.search(r"\buri\s*=\s*'([^']*)'", options, re.IGNORECASE)
+    fmt = re.search(r"\bformat\s*=\s*'([^']*)'", options, re.IGNORECASE)
+    if uri is None or "*" not in uri.group(1).rsplit("/", 1)[-1]:
+        raise TranslationError("EXPORT DATA needs uri='<directory>/<name>*.<ext>'")
+    query = re.sub(r"^\s*AS\b", "", sql[close + 1:], flags=re.IGNORECASE)
+    file_format = _EXPORT_FORMATS[(fmt.group(1) if fmt else "CSV").upper()]
+    return (f"COPY ({_translate_normalized(query.strip(), external_sources)}) TO '{uri.group(1).rsplit('/', 1)[0]}' "
+            f"(FORMAT {file_format}, PER_THREAD_OUTPUT true, OVERWRITE true)")
+
+
+def _json_source(path: str) -> str:
+    p = Path(path)
+    if p.is_dir():
+        return str(p / "*")
+    return str(p)
+
+
+def _external_table_sql(table: str, path: str) -> str:
+    """Autodetected JSONL as a table; marker consumed by DuckDBClient to fix up TIMESTAMPs."""
+    return (f"CREATE OR REPLACE TABLE \"{table}\" AS SELECT * FROM read_json('{_json_source(path)}', "
+            f"format = 'newline_delimited', ignore_errors = true, sample_size = -1)")
+
+
+# -- Client ------------------------------------------------------------------
+
+class Row(dict):
+    """A result row with attribute access, like bigquery.Row."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+class NotFound(LookupError):
+    """get_table() on a missing table, like google.api_core.exceptions.NotFound."""
+
+
+class Table:
+    """get_table() result: the bigquery.Table fields part3_pipeline.py reads."""
+
+    def __init__(self, table_id: str, table_type: str, modified: datetime | None):
+        self.table_id = table_id
+        self.table_type = table_type
+        self.modified = modified
+
+
+class QueryJobConfig:
+    """The bigquery.QueryJobConfig options DuckDBClient.query() honours."""
+
+    def __init__(self, dry_run: bool = False, use_query_cache: bool = True):
+        self.dry_run = dry_run
+        self.use_query_cache = use_query_cache
+
+
+class QueryJob:
+    """Rows plus the bigquery.QueryJob statistics DuckDB can report (no byte or slot counts)."""
+
+    def __init__(self, rows: list[Row] | None, total_rows: int | None):
+        self._rows = rows or []
+        self.total_rows = total_rows
+        self.errors = None
+        self.job_id = None
+        self.statement_type = None
+        self.started = None
+        self.ended = None
+        self.total_bytes_processed = None
+
+    def result(self):
+        return iter(self._rows)
+
+
+class DuckDBClient:
+    """Executes BigQuery SQL on an embedded DuckDB database (see module docstring).
+
+    external_sources maps external-table names to local files; source_1 and
+    source_2 are bronze directories written by `bronze.py source-1/source-2`,
+    loaded as the typed bronze and quarantine tables 01-04 read.
+
+    Every thread gets its own cursor on the database, so independent steps
+    can run concurrently. DuckDB has no table modification times, so the
+    client records one in VERSIONS_TABLE whenever it creates, replaces,
+    writes or drops a table or view. Bronze parts are only reloaded when
+    their files changed, so an unchanged source keeps its time.
+    """
+
+    def __init__(self, database: str = ":memory:", external_sources: dict[str, str] | None = None,
+                 source_1: str | None = None, source_2: str | None = None,
+                 source_2_table: str = SOURCE_2_TABLE):
+        import duckdb
+
+        self.conn = duckdb.connect(database)
+        self.conn.execute("SET TimeZone = 'UTC'")
+        for macro in _MACROS:
+            self.conn.execute(macro)
+        self.conn.execute(f'CREATE TABLE IF NOT EXISTS "{VERSIONS_TABLE}" '
+                          f"(name VARCHAR PRIMARY KEY, modified VARCHAR, fingerprint VARCHAR)")
+        self._local = threading.local()
+        self._local.conn = self.conn
+        self._versions_lock = threading.Lock()
+        self._jobs = 0
+        self.external_sources = dict(external_sources or {})
+        if source_1:
+            self.load_source_1(source_1)
+        if source_2:
+            self.load_source_2(source_2, source_2_table)
+
+    def _conn(self):
+        """This thread's connection (a cursor on the same database)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self.conn.cursor()
+            conn.execute("SET TimeZone = 'UTC'")
+        return conn
+
+    def _touch(self, table: str, fingerprint: str | None = None):
+        with self._versions_lock:
+            self._conn().execute(f'INSERT OR REPLACE INTO "{VERSIONS_TABLE}" VALUES (?, ?, ?)',
+                                 [table, datetime.now(timezone.utc).isoformat(), fingerprint])
+
+    def _view_fingerprint(self, view: str, translated: str) -> str:
+        """The view's SQL and the modified times of the tables and views it names."""
+        names = sorted(set(re.findall(r'"(\w+)"', translated)) - {view})
+        versions = self._conn().execute(
+            f'SELECT name, modified FROM "{VERSIONS_TABLE}" WHERE list_contains(?, name) ORDER BY name',
+            [names]).fetchall()
+        return hashlib.sha256(json.dumps([translated, versions]).encode()).hexdigest()
+
+    def _forget(self, table: str):
+        with self._versions_lock:
+            self._conn().execute(f'DELETE FROM "{VERSIONS_TABLE}" WHERE name = ?', [table])
+
+    def get_table(self, table_id: str) -> Table:
+        """Type and last-modified time of a table or view (`project.dataset.name` or name)."""
+        name = table_id.strip("`").split(".")[-1]
+        found = self._conn().execute("SELECT table_type FROM information_schema.tables WHERE table_name = ?",
+                                     [name]).fetchone()
+        if found is None:
+            raise NotFound(table_id)
+        version = self._conn().execute(f'SELECT modified FROM "{VERSIONS_TABLE}" WHERE name = ?',
+                                       [name]).fetchone()
+        modified = datetime.fromisoformat(version[0]) if version else None
+        return Table(table_id, "VIEW" if found[0] == "VIEW" else "TABLE", modified)
+
+    def _load_parts(self, table: str, directory: Path, pattern: str = "**/*.parquet"):
+        parts = sorted(directory.glob(pattern))
+        if not parts:
+            raise FileNotFoundError(f"No bronze parts under {directory}")
+        listing = [(str(p), p.stat().st_size, p.stat().st_mtime_ns) for p in parts]
+        fingerprint = hashlib.sha256(json.dumps(listing).encode()).hexdigest()
+        loaded = self._conn().execute(f'SELECT fingerprint FROM "{VERSIONS_TABLE}" WHERE name = ?',
+                                      [table]).fetchone()
+        exists = self._conn().execute("SELECT 1 FROM information_schema.tables WHERE table_name = ?",
+                                      [table]).fetchone()
+        if exists and loaded and loaded[0] == fingerprint:
+            return  # same files as the last load: keep the table and its modified time
+        self._conn().execute(f'CREATE OR REPLACE TABLE "{table}" AS '
+                             f"SELECT * FROM read_parquet({[p for p, _, _ in listing]!r}, "
+                             f"hive_partitioning = false)")
+        self._empty_null_arrays(table)
+        self._touch(table, fingerprint)
+
+    def load_parquet(self, table: str, path: str):
+        """A table from a directory of Parquet parts (e.g. local_merge.py output)."""
+        self._load_parts(table, Path(path))
+
+    def load_source_1(self, path: str, table: str = SOURCE_1_TABLE):
+        """Bronze Source 1 snapshots and their quarantine, like load_source_1.sh loads them."""
+        self._load_parts(table, Path(path) / "source_1", "snapshot_date=*/*.parquet")
+        self._load_parts(f"{table}_quarantine", Path(path) / "source_1_quarantine", "snapshot_date=*/*.parquet")
+
+    def load_source_2(self, path: str, table: str = SOURCE_2_TABLE):
+        """Bronze Source 2 parts and their quarantine, like load_source_2.sh loads them."""
+        self._load_parts(table, Path(path) / "source_2")
+        self._load_parts(f"{table}_quarantine", Path(path) / "source_2_quarantine")
+
+    def _timestamps_to_tz(self, table: str):
+        """BigQuery autodetect types ISO timestamps as TIMESTAMP (UTC); DuckDB's are naive."""
+        columns = self._conn().execute(f'DESCRIBE "{table}"').fetchall()
+        exprs, changed = [], False
+        for name, col_type, *_ in columns:
+            tz_type = re.sub(r"\bTIMESTAMP\b(?! WITH)", "TIMESTAMPTZ", col_type)
+            if tz_type != col_type:
+                changed = True
+                exprs.append(f'CAST("{name}" AS {tz_type}) AS "{name}"')
+            else:
+                exprs.append(f'"{name}"')
+        if changed:
+            self._conn().execute(f'CREATE OR REPLACE TABLE "{table}" AS SELECT {", ".join(exprs)} FROM "{table}"')
+
+    def _empty_null_arrays(self, table: str):
+        """BigQuery stores NULL arrays as []; match it for top-level array columns."""
+        columns = self._conn().execute(f'DESCRIBE "{table}"').fetchall()
+        sets = [f'"{name}" = COALESCE("{name}", [])' for name, col_type, *_ in columns
+                if col_type.endswith("[]")]
+        if sets:
+            self._conn().execute(f'UPDATE "{table}" SET {", ".join(sets)}')
+
+    def query(self, sql: str, job_config: QueryJobConfig | None = None) -> QueryJob:
+        """Run one statement. With job_config.dry_run it is only planned (EXPLAIN)."""
+        translated = translate(sql, self.external_sources)
+        with self._versions_lock:
+            self._jobs += 1
+            job_id = f"duckdb_{self._jobs}"
+        statement_type = " ".join(translated.split(None, 2)[:2]).upper()
+        started = datetime.now(timezone.utc)
+        if job_config is not None and job_config.dry_run:
+            self._conn().execute(f"EXPLAIN {translated}")
+            job = QueryJob(None, None)
+        else:
+            job = self._execute(sql, translated)
+        job.job_id, job.statement_type = job_id, statement_type
+        job.started, job.ended = started, datetime.now(timezone.utc)
+        return job
+
+    def _execute(self, sql: str, translated: str) -> QueryJob:
+        copy = re.match(r"COPY\s*\(.*\)\s+TO\s+'([^']+)'", translated, re.DOTALL)
+        if copy:
+            # BigQuery's EXPORT DATA creates the object prefix, DuckDB's COPY needs the parent
+            Path(copy.group(1)).parent.mkdir(parents=True, exist_ok=True)
+            count = self._conn().execute(translated).fetchone()
+            return QueryJob(None, count[0] if count else None)
+        cursor = self._conn().execute(translated)
+        created = re.match(r"CREATE\s+(?:OR\s+REPLACE\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?\"?(\w+)\"?",
+                           translated, re.IGNORECASE)
+        if created and re.match(r"CREATE\s+TABLE\s+IF\s+NOT\s+EXISTS\b", translated, re.IGNORECASE):
+            if self._conn().execute(f'SELECT 1 FROM "{VERSIONS_TABLE}" WHERE name = ?',
+                                    [created.group(1)]).fetchone() is None:
+                self._touch(created.group(1))
+            return QueryJob(None, None)  # may be a no-op: the existing row count says nothing
+        if created:
+            self._touch(created.group(1))
+            if _EXTERNAL.match(_normalize_lexemes(sql).strip()):
+                self._timestamps_to_tz(created.group(1))
+            self._empty_null_arrays(created.group(1))
+            count = self._conn().execute(f'SELECT COUNT(*) FROM "{created.group(1)}"').fetchone()[0]
+            return QueryJob(None, count)
+        view = re.match(r"CREATE\s+(?:OR\s+REPLACE\s+)?VIEW\s+\"?(\w+)\"?", translated, re.IGNORECASE)
+        if view:
+            fingerprint = self._view_fingerprint(view.group(1), translated)
+            stored = self._conn().execute(f'SELECT fingerprint FROM "{VERSIONS_TABLE}" WHERE name = ?',
+                                          [view.group(1)]).fetchone()
+            if stored is None or stored[0] != fingerprint:
+                self._touch(view.group(1), fingerprint)
+        dropped = re.match(r"DROP\s+(?:TABLE|VIEW)\s+(?:IF\s+EXISTS\s+)?\"?(\w+)\"?",
+                           translated, re.IGNORECASE)
+        if dropped:
+            self._forget(dropped.group(1))
+        if cursor.description is None or re.match(r"(CREATE|DROP)\b", translated, re.IGNORECASE):
+            return QueryJob(None, None)
+        names = [d[0] for d in cursor.description]
+        if re.match(r"(UPDATE|INSERT|DELETE|MERGE)\b", translated, re.IGNORECASE):
+            affected = cursor.fetchone()[0]  # DML returns its affected row count
+            target = re.match(r"(?:INSERT|MERGE)\s+INTO\s+\"?(\w+)\"?", translated, re.IGNORECASE)
+            if target and affected:
+                self._empty_null_arrays(target.group(1))
+            written = target or re.match(r"(?:UPDATE|DELETE\s+FROM)\s+\"?(\w+)\"?", translated,
+                                         re.IGNORECASE)
+            if written and affected:
+                self._touch(written.group(1))
+            return QueryJob(None, affected)
+        rows = [Row(zip(names, values)) for values in cursor.fetchall()]
+        return QueryJob(rows, len(rows))
+
+    def close(self):
+        self.conn.close()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("Usage: duckdb_backend.py FILE.sql ...", file=sys.stderr)
+        return 2
+    for path in argv:
+        for statement in Path(path).read_text().split(";"):
+            if statement.strip() and _normalize_lexemes(statement).strip():
+                try:
+                    print(translate(statement) + ";\n")
+                except TranslationError as e:
+                    print(f"-- {path}: {e}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
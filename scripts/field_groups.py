@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Field groups of a person (sql/field_groups.json) and their hashes.
+
+05 hashes each group over its canonical_paths, in file order, into
+people_canonical.sync_metadata.field_hashes, and sync_hash is the MD5 of
+those hashes. The two SQL fragments that list the groups, the field_hashes
+STRUCT of 05's grouped CTE and the CONCAT of its sync_hash, are rendered
+from the file between marker comments, as derived_fields.py renders the
+portfolio taxonomy. `render` rewrites them and `check` fails when 05 is
+stale. Everything downstream reads the stored hashes: the export views
+expose field_hashes, firestore_sync.py writes only the changed groups and
+changelog.py names them.
+
+field_hashes() is the same hashing for local_merge.py rows. It serializes
+with JSON, not TO_JSON_STRING, so local hashes are only comparable with
+other local output.
+
+Usage:
+    python3 scripts/field_groups.py render
+    python3 scripts/field_groups.py check
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+from pathlib import Path
+
+DEFAULT_GROUPS_PATH = Path(__file__).parent / "sql" / "field_groups.json"
+MERGE_SQL_PATH = Path(__file__).parent / "sql" / "05_merge_canonical.sql"
+FIELD_HASHES_BLOCK = "field_hashes"
+SYNC_HASH_BLOCK = "sync_hash"
+
+_GROUP_KEYS = {"firestore_fields", "canonical_paths"}
+
+
+def load_field_groups(path: Path | str = DEFAULT_GROUPS_PATH) -> dict[str, dict]:
+    """Group name -> its fields. Raises ValueError on a malformed declaration."""
+    groups = json.loads(Path(path).read_text())["groups"]
+    if not groups:
+        raise ValueError("No field groups declared")
+    for name, group in groups.items():
+        if not name.isidentifier():
+            raise ValueError(f"Field group name {name!r} must be an identifier")
+        if set(group) != _GROUP_KEYS or not all(group[k] for k in _GROUP_KEYS):
+            raise ValueError(f"Field group {name} needs non-empty firestore_fields and canonical_paths")
+        for path in group["canonical_paths"]:
+            if not all(part.isidentifier() for part in path.split(".")):
+                raise ValueError(f"Field group {name}: canonical path {path!r} is not a column path")
+    return groups
+
+
+# -- SQL (05) ----------------------------------------------------------------
+
+def _marker(kind: str, block: str) -> str:
+    return f"-- {kind} {block}"
+
+
+def field_hashes_sql(groups: dict[str, dict], alias: str = "c") -> str:
+    """STRUCT of one MD5 per group over its canonical_paths, named by group."""
+    lines = ["STRUCT("]
+    for i, (name, group) in enumerate(groups.items()):
+        fields = [f"{alias}.{p} AS {p.split('.')[-1]}" for p in group["canonical_paths"]]
+        comma = "," if i + 1 < len(groups) else ""
+        if len(fields) == 1:
+            lines.append(f"  TO_HEX(MD5(TO_JSON_STRING(STRUCT({fields[0]})))) AS {name}{comma}")
+        else:
+            lines += ["  TO_HEX(MD5(TO_JSON_STRING(STRUCT(", ",\n".join(f"    {f}" for f in fields),
+                      f"  )))) AS {name}{comma}"]
+    lines.append(") AS field_hashes")
+    return "\n".join(lines)
+
+
+def sync_hash_sql(groups: dict[str, dict]) -> str:
+    """MD5 of the group hashes, in group order."""
+    return ("TO_HEX(MD5(CONCAT(\n"
+            + ",\n".join(f"  field_hashes.{name}" for name in groups)
+            + "\n))) AS sync_hash,")
+
+
+def _block(block: str, body: str, indent: str) -> str:
+    lines = [f"{_marker('BEGIN', block)} (rendered by scripts/field_groups.py from field_groups.json, "
+             f"do not edit by hand)", *body.split("\n"), _marker("END", block)]
+    return "\n".join(indent + line for line in lines)
+
+
+def render(groups: dict[str, dict], sql: str) -> str:
+    """05's SQL with the field_hashes and sync_hash blocks replaced by the current rendering."""
+    for block, body in ((FIELD_HASHES_BLOCK, field_hashes_sql(groups)), (SYNC_HASH_BLOCK, sync_hash_sql(groups))):
+        begin, end = _marker("BEGIN", block), _marker("END", block)
+        pattern = re.compile(rf"^([ \t]*){re.escape(begin)} .*?^[ \t]*{re.escape(end)}$",
+                             re.MULTILINE | re.DOTALL)
+        if not pattern.search(sql):
+            raise ValueError(f"{MERGE_SQL_PATH.name}: no '{begin}' ... '{end}' block")
+        sql = pattern.sub(lambda m: _block(block, body, m.group(1)), sql, count=1)
+    return sql
+
+
+# -- Local (local_merge.py) --------------------------------------------------
+
+def _value(row: dict, path: str):
+    for key in path.split("."):
+        row = row.get(key) if row is not None else None
+    return row
+
+
+def field_hashes(row: dict, groups: dict[str, dict]) -> tuple[str, dict[str, str]]:
+    """One people_canonical row -> (sync_hash, group hashes), as 05 stores them but hashed over JSON."""
+    hashes = {name: hashlib.md5(json.dumps([_value(row, p) for p in group["canonical_paths"]],
+                                           sort_keys=True, default=str).encode("utf-8")).hexdigest()
+              for name, group in groups.items()}
+    return hashlib.md5("".join(hashes.values()).encode("ascii")).hexdigest(), hashes
+
+
+# -- CLI ---------------------------------------------------------------------
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Field groups: render their hashes into 05")
+    parser.add_argument("--groups", default=str(DEFAULT_GROUPS_PATH))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("render", help=f"Rewrite the field_hashes and sync_hash blocks in {MERGE_SQL_PATH.name}")
+    sub.add_parser("check", help=f"Fail if {MERGE_SQL_PATH.name} is stale")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    groups = load_field_groups(args.groups)
+    current = MERGE_SQL_PATH.read_text()
+    rendered = render(groups, current)
+    if args.command == "render":
+        if rendered != current:
+            MERGE_SQL_PATH.write_text(rendered)
+            print(f"Rendered {len(groups)} field groups into {MERGE_SQL_PATH}")
+        else:
+            print(f"{MERGE_SQL_PATH.name} already up to date")
+        return 0
+
+    if rendered != current:
+        print(f"STALE: {MERGE_SQL_PATH.name} does not match {Path(args.groups).name}, run field_groups.py render")
+        return 1
+    print(f"OK: {MERGE_SQL_PATH.name} matches {Path(args.groups).name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
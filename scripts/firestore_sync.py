@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+"""
+Part 4: delta sync of the promoted firestore_export snapshot to Firestore.
+
+firestore_export always serves one snapshot (snapshot_versions.py). A sync
+makes Firestore match the promoted one. What Firestore already holds is
+known locally: sync_index.py keeps doc_id -> (sync_hash, field group
+hashes, synced_at) for every document written. A document is written when
+its sync_hash differs from the index, and deleted when it is indexed but has
+left the export. Firestore is never read.
+
+05 hashes each field group of sql/field_groups.json (identity, location,
+social_metrics, derived_fields, experience, education, certifications,
+skills) once per merged row. A changed document that the index already
+holds is written partially: set(..., merge=fields) with an update mask of
+the changed groups' fields plus the ungrouped ones (sync_hash,
+last_modified_at, ...). A follower-count change then sends two counts, not
+the whole profile with its about and experience_json text. New documents,
+documents whose group hashes the index does not know, and --full write the
+whole document.
+
+The snapshot's export is materialized once into firestore_sync_source,
+clustered by key_hash = TO_HEX(MD5(doc_id)). The index is sorted by the
+same key. The key space splits into --shards contiguous ranges, and each
+worker thread merge-joins one range: the export rows stream in key_hash
+order past the index entries of that range. At any moment the writers sit
+at unrelated points of the doc_id space, never on one hot lexicographic
+range. Each worker fills maximal batched commits: 500 writes, or
+MAX_BATCH_BYTES of document data, whichever comes first.
+
+Throughput follows Firestore's 500/50/5 rule: start at 500 writes/s and
+raise the rate by 50% every 5 minutes (RampLimiter). Contention and
+throttling (ABORTED, RESOURCE_EXHAUSTED, UNAVAILABLE, DEADLINE_EXCEEDED)
+retry the commit with full-jitter backoff, and cut the number of commits in
+flight (adaptive_concurrency.AIMDLimiter, under a shared RetryBudget). At
+500 writes/s rising, ~100K changed documents take about 3-4 minutes.
+
+After every commit, the batch is appended to the index journal (fsynced)
+and the shard's last key is checkpointed in the --state SQLite file. An
+interrupted sync resumes where each shard stopped. Because the index only
+ever holds committed writes, a sync to a newer snapshot can also just start
+over: the abandoned run's writes are already in the index. The index is
+compacted into its sorted base when a sync finishes.
+
+FIRESTORE_EMULATOR_HOST (or --emulator) points the client at the Firestore
+emulator. With --backend duckdb, the whole sync runs locally end to end:
+
+    gcloud emulators firestore start --host-port=localhost:8681
+    python3 scripts/firestore_sync.py --emulator localhost:8681 \\
+        --backend duckdb --database ./pipeline.duckdb
+
+Usage:
+    python3 scripts/firestore_sync.py                    # sync the promoted snapshot
+    python3 scripts/firestore_sync.py --full             # rewrite every document
+    python3 scripts/firestore_sync.py --index ./people.idx --state ./people.sqlite
+    python3 scripts/firestore_sync.py --workers 64 --shards 256
+    python3 scripts/firestore_sync.py status
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from adaptive_concurrency import AIMDLimiter, RetryBudget, call_with_retries, is_retryable
+from field_groups import DEFAULT_GROUPS_PATH, load_field_groups
+from snapshot_versions import SERVING_VIEW, SnapshotStore, _check_id
+from sync_index import SyncIndex, changed_groups, key_of
+
+DEFAULT_COLLECTION = "people"
+DEFAULT_STATE_PATH = "firestore_sync.sqlite"
+DEFAULT_INDEX_PATH = "firestore_sync.idx"
+SOURCE_TABLE = "firestore_sync_source"
+DEFAULT_SHARDS = 64
+DEFAULT_WORKERS = 32
+MAX_BATCH_WRITES = 500  # Firestore's limit per commit
+MAX_BATCH_BYTES = 9 * 1024 * 1024  # under the 10 MiB commit request limit
+RAMP_START_WRITES = 500  # writes/s
+RAMP_GROWTH = 1.5
+RAMP_PERIOD_S = 300
+CONTENTION_STATUS = {409}  # ABORTED: transaction contention
+KEY_SPACE = 16 ** 8  # shards split the first 8 hex digits of key_hash
+NOT_DOCUMENT_FIELDS = ("key_hash", "sync_snapshot", "doc_id", "field_hashes")
+
+RUNNING, FINISHED, ABANDONED = "running", "finished", "abandoned"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_runs (
+    run_id TEXT PRIMARY KEY,
+    target TEXT NOT NULL,
+    from_snapshot TEXT,
+    to_snapshot TEXT NOT NULL,
+    shards INTEGER NOT NULL,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    status TEXT NOT NULL DEFAULT 'running'
+);
+CREATE TABLE IF NOT EXISTS sync_shards (
+    run_id TEXT NOT NULL,
+    shard INTEGER NOT NULL,
+    last_key TEXT,
+    written INTEGER NOT NULL DEFAULT 0,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    unchanged INTEGER NOT NULL DEFAULT 0,
+    commits INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (run_id, shard)
+);
+"""
+
+
+class RampLimiter:
+    """Token bucket whose rate follows the 500/50/5 rule: start, then x1.5 every period."""
+
+    def __init__(self, start_rate: float = RAMP_START_WRITES, growth: float = RAMP_GROWTH,
+                 period_s: float = RAMP_PERIOD_S):
+        self.start_rate = start_rate
+        self.growth = growth
+        self.period_s = period_s
+        self._started = time.monotonic()
+        self._tokens = 0.0
+        self._last = self._started
+        self._lock = threading.Lock()
+
+    def rate(self) -> float:
+        return self.start_rate * self.growth ** int((time.monotonic() - self._started) // self.period_s)
+
+    def acquire(self, writes: int):
+        """Block until `writes` writes fit under the current rate (at most one second of burst)."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                rate = self.rate()
+                self._tokens = min(max(rate, writes), self._tokens + (now - self._last) * rate)
+                self._last = now
+                if self._tokens >= writes:
+                    self._tokens -= writes
+                    return
+                wait = (writes - self._tokens) / rate
+            time.sleep(wait)
+
+
+def is_contention(exc: Exception) -> bool:
+    """Retryable for a commit: the loader's transient errors plus ABORTED."""
+    return is_retryable(exc) or getattr(exc, "code", None) in CONTENTION_STATUS
+
+
+def source_sql(dataset: str, snapshot_id: str) -> str:
+    """Materialize one snapshot's export with its key_hash, for the shards to read in key order."""
+    return f"""CREATE OR REPLACE TABLE `{dataset}.{SOURCE_TABLE}`
+CLUSTER BY key_hash
+AS SELECT
+  TO_HEX(MD5(doc_id)) AS key_hash,
+  '{_check_id(snapshot_id)}' AS sync_snapshot,
+  * EXCEPT (last_modified_at),
+  CAST(last_modified_at AS STRING) AS last_modified_at
+FROM `{dataset}.{SERVING_VIEW}_{snapshot_id}`"""
+
+
+def shard_range(shard: int, shards: int) -> tuple[str, str | None]:
+    """[low, high) of key_hash for a shard; high None for the last one."""
+    low = f"{shard * KEY_SPACE // shards:08x}"
+    return low, (f"{(shard + 1) * KEY_SPACE // shards:08x}" if shard + 1 < shards else None)
+
+
+def shard_sql(dataset: str, shard: int, shards: int, after: str | None) -> str:
+    low, high = shard_range(shard, shards)
+    where = [f"key_hash >= '{low}'"]
+    if high is not None:
+        where.append(f"key_hash < '{high}'")
+    if after is not None:
+        where.append(f"key_hash > '{after}'")
+    return (f"SELECT * FROM `{dataset}.{SOURCE_TABLE}`\nWHERE {' AND '.join(where)}\n"
+            f"ORDER BY key_hash")
+
+
+def document(row) -> dict:
+    """A firestore_sync_source row -> the Firestore document fields."""
+    data = {k: v for k, v in row.items() if k not in NOT_DOCUMENT_FIELDS}
+    if data.get("last_modified_at"):
+        data["last_modified_at"] = datetime.fromisoformat(data["last_modified_at"])
+    return data
+
+
+class SyncState:
+    """Sync runs and per-shard checkpoints, in one SQLite file."""
+
+    def __init__(self, path: str = DEFAULT_STATE_PATH):
+        self.path = path
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per call: the shard workers are threads
+        conn = sqlite3.connect(self.path, timeout=60)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _write(self, statement: str, params: tuple):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(statement, params)
+        finally:
+            conn.close()
+
+    def _read(self, statement: str, params: tuple) -> list[sqlite3.Row]:
+        conn = self._connect()
+        try:
+            return conn.execute(statement, params).fetchall()
+        finally:
+            conn.close()
+
+    def unfinished(self, target: str) -> sqlite3.Row | None:
+        rows = self._read(f"SELECT * FROM sync_runs WHERE target = ? AND status = '{RUNNING}' "
+                          "ORDER BY started_at LIMIT 1", (target,))
+        return rows[0] if rows else None
+
+    def last_synced(self, target: str) -> str | None:
+        rows = self._read(f"SELECT to_snapshot FROM sync_runs WHERE target = ? AND status = '{FINISHED}' "
+                          "ORDER BY finished_at DESC LIMIT 1", (target,))
+        return rows[0]["to_snapshot"] if rows else None
+
+    def start(self, run_id: str, target: str, from_snapshot: str | None, to_snapshot: str, shards: int):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("INSERT INTO sync_runs (run_id, target, from_snapshot, to_snapshot, shards, "
+                             "started_at) VALUES (?, ?, ?, ?, ?, ?)",
+                             (run_id, target, from_snapshot, to_snapshot, shards,
+                              datetime.now(timezone.utc).isoformat()))
+                conn.executemany("INSERT INTO sync_shards (run_id, shard) VALUES (?, ?)",
+                                 [(run_id, shard) for shard in range(shards)])
+        finally:
+            conn.close()
+
+    def shards(self, run_id: str) -> list[sqlite3.Row]:
+        return self._read("SELECT * FROM sync_shards WHERE run_id = ? ORDER BY shard", (run_id,))
+
+    def advance(self, run_id: str, shard: int, last_key: str, written: int, deleted: int, unchanged: int):
+        """Checkpoint one committed batch (and the unchanged documents the shard passed on the way)."""
+        self._write("UPDATE sync_shards SET last_key = ?, written = written + ?, deleted = deleted + ?, "
+                    "unchanged = unchanged + ?, commits = commits + 1 WHERE run_id = ? AND shard = ?",
+                    (last_key, written, deleted, unchanged, run_id, shard))
+
+    def finish_shard(self, run_id: str, shard: int, unchanged: int):
+        self._write("UPDATE sync_shards SET done = 1, unchanged = unchanged + ? WHERE run_id = ? AND shard = ?",
+                    (unchanged, run_id, shard))
+
+    def finish(self, run_id: str, status: str = FINISHED):
+        self._write("UPDATE sync_runs SET finished_at = ?, status = ? WHERE run_id = ?",
+                    (datetime.now(timezone.utc).isoformat(), status, run_id))
+
+    def runs(self, target: str) -> list[sqlite3.Row]:
+        return self._read("""SELECT r.run_id, r.from_snapshot, r.to_snapshot, r.started_at, r.finished_at, r.status,
+  SUM(s.written) AS written, SUM(s.deleted) AS deleted, SUM(s.unchanged) AS unchanged, SUM(s.commits) AS commits,
+  SUM(s.done) AS shards_done, r.shards
+FROM sync_runs r JOIN sync_shards s USING (run_id)
+WHERE r.target = ?
+GROUP BY r.run_id
+ORDER BY r.started_at DESC""", (target,))
+
+
+def merge_join(rows, indexed, full: bool = False):
+    """Export rows and index entries, both in key order -> (key_hash, doc_id, row, indexed group hashes).
+
+    A row is yielded when the index lacks its doc_id or has another
+    sync_hash (any row with full), with the indexed group hashes (None if
+    not indexed). An index entry with no row yields row None: delete.
+    Unchanged rows are yielded with row False.
+    """
+    entry = next(indexed, None)
+    for row in rows:
+        key = key_of(row["key_hash"])
+        while entry is not None and entry[0] < key:
+            yield entry[0].hex(), entry[1], None, None
+            entry = next(indexed, None)
+        groups = None
+        if entry is not None and entry[0] == key:
+            unchanged = not full and entry[2] == row["sync_hash"]
+            groups = entry[4]
+            entry = next(indexed, None)
+            if unchanged:
+                yield row["key_hash"], row["doc_id"], False, None
+                continue
+        yield row["key_hash"], row["doc_id"], row, groups
+    while entry is not None:
+        yield entry[0].hex(), entry[1], None, None
+        entry = next(indexed, None)
+
+
+def update_mask(data: dict, changed: list[str], groups: dict[str, dict]) -> list[str]:
+    """Fields of a partial write: the changed groups' firestore_fields and every ungrouped field."""
+    grouped = {f for group in groups.values() for f in group["firestore_fields"]}
+    return ([f for f in data if f not in grouped]
+            + [f for name in changed for f in groups[name]["firestore_fields"]])
+
+
+class ShardWriter:
+    """Merge-joins one shard against the index into batched commits, recording each one."""
+
+    def __init__(self, db, collection: str, state: SyncState, index: SyncIndex, groups: dict[str, dict],
+                 run_id: str, ramp: RampLimiter, limiter: AIMDLimiter, budget: RetryBudget, stop: threading.Event):
+        self.db = db
+        self.collection = db.collection(collection)
+        self.state = state
+        self.index = index
+        self.groups = groups
+        self.run_id = run_id
+        self.ramp = ramp
+        self.limiter = limiter
+        self.budget = budget
+        self.stop = stop
+
+    def _commit(self, ops: list[tuple]):
+        def attempt():
+            batch = self.db.batch()  # a fresh batch per attempt
+            for _, doc_id, data, mask, _ in ops:
+                if data is None:
+                    batch.delete(self.collection.document(doc_id))
+                elif mask is None:
+                    batch.set(self.collection.document(doc_id), data)
+                else:
+                    batch.set(self.collection.document(doc_id), data, merge=mask)
+            # No client-side retry: contention has to reach the limiter
+            return batch.commit(retry=None)
+
+        self.ramp.acquire(len(ops))
+        call_with_retries(attempt, self.limiter, self.budget, retryable=is_contention)
+        # Only a committed batch enters the index. A partial write leaves every group at the new hashes too.
+        self.index.record([(key_hash, doc_id, data["sync_hash"] if data else None, field_hashes)
+                           for key_hash, doc_id, data, _, field_hashes in ops],
+                          datetime.now(timezone.utc))
+
+    def _field_hashes(self, row) -> dict[str, str] | None:
+        field_hashes = row.get("field_hashes")
+        if field_hashes is not None and list(field_hashes) != list(self.groups):
+            raise ValueError(f"field_hashes groups {list(field_hashes)} do not match the field groups "
+                             f"{list(self.groups)}: rerender 05 or pass the matching --groups")
+        return field_hashes
+
+    def run(self, shard: int, shards: int, rows, after: str | None, full: bool = False) -> dict:
+        low, high = shard_range(shard, shards)
+        indexed = self.index.scan(key_of(after) + b"\x00" if after else key_of(low.ljust(32, "0")),
+                                  key_of(high.ljust(32, "0")) if high else None)
+        # (key_hash, doc_id, fields or None to delete, update mask or None for the whole document, field hashes)
+        ops: list[tuple] = []
+        size = 0
+        stats = {"written": 0, "partial": 0, "deleted": 0, "unchanged": 0, "commits": 0, "bytes": 0}
+        unchanged = 0
+
+        def flush():
+            nonlocal ops, size, unchanged
+            self._commit(ops)
+            deleted = sum(1 for op in ops if op[2] is None)
+            self.state.advance(self.run_id, shard, ops[-1][0], len(ops) - deleted, deleted, unchanged)
+            stats["written"] += len(ops) - deleted
+            stats["partial"] += sum(1 for op in ops if op[3] is not None)
+            stats["deleted"] += deleted
+            stats["unchanged"] += unchanged
+            stats["commits"] += 1
+            stats["bytes"] += size
+            ops, size, unchanged = [], 0, 0
+
+        for key_hash, doc_id, row, indexed_groups in merge_join(iter(rows), indexed, full):
+            if self.stop.is_set():
+                return stats
+            if row is False:
+                unchanged += 1
+                continue
+            data = mask = field_hashes = None
+            if row is not None:
+                data = document(row)
+                field_hashes = self._field_hashes(row)
+                changed = None if full or field_hashes is None else changed_groups(indexed_groups, field_hashes)
+                if changed is not None:
+                    mask = update_mask(data, changed, self.groups)
+                    data = {f: data[f] for f in mask}
+            doc_size = len(doc_id) + (len(json.dumps(data, default=str)) if data else 0)
+            if ops and (len(ops) == MAX_BATCH_WRITES or size + doc_size > MAX_BATCH_BYTES):
+                flush()
+            ops.append((key_hash, doc_id, data, mask, field_hashes))
+            size += doc_size
+        if ops:
+            flush()
+        self.state.finish_shard(self.run_id, shard, unchanged)
+        stats["unchanged"] += unchanged
+        return stats
+
+
+def sync_run(client, db, dataset: str, collection: str, state: SyncState, index: SyncIndex,
+             groups: dict[str, dict], run: sqlite3.Row, workers: int, full: bool = False) -> dict:
+    """Merge-join and write every unfinished shard of a run, workers shards at a time. Raises the first failure."""
+    ramp = RampLimiter()
+    limiter = AIMDLimiter(initial=max(1, workers // 4), max_limit=workers)
+    budget = RetryBudget()
+    stop = threading.Event()
+    writer = ShardWriter(db, collection, state, index, groups, run["run_id"], ramp, limiter, budget, stop)
+    totals = {"written": 0, "partial": 0, "deleted": 0, "unchanged": 0, "commits": 0, "bytes": 0}
+    lock = threading.Lock()
+
+    def one(shard: sqlite3.Row):
+        try:
+            rows = client.query(shard_sql(dataset, shard["shard"], run["shards"], shard["last_key"])).result()
+            stats = writer.run(shard["shard"], run["shards"], rows, shard["last_key"], full)
+        except Exception:
+            stop.set()
+            raise
+        with lock:
+            for key, value in stats.items():
+                totals[key] += value
+
+    pending = [s for s in state.shards(run["run_id"]) if not s["done"]]
+    random.shuffle(pending)  # resumed shards should not line up by key range either
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(one, shard) for shard in pending]
+        errors = [e for e in (f.exception() for f in futures) if e is not None]
+    if errors:
+        raise errors[0]
+    state.finish(run["run_id"])
+    return {**totals, "elapsed_s": time.monotonic() - started, "final_rate": ramp.rate(),
+            "retries": budget.spent, "retries_denied": budget.denied, "final_limit": limiter.limit}
+
+
+def _materialized(client, dataset: str, snapshot_id: str) -> bool:
+    """Whether SOURCE_TABLE still holds snapshot_id's export (another sync may have replaced it)."""
+    try:
+        rows = list(client.query(f"SELECT sync_snapshot FROM `{dataset}.{SOURCE_TABLE}` LIMIT 1").result())
+    except Exception:
+        return False
+    return bool(rows) and rows[0]["sync_snapshot"] == snapshot_id
+
+
+def sync(client, db, dataset: str, collection: str, state: SyncState, index: SyncIndex, groups: dict[str, dict],
+         target: str, shards: int = DEFAULT_SHARDS, workers: int = DEFAULT_WORKERS, full: bool = False,
+         log=print) -> bool:
+    """Bring Firestore to the promoted snapshot, resuming an interrupted sync of it. Returns whether it ran."""
+    promoted = SnapshotStore(client, dataset).promoted()
+    if promoted is None:
+        log("No promoted snapshot: nothing to sync")
+        return False
+    run = state.unfinished(target)
+    if run is not None and run["to_snapshot"] != promoted:
+        # Its committed writes are in the index, so the new sync picks up from them
+        log(f"Abandoning unfinished sync to {run['to_snapshot']} (run {run['run_id']})")
+        state.finish(run["run_id"], ABANDONED)
+        run = None
+
+    if run is None:
+        synced = state.last_synced(target)
+        if promoted == synced and not full:
+            log(f"Firestore is at {promoted}: nothing to sync")
+            return False
+        log(f"Sync {synced or 'nothing'} -> {promoted}: materializing the export")
+        client.query(source_sql(dataset, promoted)).result()
+        state.start(datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ"), target, synced, promoted, shards)
+        run = state.unfinished(target)
+    else:
+        log(f"Resuming sync {run['from_snapshot'] or 'nothing'} -> {run['to_snapshot']} (run {run['run_id']})")
+        # Snapshots never change, so the same export rebuilt gives the same keys and checkpoints
+        if not _materialized(client, dataset, run["to_snapshot"]):
+            client.query(source_sql(dataset, run["to_snapshot"])).result()
+
+    stats = sync_run(client, db, dataset, collection, state, index, groups, run, workers, full)
+    documents = index.compact()
+    rate = (stats["written"] + stats["deleted"]) / stats["elapsed_s"] if stats["elapsed_s"] else 0
+    log(f"  {stats['written']:,} written ({stats['partial']:,} partial), {stats['deleted']:,} deleted, "
+        f"{stats['unchanged']:,} unchanged, in {stats['commits']:,} commits, {stats['elapsed_s']:.1f}s "
+        f"({rate:,.0f} writes/s, {stats['bytes'] / 1024 / 1024:,.1f} MiB)")
+    log(f"  Retries {stats['retries']:,} ({stats['retries_denied']:,} denied), "
+        f"commits in flight {stats['final_limit']:.1f}, ramp at {stats['final_rate']:,.0f} writes/s")
+    log(f"  Index: {documents:,} documents")
+    return True
+
+
+def print_runs(rows: list):
+    print(f"  {'run_id':<24} {'to_snapshot':<16} {'status':<10} {'written':>10} {'deleted':>8} {'unchanged':>10} "
+          f"{'commits':>8} {'shards':>9}  finished_at")
+    for r in rows:
+        shards = f"{r['shards_done']}/{r['shards']}"
+        print(f"  {r['run_id']:<24} {r['to_snapshot']:<16} {r['status']:<10} {r['written']:>10,} {r['deleted']:>8,} "
+              f"{r['unchanged']:>10,} {r['commits']:>8,} {shards:>9}  {r['finished_at'] or '-'}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Delta sync of firestore_export to Firestore")
+    parser.add_argument("command", nargs="?", choices=["sync", "status"], default="sync")
+    parser.add_argument("--backend", choices=["bigquery", "duckdb"], default="bigquery")
+    parser.add_argument("--database", default=None, help="DuckDB database file (duckdb backend)")
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION)
+    parser.add_argument("--state", default=DEFAULT_STATE_PATH, help="Sync runs and checkpoints (SQLite)")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="doc_id -> sync_hash index of what was synced")
+    parser.add_argument("--groups", default=str(DEFAULT_GROUPS_PATH), help="Field groups JSON (partial writes)")
+    parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS, help="Key-hash ranges of a new sync")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Most commits in flight")
+    parser.add_argument("--full", action="store_true",
+                        help="Write every document, even those the index has with the same sync_hash")
+    parser.add_argument("--emulator", default=None, metavar="HOST:PORT",
+                        help="Firestore emulator (sets FIRESTORE_EMULATOR_HOST)")
+    args = parser.parse_args(argv)
+    if args.backend == "duckdb" and not args.database:
+        parser.error("--backend duckdb needs --database")
+    if not 1 <= args.shards <= 4096:
+        parser.error("--shards must be between 1 and 4096")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from part3_pipeline import DATASET_ID, PROJECT_ID
+
+    if args.emulator:
+        os.environ["FIRESTORE_EMULATOR_HOST"] = args.emulator
+    emulator = os.environ.get("FIRESTORE_EMULATOR_HOST")
+    if args.backend == "duckdb":
+        from duckdb_backend import DuckDBClient
+        client = DuckDBClient(args.database)
+        source = f"duckdb:{os.path.abspath(args.database)}"
+    else:
+        from google.cloud import bigquery
+        client = bigquery.Client(project=PROJECT_ID)
+        source = f"bigquery:{PROJECT_ID}.{DATASET_ID}"
+    # One checkpoint history and index per export and Firestore collection
+    target = f"{source}->{f'emulator:{emulator}' if emulator else f'firestore:{PROJECT_ID}'}/{args.collection}"
+    state = SyncState(args.state)
+    try:
+        groups = load_field_groups(args.groups)
+        index = SyncIndex(args.index, target, list(groups))
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+
+    if args.command == "sync":
+        from google.cloud import firestore
+
+        print("=" * 60)
+        print(f"Firestore Sync: {target}")
+        print("=" * 60)
+        db = firestore.Client(project=PROJECT_ID)
+        try:
+            sync(client, db, f"{PROJECT_ID}.{DATASET_ID}", args.collection, state, index, groups, target,
+                 args.shards, args.workers, args.full)
+        except Exception as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            print("Committed batches are in the index and checkpoints: rerun to resume", file=sys.stderr)
+            return 1
+        finally:
+            index.close()
+    else:
+        print(f"Index {args.index}: {index.count:,} documents, {index.pending():,} journal entries")
+        index.close()
+    print_runs(state.runs(target))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""
+Per-statement job telemetry, dry-run estimates and byte budgets for part3_pipeline.py.
+
+Every statement goes through RunTelemetry.run(). It records the job's
+statistics: job id, statement type, bytes processed and billed, slot-ms,
+bytes spilled to disk in shuffle (summed over the query plan stages), cache
+hit, affected rows and duration. At the end of the run the records are
+written twice:
+
+- a JSON run report (one file per run, with per-step totals), and
+- the `statements` table of a local SQLite history, next to a `runs` row.
+
+Before a statement executes, a BigQuery dry run (free) estimates the bytes it
+will scan whenever its step has a byte budget, or for every statement with
+--dry-run. A statement that would take its step past the budget is not
+submitted. BudgetExceeded fails the step and aborts the run. With --dry-run
+nothing executes, and the report holds the estimates per step.
+
+regressions() compares each step's bytes with the last completed run on the
+same target in the history, to catch a SQL change that doubles a scan.
+DuckDB has no byte accounting, so only durations and rows are recorded
+there.
+
+The history is a single SQLite file (same conventions as snapshot_cache.py).
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+DEFAULT_HISTORY_PATH = "part3_history.sqlite"
+DEFAULT_REPORT_DIR = "pipeline_runs"
+DEFAULT_BUDGETS_PATH = Path(__file__).parent / "sql" / "byte_budgets.json"
+REGRESSION_FACTOR = 1.5  # flag steps scanning this much more than last run
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    target TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    dry_run INTEGER NOT NULL,
+    status TEXT,
+    bytes_processed INTEGER,
+    report_path TEXT
+);
+CREATE TABLE IF NOT EXISTS statements (
+    run_id TEXT NOT NULL,
+    step TEXT NOT NULL,
+    statement INTEGER NOT NULL,
+    job_id TEXT,
+    statement_type TEXT,
+    estimated_bytes INTEGER,
+    bytes_processed INTEGER,
+    bytes_billed INTEGER,
+    slot_ms INTEGER,
+    shuffle_spilled_bytes INTEGER,
+    cache_hit INTEGER,
+    rows INTEGER,
+    duration_ms INTEGER,
+    error TEXT,
+    PRIMARY KEY (run_id, step, statement)
+);
+"""
+
+_STATISTICS = ("job_id", "statement_type", "bytes_processed", "bytes_billed", "slot_ms",
+               "shuffle_spilled_bytes", "cache_hit", "rows", "duration_ms")
+_TOTALS = ("estimated_bytes", "bytes_processed", "bytes_billed", "slot_ms", "shuffle_spilled_bytes",
+           "duration_ms")
+_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4}
+
+
+class BudgetExceeded(RuntimeError):
+    """A statement would take its step past the step's byte budget."""
+
+
+def parse_size(text: str | int) -> int:
+    """'50GB' / '1.5TB' / 1024 -> bytes (binary units, as BigQuery bills)."""
+    if isinstance(text, int):
+        return text
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*", text.upper())
+    if not m:
+        raise ValueError(f"Invalid size {text!r} (expected e.g. 500MB, 50GB)")
+    return int(float(m.group(1)) * _UNITS[m.group(2) + "B" if m.group(2) else ""])
+
+
+def format_bytes(n: int | None) -> str:
+    if n is None:
+        return "n/a"
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024:
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.2f}TB"
+
+
+def load_budgets(path: Path | str | None, overrides: list[str] | None = None) -> dict[str, int]:
+    """Step key -> byte budget from a JSON file ({"steps": {"05": "60GB"}}) plus STEP=SIZE overrides."""
+    budgets = {}
+    if path and Path(path).exists():
+        budgets = {k: parse_size(v) for k, v in json.loads(Path(path).read_text())["steps"].items()}
+    for item in overrides or []:
+        step, _, size = item.partition("=")
+        if not size:
+            raise ValueError(f"Invalid budget {item!r} (expected STEP=SIZE, e.g. 05=60GB)")
+        budgets[step] = parse_size(size)
+    return budgets
+
+
+def job_statistics(job) -> dict:
+    """The statistics we keep from a finished bigquery.QueryJob (or DuckDB QueryJob)."""
+    started, ended = getattr(job, "started", None), getattr(job, "ended", None)
+    plan = getattr(job, "query_plan", None) or []
+    rows = getattr(job, "num_dml_affected_rows", None)
+    cache_hit = getattr(job, "cache_hit", None)
+    return {
+        "job_id": getattr(job, "job_id", None),
+        "statement_type": getattr(job, "statement_type", None),
+        "bytes_processed": getattr(job, "total_bytes_processed", None),
+        "bytes_billed": getattr(job, "total_bytes_billed", None),
+        "slot_ms": getattr(job, "slot_millis", None),
+        "shuffle_spilled_bytes": sum(getattr(s, "shuffle_output_bytes_spilled", 0) or 0 for s in plan)
+        if plan else None,
+        "cache_hit": None if cache_hit is None else int(cache_hit),
+        "rows": rows if rows is not None else getattr(job, "total_rows", None),
+        "duration_ms": int((ended - started).total_seconds() * 1000) if started and ended else None,
+    }
+
+
+class RunTelemetry:
+    """Statement runner and recorder for one pipeline run (thread-safe)."""
+
+    def __init__(self, run_id: str, target: str, dry_run_config, budgets: dict[str, int] | None = None,
+                 dry_run: bool = False):
+        self.run_id = run_id
+        self.target = target
+        self.dry_run_config = dry_run_config  # QueryJobConfig(dry_run=True, use_query_cache=False)
+        self.budgets = budgets or {}
+        self.dry_run = dry_run
+        self.started_at = datetime.now(timezone.utc)
+        self.records: list[dict] = []
+        self._lock = threading.Lock()
+
+    def _record(self, step: str, index: int, **fields) -> dict:
+        record = {"step": step, "statement": index, "estimated_bytes": None, "error": None,
+                  **dict.fromkeys(_STATISTICS), **fields}
+        with self._lock:
+            self.records.append(record)
+        return record
+
+    def spent(self, step: str) -> int:
+        """Bytes the step has processed (or, in a dry run, is estimated to) so far."""
+        with self._lock:
+            return sum((r["bytes_processed"] if not self.dry_run else r["estimated_bytes"]) or 0
+                       for r in self.records if r["step"] == step)
+
+    def estimate(self, client, statement: str) -> int | None:
+        job = client.query(statement, job_config=self.dry_run_config)
+        return getattr(job, "total_bytes_processed", None)
+
+    def run(self, client, step: str, index: int, statement: str):
+        """Estimate if needed, enforce the step budget, execute and record. Returns the job.
+
+        In a dry run the dry-run job is returned (nothing executes).
+        """
+        budget = self.budgets.get(step)
+        estimated = None
+        if self.dry_run or budget is not None:
+            try:
+                estimated = self.estimate(client, statement)
+            except Exception as e:
+                self._record(step, index, error=f"dry run: {e}")
+                raise
+        if budget is not None and estimated is not None and self.spent(step) + estimated > budget:
+            message = (f"step {step} statement {index} would scan {format_bytes(estimated)}, "
+                       f"{format_bytes(self.spent(step))} already spent of the {format_bytes(budget)} budget")
+            self._record(step, index, estimated_bytes=estimated, error=f"budget: {message}")
+            raise BudgetExceeded(message)
+        if self.dry_run:
+            self._record(step, index, estimated_bytes=estimated)
+            return _Estimate(estimated)
+
+        started = time.monotonic()
+        try:
+            job = client.query(statement)
+            job.result()
+        except Exception as e:
+            self._record(step, index, estimated_bytes=estimated, error=str(e),
+                         duration_ms=int((time.monotonic() - started) * 1000))
+            raise
+        stats = job_statistics(job)
+        if stats["duration_ms"] is None:
+            stats["duration_ms"] = int((time.monotonic() - started) * 1000)
+        self._record(step, index, estimated_bytes=estimated, **stats)
+        return job
+
+    def step_totals(self) -> dict[str, dict]:
+        totals: dict[str, dict] = {}
+        with self._lock:
+            records = list(self.records)
+        for r in records:
+            # A total stays None when no statement reported it (DuckDB has no byte counts)
+            t = totals.setdefault(r["step"], {"statements": 0, "errors": 0, **dict.fromkeys(_TOTALS)})
+            t["statements"] += 1
+            t["errors"] += r["error"] is not None
+            for name in _TOTALS:
+                if r[name] is not None:
+                    t[name] = (t[name] or 0) + r[name]
+        return totals
+
+    def report(self, status: str) -> dict:
+        return {
+            "run_id": self.run_id,
+            "target": self.target,
+            "dry_run": self.dry_run,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "status": status,
+            "budgets": self.budgets,
+            "steps": self.step_totals(),
+            "statements": sorted(self.records, key=lambda r: (r["step"], r["statement"])),
+        }
+
+    def write(self, status: str, report_dir: str, history: "RunHistory | None") -> Path:
+        """JSON report into report_dir, and the run into the SQLite history."""
+        report = self.report(status)
+        path = Path(report_dir) / f"part3_run_{self.run_id}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, indent=2, default=str))
+        if history is not None:
+            history.save(report, str(path))
+        return path
+
+
+class _Estimate:
+    """Stand-in job for a dry-run statement (run_sql_file reads total_rows / errors)."""
+
+    def __init__(self, estimated_bytes: int | None):
+        self.total_bytes_processed = estimated_bytes
+        self.total_rows = None
+        self.errors = None
+
+    def result(self):
+        return iter(())
+
+
+class RunHistory:
+    """Local SQLite history of runs and their statements, for regression tracking."""
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60)
+        try:
+            with conn:  # commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def save(self, report: dict, report_path: str):
+        columns = ["job_id", "statement_type", "estimated_bytes", "bytes_processed", "bytes_billed",
+                   "slot_ms", "shuffle_spilled_bytes", "cache_hit", "rows", "duration_ms", "error"]
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO runs (run_id, target, started_at, finished_at, dry_run, status, "
+                "bytes_processed, report_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (report["run_id"], report["target"], report["started_at"], report["finished_at"],
+                 int(report["dry_run"]), report["status"],
+                 sum(s["bytes_processed"] or 0 for s in report["steps"].values()), report_path),
+            )
+            conn.executemany(
+                f"INSERT OR REPLACE INTO statements (run_id, step, statement, {', '.join(columns)}) "
+                f"VALUES (?, ?, ?, {', '.join('?' * len(columns))})",
+                [(report["run_id"], r["step"], r["statement"], *[r[c] for c in columns])
+                 for r in report["statements"]],
+            )
+
+    def last_step_bytes(self, target: str, before_run: str) -> dict[str, int]:
+        """Bytes per step of the most recent completed, executed run on target (other than before_run)."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT run_id FROM runs WHERE target = ? AND dry_run = 0 AND status = 'succeeded' "
+                "AND run_id != ? ORDER BY started_at DESC LIMIT 1",
+                (target, before_run),
+            ).fetchone()
+            if row is None:
+                return {}
+            rows = conn.execute(
+                "SELECT step, SUM(COALESCE(bytes_processed, 0)) FROM statements "
+                "WHERE run_id = ? GROUP BY step", (row[0],),
+            ).fetchall()
+        return {step: total for step, total in rows}
+
+
+def regressions(totals: dict[str, dict], previous: dict[str, int], dry_run: bool,
+                factor: float = REGRESSION_FACTOR) -> list[tuple[str, int, int]]:
+    """(step, previous bytes, current bytes) for steps scanning >= factor x the last run."""
+    flagged = []
+    for step, t in sorted(totals.items()):
+        now = t["estimated_bytes"] if dry_run else t["bytes_processed"]
+        before = previous.get(step)
+        if before and now and now >= factor * before:
+            flagged.append((step, before, now))
+    return flagged
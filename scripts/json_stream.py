@@ -0,0 +1,120 @@
+"""
+Incremental JSON record reader.
+
+Source 2 files are JSON arrays ([{...}, {...}, ...]) of ~40MB each. Parsing
+them with json.loads() holds the whole file (text + objects) in memory; this
+reader decodes one element at a time from a binary stream so memory is
+bounded by the read chunk plus the largest single record.
+
+Also accepts a single top-level object or concatenated/newline-delimited
+objects, so the same reader works for Source 1 JSONL. For splitting one large
+JSONL file across workers, iter_jsonl_range() reads a newline-aligned byte
+range from a seekable stream.
+"""
+
+import codecs
+import json
+
+CHUNK_CHARS = 1024 * 1024
+MAX_RECORD_CHARS = 64 * 1024 * 1024  # guard against buffering a corrupt file
+_WHITESPACE = " \t\n\r"
+
+_decoder = json.JSONDecoder()
+
+
+def iter_json_records(fileobj, chunk_size: int = CHUNK_CHARS):
+    """Yield top-level records from a binary file-like object."""
+    reader = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        raw = fileobj.read(chunk_size)
+        if not raw:
+            eof = True
+            buf = buf[pos:] + reader.decode(b"", final=True)
+            pos = 0
+            return False
+        buf = buf[pos:] + reader.decode(raw)
+        pos = 0
+        return True
+
+    def skip(chars: str) -> str | None:
+        """Advance past `chars`; return the next significant char (or None at EOF)."""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not fill():
+                return None
+
+    first = skip(_WHITESPACE)
+    if first is None:
+        return
+    in_array = first == "["
+    if in_array:
+        pos += 1
+
+    while True:
+        nxt = skip(_WHITESPACE + ",")
+        if nxt is None:
+            if in_array:
+                raise ValueError("Unexpected end of input inside JSON array")
+            return
+        if in_array and nxt == "]":
+            return
+
+        while True:
+            try:
+                record, end = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if len(buf) - pos < MAX_RECORD_CHARS and fill():
+                    continue
+                raise
+            # A number/literal cut at the buffer edge can decode "successfully"
+            if end == len(buf) and not eof and fill():
+                continue
+            break
+
+        pos = end
+        yield record
+
+
+def iter_json_file(path: str, chunk_size: int = CHUNK_CHARS):
+    """Convenience wrapper: yield records from a local path."""
+    with open(path, "rb") as f:
+        yield from iter_json_records(f, chunk_size)
+
+
+def split_byte_ranges(size: int, parts: int) -> list[tuple[int, int]]:
+    """Split [0, size) into `parts` contiguous byte ranges (not yet line-aligned)."""
+    parts = max(1, min(parts, size or 1))
+    step = -(-size // parts)
+    return [(start, min(start + step, size)) for start in range(0, size, step)] or [(0, 0)]
+
+
+def iter_jsonl_range(fileobj, start: int, end: int):
+    """Yield JSONL records whose line starts at a byte offset in [start, end).
+
+    Ranges from split_byte_ranges() therefore cover every line exactly once,
+    wherever the range boundaries fall.
+    """
+    if start > 0:
+        fileobj.seek(start - 1)
+        fileobj.readline()  # finish the line that began before `start`
+    else:
+        fileobj.seek(0)
+    pos = fileobj.tell()
+    while pos < end:
+        line = fileobj.readline()
+        if not line:
+            break
+        pos += len(line)
+        if line.strip():
+            yield json.loads(line)
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Resumable, incremental loader for the Source 2 bronze parts.
+
+bronze.py source-2 writes one bronze part and one quarantine part per Source 2
+file (bronze.source_2_parts). This loads each file's pair of parts into
+bronze_source_2 / bronze_source_2_quarantine with WRITE_APPEND Parquet load
+jobs, one file per work item, so a quarter in which most files are unchanged
+only loads the files that changed.
+
+Progress is tracked per source file in a SQLite manifest (load_manifest.py),
+keyed by the file's content checksum:
+- Workers claim files through leases, so several loader processes - or
+  machines sharing the manifest - can drain the same queue. Re-running after
+  a crash only reloads unfinished files.
+- Rows are tagged with _source_file. Before a file is loaded again - a retry
+  of a failed attempt, or a file whose checksum changed since it was loaded
+  (needs_cleanup) - its rows are deleted from both tables.
+- Files that disappeared from the source have their rows deleted and are
+  dropped from the manifest.
+- --replace drops both tables and resets the manifest for a full reload.
+
+Backend calls (load jobs, deletes) run through an AIMD concurrency limiter
+with jittered retries under a shared retry budget (adaptive_concurrency.py);
+--workers is only the upper bound, and a part load slower than
+--latency-target counts as congestion. Retrying a WRITE_APPEND load is not
+safe by itself: a submission whose response was lost may still run. Each
+load job therefore gets a deterministic job_id (file, checksum, part index,
+manifest claim); a retry fetches that job with get_job and waits for it
+instead of submitting the part again. A job that ran and failed is left to
+the manifest's next attempt, which deletes the file's rows and, as a new
+claim, uses a new job_id. DELETEs by _source_file are idempotent and are
+retried as they are.
+
+Run from Cloud Shell after bronze.py source-2 (load_source_2.sh does both):
+    python3 scripts/load_bronze_source_2.py --dest gs://coffeespace-sandbox-bronze/current/
+    python3 scripts/load_bronze_source_2.py --dest gs://coffeespace-sandbox-bronze/current/ --replace
+"""
+
+import argparse
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from adaptive_concurrency import AIMDLimiter, RetryBudget, call_with_retries
+from bronze import SOURCE_2_URI, source_2_parts
+from load_manifest import LoadManifest, claim_id, default_worker_id, row_to_object
+from object_store import is_gcs, list_objects
+
+PROJECT = "coffeespace-sandbox"
+DATASET = "coffeespace_canonical"
+TABLE = "bronze_source_2"
+QUARANTINE_TABLE = "bronze_source_2_quarantine"
+MAX_WORKERS = 20  # Upper bound; the AIMD limiter finds the working level
+LATENCY_TARGET_S = 120.0  # A part load slower than this cuts the concurrency limit
+MANIFEST_PATH = "source_2_manifest.sqlite"
+
+
+class Backend:
+    """One pooled BigQuery client per process plus shared flow control."""
+
+    def __init__(self, project: str, max_workers: int, latency_target_s: float = LATENCY_TARGET_S):
+        self.client = make_bq_client(project, pool_size=max_workers)
+        self.limiter = AIMDLimiter(initial=min(4, max_workers), max_limit=max_workers,
+                                   latency_target_s=latency_target_s)
+        self.budget = RetryBudget()
+
+    def call(self, fn):
+        return call_with_retries(fn, self.limiter, self.budget)
+
+
+class LoadJobFailed(Exception):
+    """A load job ran and failed: its job_id is spent, so it is not retried in place."""
+
+
+def make_bq_client(project: str, pool_size: int):
+    """BigQuery client whose HTTP connection pool fits every worker thread."""
+    import google.auth
+    from google.auth.transport.requests import AuthorizedSession
+    from google.cloud import bigquery
+    from requests.adapters import HTTPAdapter
+
+    credentials, _ = google.auth.default(
+        scopes=["https://www.googleapis.com/auth/cloud-platform"]
+    )
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    return bigquery.Client(project=project, credentials=credentials, _http=session)
+
+
+def parquet_job_config():
+    """WRITE_APPEND Parquet load; the schema comes from the parts themselves."""
+    from google.cloud import bigquery
+
+    parquet_options = bigquery.ParquetOptions()
+    parquet_options.enable_list_inference = True
+    return bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.PARQUET,
+        parquet_options=parquet_options,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+    )
+
+
+def load_job_id(obj, part_index: int, claim: str) -> str:
+    """Deterministic job_id of one part load: the same file version, part and claim map to one job."""
+    key = f"{obj.name}|{obj.checksum}|{part_index}|{claim}"
+    return f"bronze_source_2_{hashlib.sha256(key.encode()).hexdigest()[:32]}"
+
+
+def _not_found(exc: Exception) -> bool:
+    return getattr(exc, "code", None) == 404
+
+
+def load_part(backend: Backend, uri: str, table_ref: str, job_config, job_id: str) -> int:
+    """Load one Parquet part (gs:// or local) into a table; returns rows loaded.
+
+    The first try submits the job under job_id; retries get_job(job_id) and
+    only submit if BigQuery never received it.
+    """
+    submitted = False
+
+    def submit():
+        if is_gcs(uri):
+            return backend.client.load_table_from_uri(uri, table_ref, job_id=job_id,
+                                                      job_config=job_config)
+        with open(uri, "rb") as f:
+            return backend.client.load_table_from_file(f, table_ref, job_id=job_id,
+                                                       job_config=job_config)
+
+    def run():
+        nonlocal submitted
+        job = None
+        if submitted:
+            try:
+                job = backend.client.get_job(job_id)
+            except Exception as e:
+                if not _not_found(e):
+                    raise
+        if job is None:
+            submitted = True
+            job = submit()
+        try:
+            return job.result().output_rows
+        except Exception as e:
+            if getattr(job, "error_result", None):
+                raise LoadJobFailed(f"{job_id}: {job.error_result}") from e
+            raise  # polling failed; the job may still be running
+    return backend.call(run)
+
+
+def load_one_file(obj, claim: str, backend: Backend, dest: str,
+                  table_refs: tuple[str, str], job_config):
+    """Load a source file's bronze part and quarantine part."""
+    try:
+        rows = 0
+        parts = zip(source_2_parts(dest, obj.name), table_refs)
+        for index, (uri, table_ref) in enumerate(parts):
+            loaded = load_part(backend, uri, table_ref, job_config, load_job_id(obj, index, claim))
+            rows = rows or loaded  # the bronze part's count; quarantine rows are not records
+        return (obj.name, rows)
+    except Exception as e:
+        return (obj.name, f"Error: {e}")
+
+
+def prepare_tables(backend: Backend, table_refs: tuple[str, str], replace: bool):
+    """Drop both tables for a full reload; load jobs create them from the Parquet schema."""
+    if replace:
+        for table_ref in table_refs:
+            backend.client.delete_table(table_ref, not_found_ok=True)
+
+
+def delete_file_rows(backend: Backend, table_refs: tuple[str, str], source_file: str):
+    """Remove a file's rows (from an older version or an unfinished attempt) from both tables."""
+    from google.cloud import bigquery
+
+    job_config = bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ScalarQueryParameter("source_file", "STRING", source_file),
+    ])
+    for table_ref in table_refs:
+        backend.call(lambda: backend.client.query(
+            f"DELETE FROM `{table_ref}` WHERE _source_file = @source_file",
+            job_config=job_config,
+        ).result())
+
+
+def worker_loop(worker_id: str, manifest: LoadManifest, process, delete_rows, on_result):
+    """Claim and process files until the manifest queue is drained."""
+    while (row := manifest.claim(worker_id)) is not None:
+        obj = row_to_object(row)
+        try:
+            # Rows of an older version of the file, or of an unfinished attempt
+            if row["needs_cleanup"] or row["attempts"] > 1:
+                delete_rows(obj.name)
+                manifest.cleaned(obj.name, worker_id)
+            name, result = process(obj, claim_id(row))
+        except Exception as e:
+            name, result = obj.name, f"Error: {e}"
+
+        if isinstance(result, int):
+            manifest.complete(name, worker_id, result)
+        else:
+            manifest.fail(name, worker_id, result)
+        on_result(obj, result)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Load Source 2 bronze parts into BigQuery, resumably and incrementally")
+    parser.add_argument("--source", default=SOURCE_2_URI,
+                        help="Source 2 gs:// prefix or local directory (file checksums)")
+    parser.add_argument("--dest", required=True,
+                        help="Bronze prefix bronze.py source-2 wrote the parts under")
+    parser.add_argument("--pattern", default="*.json")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="SQLite manifest path")
+    parser.add_argument("--replace", action="store_true",
+                        help="Drop both tables, reset the manifest and reload every file")
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--latency-target", type=float, default=LATENCY_TARGET_S,
+                        help="Seconds per part load above which concurrency is cut")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("=" * 60)
+    print("Source 2 Bronze Loader")
+    print("=" * 60)
+
+    backend = Backend(PROJECT, args.workers, args.latency_target)
+    table_refs = (f"{PROJECT}.{DATASET}.{TABLE}", f"{PROJECT}.{DATASET}.{QUARANTINE_TABLE}")
+
+    print(f"\nListing files in {args.source}...")
+    objects = list_objects(args.source, args.pattern)
+    print(f"Found {len(objects)} JSON files")
+
+    if not objects:
+        print("ERROR: No JSON files found!")
+        return 1
+
+    manifest = LoadManifest(args.manifest, max_attempts=args.max_attempts)
+    if args.replace:
+        manifest.reset()
+    new_files = manifest.register(objects)
+    removed = manifest.names() - {o.name for o in objects}
+    before = manifest.counts()
+    print(f"Manifest {args.manifest}: {new_files} new or changed files, "
+          f"{before.get('done', {}).get('files', 0)} loaded, {len(removed)} removed")
+
+    # Exactly one process per manifest prepares the tables; the rest wait for it
+    if manifest.claim_flag("table_prepared"):
+        print(f"\nStep 1: {'Replacing' if args.replace else 'Appending to'} {', '.join(table_refs)}")
+        prepare_tables(backend, table_refs, replace=args.replace)
+        manifest.set_flag("table_ready")
+    else:
+        print(f"\nStep 1: Resuming into existing {', '.join(table_refs)}")
+        while manifest.get_flag("table_ready") is None:
+            time.sleep(2)
+
+    for name in sorted(removed):
+        delete_file_rows(backend, table_refs, name)
+    manifest.forget(removed)
+
+    print(f"\nStep 2: Draining queue with {args.workers} workers...")
+    job_config = parquet_job_config()
+
+    def process(obj, claim):
+        return load_one_file(obj, claim, backend, args.dest, table_refs, job_config)
+
+    def delete_rows(name):
+        delete_file_rows(backend, table_refs, name)
+
+    loaded = 0
+    processed = 0
+    failures = 0
+    lock = threading.Lock()
+    started = time.time()
+
+    def on_result(obj, result):
+        nonlocal loaded, processed, failures
+        with lock:
+            processed += 1
+            if isinstance(result, int):
+                loaded += result
+                if processed % 50 == 0:
+                    rate = loaded / max(time.time() - started, 1e-9)
+                    print(f"  Progress: {processed} files this run, {loaded:,} rows "
+                          f"({rate:,.0f} rows/s, concurrency limit "
+                          f"{backend.limiter.limit:.1f})")
+            else:
+                failures += 1
+                if failures <= 3:
+                    print(f"  WARN: {obj.name}: {result}")
+
+    worker_prefix = default_worker_id()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(worker_loop, f"{worker_prefix}:{i}", manifest, process,
+                            delete_rows, on_result)
+            for i in range(args.workers)
+        ]
+        for future in as_completed(futures):
+            future.result()
+
+    elapsed = time.time() - started
+    counts = manifest.counts()
+    failed = manifest.failed()
+    unfinished = sum(v["files"] for k, v in counts.items() if k != "done")
+
+    # Summary
+    print("\n" + "=" * 60)
+    print("Summary")
+    print("=" * 60)
+    print(f"Rows loaded this run: {loaded:,}")
+    print(f"Files loaded this run: {processed}")
+    print(f"Elapsed: {elapsed:.1f}s ({loaded / max(elapsed, 1e-9):,.0f} rows/s)")
+    print(f"Final concurrency limit: {backend.limiter.limit:.1f} "
+          f"(retries: {backend.budget.spent}, denied by budget: {backend.budget.denied})")
+    print(f"Manifest: {counts.get('done', {}).get('files', 0)}/"
+          f"{sum(v['files'] for v in counts.values())} files done, "
+          f"{counts.get('done', {}).get('rows', 0):,} rows total")
+    print(f"Failed files: {len(failed)}")
+
+    if failed:
+        print("\nFailed files (first 10):")
+        for row in failed[:10]:
+            print(f"  {row['name']} (attempts={row['attempts']}): {row['error']}")
+
+    # Verify
+    print("\nVerifying row counts...")
+    for table_ref in table_refs:
+        result = list(backend.client.query(f"SELECT COUNT(*) as cnt FROM `{table_ref}`").result())
+        print(f"  {table_ref}: {result[0].cnt:,}")
+
+    return 0 if not unfinished else 1
+
+
+if __name__ == "__main__":
+    exit(main())
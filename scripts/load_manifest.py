@@ -0,0 +1,269 @@
+"""
+Persistent per-file manifest and lease-based work queue for the Source 2 bronze loader.
+
+Each source file has one row recording its state, row count, attempt count
+and last error. Workers claim files by taking a time-limited lease, so any
+number of threads or processes can drain the same queue; a worker that dies
+simply lets its lease expire and the file is picked up again.
+
+The store is a single SQLite database. Several processes on one machine can
+share it directly; several machines can share it on a filesystem with working
+POSIX locks. All state transitions run inside BEGIN IMMEDIATE transactions.
+
+States: pending -> leased -> done | failed (failed files are retried until
+max_attempts is reached).
+
+needs_cleanup marks a file whose rows from an earlier version may still be
+in the target table: register() sets it when a known file's checksum
+changed, mark_cleanup() when the caller knows the table holds an older
+version. The worker deletes those rows before loading and calls cleaned(),
+which also records the checksum they were cleaned for, so the same version
+is never cleaned twice. Files that left the source are dropped with
+forget() once their rows are deleted.
+"""
+
+import os
+import socket
+import sqlite3
+import time
+
+from object_store import ObjectInfo
+
+DEFAULT_LEASE_SECONDS = 600
+DEFAULT_MAX_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    uri TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    checksum TEXT,
+    state TEXT NOT NULL DEFAULT 'pending',
+    rows INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    lease_owner TEXT,
+    lease_expires REAL,
+    updated_at REAL,
+    needs_cleanup INTEGER NOT NULL DEFAULT 0,
+    cleaned_checksum TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Columns added after the first release: manifests created earlier get them on open
+_ADDED_COLUMNS = {
+    "needs_cleanup": "needs_cleanup INTEGER NOT NULL DEFAULT 0",
+    "cleaned_checksum": "cleaned_checksum TEXT",
+}
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LoadManifest:
+    """SQLite-backed file manifest with lease-based claiming."""
+
+    def __init__(self, path: str, lease_seconds: int = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(files)")}
+        for column, ddl in _ADDED_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE files ADD COLUMN {ddl}")
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per call: connections must not cross threads
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _transaction(self, fn):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    # -- setup ---------------------------------------------------------------
+
+    def register(self, objects: list[ObjectInfo]) -> int:
+        """Add new files and requeue files whose checksum changed; return how many.
+
+        A requeued file is marked needs_cleanup: its old rows are in the table.
+        """
+        def fn(conn):
+            before = conn.total_changes
+            conn.executemany(
+                """
+                INSERT INTO files (name, uri, size, checksum, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET
+                    uri = excluded.uri, size = excluded.size, checksum = excluded.checksum,
+                    state = 'pending', rows = NULL, attempts = 0, error = NULL,
+                    lease_owner = NULL, lease_expires = NULL, updated_at = excluded.updated_at,
+                    needs_cleanup = 1
+                WHERE files.checksum IS NOT excluded.checksum
+                """,
+                [(o.name, o.uri, o.size, o.checksum, time.time()) for o in objects],
+            )
+            return conn.total_changes - before
+        return self._transaction(fn)
+
+    def mark_cleanup(self, names: set[str]):
+        """Mark unfinished files whose older rows are in the table, unless this version was cleaned."""
+        self._transaction(lambda conn: conn.executemany(
+            "UPDATE files SET needs_cleanup = 1 "
+            "WHERE name = ? AND state != 'done' AND cleaned_checksum IS NOT checksum",
+            [(name,) for name in names]))
+
+    def cleaned(self, name: str, owner: str):
+        """Record that the file's older rows were deleted."""
+        self._transaction(lambda conn: conn.execute(
+            "UPDATE files SET needs_cleanup = 0, cleaned_checksum = checksum "
+            "WHERE name = ? AND lease_owner = ?", (name, owner)))
+
+    def forget(self, names: set[str]):
+        """Drop files that are no longer in the source (their rows are deleted)."""
+        self._transaction(lambda conn: conn.executemany(
+            "DELETE FROM files WHERE name = ?", [(name,) for name in names]))
+
+    def reset(self):
+        """Forget all progress (fresh full reload)."""
+        self._transaction(lambda conn: (conn.execute("DELETE FROM files"),
+                                        conn.execute("DELETE FROM meta")))
+
+    def claim_flag(self, key: str) -> bool:
+        """Atomically set a one-shot flag; True only for the first caller."""
+        def fn(conn):
+            cur = conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)",
+                               (key, str(time.time())))
+            return cur.rowcount == 1
+        return self._transaction(fn)
+
+    def get_flag(self, key: str) -> str | None:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            return row["value"] if row else None
+        finally:
+            conn.close()
+
+    def set_flag(self, key: str, value: str = "1"):
+        self._transaction(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)))
+
+    # -- work queue ----------------------------------------------------------
+
+    def claim(self, owner: str) -> sqlite3.Row | None:
+        """Lease the next runnable file, or return None when the queue is drained."""
+        def fn(conn):
+            now = time.time()
+            row = conn.execute(
+                """
+                SELECT * FROM files
+                WHERE state = 'pending'
+                   OR (state = 'leased' AND lease_expires < ?)
+                   OR (state = 'failed' AND attempts < ?)
+                ORDER BY attempts, name
+                LIMIT 1
+                """,
+                (now, self.max_attempts),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE files SET state = 'leased', attempts = attempts + 1, "
+                "lease_owner = ?, lease_expires = ?, updated_at = ? WHERE name = ?",
+                (owner, now + self.lease_seconds, now, row["name"]),
+            )
+            return conn.execute("SELECT * FROM files WHERE name = ?", (row["name"],)).fetchone()
+        return self._transaction(fn)
+
+    def renew(self, name: str, owner: str) -> bool:
+        """Extend a lease; False if it was lost to another worker."""
+        def fn(conn):
+            now = time.time()
+            cur = conn.execute(
+                "UPDATE files SET lease_expires = ?, updated_at = ? "
+                "WHERE name = ? AND state = 'leased' AND lease_owner = ?",
+                (now + self.lease_seconds, now, name, owner),
+            )
+            return cur.rowcount == 1
+        return self._transaction(fn)
+
+    def complete(self, name: str, owner: str, rows: int) -> bool:
+        def fn(conn):
+            cur = conn.execute(
+                "UPDATE files SET state = 'done', rows = ?, error = NULL, "
+                "lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE name = ? AND lease_owner = ?",
+                (rows, time.time(), name, owner),
+            )
+            return cur.rowcount == 1
+        return self._transaction(fn)
+
+    def fail(self, name: str, owner: str, error: str) -> bool:
+        def fn(conn):
+            cur = conn.execute(
+                "UPDATE files SET state = 'failed', error = ?, "
+                "lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE name = ? AND lease_owner = ?",
+                (error[:2000], time.time(), name, owner),
+            )
+            return cur.rowcount == 1
+        return self._transaction(fn)
+
+    # -- reporting -----------------------------------------------------------
+
+    def counts(self) -> dict:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT state, COUNT(*) AS n, COALESCE(SUM(rows), 0) AS r "
+                "FROM files GROUP BY state"
+            ).fetchall()
+            return {row["state"]: {"files": row["n"], "rows": row["r"]} for row in rows}
+        finally:
+            conn.close()
+
+    def names(self) -> set[str]:
+        conn = self._connect()
+        try:
+            return {row["name"] for row in conn.execute("SELECT name FROM files")}
+        finally:
+            conn.close()
+
+    def failed(self) -> list[sqlite3.Row]:
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT name, attempts, error FROM files WHERE state = 'failed' ORDER BY name"
+            ).fetchall()
+        finally:
+            conn.close()
+
+
+def claim_id(row: sqlite3.Row) -> str:
+    """Identifies one claim of a file (attempt number and lease time), e.g. for backend job ids."""
+    return f"{row['attempts']}@{row['updated_at']!r}"
+
+
+def row_to_object(row: sqlite3.Row) -> ObjectInfo:
+    return ObjectInfo(uri=row["uri"], name=row["name"], size=row["size"],
+                      checksum=row["checksum"])
@@ -0,0 +1,66 @@
+#!/bin/bash
+# Load Source 1 into BigQuery
+# Run this from Cloud Shell or a GCE VM for best performance
+#
+# Source 1 is one large JSONL file. bronze.py splits it into byte ranges and
+# converts them in parallel (one process per core, bounded memory per
+# worker) into typed Parquet parts with an explicit schema and a
+# snapshot_date column. bq load then replaces that day's partition of
+# bronze_source_1, which is partitioned by snapshot_date and clustered by
+# linkedinID; earlier snapshots stay queryable. The quarantine parts carry
+# snapshot_date too and replace only that day's partition of
+# bronze_source_1_quarantine. 01 points raw_source_1 and
+# raw_source_1_quarantine at the latest snapshot.
+
+set -euo pipefail
+
+PROJECT="coffeespace-sandbox"
+DATASET="coffeespace_canonical"
+TABLE="bronze_source_1"
+QUARANTINE_TABLE="bronze_source_1_quarantine"
+SOURCE_URI="gs://coffeespace-sandbox-source-1/CoffeeSpaceTestDatav4.jsonl"
+BRONZE_PREFIX="${BRONZE_PREFIX:-gs://coffeespace-sandbox-bronze/current}"
+SNAPSHOT_DATE="${SNAPSHOT_DATE:-$(date -u +%Y-%m-%d)}"
+WORKERS="${WORKERS:-$(nproc)}"
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
+echo "Converting ${SOURCE_URI} -> ${BRONZE_PREFIX}/ (snapshot ${SNAPSHOT_DATE}, ${WORKERS} workers)"
+python3 "${SCRIPT_DIR}/bronze.py" source-1 \
+  --source "${SOURCE_URI}" \
+  --dest "${BRONZE_PREFIX}/" \
+  --snapshot-date "${SNAPSHOT_DATE}" \
+  --workers "${WORKERS}"
+
+echo "Loading parts into ${PROJECT}:${DATASET}.${TABLE} (partition ${SNAPSHOT_DATE})"
+bq load \
+  --source_format=PARQUET \
+  --parquet_enable_list_inference \
+  --time_partitioning_field=snapshot_date \
+  --time_partitioning_type=DAY \
+  --clustering_fields=linkedinID \
+  --replace \
+  "${PROJECT}:${DATASET}.${TABLE}\$${SNAPSHOT_DATE//-/}" \
+  "${BRONZE_PREFIX}/source_1/snapshot_date=${SNAPSHOT_DATE}/*.parquet"
+
+# The quarantine table used to hold only the last conversion, unpartitioned:
+# drop it once so the partitioned load can create it
+if ! bq show --format=json "${PROJECT}:${DATASET}.${QUARANTINE_TABLE}" 2>/dev/null \
+    | grep -q '"timePartitioning"'; then
+  bq rm -f -t "${PROJECT}:${DATASET}.${QUARANTINE_TABLE}" >/dev/null 2>&1 || true
+fi
+
+echo "Loading quarantine into ${PROJECT}:${DATASET}.${QUARANTINE_TABLE} (partition ${SNAPSHOT_DATE})"
+bq load \
+  --source_format=PARQUET \
+  --time_partitioning_field=snapshot_date \
+  --time_partitioning_type=DAY \
+  --replace \
+  "${PROJECT}:${DATASET}.${QUARANTINE_TABLE}\$${SNAPSHOT_DATE//-/}" \
+  "${BRONZE_PREFIX}/source_1_quarantine/snapshot_date=${SNAPSHOT_DATE}/*.parquet"
+
+echo "Done. Verifying row counts..."
+bq query --use_legacy_sql=false \
+  "SELECT snapshot_date, COUNT(*) AS row_count
+   FROM \`${PROJECT}.${DATASET}.${TABLE}\`
+   GROUP BY snapshot_date ORDER BY snapshot_date DESC LIMIT 5"
@@ -3,27 +3,43 @@
 # Run this from Cloud Shell or a GCE VM for best performance
 #
 # Source 2 files are JSON arrays [...], not JSONL.
-# This script converts them on-the-fly and loads into BigQuery.
+# bronze.py parses each file once (one process per core) against the explicit
+# Source 2 schema and writes typed Parquet parts plus a quarantine side-table
+# of values that failed coercion. load_bronze_source_2.py loads them with the
+# schema embedded in the Parquet files - no autodetect pass, no json_line
+# re-parsing downstream.
+#
+# The bronze prefix is stable across quarterly runs and the converter consults
+# the snapshot cache, so files byte-identical to last quarter's are neither
+# downloaded nor converted again. The loader's manifest (file -> checksum)
+# likewise only loads new or changed files, deleting a changed file's old rows
+# first, and resumes where it stopped after a crash. Set REPLACE=1 to drop the
+# tables and reload every file.
 
 set -euo pipefail
 
 PROJECT="coffeespace-sandbox"
 DATASET="coffeespace_canonical"
-TABLE="raw_source_2"
+TABLE="bronze_source_2"
+QUARANTINE_TABLE="bronze_source_2_quarantine"
 SOURCE_BUCKET="gs://coffeespace-sandbox-source-2"
+BRONZE_PREFIX="${BRONZE_PREFIX:-gs://coffeespace-sandbox-bronze/current}"
+CACHE="${CACHE:-snapshot_cache.sqlite}"
+MANIFEST="${MANIFEST:-source_2_manifest.sqlite}"
+WORKERS="${WORKERS:-$(nproc)}"
 
-echo "Loading Source 2 from ${SOURCE_BUCKET}/*.json"
-echo "Converting JSON arrays to NDJSON and loading into ${PROJECT}:${DATASET}.${TABLE}"
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 
-gsutil cat "${SOURCE_BUCKET}/*.json" \
-  | jq -c 'if type=="array" then .[] else . end' \
-  | bq load \
-      --source_format=NEWLINE_DELIMITED_JSON \
-      --autodetect \
-      --replace \
-      "${PROJECT}:${DATASET}.${TABLE}" \
-      -
+echo "Converting ${SOURCE_BUCKET}/*.json -> ${BRONZE_PREFIX}/ (${WORKERS} workers)"
+python3 "${SCRIPT_DIR}/bronze.py" source-2 \
+  --source "${SOURCE_BUCKET}/" \
+  --dest "${BRONZE_PREFIX}/" \
+  --workers "${WORKERS}" \
+  --cache "${CACHE}"
 
-echo "Done. Verifying row count..."
-bq query --use_legacy_sql=false \
-  "SELECT COUNT(*) as row_count FROM \`${PROJECT}.${DATASET}.${TABLE}\`"
+echo "Loading parts into ${PROJECT}:${DATASET}.${TABLE} and ${QUARANTINE_TABLE}"
+python3 "${SCRIPT_DIR}/load_bronze_source_2.py" \
+  --source "${SOURCE_BUCKET}/" \
+  --dest "${BRONZE_PREFIX}/" \
+  --manifest "${MANIFEST}" \
+  ${REPLACE:+--replace}
@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+Offline merge engine: 05_merge_canonical.sql, out of core, to Parquet.
+
+Reads the staged tables written by local_staging.py and produces
+people_canonical rows with the same FULL OUTER JOIN on linkedin_id, the same
+COALESCE precedence (Source 1 first for identity and location, most recent
+for social metrics) and the same provenance / sync_metadata structs.
+
+Two phases, both in a process pool:
+
+1. Partition: every staged Parquet part is streamed in record batches and
+   split by hash(linkedin_id) into P spill files per side (Arrow IPC). The
+   hash is the canonical_id MD5, so it is computed once per row.
+2. Merge: each partition holds ~1/P of both inputs and every row for its
+   ids, so it is joined and merged on its own and written as one Parquet
+   part. P grows with the input size (PARTITION_MB of staged Parquet per
+   partition), so peak memory per worker does not depend on the total size.
+
+Experience / education are deduplicated by experience_id / education_id in
+one pass (first occurrence wins, Source 1 before Source 2 as in the
+ARRAY_CONCAT); 05 uses SELECT DISTINCT over whole structs, which only
+differs when two entries share an id but not every other field.
+
+Duplicate linkedin_ids within one source join like the SQL does (every
+Source 1 row pairs with every Source 2 row of the same id), then one row per
+id is kept: the most recent Source 1 last_updated, as 05's QUALIFY does.
+
+provenance.content_hash is 05's change-detection hash. It is an MD5 over the
+source-derived columns, excluding CURRENT_TIMESTAMP() values. The
+sync_metadata hashes (one MD5 per sql/field_groups.json group, and
+sync_hash over them) are computed after derived_fields, as 05's grouped CTE
+does. This engine serializes with JSON, not TO_JSON_STRING, so its hashes
+are only comparable with its own earlier output. parity() treats them as
+volatile.
+
+Like 05, the merge is incremental. An existing <out>/people_canonical is
+spilled into the same partitions as a third side, and each partition applies
+05's MERGE to it: new ids are inserted, rows whose content_hash or
+computation_method changed are rewritten with their first_seen_at,
+last_synced_at and record_version + 1, tombstones come back the same way,
+ids that left both sources are tombstoned (provenance.deleted_at), and every
+other row is kept as it was. --full-refresh starts from an empty table.
+
+derived_fields are computed per partition as 05 computes them in the same
+pass: primary_portfolio with derived_fields.PortfolioClassifier (the
+portfolio_taxonomy.json regexes on RE2, vectorized over the partition), and
+years_of_experience with CURRENT_DATE() taken as the run date (UTC).
+
+Usage:
+    python3 scripts/local_merge.py --staging ./staging --out ./canonical
+    python3 scripts/local_merge.py --staging ./staging --workers 16 --partitions 512
+    python3 scripts/local_merge.py --staging ./staging --out ./canonical --full-refresh
+    python3 scripts/local_merge.py parity --expected fixture/people_canonical.json --actual ./canonical/people_canonical
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from derived_fields import PortfolioClassifier, load_taxonomy, years_of_experience
+from field_groups import field_hashes, load_field_groups
+from local_staging import STAGING_SCHEMA, parity
+
+DEFAULT_STAGING_DIR = "staging"
+DEFAULT_OUTPUT_DIR = "canonical"
+PARTITION_MB = 32  # staged Parquet (compressed) per merge partition
+MIN_PARTITIONS_PER_WORKER = 4
+BATCH_ROWS = 10000
+SIDES = ("stg_source_1", "stg_source_2")
+PREVIOUS = "people_canonical"  # spill side of the table being merged into
+
+INSERTED, UPDATED, TOMBSTONED, UNCHANGED = "inserted", "updated", "tombstoned", "unchanged"
+OUTCOMES = (INSERTED, UPDATED, TOMBSTONED, UNCHANGED)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_TS = pa.timestamp("us", tz="UTC")
+
+CANONICAL_SCHEMA = pa.schema([
+    ("canonical_id", pa.string()),
+    ("linkedin_id", pa.string()),
+    STAGING_SCHEMA.field("identity"),
+    STAGING_SCHEMA.field("identity_sources"),
+    STAGING_SCHEMA.field("location"),
+    STAGING_SCHEMA.field("social_metrics"),
+    STAGING_SCHEMA.field("experience"),
+    STAGING_SCHEMA.field("education"),
+    STAGING_SCHEMA.field("certifications"),
+    STAGING_SCHEMA.field("skills"),
+    STAGING_SCHEMA.field("computed_signals"),
+    ("derived_fields", pa.struct([
+        ("primary_portfolio", pa.string()),
+        ("years_of_experience", pa.float64()),
+        ("computation_method", pa.string()),
+    ])),
+    ("provenance", pa.struct([
+        ("source_systems", pa.list_(pa.string())),
+        ("source_1_id", pa.string()),
+        ("source_2_id", pa.string()),
+        ("source_1_last_updated", _TS),
+        ("source_2_last_updated", _TS),
+        ("content_hash", pa.string()),
+        ("first_seen_at", _TS),
+        ("last_merged_at", _TS),
+        ("record_version", pa.int64()),
+        ("deleted_at", _TS),
+    ])),
+    ("sync_metadata", pa.struct([
+        ("firestore_doc_id", pa.string()),
+        ("last_synced_at", _TS),
+        ("sync_hash", pa.string()),
+        ("field_hashes", pa.struct([(name, pa.string()) for name in load_field_groups()])),
+    ])),
+    STAGING_SCHEMA.field("normalization_errors"),
+    ("last_merged_date", pa.date32()),
+])
+
+# CURRENT_TIMESTAMP() columns, here and inherited from stg_source_2
+VOLATILE_PATHS = {
+    "identity_sources[].last_updated", "social_metrics.metrics_as_of",
+    "provenance.source_2_last_updated", "provenance.first_seen_at", "provenance.last_merged_at",
+    "provenance.content_hash", "sync_metadata.sync_hash", "sync_metadata.field_hashes", "last_merged_date",
+}
+
+
+def canonical_id(linkedin_id: str) -> str:
+    """TO_HEX(MD5(linkedin_id))."""
+    return hashlib.md5(linkedin_id.encode("utf-8")).hexdigest()
+
+
+def partition_of(linkedin_id: str, partitions: int) -> int:
+    return int(canonical_id(linkedin_id)[:8], 16) % partitions
+
+
+# -- Phase 1: partition ------------------------------------------------------
+
+def spill_path(spill_dir: str, side: str, partition: int, part: int) -> Path:
+    return Path(spill_dir) / side / f"p{partition:05d}" / f"part-{part:05d}.arrow"
+
+
+def partition_part(side: str, path: str, part: int, spill_dir: str, partitions: int,
+                   schema: pa.Schema = STAGING_SCHEMA) -> int:
+    """Split one staged (or previous people_canonical) Parquet part into per-partition spill files (worker process)."""
+    writers: dict[int, pa.ipc.RecordBatchStreamWriter] = {}
+    rows = 0
+    try:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=BATCH_ROWS):
+            batch = batch.cast(schema) if batch.schema != schema else batch
+            keys = [partition_of(k, partitions) for k in batch.column("linkedin_id").to_pylist()]
+            groups: dict[int, list[int]] = {}
+            for i, p in enumerate(keys):
+                groups.setdefault(p, []).append(i)
+            for p, indices in groups.items():
+                if p not in writers:
+                    out = spill_path(spill_dir, side, p, part)
+                    out.parent.mkdir(parents=True, exist_ok=True)
+                    writers[p] = pa.ipc.new_stream(str(out), schema)
+                writers[p].write_batch(batch.take(pa.array(indices, pa.int32())))
+            rows += batch.num_rows
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return rows
+
+
+# -- Phase 2: merge ----------------------------------------------------------
+
+def _coalesce(*values):
+    for value in values:
+        if value is not None:
+            return value
+    return None
+
+
+def _dedupe(items: list[dict], key: str) -> list[dict]:
+    seen = set()
+    out = []
+    for item in items:
+        if item[key] not in seen:
+            seen.add(item[key])
+            out.append(item)
+    return out
+
+
+def content_hash(row: dict) -> str:
+    """MD5 over what 05 hashes: source-derived columns minus CURRENT_TIMESTAMP() values."""
+    provenance = row["provenance"]
+    payload = {
+        "identity": row["identity"],
+        "identity_sources": [{k: v for k, v in src.items() if k != "last_updated"}
+                             for src in row["identity_sources"]],
+        "location": row["location"],
+        "connections": row["social_metrics"]["connections"],
+        "followers": row["social_metrics"]["followers"],
+        **{name: row[name] for name in ("experience", "education", "certifications", "skills",
+                                        "computed_signals", "normalization_errors")},
+        **{name: provenance[name] for name in ("source_systems", "source_1_id", "source_2_id",
+                                               "source_1_last_updated")},
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.md5(encoded.encode("utf-8")).hexdigest()
+
+
+def merge_rows(s1: dict | None, s2: dict | None, run_ts: datetime) -> dict:
+    """One people_canonical row from a joined (stg_source_1, stg_source_2) pair."""
+    linkedin_id = (s1 or s2)["linkedin_id"]
+    empty = {}
+    id1, id2 = (s1 or empty).get("identity") or empty, (s2 or empty).get("identity") or empty
+    loc1, loc2 = (s1 or empty).get("location") or empty, (s2 or empty).get("location") or empty
+    sm1, sm2 = (s1 or empty).get("social_metrics") or empty, (s2 or empty).get("social_metrics") or empty
+
+    as_of_1, as_of_2 = sm1.get("metrics_as_of"), sm2.get("metrics_as_of")
+    # CASE WHEN s1.as_of >= COALESCE(s2.as_of, epoch): NULL s1.as_of takes the ELSE branch
+    prefer_1 = as_of_1 is not None and as_of_1 >= _coalesce(as_of_2, EPOCH)
+
+    def metric(name):
+        if prefer_1:
+            return sm1.get(name)
+        return _coalesce(sm2.get(name), sm1.get(name))
+
+    def both(field):
+        return ((s1 or empty).get(field) or []) + ((s2 or empty).get(field) or [])
+
+    if s1 and s2:
+        source_systems = ["source_1", "source_2"]
+    elif s1:
+        source_systems = ["source_1"]
+    else:
+        source_systems = ["source_2"]
+
+    return {
+        "canonical_id": canonical_id(linkedin_id),
+        "linkedin_id": linkedin_id,
+        "identity": {
+            name: _coalesce(id1.get(name), id2.get(name))
+            for name in ("full_name", "first_name", "last_name", "headline", "about")
+        },
+        "identity_sources": both("identity_sources"),
+        "location": {
+            "display_string": _coalesce(loc1.get("display_string"), loc2.get("display_string")),
+            "country": loc1.get("country"),
+            "region": loc1.get("region"),
+            "locality": _coalesce(loc1.get("locality"), loc2.get("locality")),
+            "country_code": _coalesce(loc1.get("country_code"), loc2.get("country_code")),
+            "location_ids": loc1.get("location_ids") or [],
+        },
+        "social_metrics": {
+            "connections": metric("connections"),
+            "followers": metric("followers"),
+            "metrics_as_of": max(_coalesce(as_of_1, EPOCH), _coalesce(as_of_2, EPOCH)),
+        },
+        "experience": sorted(_dedupe(both("experience"), "experience_id"),
+                             key=lambda e: (e["experience_id"], e["source_system"])),
+        "education": sorted(_dedupe(both("education"), "education_id"),
+                            key=lambda e: (e["education_id"], e["source_system"])),
+        "certifications": (s2 or empty).get("certifications") or [],
+        "skills": sorted({s for s in both("skills") if s is not None}),
+        "computed_signals": (s1 or empty).get("computed_signals"),
+        # Filled in per partition by merge_partition() (vectorized classifier)
+        "derived_fields": {"primary_portfolio": None, "years_of_experience": None,
+                           "computation_method": None},
+        "provenance": {
+            "source_systems": source_systems,
+            "source_1_id": (s1 or empty).get("source_id"),
+            "source_2_id": (s2 or empty).get("source_id"),
+            "source_1_last_updated": (s1 or empty).get("last_updated"),
+            "source_2_last_updated": (s2 or empty).get("last_updated"),
+            "content_hash": None,
+            "first_seen_at": run_ts,
+            "last_merged_at": run_ts,
+            "record_version": 1,
+            "deleted_at": None,
+        },
+        # Hashed per partition by merge_partition(), after derived_fields
+        "sync_metadata": {"firestore_doc_id": linkedin_id, "last_synced_at": None, "sync_hash": None,
+                          "field_hashes": None},
+        "normalization_errors": both("normalization_errors"),
+        "last_merged_date": run_ts.date(),
+    }
+
+
+def _read_partition(spill_dir: str, side: str, partition: int) -> dict[str, list[dict]]:
+    rows: dict[str, list[dict]] = {}
+    directory = Path(spill_dir) / side / f"p{partition:05d}"
+    for path in sorted(directory.glob("*.arrow")):
+        with pa.ipc.open_stream(str(path)) as reader:
+            for batch in reader:
+                for row in batch.to_pylist():
+                    rows.setdefault(row["linkedin_id"], []).append(row)
+    return rows
+
+
+def apply_merge(previous: dict | None, candidate: dict | None, run_ts: datetime) -> tuple[str, dict]:
+    """05's MERGE for one id: (outcome, row) from its previous row and its candidate."""
+    if previous is None:
+        return INSERTED, candidate
+    before = previous["provenance"]
+    if candidate is None:
+        if before["deleted_at"] is not None:
+            return UNCHANGED, previous
+        # WHEN NOT MATCHED BY SOURCE: tombstone
+        previous["provenance"] = {**before, "last_merged_at": run_ts,
+                                  "record_version": before["record_version"] + 1, "deleted_at": run_ts}
+        previous["last_merged_date"] = run_ts.date()
+        return TOMBSTONED, previous
+    if (before["content_hash"] == candidate["provenance"]["content_hash"]
+            and previous["derived_fields"]["computation_method"]
+            == candidate["derived_fields"]["computation_method"]
+            and before["deleted_at"] is None):
+        return UNCHANGED, previous
+    # WHEN MATCHED: rewrite, keeping first_seen_at and last_synced_at
+    candidate["provenance"].update(first_seen_at=before["first_seen_at"],
+                                   record_version=before["record_version"] + 1)
+    candidate["sync_metadata"].update(firestore_doc_id=previous["sync_metadata"]["firestore_doc_id"],
+                                      last_synced_at=previous["sync_metadata"]["last_synced_at"])
+    return UPDATED, candidate
+
+
+def merge_partition(spill_dir: str, partition: int, out_path: str, run_ts: datetime,
+                    taxonomy: dict, groups: dict[str, dict]) -> dict:
+    """FULL OUTER JOIN one partition, MERGE it into its previous rows and write its part (worker process)."""
+    s1_rows = _read_partition(spill_dir, "stg_source_1", partition)
+    s2_rows = _read_partition(spill_dir, "stg_source_2", partition)
+    previous = {linkedin_id: rows[0]
+                for linkedin_id, rows in _read_partition(spill_dir, PREVIOUS, partition).items()}
+    merged = []
+    matched = 0
+    for linkedin_id in sorted(s1_rows.keys() | s2_rows.keys()):
+        left = s1_rows.get(linkedin_id, [None])
+        right = s2_rows.get(linkedin_id, [None])
+        if left[0] is not None and right[0] is not None:
+            matched += 1
+        candidates = []
+        for s1 in left:
+            for s2 in right:
+                row = merge_rows(s1, s2, run_ts)
+                row["provenance"]["content_hash"] = content_hash(row)
+                candidates.append(row)
+        # QUALIFY ROW_NUMBER() OVER (ORDER BY source_1_last_updated DESC, content_hash) = 1
+        merged.append(min(candidates, key=lambda r: (
+            r["provenance"]["source_1_last_updated"] is None,
+            -(r["provenance"]["source_1_last_updated"] or EPOCH).timestamp(),
+            r["provenance"]["content_hash"],
+        )))
+    classifier = PortfolioClassifier(taxonomy)
+    portfolios = classifier.classify([row["identity"]["headline"] for row in merged]).to_pylist()
+    for row, portfolio in zip(merged, portfolios):
+        row["derived_fields"] = {
+            "primary_portfolio": portfolio,
+            "years_of_experience": years_of_experience(row["experience"], run_ts.date()),
+            "computation_method": classifier.computation_method,
+        }
+        sync = row["sync_metadata"]
+        sync["sync_hash"], sync["field_hashes"] = field_hashes(row, groups)
+
+    counts = dict.fromkeys(OUTCOMES, 0)
+    candidates = {row["linkedin_id"]: row for row in merged}
+    rows = []
+    for linkedin_id in sorted(candidates.keys() | previous.keys()):
+        outcome, row = apply_merge(previous.get(linkedin_id), candidates.get(linkedin_id), run_ts)
+        counts[outcome] += 1
+        rows.append(row)
+    if rows:
+        pq.write_table(pa.Table.from_pylist(rows, schema=CANONICAL_SCHEMA), out_path,
+                       compression="zstd")
+    return {"rows": len(rows), "matched_ids": matched, **counts}
+
+
+# -- Driver ------------------------------------------------------------------
+
+def choose_partitions(staging_dir: str, workers: int) -> int:
+    staged = sum(p.stat().st_size for side in SIDES
+                 for p in (Path(staging_dir) / side).glob("*.parquet"))
+    by_size = -(-staged // (PARTITION_MB * 1024 * 1024))
+    return max(workers * MIN_PARTITIONS_PER_WORKER, by_size)
+
+
+def merge(staging_dir: str, out_dir: str, workers: int, partitions: int | None = None,
+          keep_spill: bool = False, full_refresh: bool = False) -> dict:
+    partitions = partitions or choose_partitions(staging_dir, workers)
+    table_dir = Path(out_dir) / "people_canonical"
+    spill_dir = Path(out_dir) / "_spill"
+    shutil.rmtree(spill_dir, ignore_errors=True)
+    table_dir.mkdir(parents=True, exist_ok=True)
+    previous = sorted(table_dir.glob("part-*.parquet"))
+    if full_refresh:
+        for old in previous:
+            old.unlink()
+        previous = []
+
+    inputs = [(side, str(path), STAGING_SCHEMA) for side in SIDES
+              for path in sorted((Path(staging_dir) / side).glob("*.parquet"))]
+    inputs += [(PREVIOUS, str(path), CANONICAL_SCHEMA) for path in previous]
+    run_ts = datetime.now(timezone.utc)
+    taxonomy = load_taxonomy()
+    groups = load_field_groups()
+    stats = {"partitions": partitions, "input_rows": 0, "rows": 0, "matched_ids": 0,
+             **dict.fromkeys(OUTCOMES, 0)}
+    started = time.time()
+
+    # spawn: never fork a process that already holds a GCS client
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        print(f"Partitioning {len(inputs)} staged and previous parts into {partitions} partitions")
+        futures = [pool.submit(partition_part, side, path, i, str(spill_dir), partitions, schema)
+                   for i, (side, path, schema) in enumerate(inputs)]
+        for future in as_completed(futures):
+            stats["input_rows"] += future.result()
+        stats["partition_s"] = time.time() - started
+        print(f"  {stats['input_rows']:,} rows spilled in {stats['partition_s']:.1f}s")
+        # The previous table is spilled: its parts are replaced by the merged ones
+        for old in previous:
+            old.unlink()
+
+        print(f"Merging {partitions} partitions with {workers} workers")
+        futures = [
+            pool.submit(merge_partition, str(spill_dir), p,
+                        str(table_dir / f"part-{p:05d}.parquet"), run_ts, taxonomy, groups)
+            for p in range(partitions)
+        ]
+        for i, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            for key in ("rows", "matched_ids", *OUTCOMES):
+                stats[key] += result[key]
+            if i % 50 == 0 or i == len(futures):
+                print(f"  {i}/{partitions} partitions, {stats['rows']:,} rows")
+
+    if not keep_spill:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+    stats["elapsed_s"] = time.time() - started
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline merge engine (05 SQL mirror)")
+    sub = parser.add_subparsers(dest="command")
+
+    check = sub.add_parser("parity", help="Compare local output with a BigQuery export")
+    check.add_argument("--expected", required=True, help="NDJSON or JSON array export of people_canonical")
+    check.add_argument("--actual", required=True, help="Local people_canonical Parquet directory")
+
+    parser.add_argument("--staging", default=DEFAULT_STAGING_DIR, help="local_staging.py output directory")
+    parser.add_argument("--out", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--partitions", type=int, default=None,
+                        help=f"Default: one per {PARTITION_MB}MB staged, at least "
+                             f"{MIN_PARTITIONS_PER_WORKER} per worker")
+    parser.add_argument("--keep-spill", action="store_true")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="Rebuild <out>/people_canonical from scratch instead of merging into it")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "parity":
+        return parity("people_canonical", args.expected, args.actual,
+                      schema=CANONICAL_SCHEMA, volatile=VOLATILE_PATHS)
+
+    print("=" * 60)
+    print("Local Merge (05 mirror)")
+    print("=" * 60)
+    stats = merge(args.staging, args.out, args.workers, args.partitions, args.keep_spill,
+                  args.full_refresh)
+
+    print("\n" + "=" * 60)
+    print("Summary")
+    print("=" * 60)
+    print(f"Staged rows in:     {stats['input_rows']:,}")
+    print(f"Canonical rows out: {stats['rows']:,} ({stats['matched_ids']:,} ids in both sources)")
+    print(f"Merge:              {stats[INSERTED]:,} inserted, {stats[UPDATED]:,} updated, "
+          f"{stats[TOMBSTONED]:,} tombstoned, {stats[UNCHANGED]:,} unchanged")
+    print(f"Partitions:         {stats['partitions']}")
+    print(f"Elapsed:            {stats['elapsed_s']:.1f}s "
+          f"(partition {stats['partition_s']:.1f}s, "
+          f"{stats['input_rows'] / stats['elapsed_s'] if stats['elapsed_s'] else 0:,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
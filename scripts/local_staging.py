@@ -0,0 +1,703 @@
+#!/usr/bin/env python3
+"""
+Offline staging engine: the 03/04 staging SQL, in Python, to Parquet.
+
+Produces the same rows as 03_staging_source_1.sql (stg_source_1) and
+04_staging_source_2.sql (stg_source_2) from the raw sources, without a
+BigQuery rebuild, so normalization changes can be iterated at local-disk
+speed. Records are read in batches and each batch is built column by column
+with pyarrow:
+- Name cleaning and the EXTRA_WHITESPACE check use pyarrow.compute regexes
+  (RE2, the same engine BigQuery uses)
+- Date strings ('Oct 2024', 'Present', ISO timestamps) are low-cardinality:
+  each batch column is dictionary-encoded and only distinct values are
+  parsed, through memoized parsers shared across batches
+- experience_id / education_id are MD5 hex digests of the same CONCATs
+- Each record also goes through bronze.py's Coercer, as it does before 03/04
+  run: typed scalars (metrics, signals) are its values and its quarantined
+  values become the COERCION_FAILED errors
+
+BigQuery semantics mirrored explicitly: JSON_VALUE (scalars only, as
+strings), SAFE.PARSE_DATE('%b %Y'), and CAST(TIMESTAMP AS
+STRING) ('YYYY-MM-DD HH:MM:SS[.ffffff]+00') inside the Source 1 hashes.
+CURRENT_TIMESTAMP() is the run's start time, as it is per query in BigQuery.
+
+Files (Source 2) and byte ranges (Source 1) are staged in a process pool;
+each task writes one Parquet part under <out>/stg_source_N/.
+
+Parity: export the BigQuery staging table built from the same fixture
+(bq extract --destination_format NEWLINE_DELIMITED_JSON, or
+bq query --format=prettyjson) and compare it with the local output:
+
+    python3 scripts/local_staging.py parity --table stg_source_2 \\
+        --expected fixture/stg_source_2.json --actual staging/stg_source_2
+
+Usage:
+    python3 scripts/local_staging.py stage --source-1 ./s1.jsonl --source-2 ./s2/ --out ./staging
+    python3 scripts/local_staging.py stage --only source_2 --source-2 gs://coffeespace-sandbox-source-2/
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import bronze
+from json_stream import iter_json_records, iter_jsonl_range, split_byte_ranges
+from object_store import list_objects, open_stream
+
+SOURCE_1_URI = "gs://coffeespace-sandbox-source-1/CoffeeSpaceTestDatav4.jsonl"
+SOURCE_2_URI = "gs://coffeespace-sandbox-source-2/"
+DEFAULT_OUTPUT_DIR = "staging"
+BATCH_ROWS = 5000
+SOURCE_1_RANGE_MB = 256
+
+# -- Output schema (matches the BigQuery staging tables) ---------------------
+
+_ERROR = pa.struct([("field", pa.string()), ("error", pa.string()), ("raw_value", pa.string())])
+_TS = pa.timestamp("us", tz="UTC")
+
+_IDENTITY_FIELDS = [
+    ("full_name", pa.string()), ("first_name", pa.string()), ("last_name", pa.string()),
+    ("headline", pa.string()), ("about", pa.string()),
+]
+_IDENTITY_SOURCE_FIELDS = [
+    ("source_system", pa.string()), ("full_name", pa.string()), ("headline", pa.string()),
+    ("about", pa.string()), ("last_updated", _TS),
+]
+_LOCATION_FIELDS = [
+    ("display_string", pa.string()), ("country", pa.string()), ("region", pa.string()),
+    ("locality", pa.string()), ("country_code", pa.string()), ("location_ids", pa.list_(pa.int64())),
+]
+_METRICS_FIELDS = [("connections", pa.int64()), ("followers", pa.int64()), ("metrics_as_of", _TS)]
+_EXPERIENCE_FIELDS = [
+    ("experience_id", pa.string()), ("company_name", pa.string()),
+    ("company_linkedin_id", pa.string()), ("title", pa.string()),
+    ("start_date", pa.date32()), ("end_date", pa.date32()), ("location", pa.string()),
+    ("description", pa.string()), ("is_current", pa.bool_()), ("source_system", pa.string()),
+]
+_EDUCATION_FIELDS = [
+    ("education_id", pa.string()), ("institution_name", pa.string()), ("degree", pa.string()),
+    ("field_of_study", pa.string()), ("start_date", pa.date32()), ("end_date", pa.date32()),
+    ("source_system", pa.string()),
+]
+_CERTIFICATION_FIELDS = [
+    ("title", pa.string()), ("issuing_org", pa.string()), ("issue_date", pa.date32()),
+    ("credential_id", pa.string()),
+]
+_SIGNAL_FIELDS = [
+    ("likely_to_explore", "computed_likelyToExplore"),
+    ("recently_left_company", "computed_recentlyLeftCompany"),
+    ("potential_to_leave", "computed_potentialToLeave"),
+    ("prior_backed_founder", "computed_priorBackedFounder"),
+    ("unicorn_early_engineer", "computed_unicornEarlyEngineer"),
+    ("big_tech_alum_private", "computed_bigTechAlumPrivate"),
+    ("big_tech_alum_public", "computed_bigTechAlumPublic"),
+]
+
+STAGING_SCHEMA = pa.schema([
+    ("linkedin_id", pa.string()),
+    ("identity", pa.struct(_IDENTITY_FIELDS)),
+    ("identity_sources", pa.list_(pa.struct(_IDENTITY_SOURCE_FIELDS))),
+    ("location", pa.struct(_LOCATION_FIELDS)),
+    ("social_metrics", pa.struct(_METRICS_FIELDS)),
+    ("experience", pa.list_(pa.struct(_EXPERIENCE_FIELDS))),
+    ("education", pa.list_(pa.struct(_EDUCATION_FIELDS))),
+    ("certifications", pa.list_(pa.struct(_CERTIFICATION_FIELDS))),
+    ("skills", pa.list_(pa.string())),
+    ("computed_signals", pa.struct([(name, pa.bool_()) for name, _ in _SIGNAL_FIELDS])),
+    ("source_id", pa.string()),
+    ("source_system", pa.string()),
+    ("last_updated", _TS),
+    ("normalization_errors", pa.list_(_ERROR)),
+])
+
+# -- BigQuery function equivalents -------------------------------------------
+
+_MONTH_YEAR = re.compile(r"([A-Za-z]+)\s+(\d{1,4})")
+_MONTHS = {
+    name: i + 1
+    for i, names in enumerate(zip(
+        ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"],
+        ["january", "february", "march", "april", "may", "june", "july", "august",
+         "september", "october", "november", "december"],
+    ))
+    for name in names
+}
+
+
+def json_value(value) -> str | None:
+    """JSON_VALUE: scalars as strings; objects, arrays and null give NULL."""
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    if isinstance(value, str):
+        return value
+    return json.dumps(value)  # true/false, numbers in JSON form
+
+
+def json_get(obj, key: str):
+    return obj.get(key) if isinstance(obj, dict) else None
+
+
+@lru_cache(maxsize=65536)
+def parse_month_year(value: str | None) -> date | None:
+    """SAFE.PARSE_DATE('%b %Y', value): 'Oct 2024' -> 2024-10-01, else NULL."""
+    if value is None:
+        return None
+    m = _MONTH_YEAR.fullmatch(value)
+    if not m or m.group(1).lower() not in _MONTHS:
+        return None
+    year = int(m.group(2))
+    return date(year, _MONTHS[m.group(1).lower()], 1) if year >= 1 else None
+
+
+@lru_cache(maxsize=65536)
+def parse_timestamp(value) -> datetime | None:
+    """An autodetected Source 1 TIMESTAMP ('2022-03-01T00:00:00.000Z') as UTC."""
+    if not isinstance(value, str):
+        return None
+    try:
+        ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return ts.astimezone(timezone.utc) if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+@lru_cache(maxsize=65536)
+def timestamp_date(value) -> date | None:
+    """SAFE_CAST(<timestamp> AS DATE), in UTC."""
+    ts = parse_timestamp(value)
+    return ts.date() if ts else None
+
+
+@lru_cache(maxsize=65536)
+def timestamp_string(value) -> str | None:
+    """CAST(<timestamp> AS STRING): '2022-03-01 00:00:00+00', fraction only if non-zero."""
+    ts = parse_timestamp(value)
+    if ts is None:
+        return None
+    text = ts.strftime("%Y-%m-%d %H:%M:%S")
+    if ts.microsecond:
+        text += f".{ts.microsecond:06d}".rstrip("0")
+    return text + "+00"
+
+
+def md5_hex(*parts: str | None) -> str:
+    """TO_HEX(MD5(CONCAT(COALESCE(p, ''), ...)))."""
+    return hashlib.md5("".join(p or "" for p in parts).encode("utf-8")).hexdigest()
+
+
+# -- Columnar helpers --------------------------------------------------------
+
+def memo_column(values: list, fn, type_: pa.DataType) -> pa.Array:
+    """Apply fn once per distinct value (dictionary-encode, map, take)."""
+    if any(v is not None and not isinstance(v, str) for v in values):
+        return pa.array([fn(v) for v in values], type=type_)
+    encoded = pa.array(values, type=pa.string()).dictionary_encode()
+    mapped = pa.array([fn(v) for v in encoded.dictionary.to_pylist()], type=type_)
+    return mapped.take(encoded.indices)
+
+
+def list_column(offsets: list[int], fields: list[tuple], columns: dict) -> pa.ListArray:
+    """Assemble a non-null list<struct> column from flattened child columns."""
+    children = [
+        columns[name] if isinstance(columns[name], pa.Array) else pa.array(columns[name], type=type_)
+        for name, type_ in fields
+    ]
+    values = pa.StructArray.from_arrays(children, fields=[pa.field(n, t) for n, t in fields])
+    return pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()), values)
+
+
+def struct_column(fields: list[tuple], columns: dict, mask=None) -> pa.StructArray:
+    children = [
+        columns[name] if isinstance(columns[name], pa.Array) else pa.array(columns[name], type=type_)
+        for name, type_ in fields
+    ]
+    return pa.StructArray.from_arrays(children, fields=[pa.field(n, t) for n, t in fields], mask=mask)
+
+
+def clean_name(names: pa.Array) -> pa.Array:
+    """TRIM(REGEXP_REPLACE(name, r'\\s+', ' '))."""
+    return pc.utf8_trim_whitespace(pc.replace_substring_regex(names, r"\s+", " "))
+
+
+def coerce_records(records: list[dict], schema: pa.Schema) -> tuple[list[dict], list[list[dict]]]:
+    """bronze.py's coercion of a batch: the typed rows 03/04 read, and per record
+    the quarantine rows as they aggregate them (COERCION_FAILED, ORDER BY field)."""
+    coercer = bronze.Coercer(schema)
+    rows, errors = [], []
+    for record in records:
+        row, _, failed = coercer.coerce(record)
+        rows.append(row)
+        errors.append([{"field": path, "error": "COERCION_FAILED", "raw_value": raw}
+                       for path, _, raw in sorted(failed)])
+    return rows, errors
+
+
+def constant(value, n: int, type_: pa.DataType) -> pa.Array:
+    return pa.array([value] * n, type=type_)
+
+
+# -- Source 1 ----------------------------------------------------------------
+
+def stage_source_1_batch(records: list[dict]) -> pa.RecordBatch:
+    """03_staging_source_1.sql for one batch of raw Source 1 records."""
+    records = [r for r in records if r.get("linkedinID") is not None]
+    n = len(records)
+
+    def col(key):
+        return [r.get(key) for r in records]
+
+    last_updated_raw = col("lastUpdated")
+    last_updated = memo_column(last_updated_raw, parse_timestamp, _TS)
+
+    # experience: one row per (experienceList[], positionList[])
+    exp = {name: [] for name, _ in _EXPERIENCE_FIELDS}
+    exp_start, exp_end, exp_offsets = [], [], [0]
+    for r in records:
+        for e in r.get("experienceList") or []:
+            for p in (e.get("positionList") or []) if isinstance(e, dict) else []:
+                exp["company_name"].append(e.get("companyName"))
+                exp["company_linkedin_id"].append(e.get("companyID"))
+                exp["title"].append(p.get("title"))
+                exp["location"].append(p.get("location"))
+                exp["description"].append(p.get("description"))
+                exp_start.append(p.get("startDate"))
+                exp_end.append(p.get("endDate"))
+        exp_offsets.append(len(exp_start))
+    start_strings = memo_column(exp_start, timestamp_string, pa.string()).to_pylist()
+    exp["experience_id"] = [
+        md5_hex(c, t, s) for c, t, s in zip(exp["company_linkedin_id"], exp["title"], start_strings)
+    ]
+    exp["start_date"] = memo_column(exp_start, timestamp_date, pa.date32())
+    exp["end_date"] = memo_column(exp_end, timestamp_date, pa.date32())
+    exp["is_current"] = [v is None for v in exp_end]
+    exp["source_system"] = constant("source_1", len(exp_start), pa.string())
+
+    edu = {name: [] for name, _ in _EDUCATION_FIELDS}
+    edu_start, edu_end, edu_offsets = [], [], [0]
+    for r in records:
+        for e in r.get("educationList") or []:
+            edu["institution_name"].append(e.get("name"))
+            edu["field_of_study"].append(e.get("subject"))
+            edu_start.append(e.get("startDate"))
+            edu_end.append(e.get("endDate"))
+        edu_offsets.append(len(edu_start))
+    start_strings = memo_column(edu_start, timestamp_string, pa.string()).to_pylist()
+    edu["education_id"] = [
+        md5_hex(i, f, s) for i, f, s in zip(edu["institution_name"], edu["field_of_study"], start_strings)
+    ]
+    edu["degree"] = constant(None, len(edu_start), pa.string())
+    edu["start_date"] = memo_column(edu_start, timestamp_date, pa.date32())
+    edu["end_date"] = memo_column(edu_end, timestamp_date, pa.date32())
+    edu["source_system"] = constant("source_1", len(edu_start), pa.string())
+
+    details = col("locationDetails")
+    typed, coerced = coerce_records(records, bronze.SOURCE_1_SCHEMA)
+    errors = [
+        ([{"field": "last_updated", "error": "NULL_VALUE", "raw_value": ""}] if r["lastUpdated"] is None else [])
+        + failed
+        for r, failed in zip(typed, coerced)
+    ]
+
+    identity = {
+        "full_name": col("fullName"), "first_name": col("firstName"), "last_name": col("lastName"),
+        "headline": col("headline"), "about": col("about"),
+    }
+    columns = {
+        "linkedin_id": pa.array(col("linkedinID"), pa.string()),
+        "identity": struct_column(_IDENTITY_FIELDS, identity),
+        "identity_sources": list_column(list(range(n + 1)), _IDENTITY_SOURCE_FIELDS, {
+            "source_system": constant("source_1", n, pa.string()),
+            "full_name": identity["full_name"], "headline": identity["headline"],
+            "about": identity["about"], "last_updated": last_updated,
+        }),
+        "location": struct_column(_LOCATION_FIELDS, {
+            "display_string": col("location"),
+            "country": [json_value(json_get(json_get(d, "country"), "name")) for d in details],
+            "region": [json_value(json_get(json_get(d, "region"), "name")) for d in details],
+            "locality": [json_value(json_get(json_get(d, "locality"), "name")) for d in details],
+            "country_code": constant(None, n, pa.string()),
+            "location_ids": [v or [] for v in col("locationIDList")],
+        }),
+        "social_metrics": struct_column(_METRICS_FIELDS, {
+            "connections": [r["linkedinConnections"] for r in typed],
+            "followers": [r["linkedinFollowers"] for r in typed],
+            "metrics_as_of": last_updated,
+        }),
+        "experience": list_column(exp_offsets, _EXPERIENCE_FIELDS, exp),
+        "education": list_column(edu_offsets, _EDUCATION_FIELDS, edu),
+        "certifications": list_column([0] * (n + 1), _CERTIFICATION_FIELDS,
+                                      {name: [] for name, _ in _CERTIFICATION_FIELDS}),
+        "skills": pa.array([v or [] for v in col("skills")], pa.list_(pa.string())),
+        "computed_signals": struct_column(
+            [(name, pa.bool_()) for name, _ in _SIGNAL_FIELDS],
+            {name: [r[raw] for r in typed] for name, raw in _SIGNAL_FIELDS},
+        ),
+        "source_id": pa.array(col("id"), pa.string()),
+        "source_system": constant("source_1", n, pa.string()),
+        "last_updated": last_updated,
+        "normalization_errors": pa.array(errors, pa.list_(_ERROR)),
+    }
+    return pa.RecordBatch.from_arrays([columns[f.name] for f in STAGING_SCHEMA],
+                                      schema=STAGING_SCHEMA)
+
+
+# -- Source 2 ----------------------------------------------------------------
+
+def _json_array(value) -> list:
+    """UNNEST(JSON_QUERY_ARRAY(...)): elements of a JSON array, else nothing."""
+    return value if isinstance(value, list) else []
+
+
+def stage_source_2_batch(records: list[dict], run_ts: datetime) -> pa.RecordBatch:
+    """04_staging_source_2.sql for one batch of raw Source 2 records."""
+    records = [r for r in records if json_value(json_get(r, "linkedin_id")) is not None]
+    n = len(records)
+
+    def col(key):
+        return [json_value(r.get(key)) for r in records]
+
+    names = pa.array(col("name"), pa.string())
+    full_names = clean_name(names)
+    extra_whitespace = pc.match_substring_regex(names, r"\s{2,}").to_pylist()
+    typed, coerced = coerce_records(records, bronze.SOURCE_2_SCHEMA)
+    errors = [
+        ([{"field": "full_name", "error": "EXTRA_WHITESPACE", "raw_value": raw}] if flagged else []) + failed
+        for flagged, raw, failed in zip(extra_whitespace, names.to_pylist(), coerced)
+    ]
+    now = constant(run_ts, n, _TS)
+
+    exp = {name: [] for name, _ in _EXPERIENCE_FIELDS}
+    exp_start, exp_end, exp_offsets = [], [], [0]
+    for r in records:
+        for e in _json_array(r.get("experience")):
+            company_id = json_value(json_get(e, "company_id"))
+            company = json_value(json_get(e, "company"))
+            title = json_value(json_get(e, "title"))
+            start = json_value(json_get(e, "start_date"))
+            exp["experience_id"].append(md5_hex(company_id if company_id is not None else company,
+                                                title, start))
+            exp["company_name"].append(company)
+            exp["company_linkedin_id"].append(company_id)
+            exp["title"].append(title)
+            exp["location"].append(json_value(json_get(e, "location")))
+            exp["description"].append(json_value(json_get(e, "description")))
+            exp_start.append(start)
+            exp_end.append(json_value(json_get(e, "end_date")))
+        exp_offsets.append(len(exp_start))
+    exp["start_date"] = memo_column(exp_start, parse_month_year, pa.date32())
+    exp["end_date"] = memo_column([None if v == "Present" else v for v in exp_end],
+                                  parse_month_year, pa.date32())
+    exp["is_current"] = [v is None or v == "Present" for v in exp_end]
+    exp["source_system"] = constant("source_2", len(exp_start), pa.string())
+
+    edu = {name: [] for name, _ in _EDUCATION_FIELDS}
+    edu_offsets = [0]
+    for r in records:
+        for e in _json_array(r.get("education")):
+            title = json_value(json_get(e, "title"))
+            degree = json_value(json_get(e, "degree"))
+            edu["education_id"].append(md5_hex(title, degree, ""))
+            edu["institution_name"].append(title)
+            edu["degree"].append(degree)
+            edu["field_of_study"].append(json_value(json_get(e, "field")))
+        edu_offsets.append(len(edu["education_id"]))
+    m = len(edu["education_id"])
+    edu["start_date"] = constant(None, m, pa.date32())
+    edu["end_date"] = constant(None, m, pa.date32())
+    edu["source_system"] = constant("source_2", m, pa.string())
+
+    cert = {name: [] for name, _ in _CERTIFICATION_FIELDS}
+    cert_offsets = [0]
+    for r in records:
+        for c in _json_array(r.get("certifications")):
+            cert["title"].append(json_value(json_get(c, "title")))
+            cert["issuing_org"].append(json_value(json_get(c, "subtitle")))
+            cert["issue_date"].append(None)
+            cert["credential_id"].append(json_value(json_get(c, "credential_id")))
+        cert_offsets.append(len(cert["title"]))
+
+    identity = {
+        "full_name": full_names,
+        "first_name": pc.utf8_trim_whitespace(pa.array(col("first_name"), pa.string())),
+        "last_name": pc.utf8_trim_whitespace(pa.array(col("last_name"), pa.string())),
+        "headline": pa.array(col("position"), pa.string()),
+        "about": pa.array(col("about"), pa.string()),
+    }
+    columns = {
+        "linkedin_id": pa.array(col("linkedin_id"), pa.string()),
+        "identity": struct_column(_IDENTITY_FIELDS, identity),
+        "identity_sources": list_column(list(range(n + 1)), _IDENTITY_SOURCE_FIELDS, {
+            "source_system": constant("source_2", n, pa.string()),
+            "full_name": full_names, "headline": identity["headline"],
+            "about": identity["about"], "last_updated": now,
+        }),
+        "location": struct_column(_LOCATION_FIELDS, {
+            "display_string": col("location"),
+            "country": constant(None, n, pa.string()),
+            "region": constant(None, n, pa.string()),
+            "locality": col("city"),
+            "country_code": col("country_code"),
+            "location_ids": [[] for _ in range(n)],
+        }),
+        "social_metrics": struct_column(_METRICS_FIELDS, {
+            "connections": [r["connections"] for r in typed],
+            "followers": [r["followers"] for r in typed],
+            "metrics_as_of": now,
+        }),
+        "experience": list_column(exp_offsets, _EXPERIENCE_FIELDS, exp),
+        "education": list_column(edu_offsets, _EDUCATION_FIELDS, edu),
+        "certifications": list_column(cert_offsets, _CERTIFICATION_FIELDS, cert),
+        "skills": pa.array([[] for _ in range(n)], pa.list_(pa.string())),
+        "computed_signals": struct_column(
+            [(name, pa.bool_()) for name, _ in _SIGNAL_FIELDS],
+            {name: [None] * n for name, _ in _SIGNAL_FIELDS},
+            mask=pa.array([True] * n),
+        ),
+        "source_id": pa.array(col("id"), pa.string()),
+        "source_system": constant("source_2", n, pa.string()),
+        "last_updated": now,
+        "normalization_errors": pa.array(errors, pa.list_(_ERROR)),
+    }
+    return pa.RecordBatch.from_arrays([columns[f.name] for f in STAGING_SCHEMA],
+                                      schema=STAGING_SCHEMA)
+
+
+# -- Driver ------------------------------------------------------------------
+
+def iter_source_2_records(f, name: str):
+    """Raw Source 2 records from a JSON array file or json_line NDJSON shard."""
+    if ".ndjson" in name:
+        stream = gzip.GzipFile(fileobj=f) if name.endswith(".gz") else f
+        for line in stream:
+            if line.strip():
+                row = json.loads(line)
+                yield json.loads(row["json_line"]) if "json_line" in row else row
+    else:
+        yield from iter_json_records(f)
+
+
+def _batches(records, size: int):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stage_part(table: str, uri: str, name: str, start: int | None, end: int | None,
+               out_path: str, run_ts: datetime) -> dict:
+    """Stage one Source 2 file or Source 1 byte range into one Parquet part (worker process)."""
+    rows = 0
+    with open_stream(uri, end_hint=end) as f:
+        if table == "stg_source_1":
+            records = iter_jsonl_range(f, start, end)
+        else:
+            records = iter_source_2_records(f, name)
+        with pq.ParquetWriter(out_path, STAGING_SCHEMA, compression="zstd") as writer:
+            for batch in _batches(records, BATCH_ROWS):
+                staged = (stage_source_1_batch(batch) if table == "stg_source_1"
+                          else stage_source_2_batch(batch, run_ts))
+                writer.write_batch(staged)
+                rows += staged.num_rows
+    return {"part": out_path, "rows": rows}
+
+
+def stage_table(table: str, source: str, out_dir: str, workers: int, run_ts: datetime) -> dict:
+    """Stage a whole source into <out_dir>/<table>/part-NNNNN.parquet."""
+    if table == "stg_source_1":
+        tasks = []
+        for obj in list_objects(source):
+            parts = max(workers, -(-obj.size // (SOURCE_1_RANGE_MB * 1024 * 1024)))
+            tasks += [(obj.uri, obj.name, s, e) for s, e in split_byte_ranges(obj.size, parts)]
+    else:
+        objects = list_objects(source, "*.json") if not source.endswith(".json") else list_objects(source)
+        if not objects:
+            objects = list_objects(source, "*.ndjson*")
+        tasks = [(o.uri, o.name, None, None) for o in objects]
+
+    table_dir = Path(out_dir) / table
+    table_dir.mkdir(parents=True, exist_ok=True)
+    for old in table_dir.glob("part-*.parquet"):
+        old.unlink()
+
+    print(f"Staging {table} from {source}: {len(tasks)} tasks, {workers} workers")
+    started = time.time()
+    rows = 0
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = [
+            pool.submit(stage_part, table, uri, name, start, end,
+                        str(table_dir / f"part-{i:05d}.parquet"), run_ts)
+            for i, (uri, name, start, end) in enumerate(tasks)
+        ]
+        for i, future in enumerate(as_completed(futures), 1):
+            rows += future.result()["rows"]
+            if i % 50 == 0 or i == len(futures):
+                print(f"  {i}/{len(futures)} parts, {rows:,} rows")
+    elapsed = time.time() - started
+    return {"table": table, "rows": rows, "parts": len(tasks), "elapsed_s": elapsed}
+
+
+# -- Parity ------------------------------------------------------------------
+
+# CURRENT_TIMESTAMP() columns differ between any two runs
+VOLATILE_PATHS = {
+    "stg_source_1": set(),
+    "stg_source_2": {"identity_sources[].last_updated", "social_metrics.metrics_as_of", "last_updated"},
+}
+
+
+def _canonical(value, path: str, volatile: set):
+    """Normalize a row from either side: dates/timestamps to one form, lists order-free."""
+    if path in volatile:
+        return None
+    if isinstance(value, dict):
+        return {k: _canonical(v, f"{path}.{k}" if path else k, volatile) for k, v in value.items()}
+    if isinstance(value, list):
+        items = [_canonical(v, f"{path}[]", volatile) for v in value]
+        return sorted(items, key=lambda v: json.dumps(v, sort_keys=True, default=str))
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, str):
+        ts = _bq_timestamp(value)
+        if ts is not None:
+            return ts
+    return value
+
+
+def _bq_timestamp(text: str) -> str | None:
+    """BigQuery exports timestamps as '2025-10-24 05:37:55.731 UTC' (or epoch seconds in JSON)."""
+    m = re.fullmatch(r"(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}:\d{2}(?:\.\d+)?)(?: UTC|Z|\+00(?::?00)?)", text)
+    if not m:
+        return None
+    return datetime.fromisoformat(f"{m.group(1)}T{m.group(2)}+00:00").isoformat()
+
+
+def _load_expected(path: str) -> list[dict]:
+    with open(path, "rb") as f:
+        head = f.read(1)
+        f.seek(0)
+        if head == b"[":
+            return json.load(f)
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _keyed(rows, volatile: set) -> dict[str, list]:
+    """Canonical rows by linkedin_id (staging keeps duplicate ids; 05 dedupes them)."""
+    keyed: dict[str, list] = {}
+    for row in rows:
+        keyed.setdefault(row["linkedin_id"], []).append(_canonical(row, "", volatile))
+    for group in keyed.values():
+        group.sort(key=lambda r: json.dumps(r, sort_keys=True, default=str))
+    return keyed
+
+
+def _diff(expected, actual, path: str, out: list):
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in sorted(set(expected) | set(actual)):
+            _diff(expected.get(key), actual.get(key), f"{path}.{key}" if path else key, out)
+    elif expected != actual:
+        # BigQuery JSON renders INT64 as strings
+        if not (isinstance(actual, (int, float)) and str(actual) == str(expected)):
+            out.append(path)
+
+
+def parity(table: str, expected_path: str, actual_dir: str, schema: pa.Schema = STAGING_SCHEMA,
+           volatile: set | None = None, show: int = 10) -> int:
+    """Compare a BigQuery export of a table with local Parquet output."""
+    volatile = VOLATILE_PATHS[table] if volatile is None else volatile
+    expected = _keyed(_load_expected(expected_path), volatile)
+    actual = _keyed(pq.read_table(actual_dir, schema=schema).to_pylist(), volatile)
+
+    missing = sorted(set(expected) - set(actual))
+    extra = sorted(set(actual) - set(expected))
+    mismatched: dict[str, list] = {}
+    for key in sorted(set(expected) & set(actual)):
+        paths = []
+        if len(expected[key]) != len(actual[key]):
+            paths.append("<row count>")
+        for e, a in zip(expected[key], actual[key]):
+            _diff(e, a, "", paths)
+        for p in dict.fromkeys(paths):
+            mismatched.setdefault(p, []).append(key)
+
+    print(f"Parity {table}: {sum(map(len, expected.values())):,} expected rows, "
+          f"{sum(map(len, actual.values())):,} local rows")
+    print(f"  Missing locally: {len(missing)}  Extra locally: {len(extra)}")
+    for key in missing[:show]:
+        print(f"    missing: {key}")
+    for key in extra[:show]:
+        print(f"    extra: {key}")
+    for p, keys in sorted(mismatched.items()):
+        print(f"  MISMATCH {p}: {len(keys)} rows (e.g. {keys[0]})")
+    ok = not missing and not extra and not mismatched
+    print("  PASS" if ok else "  FAIL")
+    return 0 if ok else 1
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline staging engine (03/04 SQL mirror)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    stage = sub.add_parser("stage", help="Stage raw sources to Parquet")
+    stage.add_argument("--source-1", default=SOURCE_1_URI, help="gs:// URI or local JSONL")
+    stage.add_argument("--source-2", default=SOURCE_2_URI,
+                       help="gs:// prefix or local directory (JSON arrays or json_line NDJSON)")
+    stage.add_argument("--out", default=DEFAULT_OUTPUT_DIR)
+    stage.add_argument("--only", choices=["source_1", "source_2"], default=None)
+    stage.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+
+    check = sub.add_parser("parity", help="Compare local output with a BigQuery export")
+    check.add_argument("--table", choices=["stg_source_1", "stg_source_2"], required=True)
+    check.add_argument("--expected", required=True, help="NDJSON or JSON array export of the BQ table")
+    check.add_argument("--actual", required=True, help="Local Parquet directory for the table")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "parity":
+        return parity(args.table, args.expected, args.actual)
+
+    print("=" * 60)
+    print("Local Staging (03/04 mirror)")
+    print("=" * 60)
+    run_ts = datetime.now(timezone.utc)
+    results = []
+    if args.only in (None, "source_1"):
+        results.append(stage_table("stg_source_1", args.source_1, args.out, args.workers, run_ts))
+    if args.only in (None, "source_2"):
+        results.append(stage_table("stg_source_2", args.source_2, args.out, args.workers, run_ts))
+
+    print("\n" + "=" * 60)
+    print("Summary")
+    print("=" * 60)
+    for r in results:
+        rate = r["rows"] / r["elapsed_s"] if r["elapsed_s"] else 0
+        print(f"{r['table']}: {r['rows']:,} rows in {r['parts']} parts, "
+              f"{r['elapsed_s']:.1f}s ({rate:,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
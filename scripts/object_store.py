@@ -0,0 +1,359 @@
+"""
+Object store helpers shared by the loaders and the profiler.
+
+Every path in the pipeline is either a GCS URI (gs://bucket/prefix) or a
+local directory/file. The backends expose the same small interface so the
+loaders can be developed and benchmarked against a local copy of the data
+and then pointed at the bucket unchanged.
+
+AsyncObjectStore layers asyncio on top of the same backends: every request
+runs on the store's thread pool under a concurrency semaphore, so many
+objects/ranges are fetched concurrently from one process, and stream()
+yields an object's body in chunks with the next chunk already in flight.
+open_stream() exposes such a stream as an ordinary (seekable, buffered)
+binary file for synchronous parsers, so network reads overlap parsing.
+"""
+
+import asyncio
+import collections
+import fnmatch
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+GCS_SCHEME = "gs://"
+READ_CHUNK_BYTES = 8 * 1024 * 1024
+ASYNC_MAX_CONCURRENCY = 32  # in-flight backend requests per AsyncObjectStore
+STREAM_PREFETCH = 2  # chunks requested ahead of the consumer
+TAIL_READ_BYTES = 256 * 1024  # open_stream reads past end_hint
+
+
+@dataclass(frozen=True)
+class ObjectInfo:
+    """A listed object: full URI plus the metadata needed for caching."""
+    uri: str
+    name: str
+    size: int
+    checksum: str  # GCS content hash (md5, or crc32c for composites); size + mtime locally
+
+
+def is_gcs(uri: str) -> bool:
+    return uri.startswith(GCS_SCHEME)
+
+
+def split_gcs_uri(uri: str) -> tuple[str, str]:
+    """Split gs://bucket/path into (bucket, path)."""
+    bucket, _, path = uri[len(GCS_SCHEME):].partition("/")
+    return bucket, path
+
+
+def join_uri(base: str, name: str) -> str:
+    if is_gcs(base):
+        return base.rstrip("/") + "/" + name
+    return str(Path(base) / name)
+
+
+class LocalBackend:
+    """Local filesystem backend (a directory of files, or a single file)."""
+
+    def list(self, base_uri: str, pattern: str = "*") -> list[ObjectInfo]:
+        base = Path(base_uri)
+        paths = [base] if base.is_file() else sorted(
+            p for p in base.iterdir() if p.is_file() and fnmatch.fnmatch(p.name, pattern)
+        )
+        infos = []
+        for p in paths:
+            st = p.stat()
+            infos.append(ObjectInfo(
+                uri=str(p),
+                name=p.name,
+                size=st.st_size,
+                checksum=f"local:{st.st_size}:{st.st_mtime_ns}",
+            ))
+        return infos
+
+    def open_read(self, uri: str):
+        return open(uri, "rb")
+
+    def open_write(self, uri: str):
+        Path(uri).parent.mkdir(parents=True, exist_ok=True)
+        return open(uri, "wb")
+
+    def read_range(self, uri: str, start: int, end: int) -> bytes:
+        """Read bytes [start, end) of an object."""
+        with open(uri, "rb") as f:
+            f.seek(start)
+            return f.read(max(0, end - start))
+
+    def size(self, uri: str) -> int:
+        return os.path.getsize(uri)
+
+    def delete(self, uri: str):
+        Path(uri).unlink(missing_ok=True)
+
+
+class GCSBackend:
+    """Google Cloud Storage backend (one client per process)."""
+
+    def __init__(self, project: str | None = None):
+        from google.cloud import storage
+        self.client = storage.Client(project=project)
+
+    def _blob(self, uri: str):
+        bucket, path = split_gcs_uri(uri)
+        return self.client.bucket(bucket).blob(path)
+
+    def list(self, base_uri: str, pattern: str = "*") -> list[ObjectInfo]:
+        bucket_name, prefix = split_gcs_uri(base_uri)
+        if prefix and not prefix.endswith("/"):
+            # Single object
+            blob = self.client.bucket(bucket_name).get_blob(prefix)
+            blobs = [blob] if blob is not None else []
+        else:
+            blobs = [
+                b for b in self.client.list_blobs(bucket_name, prefix=prefix or None)
+                if fnmatch.fnmatch(b.name.rsplit("/", 1)[-1], pattern)
+            ]
+        return [
+            ObjectInfo(
+                uri=f"{GCS_SCHEME}{bucket_name}/{b.name}",
+                name=b.name.rsplit("/", 1)[-1],
+                size=b.size or 0,
+                # Content hashes survive re-uploads of identical bytes; generation does not
+                checksum=f"gcs-md5:{b.md5_hash}" if b.md5_hash else f"gcs-crc32c:{b.crc32c}:{b.size}",
+            )
+            for b in blobs
+        ]
+
+    def open_read(self, uri: str):
+        return self._blob(uri).open("rb", chunk_size=READ_CHUNK_BYTES)
+
+    def open_write(self, uri: str):
+        return self._blob(uri).open("wb", ignore_flush=True)
+
+    def read_range(self, uri: str, start: int, end: int) -> bytes:
+        if end <= start:
+            return b""
+        # download_as_bytes treats `end` as inclusive
+        return self._blob(uri).download_as_bytes(start=start, end=end - 1)
+
+    def size(self, uri: str) -> int:
+        bucket, path = split_gcs_uri(uri)
+        return self.client.bucket(bucket).get_blob(path).size
+
+    def delete(self, uri: str):
+        from google.api_core.exceptions import NotFound
+        try:
+            self._blob(uri).delete()
+        except NotFound:
+            pass
+
+
+_backends: dict[str, object] = {}
+
+
+def get_backend(uri: str):
+    """Return the (per-process, cached) backend for a URI."""
+    kind = "gcs" if is_gcs(uri) else "local"
+    if kind not in _backends:
+        _backends[kind] = GCSBackend() if kind == "gcs" else LocalBackend()
+    return _backends[kind]
+
+
+def list_objects(base_uri: str, pattern: str = "*") -> list[ObjectInfo]:
+    return get_backend(base_uri).list(base_uri, pattern)
+
+
+def open_read(uri: str):
+    return get_backend(uri).open_read(uri)
+
+
+def open_write(uri: str):
+    return get_backend(uri).open_write(uri)
+
+
+def read_range(uri: str, start: int, end: int) -> bytes:
+    return get_backend(uri).read_range(uri, start, end)
+
+
+def object_size(uri: str) -> int:
+    return get_backend(uri).size(uri)
+
+
+def delete_object(uri: str):
+    get_backend(uri).delete(uri)
+
+
+class AsyncObjectStore:
+    """Asyncio client over the sync backends with bounded concurrency.
+
+    `backend` pins every URI to one backend (e.g. LocalBackend() for offline
+    runs and benchmarks); by default the backend is chosen per URI. Use one
+    store per event loop.
+    """
+
+    def __init__(self, max_concurrency: int = ASYNC_MAX_CONCURRENCY, backend=None,
+                 chunk_bytes: int = READ_CHUNK_BYTES, prefetch: int = STREAM_PREFETCH):
+        self.backend = backend
+        self.chunk_bytes = chunk_bytes
+        self.prefetch = prefetch
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix="object-store")
+
+    def _backend(self, uri: str):
+        return self.backend if self.backend is not None else get_backend(uri)
+
+    async def _call(self, fn, *args):
+        async with self._sem:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def list(self, base_uri: str, pattern: str = "*") -> list[ObjectInfo]:
+        return await self._call(self._backend(base_uri).list, base_uri, pattern)
+
+    async def size(self, uri: str) -> int:
+        return await self._call(self._backend(uri).size, uri)
+
+    async def read_range(self, uri: str, start: int, end: int) -> bytes:
+        """Read bytes [start, end) of an object."""
+        return await self._call(self._backend(uri).read_range, uri, start, end)
+
+    async def read(self, uri: str) -> bytes:
+        return b"".join([chunk async for chunk in self.stream(uri)])
+
+    async def stream(self, uri: str, start: int = 0, end: int | None = None):
+        """Yield the object's bytes [start, end) in chunks, prefetching ahead."""
+        if end is None:
+            end = await self.size(uri)
+        pending = collections.deque()
+        next_start = start
+
+        def schedule():
+            nonlocal next_start
+            while next_start < end and len(pending) < self.prefetch:
+                stop = min(end, next_start + self.chunk_bytes)
+                pending.append(asyncio.ensure_future(self.read_range(uri, next_start, stop)))
+                next_start = stop
+
+        schedule()
+        try:
+            while pending:
+                data = await pending.popleft()
+                schedule()
+                yield data
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _LoopThread:
+    """A background event loop (one per process) owning a shared AsyncObjectStore."""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="object-store-loop",
+                         daemon=True).start()
+        self.store = self.run(self._make_store())
+
+    @staticmethod
+    async def _make_store():
+        return AsyncObjectStore()
+
+    @classmethod
+    def get(cls) -> "_LoopThread":
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+class _StreamRaw(io.RawIOBase):
+    """Sync, seekable raw file over AsyncObjectStore.stream() on the loop thread."""
+
+    def __init__(self, uri: str, size: int | None = None, end_hint: int | None = None):
+        self._loop = _LoopThread.get()
+        self.uri = uri
+        self.size = size if size is not None else self._loop.run(self._loop.store.size(uri))
+        # Prefetch only up to end_hint; past it, read small ranges on demand
+        self.end_hint = self.size if end_hint is None else min(end_hint, self.size)
+        self._pos = 0
+        self._chunk = memoryview(b"")  # unread rest of the current chunk (slicing does not copy)
+        self._stream = None
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self.size}[whence]
+        target = max(0, base + offset)
+        if target != self._pos:
+            self._drop_stream()
+            self._pos = target
+        return self._pos
+
+    def _drop_stream(self):
+        if self._stream is not None:
+            self._loop.run(self._stream.aclose())
+            self._stream = None
+        self._chunk = memoryview(b"")
+
+    async def _next_chunk(self):
+        try:
+            return await self._stream.__anext__()
+        except StopAsyncIteration:
+            return b""
+
+    def readinto(self, buffer) -> int:
+        if not self._chunk:
+            if self._pos >= self.size:
+                return 0
+            if self._pos >= self.end_hint:
+                self._chunk = memoryview(self._loop.run(self._loop.store.read_range(
+                    self.uri, self._pos, min(self.size, self._pos + TAIL_READ_BYTES))))
+            else:
+                if self._stream is None:
+                    self._stream = self._loop.store.stream(self.uri, self._pos, self.end_hint)
+                self._chunk = memoryview(self._loop.run(self._next_chunk()))
+                if not self._chunk:
+                    self._drop_stream()
+                    return self.readinto(buffer) if self._pos < self.size else 0
+            if not self._chunk:
+                return 0
+        n = min(len(buffer), len(self._chunk))
+        buffer[:n] = self._chunk[:n]
+        self._chunk = self._chunk[n:]
+        self._pos += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._drop_stream()
+        super().close()
+
+
+def open_stream(uri: str, size: int | None = None, end_hint: int | None = None) -> io.BufferedReader:
+    """Open an object for streaming reads with chunks prefetched in the background.
+
+    Drop-in for open_read() wherever a parser consumes a whole object (or a
+    byte range, via seek) sequentially. When only a range is needed, pass
+    end_hint so prefetching stops there; reads past it still work.
+    """
+    return io.BufferedReader(_StreamRaw(uri, size, end_hint), buffer_size=1024 * 1024)
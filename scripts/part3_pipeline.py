@@ -3,40 +3,127 @@
 Part 3: Cleaning, Normalization & Merge Logic Pipeline
 
 Orchestrates the BigQuery SQL pipeline:
-1. Create external table for Source 1 (bronze)
-2. [PREREQ] Source 2 must be loaded via scripts/load_source_2.sh from Cloud Shell
-3. Validate source data
+1. Point raw_source_1 at the latest Source 1 snapshot (bronze)
+2. [PREREQ] Both sources must be loaded via scripts/load_source_1.sh and
+   scripts/load_source_2.sh from Cloud Shell (typed bronze_source_1/2 tables)
+3. Quality gates on the sources
 4. Stage Source 1 (silver)
 5. Stage Source 2 (silver)
-6. Merge to canonical (gold)
-7. Compute derived fields
-8. Create Firestore export view
+6. Merge to canonical (gold), derived fields included
+7. Quality gates on people_canonical
+8. Snapshot people_canonical and promote it: firestore_export serves it
+9. Diff the promoted snapshot against the last one diffed: people_changelog
+
+Steps are a DAG over the tables they read and write (STEPS): the source
+gates and both stagings run concurrently, and a step whose SQL file and input
+tables are unchanged since its last successful run is skipped (state in
+--state-file).
+
+Every statement's job statistics (bytes, slot-ms, shuffle spill, duration)
+go into a JSON run report in --report-dir and the --history SQLite file.
+Steps with a byte budget (sql/byte_budgets.json, --budget) are dry-run
+first, and a statement that would exceed the budget aborts the run.
+
+The quality gates (quality_gates.py, sql/quality_gates.json) compute every
+metric of a table in one aggregate scan and check it against declared
+thresholds. A failed gate blocks the merge (sources) or the export view
+(people_canonical) and fails the run.
+
+Step 07 freezes people_canonical as a zero-copy table snapshot with its own
+export view, records it in snapshot_metadata and swaps firestore_export to
+it (snapshot_versions.py, which also rolls back and prunes old snapshots).
+Step 08 diffs the newly promoted snapshot against the previous one into
+people_changelog (inserts, updates, deletes with the changed field groups)
+and exports the events as Parquet or NDJSON (changelog.py).
 
 Prerequisites:
     # Run from Cloud Shell (keeps traffic inside GCP):
-    chmod +x scripts/load_source_2.sh
+    chmod +x scripts/load_source_1.sh scripts/load_source_2.sh
+    ./scripts/load_source_1.sh
     ./scripts/load_source_2.sh
 
 Usage:
     uv run python scripts/part3_pipeline.py
+    uv run python scripts/part3_pipeline.py --fail-fast
+    uv run python scripts/part3_pipeline.py --full-refresh   # rebuild people_canonical
+    uv run python scripts/part3_pipeline.py --from 05        # rerun 05 and downstream
+    uv run python scripts/part3_pipeline.py --force          # ignore skip-if-unchanged
+    uv run python scripts/part3_pipeline.py --dry-run        # estimate bytes, run nothing
+    uv run python scripts/part3_pipeline.py --budget 05=80GB # override a step's byte budget
+    uv run python scripts/part3_pipeline.py --hold           # snapshot, but keep serving the last one
+    uv run python scripts/part3_pipeline.py --changelog-format json   # NDJSON changelog export
+
+    # Offline: the same SQL on an embedded DuckDB database over local files
+    uv run python scripts/part3_pipeline.py --backend duckdb \\
+        --source-1 ./s1.jsonl --source-2 ./source2/ --database ./pipeline.duckdb
+    # (raw source files are converted to typed bronze Parquet in ./bronze first)
 """
 
+import argparse
+import os
 import sys
+import time
+from datetime import date, datetime, timezone
 from pathlib import Path
-from google.cloud import bigquery
+
+from job_telemetry import (DEFAULT_BUDGETS_PATH, DEFAULT_HISTORY_PATH, DEFAULT_REPORT_DIR,
+                           BudgetExceeded, RunHistory, RunTelemetry, format_bytes, load_budgets,
+                           regressions)
+from step_scheduler import (FAILED, NOT_SELECTED, RAN, SKIPPED, Step, StepState, downstream,
+                            print_schedule, run_dag, sql_hash)
+from quality_gates import (DEFAULT_GATES_PATH, GateHistory, check_table, format_metric, gate_sql, load_gates,
+                           print_result)
+from snapshot_versions import DEFAULT_KEEP, SnapshotStore, snapshot_id_for
+from changelog import DEFAULT_LOCAL_URI, DEFAULT_URI, DELETE, FORMATS, INSERT, UPDATE, Changelog
+from field_groups import DEFAULT_GROUPS_PATH, load_field_groups
 
 # Configuration
 PROJECT_ID = "coffeespace-sandbox"
 DATASET_ID = "coffeespace_canonical"
-SQL_DIR = Path(__file__).parent / "sql"
-
-
-def run_sql_file(client: bigquery.Client, sql_file: Path, description: str) -> dict:
-    """Execute a SQL file and return results summary."""
-    print(f"\n{'='*60}")
-    print(f"Step: {description}")
-    print(f"File: {sql_file.name}")
-    print("="*60)
+SCRIPTS_DIR = Path(__file__).parent
+SQL_DIR = SCRIPTS_DIR / "sql"
+DEFAULT_STATE_FILE = "part3_state.json"
+MAX_PARALLEL_STEPS = 4
+
+# The DAG: a step depends on the steps that write its inputs (see step_scheduler.py)
+STEPS = [
+    Step("01", "01_source_1_snapshot.sql", "Select Source 1 Snapshot (Bronze)",
+         inputs=("bronze_source_1", "bronze_source_1_quarantine"),
+         outputs=("raw_source_1", "raw_source_1_quarantine")),
+    Step("02", DEFAULT_GATES_PATH.name, "Quality Gates: Sources",
+         inputs=("raw_source_1", "raw_source_1_quarantine",
+                 "bronze_source_2", "bronze_source_2_quarantine"),
+         sources=("quality_gates.py",)),
+    Step("03", "03_staging_source_1.sql", "Stage Source 1 (Silver)",
+         inputs=("raw_source_1", "raw_source_1_quarantine"), outputs=("stg_source_1",)),
+    Step("04", "04_staging_source_2.sql", "Stage Source 2 (Silver)",
+         inputs=("bronze_source_2", "bronze_source_2_quarantine"), outputs=("stg_source_2",)),
+    Step("05", "05_merge_canonical.sql", "Merge to Canonical (Gold)",
+         inputs=("stg_source_1", "stg_source_2"),
+         outputs=("people_canonical_candidates", "people_canonical"), after=("02",)),
+    Step("06", DEFAULT_GATES_PATH.name, "Quality Gates: Canonical (Gold)",
+         inputs=("people_canonical",), sources=("quality_gates.py",)),
+    Step("07", "07_firestore_export_view.sql", "Snapshot and Promote to Firestore Export",
+         inputs=("people_canonical",), outputs=("firestore_export", "snapshot_metadata"), after=("06",),
+         sources=("snapshot_versions.py",)),
+    Step("08", DEFAULT_GROUPS_PATH.name, "People Changelog (CDC)",
+         inputs=("snapshot_metadata",), outputs=("people_changelog",), sources=("changelog.py", "field_groups.py")),
+]
+PROMOTE_STEP = "07"  # snapshots people_canonical and swaps firestore_export (snapshot_versions.py)
+CHANGELOG_STEP = "08"  # diffs the promoted snapshot against the changelog head (changelog.py)
+
+
+def run_sql_file(client, sql_file: Path, description: str, log=print,
+                 telemetry: RunTelemetry | None = None) -> dict:
+    """Execute a SQL file and return results summary.
+
+    With telemetry, every statement is recorded, checked against the step's
+    byte budget first, or only estimated in a dry run (see job_telemetry.py).
+    """
+    log(f"\n{'='*60}")
+    log(f"Step: {description}")
+    log(f"File: {sql_file.name}")
+    log("="*60)
 
     sql = sql_file.read_text()
 
@@ -50,34 +137,187 @@ def run_sql_file(client: bigquery.Client, sql_file: Path, description: str) -> d
             continue
 
         try:
-            print(f"  Executing statement {i}/{len(statements)}...")
-            query_job = client.query(statement)
-            query_job.result()  # Wait for completion
+            log(f"  Executing statement {i}/{len(statements)}...")
+            if telemetry is not None:
+                query_job = telemetry.run(client, sql_file.name.split("_")[0], i, statement)
+            else:
+                query_job = client.query(statement)
+                query_job.result()  # Wait for completion
 
-            if query_job.errors:
+            if telemetry is not None and telemetry.dry_run:
+                log(f"    Estimated bytes: {format_bytes(query_job.total_bytes_processed)}")
+            elif query_job.errors:
                 results["errors"].extend(query_job.errors)
-                print(f"    Warning: {query_job.errors}")
+                log(f"    Warning: {query_job.errors}")
             else:
                 # Try to get row count for SELECT/CREATE statements
                 if hasattr(query_job, 'total_rows') and query_job.total_rows is not None:
-                    print(f"    Rows affected: {query_job.total_rows}")
+                    log(f"    Rows affected: {query_job.total_rows}")
                 else:
-                    print(f"    Completed successfully")
+                    log(f"    Completed successfully")
+
+        except BudgetExceeded as e:
+            results["success"] = False
+            results["abort"] = True
+            results["errors"].append(str(e))
+            log(f"    BUDGET EXCEEDED, not executed: {e}")
+            break
 
         except Exception as e:
+            if telemetry is not None and telemetry.dry_run:
+                # Usually a table an earlier step creates: estimate the rest anyway
+                log(f"    Cannot estimate: {e}")
+                continue
+            results["success"] = False
+            results["errors"].append(str(e))
+            log(f"    ERROR: {e}")
+
+    return results
+
+
+def run_quality_gates(client, step: Step, gates: dict[str, dict], telemetry: RunTelemetry,
+                      history: GateHistory | None = None, log=print) -> dict:
+    """One aggregate scan per gated input table of a gate step, checked against its gates."""
+    log(f"\n{'='*60}")
+    log(f"Step: {step.description}")
+    log(f"File: {step.sql_file}")
+    log("="*60)
+
+    tables = [table for table in step.inputs if table in gates]
+    results = {"success": True, "statements": len(tables), "errors": []}
+
+    for i, table in enumerate(tables, 1):
+        table_ref = f"{PROJECT_ID}.{DATASET_ID}.{table}"
+        try:
+            if telemetry.dry_run:
+                job = telemetry.run(client, step.key, i, gate_sql(table_ref, gates[table]))
+                log(f"  {table}: estimated bytes {format_bytes(job.total_bytes_processed)}")
+                continue
+            previous = history.previous(telemetry.target, table, telemetry.run_id) if history else None
+            result = check_table(lambda sql: telemetry.run(client, step.key, i, sql),
+                                 table, gates[table], table_ref, previous)
+        except BudgetExceeded as e:
             results["success"] = False
+            results["abort"] = True
             results["errors"].append(str(e))
-            print(f"    ERROR: {e}")
+            log(f"  BUDGET EXCEEDED, not executed: {e}")
+            break
+        except Exception as e:
+            if telemetry.dry_run:
+                log(f"  {table}: cannot estimate: {e}")
+                continue
+            results["success"] = False
+            results["errors"].append(f"{table}: {e}")
+            log(f"  {table}: ERROR: {e}")
+            continue
+
+        print_result(result, log)
+        if history is not None:
+            history.save(telemetry.run_id, telemetry.target, result)
+        if not result.passed:
+            results["success"] = False
+            results["errors"].extend(f"{table}: {c.metric} = {format_metric(c.metric, c.value)} ({c.threshold})"
+                                     for c in result.failures())
+
+    return results
 
+
+def run_promotion(client, step: Step, snapshot_id: str, telemetry: RunTelemetry, hold: bool = False,
+                  keep: int = DEFAULT_KEEP, log=print) -> dict:
+    """Snapshot people_canonical, define its export view from the step's SQL, promote and prune."""
+    log(f"\n{'='*60}")
+    log(f"Step: {step.description}")
+    log(f"File: {step.sql_file}")
+    log("="*60)
+
+    results = {"success": True, "statements": 0, "errors": []}
+    if telemetry.dry_run:
+        log(f"  Would snapshot people_canonical as {snapshot_id}"
+            + (" (held)" if hold else " and promote it"))
+        return results
+
+    def run(statement):
+        results["statements"] += 1
+        return telemetry.run(client, step.key, results["statements"], statement)
+
+    store = SnapshotStore(client, f"{PROJECT_ID}.{DATASET_ID}", run)
+    export_sql = (SQL_DIR / step.sql_file).read_text()
+    try:
+        current = store.unchanged_since(export_sql)
+        if current:
+            # e.g. a --from 05 rerun whose merge inserted, updated and tombstoned nothing
+            snapshot_id = current
+            log(f"  people_canonical unchanged since snapshot {snapshot_id}: not snapshotting it again")
+        else:
+            store.create(snapshot_id, export_sql, telemetry.run_id)
+            log(f"  Snapshot {snapshot_id} created (validated)")
+        if hold:
+            log(f"  Held: firestore_export still serves {store.promoted() or 'nothing'}")
+            log(f"  Promote with: python3 scripts/snapshot_versions.py promote {snapshot_id}")
+        else:
+            previous = store.promoted()
+            store.promote(snapshot_id)
+            log(f"  Promoted {snapshot_id} (was {previous or 'none'})" if previous != snapshot_id
+                else f"  {snapshot_id} is still promoted")
+        for pruned in store.prune(keep):
+            log(f"  Pruned snapshot {pruned}")
+    except BudgetExceeded as e:
+        results.update(success=False, abort=True)
+        results["errors"].append(str(e))
+        log(f"  BUDGET EXCEEDED, not executed: {e}")
+    except Exception as e:
+        results["success"] = False
+        results["errors"].append(str(e))
+        log(f"  ERROR: {e}")
+    return results
+
+
+def run_changelog(client, step: Step, telemetry: RunTelemetry, uri: str, fmt: str = "parquet",
+                  log=print) -> dict:
+    """Diff the promoted snapshot against the changelog head into people_changelog and export it."""
+    log(f"\n{'='*60}")
+    log(f"Step: {step.description}")
+    log(f"File: {step.sql_file}")
+    log("="*60)
+
+    results = {"success": True, "statements": 0, "errors": []}
+
+    def run(statement):
+        results["statements"] += 1
+        return telemetry.run(client, step.key, results["statements"], statement)
+
+    dataset = f"{PROJECT_ID}.{DATASET_ID}"
+    changelog = Changelog(client, dataset, run)
+    try:
+        if telemetry.dry_run:
+            log("  Would diff the promoted snapshot against the changelog head")
+            return results
+        changelog.ensure_tables()
+        head, promoted = changelog.head(), SnapshotStore(client, dataset, run).promoted()
+        if promoted is None or promoted == head:
+            log(f"  Nothing to diff: changelog head {head or 'none'}, promoted {promoted or 'none'}")
+            return results
+        counts = changelog.diff(head, promoted, load_field_groups(), uri, fmt)
+        log(f"  {head or 'nothing'} -> {promoted}: {counts[INSERT]:,} inserts, {counts[UPDATE]:,} updates, "
+            f"{counts[DELETE]:,} deletes")
+        log(f"  Exported to {counts['uri']}")
+    except BudgetExceeded as e:
+        results.update(success=False, abort=True)
+        results["errors"].append(str(e))
+        log(f"  BUDGET EXCEEDED, not executed: {e}")
+    except Exception as e:
+        results["success"] = False
+        results["errors"].append(str(e))
+        log(f"  ERROR: {e}")
     return results
 
 
-def check_source_2_loaded(bq_client: bigquery.Client) -> dict:
+def check_source_2_loaded(bq_client) -> dict:
     """
-    Verify Source 2 was loaded as raw JSON strings.
+    Verify the Source 2 bronze table was loaded.
 
-    Source 2 is loaded as a single json_line column (STRING) to avoid
-    autodetect issues with dirty data. Loaded via Cloud Shell bq load.
+    bronze_source_2 holds typed columns (values that failed coercion are in
+    bronze_source_2_quarantine). Loaded via Cloud Shell with load_source_2.sh.
     """
     print(f"\n{'='*60}")
     print("Step: Verify Source 2 Loaded")
@@ -86,19 +326,19 @@ def check_source_2_loaded(bq_client: bigquery.Client) -> dict:
     results = {"success": True, "errors": [], "row_count": 0}
 
     try:
-        # Using sample50 table for now (50 files loaded)
-        table_id = f"{PROJECT_ID}.{DATASET_ID}.raw_source_2_sample50"
+        # Typed bronze table written by scripts/bronze.py (see load_source_2.sh)
+        table_id = f"{PROJECT_ID}.{DATASET_ID}.bronze_source_2"
         query = f"SELECT COUNT(*) as cnt FROM `{table_id}`"
         result = list(bq_client.query(query).result())
         row_count = result[0].cnt if result else 0
 
         if row_count == 0:
-            print("  ERROR: raw_source_2_sample50 table is empty or doesn't exist!")
+            print("  ERROR: bronze_source_2 table is empty or doesn't exist!")
             print("  Load Source 2 via Cloud Shell first (see README).")
             results["success"] = False
         else:
             results["row_count"] = row_count
-            print(f"  OK: raw_source_2_sample50 has {row_count:,} rows")
+            print(f"  OK: bronze_source_2 has {row_count:,} rows")
 
     except Exception as e:
         results["success"] = False
@@ -109,99 +349,114 @@ def check_source_2_loaded(bq_client: bigquery.Client) -> dict:
     return results
 
 
-def verify_table_counts(client: bigquery.Client):
-    """Verify row counts across pipeline stages."""
-    print(f"\n{'='*60}")
-    print("Verification: Table Row Counts")
-    print("="*60)
-
-    tables = [
-        "raw_source_1",
-        "raw_source_2_sample50",  # Loaded as raw JSON strings
-        "stg_source_1",
-        "stg_source_2",
-        "people_canonical",
-    ]
-
-    for table in tables:
-        try:
-            query = f"SELECT COUNT(*) as cnt FROM `{PROJECT_ID}.{DATASET_ID}.{table}`"
-            result = client.query(query).result()
-            for row in result:
-                print(f"  {table}: {row.cnt:,} rows")
-        except Exception as e:
-            print(f"  {table}: ERROR - {e}")
-
-
-def verify_deduplication(client: bigquery.Client):
-    """Verify no duplicates in canonical table."""
+def verify_record_versions(client, run_started: datetime):
+    """Rows inserted / rewritten / tombstoned by this run's incremental MERGE."""
     print(f"\n{'='*60}")
-    print("Verification: Deduplication Check")
+    print("Verification: Incremental Merge")
     print("="*60)
 
+    since = f"TIMESTAMP('{run_started.isoformat()}')"
     query = f"""
-    SELECT linkedin_id, COUNT(*) as cnt
+    SELECT
+      COUNTIF(provenance.record_version = 1 AND provenance.last_merged_at >= {since}) AS inserted,
+      COUNTIF(provenance.record_version > 1 AND provenance.last_merged_at >= {since}
+              AND provenance.deleted_at IS NULL) AS updated,
+      COUNTIF(provenance.deleted_at >= {since}) AS deleted,
+      COUNTIF(provenance.last_merged_at < {since}) AS unchanged
     FROM `{PROJECT_ID}.{DATASET_ID}.people_canonical`
-    GROUP BY 1
-    HAVING cnt > 1
-    LIMIT 10
     """
 
-    result = list(client.query(query).result())
-    if result:
-        print(f"  WARNING: Found {len(result)} duplicate linkedin_ids!")
-        for row in result[:5]:
-            print(f"    - {row.linkedin_id}: {row.cnt} occurrences")
-    else:
-        print("  OK: No duplicates found (grain = 1 row per person)")
+    for row in client.query(query).result():
+        print(f"  Inserted: {row.inserted:,}  Updated: {row.updated:,}  Tombstoned: {row.deleted:,}  "
+              f"Unchanged: {row.unchanged:,}")
+        written = row.inserted + row.updated + row.deleted
+        total = written + row.unchanged
+        print(f"  Rows written: {written:,} of {total:,} ({written / total if total else 0:.1%}); "
+              f"05 still reads both staging tables in full (see its header)")
 
 
-def verify_provenance(client: bigquery.Client):
-    """Verify source system distribution."""
-    print(f"\n{'='*60}")
-    print("Verification: Source System Distribution")
-    print("="*60)
+def check_derived_fields_rendered() -> bool:
+    """05 must embed the current portfolio taxonomy (derived_fields.py render)."""
+    from derived_fields import MERGE_SQL_PATH, load_taxonomy, render
+
+    taxonomy = load_taxonomy()
+    if render(taxonomy, MERGE_SQL_PATH.read_text()) != MERGE_SQL_PATH.read_text():
+        print(f"ERROR: {MERGE_SQL_PATH.name} does not match portfolio taxonomy {taxonomy['version']}")
+        print("  Run: python3 scripts/derived_fields.py render")
+        return False
+    return True
 
-    query = f"""
-    SELECT
-      ARRAY_TO_STRING(provenance.source_systems, ',') as sources,
-      COUNT(*) as cnt
-    FROM `{PROJECT_ID}.{DATASET_ID}.people_canonical`
-    GROUP BY 1
-    ORDER BY 2 DESC
-    """
 
-    result = client.query(query).result()
-    for row in result:
-        print(f"  {row.sources}: {row.cnt:,} records")
+def check_field_groups_rendered() -> bool:
+    """05's field_hashes and sync_hash must list the current field groups (field_groups.py render)."""
+    from field_groups import MERGE_SQL_PATH, render
 
+    if render(load_field_groups(), MERGE_SQL_PATH.read_text()) != MERGE_SQL_PATH.read_text():
+        print(f"ERROR: {MERGE_SQL_PATH.name} does not match {DEFAULT_GROUPS_PATH.name}")
+        print("  Run: python3 scripts/field_groups.py render")
+        return False
+    return True
 
-def verify_normalization_errors(client: bigquery.Client):
-    """Check for tracked normalization errors."""
+
+def verify_derived_fields(client):
+    """primary_portfolio distribution by computation_method."""
     print(f"\n{'='*60}")
-    print("Verification: Normalization Errors Tracked")
+    print("Verification: Derived Fields")
     print("="*60)
 
     query = f"""
     SELECT
-      ARRAY_LENGTH(normalization_errors) as error_count,
-      COUNT(*) as records
+      derived_fields.computation_method AS method,
+      derived_fields.primary_portfolio AS portfolio,
+      COUNT(*) AS cnt
     FROM `{PROJECT_ID}.{DATASET_ID}.people_canonical`
-    GROUP BY 1
-    ORDER BY 1
+    GROUP BY 1, 2
+    ORDER BY 1, 3 DESC
     """
 
-    result = client.query(query).result()
-    for row in result:
-        print(f"  {row.error_count} errors: {row.records:,} records")
+    for row in client.query(query).result():
+        print(f"  {row.method}: {row.portfolio}: {row.cnt:,} records")
 
 
-def main():
-    print("="*60)
-    print("Part 3: Cleaning, Normalization & Merge Logic Pipeline")
-    print("="*60)
+def table_modified(client, table: str) -> str | None:
+    """Last-modified time of a dataset table or view, None if it does not exist."""
+    try:
+        modified = client.get_table(f"{PROJECT_ID}.{DATASET_ID}.{table}").modified
+    except Exception:
+        return None
+    return modified.isoformat() if modified else None
+
+
+def step_fingerprint(client, step: Step) -> dict:
+    """What skip-if-unchanged compares: SQL file (and sources) hash and input table mtimes."""
+    return {
+        "sql_sha256": sql_hash(SQL_DIR / step.sql_file, *(SCRIPTS_DIR / source for source in step.sources)),
+        "inputs": {table: table_modified(client, table) for table in step.inputs},
+        "outputs_exist": all(table_modified(client, table) for table in step.outputs),
+    }
+
+
+def print_step_costs(totals: dict[str, dict], budgets: dict[str, int], dry_run: bool):
+    """Per-step bytes, slot time, shuffle spill and duration from the run's telemetry."""
+    print(f"  {'step':<5} {'stmts':>5} {'estimated':>10} {'processed':>10} {'billed':>10} "
+          f"{'slot-s':>8} {'spilled':>10} {'seconds':>8} {'budget':>10}")
+    for step in STEPS:
+        t = totals.get(step.key)
+        if t is None:
+            continue
+        processed = "-" if dry_run else format_bytes(t["bytes_processed"])
+        billed = "-" if dry_run else format_bytes(t["bytes_billed"])
+        slot_s = "n/a" if t["slot_ms"] is None else f"{t['slot_ms'] / 1000:.1f}"
+        budget = format_bytes(budgets[step.key]) if step.key in budgets else "-"
+        print(f"  {step.key:<5} {t['statements']:>5} {format_bytes(t['estimated_bytes']):>10} "
+              f"{processed:>10} {billed:>10} {slot_s:>8} {format_bytes(t['shuffle_spilled_bytes']):>10} "
+              f"{(t['duration_ms'] or 0) / 1000:>8.1f} {budget:>10}")
+
+
+def connect_bigquery():
+    """BigQuery client for PROJECT_ID, creating DATASET_ID if needed."""
+    from google.cloud import bigquery
 
-    # Initialize client
     print(f"\nConnecting to BigQuery project: {PROJECT_ID}")
     client = bigquery.Client(project=PROJECT_ID)
 
@@ -215,58 +470,214 @@ def main():
         dataset.location = "US"
         client.create_dataset(dataset)
         print(f"Dataset {DATASET_ID} created")
+    return client
+
+
+def connect_duckdb(database: str, source_1: str, source_2: str, bronze_dir: str):
+    """Embedded DuckDB client running the same SQL over local files.
+
+    source_1 / source_2 are either bronze directories or the raw Source 1
+    JSONL / Source 2 JSON arrays, which are converted into bronze_dir first
+    (Source 1 as today's snapshot). Files unchanged since the last conversion
+    keep their parts, so the bronze tables, and every step reading them,
+    stay unchanged on a rerun.
+    """
+    from bronze import convert_source_1, convert_source_2
+    from duckdb_backend import DuckDBClient
+    from snapshot_cache import SnapshotCache
+
+    print(f"\nOpening DuckDB database: {database}")
+    print(f"  Source 1: {source_1}")
+    print(f"  Source 2: {source_2}")
+    workers = os.cpu_count() or 1
+    Path(bronze_dir).mkdir(parents=True, exist_ok=True)
+    cache = SnapshotCache(str(Path(bronze_dir) / "snapshot_cache.sqlite"))
+    if not (Path(source_1) / "source_1").is_dir():
+        print(f"  Converting Source 1 to bronze: {bronze_dir}")
+        summary = convert_source_1(source_1, bronze_dir, workers, date.today().isoformat(), cache=cache)
+        if summary["failed"]:
+            raise RuntimeError(f"Bronze conversion failed: {summary['failed'][:3]}")
+        source_1 = bronze_dir
+    if not (Path(source_2) / "source_2").is_dir():
+        print(f"  Converting Source 2 to bronze: {bronze_dir}")
+        summary = convert_source_2(source_2, bronze_dir, workers, cache=cache)
+        if summary["failed"]:
+            raise RuntimeError(f"Bronze conversion failed: {summary['failed'][:3]}")
+        source_2 = bronze_dir
+    return DuckDBClient(database, source_1=source_1, source_2=source_2)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Part 3 SQL pipeline")
+    parser.add_argument("--fail-fast", action="store_true", help="Stop at the first failed step")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="Drop people_canonical first (history is lost) instead of merging into it")
+    parser.add_argument("--from", dest="from_step", default=None, metavar="STEP",
+                        help="Rerun STEP (e.g. 05) and everything downstream of it, nothing else")
+    parser.add_argument("--force", action="store_true",
+                        help="Run every step, even when its SQL and inputs are unchanged")
+    parser.add_argument("--max-parallel", type=int, default=MAX_PARALLEL_STEPS,
+                        help="Steps running at once")
+    parser.add_argument("--state-file", default=DEFAULT_STATE_FILE,
+                        help="Last successful run per step, for skip-if-unchanged")
+    parser.add_argument("--hold", action="store_true",
+                        help="Snapshot people_canonical but keep serving the promoted snapshot")
+    parser.add_argument("--keep-snapshots", type=int, default=DEFAULT_KEEP,
+                        help="Newest people_canonical snapshots to keep (older ones are dropped)")
+    parser.add_argument("--changelog-uri", default=None,
+                        help=f"Changelog export prefix (default {DEFAULT_URI}, ./{DEFAULT_LOCAL_URI} for duckdb)")
+    parser.add_argument("--changelog-format", choices=sorted(FORMATS), default="parquet",
+                        help="Changelog export format (json: NDJSON)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Estimate bytes per statement and step, execute nothing")
+    parser.add_argument("--budgets", default=str(DEFAULT_BUDGETS_PATH),
+                        help="JSON per-step byte budgets ('' for none)")
+    parser.add_argument("--budget", action="append", default=[], metavar="STEP=SIZE",
+                        help="Override one step's byte budget, e.g. 05=80GB (repeatable)")
+    parser.add_argument("--report-dir", default=DEFAULT_REPORT_DIR, help="Where run reports (JSON) go")
+    parser.add_argument("--history", default=DEFAULT_HISTORY_PATH,
+                        help="SQLite run history for regression tracking ('' for none)")
+    parser.add_argument("--backend", choices=["bigquery", "duckdb"], default="bigquery")
+    parser.add_argument("--database", default=":memory:", help="DuckDB database file (duckdb backend)")
+    parser.add_argument("--source-1", default=None,
+                        help="Local Source 1 JSONL or bronze directory (duckdb backend)")
+    parser.add_argument("--source-2", default=None,
+                        help="Local Source 2 JSON arrays or bronze directory (duckdb backend)")
+    parser.add_argument("--bronze-dir", default="bronze",
+                        help="Where raw --source-1/--source-2 files are converted to bronze (duckdb backend)")
+    args = parser.parse_args(argv)
+    if args.backend == "duckdb" and not (args.source_1 and args.source_2):
+        parser.error("--backend duckdb needs --source-1 and --source-2")
+    if args.from_step and args.from_step not in {step.key for step in STEPS}:
+        parser.error(f"--from: unknown step {args.from_step} "
+                     f"(one of {', '.join(step.key for step in STEPS)})")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    run_started = datetime.now(timezone.utc)
 
-    # Step 1: Create external table for Source 1
-    result = run_sql_file(
-        client,
-        SQL_DIR / "01_create_external_tables.sql",
-        "Create External Tables (Bronze - Source 1 only)"
-    )
-    all_success = result["success"]
+    print("="*60)
+    print("Part 3: Cleaning, Normalization & Merge Logic Pipeline")
+    print("="*60)
 
-    # Step 2: Verify Source 2 was loaded via bash script
+    if args.backend == "duckdb":
+        client = connect_duckdb(args.database, args.source_1, args.source_2, args.bronze_dir)
+    else:
+        client = connect_bigquery()
+
+    all_success = True
+
+    # Verify Source 2 was loaded via bash script
     result = check_source_2_loaded(client)
     if not result["success"]:
         all_success = False
-        if "--fail-fast" in sys.argv:
+        if args.fail_fast:
             print("Stopping due to --fail-fast flag")
             sys.exit(1)
 
-    # Remaining pipeline steps
-    steps = [
-        ("02_validate_sources.sql", "Validate Source Data"),
-        ("03_staging_source_1.sql", "Stage Source 1 (Silver)"),
-        ("04_staging_source_2.sql", "Stage Source 2 (Silver)"),
-        ("05_merge_canonical.sql", "Merge to Canonical (Gold)"),
-        ("06_derived_fields.sql", "Compute Derived Fields"),
-        ("07_firestore_export_view.sql", "Create Firestore Export View"),
-    ]
-
-    # Execute remaining pipeline steps
-    for sql_file, description in steps:
-        sql_path = SQL_DIR / sql_file
-        if not sql_path.exists():
-            print(f"ERROR: SQL file not found: {sql_path}")
-            all_success = False
-            continue
+    if not (check_derived_fields_rendered() & check_field_groups_rendered()):
+        all_success = False
+        if args.fail_fast:
+            print("Stopping due to --fail-fast flag")
+            sys.exit(1)
+
+    if args.full_refresh and not args.dry_run:
+        print("\nFull refresh: dropping people_canonical")
+        client.query(f"DROP TABLE IF EXISTS `{PROJECT_ID}.{DATASET_ID}.people_canonical`").result()
+
+    # Pipeline steps: independent steps run concurrently, unchanged ones are skipped
+    if args.backend == "duckdb":
+        target = f"duckdb:{Path(args.database).resolve()}" if args.database != ":memory:" else None
+    else:
+        target = f"bigquery:{PROJECT_ID}.{DATASET_ID}"
+    # A dry run estimates every step and records nothing in the skip state
+    state = StepState(args.state_file if target and not args.dry_run else None, target or "memory")
+    selected = downstream(STEPS, args.from_step) if args.from_step else None
 
-        result = run_sql_file(client, sql_path, description)
+    if args.backend == "duckdb":
+        from duckdb_backend import QueryJobConfig
+    else:
+        from google.cloud.bigquery import QueryJobConfig
+    budgets = load_budgets(args.budgets, args.budget)
+    telemetry = RunTelemetry(run_started.strftime("%Y%m%dT%H%M%S%fZ"), target or "duckdb::memory:",
+                             QueryJobConfig(dry_run=True, use_query_cache=False), budgets, args.dry_run)
+    history = RunHistory(args.history) if args.history else None
+    gates = load_gates()
+    gate_history = GateHistory(args.history) if args.history else None
+
+    def execute(step: Step, log) -> dict:
+        sql_path = SQL_DIR / step.sql_file
+        if not sql_path.exists():
+            log(f"ERROR: SQL file not found: {sql_path}")
+            return {"success": False, "errors": [f"missing {sql_path}"]}
+        if step.key == PROMOTE_STEP:
+            result = run_promotion(client, step, snapshot_id_for(run_started), telemetry, args.hold,
+                                   args.keep_snapshots, log)
+        elif step.key == CHANGELOG_STEP:
+            uri = args.changelog_uri or (DEFAULT_LOCAL_URI if args.backend == "duckdb" else DEFAULT_URI)
+            result = run_changelog(client, step, telemetry, uri, args.changelog_format, log)
+        elif step.sql_file == DEFAULT_GATES_PATH.name:
+            result = run_quality_gates(client, step, gates, telemetry, gate_history, log)
+        else:
+            result = run_sql_file(client, sql_path, step.description, log, telemetry)
         if not result["success"]:
-            all_success = False
-            print(f"FAILED: {description}")
-            if "--fail-fast" in sys.argv:
-                print("Stopping due to --fail-fast flag")
-                sys.exit(1)
+            log(f"FAILED: {step.description}")
+        return result
+
+    started = time.monotonic()
+    results = run_dag(STEPS, execute, lambda step: step_fingerprint(client, step), state,
+                      selected=selected, force=args.force or args.dry_run,
+                      max_parallel=args.max_parallel, fail_fast=args.fail_fast)
+
+    print(f"\n{'='*60}")
+    print("Step Schedule")
+    print("="*60)
+    print_schedule(STEPS, results, time.monotonic() - started)
+    aborted = any((r.result or {}).get("abort") for r in results.values())
+    for step in STEPS:
+        if step.sql_file == DEFAULT_GATES_PATH.name and results[step.key].status == FAILED:
+            print(f"  Quality gates failed in {step.key}: the steps depending on it were not run")
+            for error in results[step.key].result["errors"]:
+                print(f"    {error}")
+    if any(r.status not in (RAN, SKIPPED, NOT_SELECTED) for r in results.values()):
+        all_success = False
+
+    print(f"\n{'='*60}")
+    print("Job Telemetry" + (" (dry run: estimates only)" if args.dry_run else ""))
+    print("="*60)
+    status = "aborted" if aborted else ("succeeded" if all_success else "failed")
+    previous = history.last_step_bytes(telemetry.target, telemetry.run_id) if history else {}
+    print_step_costs(telemetry.step_totals(), budgets, args.dry_run)
+    for step, before, now in regressions(telemetry.step_totals(), previous, args.dry_run):
+        print(f"  WARNING: step {step} scans {format_bytes(now)}, {now / before:.1f}x the last "
+              f"run ({format_bytes(before)})")
+    report_path = telemetry.write(status, args.report_dir, history)
+    print(f"  Report: {report_path}")
+
+    if aborted:
+        print("Stopping: a step exceeded its byte budget")
+        sys.exit(1)
+    if args.dry_run:
+        return 0 if all_success else 1
+    if not all_success and args.fail_fast:
+        print("Stopping due to --fail-fast flag")
+        sys.exit(1)
 
     # Verification
     print("\n" + "="*60)
     print("Running Verification Checks")
     print("="*60)
 
-    verify_table_counts(client)
-    verify_deduplication(client)
-    verify_provenance(client)
-    verify_normalization_errors(client)
+    # Nothing to verify when the merge did not run (e.g. blocked by a source gate on a first run)
+    if results["05"].status not in (RAN, SKIPPED, NOT_SELECTED):
+        print(f"  Skipped: step 05 {results['05'].status}")
+    elif table_modified(client, "people_canonical") is None:
+        print("  Skipped: people_canonical does not exist")
+    else:
+        verify_record_versions(client, run_started)
+        verify_derived_fields(client)
 
     # Summary
     print("\n" + "="*60)
@@ -7,206 +7,517 @@ Industry-standard data profiling approach:
 2. Compute statistical metrics with evidence
 3. Distinguish schema observations from quality claims
 
+Per-file profile accumulators are kept in the snapshot cache, keyed by the
+object's content checksum: on a quarterly re-run, files that have not changed
+are neither downloaded nor re-profiled. File and record sampling is seeded by
+checksum so an unchanged file always yields the same sample.
+
+Samples are drawn with ranged reads at random byte offsets (range_sampling.py)
+rather than by reading the first N lines or whole files, so a 10K-100K record
+sample is unbiased by export order and reads only a few times the sampled
+bytes. Source 2 samples can be stratified across files (--stratified).
+
+Field statistics are bounded-memory mergeable sketches (sketches.py), so
+--full profiles every record: Source 2 files and newline-aligned byte ranges
+of the Source 1 JSONL are profiled in a process pool and the partial profiles
+merged. Key fields (linkedin_id / linkedinID) also get an exact uniqueness
+check.
+
 Usage:
     uv run python scripts/profile_sources.py
+    uv run python scripts/profile_sources.py --sample-size 100000 --stratified
+    uv run python scripts/profile_sources.py --source-1 ./s1.jsonl --source-2 ./s2/   # offline
+    uv run python scripts/profile_sources.py --full --workers 16
+    uv run python scripts/profile_sources.py --full --deep   # every array element
 """
 
+import argparse
 import json
-import subprocess
+import multiprocessing
+import os
 import sys
-from collections import defaultdict
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 import random
 
+from json_stream import iter_json_records, iter_jsonl_range, split_byte_ranges
+from object_store import list_objects, open_stream
+from range_sampling import allocate, sample_each, sample_records
+from sketches import HyperLogLog, KeySet, QuantileSketch, ReservoirSample, RunningStats, TopK
+from snapshot_cache import DEFAULT_CACHE_PATH, SnapshotCache
+
 # Configuration
 SOURCE_1_URI = "gs://coffeespace-sandbox-source-1/CoffeeSpaceTestDatav4.jsonl"
 SOURCE_2_URI = "gs://coffeespace-sandbox-source-2/"
 SAMPLE_SIZE = 10000  # Records per source
+SAMPLE_SEED = 42  # Fixed so the same offsets are sampled each quarter
+SOURCE_1_RANGE_MB = 64  # --full: Source 1 byte range per worker task
+KEY_FIELDS = {'linkedin_id', 'linkedinID'}  # exact uniqueness check
+TOP_VALUE_MAX_CHARS = 100  # longer strings are not tracked as heavy hitters
+MAX_FIELD_PATHS = 2000  # --deep: distinct paths tracked before spilling to OVERFLOW_PATH
+OVERFLOW_PATH = '<overflow>'
 OUTPUT_DIR = Path("docs/part-1-data-profiling")
 
 
-def stream_jsonl_from_gcs(uri: str, limit: int) -> list[dict]:
-    """Stream JSONL from GCS, return first N records."""
-    print(f"Streaming {limit} records from {uri}...")
+def _walk_stage(stage: str, deep: bool, max_paths: int) -> str:
+    """Cache stage name; deep and shallow profiles are not interchangeable."""
+    return f"{stage}:deep{max_paths}" if deep else stage
 
-    # Use gsutil cat with head to avoid downloading 11GB
-    cmd = f"gsutil cat {uri} | head -n {limit}"
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
 
-    if result.returncode != 0:
-        print(f"Error: {result.stderr}")
-        return []
+def profile_source_1(uri: str, sample_size: int, cache: SnapshotCache, deep: bool = False,
+                     max_paths: int = MAX_FIELD_PATHS) -> "DataProfiler":
+    """Profile a random sample of Source 1 lines (ranged reads at random offsets)."""
+    source_name = "Source 1 (Aviato)"
+    stage = _walk_stage(f"profile:source_1:sample{sample_size}", deep, max_paths)
+    objects = list_objects(uri)
+    checksum = objects[0].checksum if objects else None
 
-    records = []
-    for line in result.stdout.strip().split('\n'):
-        if line:
-            try:
-                records.append(json.loads(line))
-            except json.JSONDecodeError as e:
-                print(f"JSON parse error: {e}")
+    cached = cache.get(stage, uri, checksum) if checksum else None
+    if cached is not None:
+        print(f"Source 1 unchanged since last run - reusing cached profile ({checksum})")
+        return DataProfiler.from_state(cached, source_name)
 
-    print(f"  Loaded {len(records)} records from Source 1")
-    return records
+    print(f"Sampling {sample_size} records from {uri} via ranged reads...")
+    records, bytes_read = sample_records(objects, sample_size,
+                                         random.Random(f"{SAMPLE_SEED}:{checksum}"), "jsonl")
+    print(f"  Loaded {len(records)} records from Source 1 ({bytes_read / 1e6:.1f} MB read)")
 
+    profiler = DataProfiler([], source_name, deep, max_paths)
+    for record in records:
+        profiler.add(record)
+    if checksum and profiler.total_count:
+        cache.put(stage, uri, checksum, profiler.to_state())
+    return profiler
 
-def sample_json_files_from_gcs(base_uri: str, sample_files: int, records_per_file: int) -> list[dict]:
-    """Sample records from multiple JSON files in GCS."""
-    print(f"Listing files in {base_uri}...")
 
-    # List all files
-    result = subprocess.run(
-        f"gsutil ls {base_uri}",
-        shell=True, capture_output=True, text=True
-    )
+def profile_source_2(base_uri: str, sample_size: int, cache: SnapshotCache,
+                     stratified: bool = False, deep: bool = False,
+                     max_paths: int = MAX_FIELD_PATHS) -> "DataProfiler":
+    """Profile a random sample of Source 2 records across all files (ranged reads).
 
-    all_files = [f.strip() for f in result.stdout.strip().split('\n') if f.strip()]
-    print(f"  Found {len(all_files)} files")
+    Samples are allocated to files in proportion to size - as random draws,
+    or as fixed proportional quotas with stratified=True - and per-file
+    accumulators are cached by (checksum, quota).
+    """
+    source_name = "Source 2 (LinkedIn Scraper)"
+    stage = _walk_stage("profile:source_2:sample", deep, max_paths)
 
-    # Sample files
-    sampled_files = random.sample(all_files, min(sample_files, len(all_files)))
-    print(f"  Sampling from {len(sampled_files)} files...")
+    print(f"Listing files in {base_uri}...")
+    all_files = list_objects(base_uri, "*.json")
+    print(f"  Found {len(all_files)} files")
 
-    records = []
-    for i, file_uri in enumerate(sampled_files):
-        if i % 10 == 0:
-            print(f"    Processing file {i+1}/{len(sampled_files)}...")
+    # Seeded: the same allocation is made each quarter while file sizes are unchanged
+    quotas = allocate(all_files, sample_size, random.Random(SAMPLE_SEED), stratified)
+    sampled_files = [o for o in all_files if o.uri in quotas]
+    print(f"  Sampling {sample_size} records from {len(sampled_files)} files "
+          f"({'stratified' if stratified else 'size-weighted random'})...")
+
+    merged = DataProfiler([], source_name, deep, max_paths)
+    pending = []
+    for obj in sampled_files:
+        cached = cache.get(stage, obj.name, f"{obj.checksum}:{quotas[obj.uri]}")
+        if cached is not None:
+            merged.merge(DataProfiler.from_state(cached, source_name))
+        else:
+            pending.append(obj)
+    reused = len(sampled_files) - len(pending)
+
+    # All pending files are probed concurrently through one async object store
+    results = sample_each(pending, quotas, [random.Random(o.checksum) for o in pending], "array")
+    bytes_read = 0
+    for obj, (records, nbytes) in zip(pending, results):
+        bytes_read += nbytes
+        profiler = DataProfiler([], source_name, deep, max_paths)
+        for record in records:
+            profiler.add(record)
+        if profiler.total_count:
+            cache.put(stage, obj.name, f"{obj.checksum}:{quotas[obj.uri]}", profiler.to_state())
+        merged.merge(profiler)
+
+    print(f"  Profiled {merged.total_count} records from Source 2 "
+          f"({reused}/{len(sampled_files)} files reused from cache, {bytes_read / 1e6:.1f} MB read)")
+    return merged
+
+
+def profile_shard(uri: str, start: int | None, end: int | None, seed: str,
+                  deep: bool = False, max_paths: int = MAX_FIELD_PATHS) -> dict:
+    """Profile one file, or one byte range of a JSONL file (runs in a worker process)."""
+    random.seed(seed)  # sketch randomness: an unchanged shard gives the same state
+    profiler = DataProfiler([], '', deep, max_paths)
+    with open_stream(uri, end_hint=end) as f:
+        records = iter_json_records(f) if start is None else iter_jsonl_range(f, start, end)
+        for record in records:
+            profiler.add(record)
+    return profiler.to_state()
+
+
+def profile_full(source_name: str, stage: str, shards: list[tuple], workers: int,
+                 cache: SnapshotCache, deep: bool = False,
+                 max_paths: int = MAX_FIELD_PATHS) -> "DataProfiler":
+    """Profile every shard (name, checksum, uri, start, end) in a process pool and merge."""
+    stage = _walk_stage(stage, deep, max_paths)
+    merged = DataProfiler([], source_name, deep, max_paths)
+    pending = []
+    for shard in shards:
+        name, checksum = shard[:2]
+        cached = cache.get(stage, name, checksum)
+        if cached is not None:
+            merged.merge(DataProfiler.from_state(cached, source_name))
+        else:
+            pending.append(shard)
+    print(f"  {len(shards) - len(pending)}/{len(shards)} shards reused from cache, "
+          f"profiling {len(pending)} with {workers} workers...")
+
+    started = time.time()
+    # spawn: never fork a process that already holds a GCS client
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = {
+            pool.submit(profile_shard, uri, start, end, f"{name}:{checksum}",
+                        deep, max_paths): (name, checksum)
+            for name, checksum, uri, start, end in pending
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            name, checksum = futures[future]
+            state = future.result()
+            cache.put(stage, name, checksum, state)
+            merged.merge(DataProfiler.from_state(state, source_name))
+            if i % 50 == 0 or i == len(pending):
+                elapsed = time.time() - started
+                print(f"    {i}/{len(pending)} shards, {merged.total_count:,} records "
+                      f"({merged.total_count / elapsed if elapsed else 0:,.0f} rec/s incl. cached)")
+    return merged
+
+
+def profile_source_1_full(uri: str, workers: int, cache: SnapshotCache, deep: bool = False,
+                          max_paths: int = MAX_FIELD_PATHS) -> "DataProfiler":
+    """Profile every Source 1 record, split into newline-aligned byte ranges."""
+    print(f"Profiling all of {uri}...")
+    shards = []
+    for obj in list_objects(uri):
+        parts = max(workers, -(-obj.size // (SOURCE_1_RANGE_MB * 1024 * 1024)))
+        for start, end in split_byte_ranges(obj.size, parts):
+            shards.append((f"{obj.name}#{start}-{end}", obj.checksum, obj.uri, start, end))
+    return profile_full("Source 1 (Aviato)", "profile:source_1:full", shards, workers, cache,
+                        deep, max_paths)
+
+
+def profile_source_2_full(base_uri: str, workers: int, cache: SnapshotCache, deep: bool = False,
+                          max_paths: int = MAX_FIELD_PATHS) -> "DataProfiler":
+    """Profile every record of every Source 2 file."""
+    print(f"Profiling all files in {base_uri}...")
+    shards = [(o.name, o.checksum, o.uri, None, None) for o in list_objects(base_uri, "*.json")]
+    return profile_full("Source 2 (LinkedIn Scraper)", "profile:source_2:full", shards, workers,
+                        cache, deep, max_paths)
+
+
+class FieldStats:
+    """Bounded-memory, mergeable statistics for one field path."""
+
+    __slots__ = (
+        'record_count', 'last_record', 'present_count', 'null_count', 'empty_count', 'type_counts', 'samples',
+        'lengths', 'length_quantiles', 'numbers', 'number_quantiles',
+        'distinct', 'top_values', 'keys',
+    )
 
-        result = subprocess.run(
-            f"gsutil cat {file_uri}",
-            shell=True, capture_output=True, text=True
-        )
+    def __init__(self, is_key: bool = False):
+        self.record_count = 0  # records containing the path (<= present_count for arrays)
+        self.last_record = 0  # transient: total_count when record_count was last bumped
+        self.present_count = 0
+        self.null_count = 0
+        self.empty_count = 0
+        self.type_counts = {}
+        self.samples = ReservoirSample(5)
+        self.lengths = RunningStats()
+        self.length_quantiles = QuantileSketch()
+        self.numbers = RunningStats()
+        self.number_quantiles = QuantileSketch()
+        self.distinct = HyperLogLog()
+        self.top_values = TopK()
+        self.keys = KeySet() if is_key else None
+
+    def merge(self, other: "FieldStats"):
+        self.record_count += other.record_count
+        self.present_count += other.present_count
+        self.null_count += other.null_count
+        self.empty_count += other.empty_count
+        for type_name, count in other.type_counts.items():
+            self.type_counts[type_name] = self.type_counts.get(type_name, 0) + count
+        self.samples.merge(other.samples)
+        self.lengths.merge(other.lengths)
+        self.length_quantiles.merge(other.length_quantiles)
+        self.numbers.merge(other.numbers)
+        self.number_quantiles.merge(other.number_quantiles)
+        self.distinct.merge(other.distinct)
+        self.top_values.merge(other.top_values)
+        if self.keys is not None and other.keys is not None:
+            self.keys.merge(other.keys)
+
+    def to_state(self) -> dict:
+        return {
+            'record_count': self.record_count,
+            'present_count': self.present_count,
+            'null_count': self.null_count,
+            'empty_count': self.empty_count,
+            'type_counts': self.type_counts,
+            'samples': self.samples.to_state(),
+            'lengths': self.lengths.to_state(),
+            'length_quantiles': self.length_quantiles.to_state(),
+            'numbers': self.numbers.to_state(),
+            'number_quantiles': self.number_quantiles.to_state(),
+            'distinct': self.distinct.to_state(),
+            'top_values': self.top_values.to_state(),
+            'keys': self.keys.to_state() if self.keys is not None else None,
+        }
 
-        if result.returncode != 0:
-            print(f"  Error reading {file_uri}: {result.stderr}")
-            continue
+    @classmethod
+    def from_state(cls, state: dict) -> "FieldStats":
+        stats = cls()
+        stats.record_count = state['record_count']
+        stats.present_count = state['present_count']
+        stats.null_count = state['null_count']
+        stats.empty_count = state['empty_count']
+        stats.type_counts = dict(state['type_counts'])
+        stats.samples = ReservoirSample.from_state(state['samples'])
+        stats.lengths = RunningStats.from_state(state['lengths'])
+        stats.length_quantiles = QuantileSketch.from_state(state['length_quantiles'])
+        stats.numbers = RunningStats.from_state(state['numbers'])
+        stats.number_quantiles = QuantileSketch.from_state(state['number_quantiles'])
+        stats.distinct = HyperLogLog.from_state(state['distinct'])
+        stats.top_values = TopK.from_state(state['top_values'])
+        stats.keys = KeySet.from_state(state['keys']) if state['keys'] is not None else None
+        return stats
 
-        try:
-            data = json.loads(result.stdout)
-            # Handle both array of records and single record
-            if isinstance(data, list):
-                # Sample from this file's records
-                sampled = random.sample(data, min(records_per_file, len(data)))
-                records.extend(sampled)
-            else:
-                records.append(data)
-        except json.JSONDecodeError as e:
-            print(f"  JSON parse error in {file_uri}: {e}")
 
-    print(f"  Loaded {len(records)} total records from Source 2")
-    return records
+class DataProfiler:
+    """Compute statistical profiles for a stream of records.
 
+    Per-field statistics are mergeable sketches with bounded memory, so
+    partial profiles (one per file or byte range, possibly from different
+    processes) can be combined with merge() and round-tripped through
+    to_state()/from_state().
 
-class DataProfiler:
-    """Compute statistical profiles for a list of records."""
+    By default nested objects are followed two levels down and only the
+    first element of an array of objects is inspected. With deep=True every
+    array element is walked at any depth; the number of distinct paths is
+    capped at max_paths and anything beyond lands in OVERFLOW_PATH.
+    """
 
-    def __init__(self, records: list[dict], source_name: str):
+    def __init__(self, records: list[dict], source_name: str, deep: bool = False,
+                 max_paths: int = MAX_FIELD_PATHS):
         self.records = records
         self.source_name = source_name
-        self.total_count = len(records)
-        self.field_stats = defaultdict(lambda: {
-            'present_count': 0,
-            'null_count': 0,
-            'empty_count': 0,
-            'type_counts': defaultdict(int),
-            'sample_values': [],
-            'value_lengths': [],
-            'numeric_values': [],
-        })
+        self.deep = deep
+        self.max_paths = max_paths
+        self.total_count = 0
+        self.field_stats: dict[str, FieldStats] = {}
+        self.overflow_paths = HyperLogLog()  # distinct paths folded into OVERFLOW_PATH
+        self._paths: dict[tuple[str, str], str] = {}  # (parent, key) -> interned path
+        self._admitted: set[str] = set()  # paths counted against max_paths, with or without stats
 
     def profile(self):
         """Run profiling on all records."""
-        print(f"\nProfiling {self.source_name} ({self.total_count} records)...")
+        print(f"\nProfiling {self.source_name} ({self.total_count + len(self.records)} records)...")
 
         for record in self.records:
-            self._profile_record(record, prefix='')
+            self.add(record)
+        self.records = []
 
         return self._compute_summary()
 
+    def add(self, record: dict):
+        """Accumulate a single record."""
+        self.total_count += 1
+        self._profile_record(record, prefix='')
+
+    def merge(self, other: "DataProfiler"):
+        """Fold another profiler's accumulated statistics into this one."""
+        self.total_count += other.total_count
+        self.overflow_paths.merge(other.overflow_paths)
+        for field_path, theirs in other.field_stats.items():
+            if not self._has_room(field_path):
+                self.overflow_paths.add(field_path)
+                field_path = OVERFLOW_PATH
+            self._stats(field_path).merge(theirs)
+
+    def to_state(self) -> dict:
+        """JSON-serializable accumulator state."""
+        return {
+            'total_count': self.total_count,
+            'deep': self.deep,
+            'max_paths': self.max_paths,
+            'overflow_paths': self.overflow_paths.to_state(),
+            'field_stats': {path: stats.to_state() for path, stats in self.field_stats.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state: dict, source_name: str) -> "DataProfiler":
+        profiler = cls([], source_name, state['deep'], state['max_paths'])
+        profiler.total_count = state['total_count']
+        profiler.overflow_paths = HyperLogLog.from_state(state['overflow_paths'])
+        for path, stats in state['field_stats'].items():
+            profiler.field_stats[path] = FieldStats.from_state(stats)
+        profiler._admitted.update(profiler.field_stats)
+        return profiler
+
+    def _has_room(self, field_path: str) -> bool:
+        return (field_path == OVERFLOW_PATH or field_path in self._admitted
+                or len(self._admitted) < self.max_paths)
+
+    def _stats(self, field_path: str) -> FieldStats:
+        """Stats for a path, created on the first value recorded under it."""
+        stats = self.field_stats.get(field_path)
+        if stats is None:
+            stats = self.field_stats[field_path] = FieldStats(is_key=field_path in KEY_FIELDS)
+            self._admitted.add(field_path)
+        return stats
+
+    def _child_path(self, parent: str, key: str) -> str:
+        """Interned path for a dict key (or '[]' for array elements) under `parent`."""
+        path = self._paths.get((parent, key))
+        if path is not None:
+            return path
+        if parent == OVERFLOW_PATH:
+            return OVERFLOW_PATH
+        if key == '[]':
+            path = parent + '[]'
+        else:
+            path = f"{parent}.{key}" if parent else key
+        if not self._has_room(path):
+            # Not cached: keys past the cap may be unbounded (e.g. ids used as keys)
+            self.overflow_paths.add(path)
+            return OVERFLOW_PATH
+        # Admitted without stats: a shallow walk only descends through the first
+        # array element, so 'experienceList[]' itself never records a value
+        path = self._paths[(parent, key)] = sys.intern(path)
+        self._admitted.add(path)
+        return path
+
     def _profile_record(self, obj, prefix: str):
         """Recursively profile a record."""
         if isinstance(obj, dict):
             for key, value in obj.items():
-                field_path = f"{prefix}.{key}" if prefix else key
+                field_path = self._child_path(prefix, key)
                 self._record_field_stats(field_path, value)
 
+                if self.deep:
+                    self._walk(field_path, value)
                 # Recurse into nested structures (limit depth to avoid explosion)
-                if prefix.count('.') < 2:
+                elif prefix.count('.') < 2:
                     if isinstance(value, dict):
                         self._profile_record(value, field_path)
                     elif isinstance(value, list) and value and isinstance(value[0], dict):
-                        self._profile_record(value[0], f"{field_path}[]")
+                        self._profile_record(value[0], self._child_path(field_path, '[]'))
+
+    def _walk(self, field_path: str, value):
+        """Deep mode: descend into every nested object and every array element."""
+        if isinstance(value, dict):
+            self._profile_record(value, field_path)
+        elif isinstance(value, list) and value:
+            element_path = self._child_path(field_path, '[]')
+            for element in value:
+                self._record_field_stats(element_path, element)
+                self._walk(element_path, element)
 
     def _record_field_stats(self, field_path: str, value):
         """Record statistics for a single field value."""
-        stats = self.field_stats[field_path]
-        stats['present_count'] += 1
+        stats = self._stats(field_path)
+        stats.present_count += 1
+        if stats.last_record != self.total_count:
+            stats.last_record = self.total_count
+            stats.record_count += 1
 
         type_name = type(value).__name__
-        stats['type_counts'][type_name] += 1
+        stats.type_counts[type_name] = stats.type_counts.get(type_name, 0) + 1
 
         if value is None:
-            stats['null_count'] += 1
+            stats.null_count += 1
         elif value == '' or value == [] or value == {}:
-            stats['empty_count'] += 1
+            stats.empty_count += 1
         else:
-            if len(stats['sample_values']) < 5:
+            slot = stats.samples.offer()
+            if slot is not None:
                 if isinstance(value, str) and len(value) > 100:
-                    stats['sample_values'].append(value[:100] + '...')
+                    stats.samples.place(slot, value[:100] + '...')
                 elif isinstance(value, (list, dict)) and len(str(value)) > 100:
-                    stats['sample_values'].append(f"{type_name}[{len(value)} items]")
+                    stats.samples.place(slot, f"{type_name}[{len(value)} items]")
                 else:
-                    stats['sample_values'].append(value)
+                    stats.samples.place(slot, value)
 
             if isinstance(value, (str, list)):
-                stats['value_lengths'].append(len(value))
+                stats.lengths.add(len(value))
+                stats.length_quantiles.add(len(value))
 
             if isinstance(value, (int, float)) and not isinstance(value, bool):
-                stats['numeric_values'].append(value)
+                stats.numbers.add(value)
+                stats.number_quantiles.add(value)
+
+            if isinstance(value, (str, int, float, bool)):
+                stats.distinct.add(value)
+                if not isinstance(value, str) or len(value) <= TOP_VALUE_MAX_CHARS:
+                    stats.top_values.add(value)
+                if stats.keys is not None:
+                    stats.keys.add(value)
 
     def _compute_summary(self) -> dict:
         """Compute summary statistics."""
         summary = {
             'source': self.source_name,
             'total_records': self.total_count,
+            'deep': self.deep,
             'fields': {}
         }
+        if OVERFLOW_PATH in self.field_stats:
+            summary['overflow_paths_estimate'] = self.overflow_paths.estimate()
 
         for field_path, stats in sorted(self.field_stats.items()):
-            present_rate = stats['present_count'] / self.total_count if self.total_count > 0 else 0
-            null_rate = stats['null_count'] / stats['present_count'] if stats['present_count'] > 0 else 0
-            empty_rate = stats['empty_count'] / stats['present_count'] if stats['present_count'] > 0 else 0
+            present_rate = stats.record_count / self.total_count if self.total_count > 0 else 0
+            null_rate = stats.null_count / stats.present_count if stats.present_count > 0 else 0
+            empty_rate = stats.empty_count / stats.present_count if stats.present_count > 0 else 0
 
             field_summary = {
                 'present_rate': round(present_rate, 4),
                 'null_rate': round(null_rate, 4),
                 'empty_rate': round(empty_rate, 4),
                 'completeness': round(1 - null_rate - empty_rate, 4),
-                'types': dict(stats['type_counts']),
-                'sample_values': stats['sample_values'][:3],
+                'occurrences': stats.present_count,
+                'types': dict(stats.type_counts),
+                'sample_values': stats.samples.items[:3],
             }
 
-            if stats['value_lengths']:
-                lengths = stats['value_lengths']
-                field_summary['length_stats'] = {
-                    'min': min(lengths),
-                    'max': max(lengths),
-                    'avg': round(sum(lengths) / len(lengths), 2)
-                }
-
-            if stats['numeric_values']:
-                nums = stats['numeric_values']
-                field_summary['numeric_stats'] = {
-                    'min': min(nums),
-                    'max': max(nums),
-                    'avg': round(sum(nums) / len(nums), 2)
-                }
+            if stats.lengths.count:
+                field_summary['length_stats'] = _distribution(stats.lengths, stats.length_quantiles)
+
+            if stats.numbers.count:
+                field_summary['numeric_stats'] = _distribution(stats.numbers, stats.number_quantiles)
+
+            if stats.top_values.counts:
+                field_summary['distinct_estimate'] = stats.distinct.estimate()
+                field_summary['top_values'] = stats.top_values.top(5)
+
+            if stats.keys is not None:
+                distinct = stats.keys.distinct()
+                field_summary['distinct_count'] = distinct
+                field_summary['duplicate_count'] = len(stats.keys.hashes) - distinct
 
             summary['fields'][field_path] = field_summary
 
         return summary
 
 
+def _distribution(running: RunningStats, quantiles: QuantileSketch) -> dict:
+    return {
+        'min': running.min,
+        'max': running.max,
+        'avg': round(running.mean, 2),
+        'stddev': round(running.stddev, 2),
+        'p50': quantiles.quantile(0.5),
+        'p95': quantiles.quantile(0.95),
+    }
+
+
 def identify_quality_issues(profile: dict) -> list[dict]:
     """Identify data quality issues from profile statistics."""
     issues = []
@@ -234,6 +545,16 @@ def identify_quality_issues(profile: dict) -> list[dict]:
                 'sample_size': profile['total_records']
             })
 
+        if stats.get('duplicate_count'):
+            issues.append({
+                'field': field_path,
+                'issue': 'DUPLICATE_KEY',
+                'severity': 'HIGH',
+                'metric': f"{stats['duplicate_count']:,} duplicate values "
+                          f"({stats['distinct_count']:,} distinct)",
+                'sample_size': profile['total_records']
+            })
+
         if len(stats['types']) > 1 and 'NoneType' not in stats['types']:
             issues.append({
                 'field': field_path,
@@ -258,21 +579,33 @@ def identify_quality_issues(profile: dict) -> list[dict]:
     return issues
 
 
-def generate_markdown_report(profile1: dict, profile2: dict, issues1: list, issues2: list) -> str:
+def _key_duplicates(profile: dict) -> str:
+    for field in KEY_FIELDS:
+        stats = profile['fields'].get(field)
+        if stats and 'duplicate_count' in stats:
+            return f"{stats['duplicate_count']:,} (`{field}`)"
+    return "-"
+
+
+def generate_markdown_report(profile1: dict, profile2: dict, issues1: list, issues2: list,
+                             full: bool = False) -> str:
     """Generate markdown report from profiles."""
+    methodology = ("Full scan of every record (mergeable sketches)" if full
+                   else "Statistical sampling from GCS sources")
 
     report = f"""# Data Profiling Report
 
 **Generated**: {datetime.now().isoformat()}
-**Methodology**: Statistical sampling from GCS sources
+**Methodology**: {methodology}
 
 ## Executive Summary
 
 | Metric | Source 1 (Aviato) | Source 2 (LinkedIn Scraper) |
 |--------|-------------------|------------------------------|
-| **Records Sampled** | {profile1['total_records']:,} | {profile2['total_records']:,} |
+| **Records Profiled** | {profile1['total_records']:,} | {profile2['total_records']:,} |
 | **Top-Level Fields** | {len([f for f in profile1['fields'] if '.' not in f])} | {len([f for f in profile2['fields'] if '.' not in f])} |
 | **Quality Issues Found** | {len(issues1)} | {len(issues2)} |
+| **Duplicate Key Values** | {_key_duplicates(profile1)} | {_key_duplicates(profile2)} |
 
 ---
 
@@ -341,7 +674,7 @@ def generate_markdown_report(profile1: dict, profile2: dict, issues1: list, issu
     if not issues2:
         report += "| - | No significant issues found | - | - | - |\n"
 
-    report += """
+    report += f"""
 ---
 
 ## Cross-Source Comparison
@@ -381,10 +714,10 @@ def generate_markdown_report(profile1: dict, profile2: dict, issues1: list, issu
 
 1. **Sample Size**: {profile1['total_records']:,} records from Source 1, {profile2['total_records']:,} from Source 2
 2. **Sampling Method**:
-   - Source 1: First N records streamed from 11GB JSONL
-   - Source 2: Random sample of 50 files from 863 total, ~200 records each
+   - Source 1: Lines at random byte offsets of the 11GB JSONL (ranged reads)
+   - Source 2: Array elements at random byte offsets, allocated across all files by size
 3. **Limitations**:
-   - First-N sampling may introduce ordering bias (Source 1)
+   - Offset sampling weights a record by the length of the record before it (independent of its own content)
    - Cannot detect cross-source duplicates without full dataset join
    - Schema observations valid; quality metrics are estimates
 
@@ -402,30 +735,60 @@ def generate_markdown_report(profile1: dict, profile2: dict, issues1: list, issu
     return report
 
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Profile Source 1 and Source 2")
+    parser.add_argument("--full", action="store_true",
+                        help="Profile every record in a process pool instead of sampling")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--sample-size", type=int, default=SAMPLE_SIZE,
+                        help="Records sampled per source (ignored with --full)")
+    parser.add_argument("--stratified", action="store_true",
+                        help="Source 2: fixed per-file quotas proportional to file size")
+    parser.add_argument("--source-1", default=SOURCE_1_URI, help="gs:// URI or local JSONL path")
+    parser.add_argument("--source-2", default=SOURCE_2_URI, help="gs:// prefix or local directory")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Snapshot cache path")
+    parser.add_argument("--deep", action="store_true",
+                        help="Walk every array element at any depth (not just the first, 2 levels)")
+    parser.add_argument("--max-paths", type=int, default=MAX_FIELD_PATHS,
+                        help="With --deep: distinct field paths tracked per source")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
     print("=" * 60)
     print("CoffeeSpace Data Profiling")
     print("=" * 60)
 
-    source1_records = stream_jsonl_from_gcs(SOURCE_1_URI, SAMPLE_SIZE)
-    source2_records = sample_json_files_from_gcs(
-        SOURCE_2_URI,
-        sample_files=50,
-        records_per_file=200
-    )
+    cache = SnapshotCache(args.cache)
+
+    if args.full:
+        profiler1 = profile_source_1_full(args.source_1, args.workers, cache,
+                                          args.deep, args.max_paths)
+        profiler2 = profile_source_2_full(args.source_2, args.workers, cache,
+                                          args.deep, args.max_paths)
+    else:
+        profiler1 = profile_source_1(args.source_1, args.sample_size, cache,
+                                     args.deep, args.max_paths)
+        profiler2 = profile_source_2(
+            args.source_2,
+            sample_size=args.sample_size,
+            cache=cache,
+            stratified=args.stratified,
+            deep=args.deep,
+            max_paths=args.max_paths,
+        )
 
-    if not source1_records:
+    if not profiler1.total_count:
         print("ERROR: Failed to load Source 1 data")
         sys.exit(1)
 
-    if not source2_records:
+    if not profiler2.total_count:
         print("ERROR: Failed to load Source 2 data")
         sys.exit(1)
 
-    profiler1 = DataProfiler(source1_records, "Source 1 (Aviato)")
     profile1 = profiler1.profile()
-
-    profiler2 = DataProfiler(source2_records, "Source 2 (LinkedIn Scraper)")
     profile2 = profiler2.profile()
 
     issues1 = identify_quality_issues(profile1)
@@ -439,7 +802,10 @@ def main():
     for issue in issues2[:3]:
         print(f"  - {issue['field']}: {issue['issue']} ({issue['metric']})")
 
-    report = generate_markdown_report(profile1, profile2, issues1, issues2)
+    for profile in (profile1, profile2):
+        print(f"\n{profile['source']} duplicate keys: {_key_duplicates(profile)}")
+
+    report = generate_markdown_report(profile1, profile2, issues1, issues2, full=args.full)
 
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -0,0 +1,303 @@
+"""
+Declarative quality gates for part3_pipeline.py: one aggregate scan per table.
+
+sql/quality_gates.json lists, per table, the metrics to compute and the
+thresholds they must meet. gate_sql() turns one table's declaration into a
+single SELECT of aggregates, so all of a table's metrics cost one scan:
+
+- row_count, and row_count_delta against the last run on the same target
+  whose gates passed (kept in the SQLite run history)
+- null_rate.<field> for each `not_null` field (nested paths allowed)
+- duplicate_keys / duplicate_key_rate for the `key` column
+- rate.<name> for each `rates` predicate (share of rows where it holds)
+- mix.<name>.<value> and mix.<name>.other: share of rows per declared value
+  of an expression, e.g. the provenance source systems
+- histogram.<name>.<bucket>: share of rows per integer bucket, the last one
+  open-ended, e.g. normalization errors per row (0, 1, 2, 3+)
+
+A table's `where` predicate limits every metric to the rows it holds, e.g.
+the live (not tombstoned) people of people_canonical.
+
+A gate is {"min": x, "max": y}. With "warn": true a breach is reported but
+does not fail. Rates and shares are fractions of row_count. A metric with no
+value (no baseline yet for row_count_delta, rates of an empty table) is n/a
+and does not fail either.
+
+The SQL is BigQuery SQL. The pipeline runs it as steps 02 (sources) and 06
+(people_canonical, before the export view) on either backend, and `check`
+runs it over local Parquet through the DuckDB translation. The same gates
+apply to the same metrics in the warehouse and on a laptop.
+
+Usage:
+    python3 scripts/quality_gates.py sql people_canonical     # print the scan
+    python3 scripts/quality_gates.py check \\
+        --table people_canonical=./canonical/people_canonical \\
+        --table bronze_source_2=./bronze/source_2
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from job_telemetry import DEFAULT_HISTORY_PATH
+
+DEFAULT_GATES_PATH = Path(__file__).parent / "sql" / "quality_gates.json"
+
+PASS, WARN, FAIL, NOT_AVAILABLE = "PASS", "WARN", "FAIL", "n/a"
+
+_SPEC_KEYS = {"where", "key", "not_null", "rates", "mix", "histogram", "gates"}
+_GATE_KEYS = {"min", "max", "warn"}
+_COUNTS = {"row_count", "duplicate_keys"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quality_metrics (
+    run_id TEXT NOT NULL,
+    target TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    checked_at TEXT NOT NULL,
+    passed INTEGER NOT NULL,
+    metrics TEXT NOT NULL,
+    PRIMARY KEY (run_id, target, table_name)
+);
+"""
+
+
+@dataclass(frozen=True)
+class Check:
+    metric: str
+    value: float | int | None
+    status: str
+    threshold: str
+
+
+@dataclass(frozen=True)
+class TableResult:
+    table: str
+    metrics: dict
+    checks: tuple[Check, ...]
+
+    @property
+    def passed(self) -> bool:
+        return all(c.status != FAIL for c in self.checks)
+
+    def failures(self) -> list[Check]:
+        return [c for c in self.checks if c.status == FAIL]
+
+
+def _aggregates(spec: dict) -> list[tuple[str, str, str]]:
+    """(metric, aggregate expression, kind): "count" kept as is, "share" divided by row_count."""
+    aggs = [("row_count", "COUNT(*)", "count")]
+    for f in spec.get("not_null", []):
+        aggs.append((f"null_rate.{f}", f"COUNTIF({f} IS NULL)", "share"))
+    if "key" in spec:
+        key = spec["key"]
+        aggs.append(("duplicate_keys", f"COUNT({key}) - COUNT(DISTINCT {key})", "count"))
+    for name, predicate in spec.get("rates", {}).items():
+        aggs.append((f"rate.{name}", f"COUNTIF({predicate})", "share"))
+    for name, mix in spec.get("mix", {}).items():
+        expr = mix["expr"]
+        for v in mix["values"]:
+            aggs.append((f"mix.{name}.{v}", f"COUNTIF({expr} = '{v}')", "share"))
+        listed = ", ".join(f"'{v}'" for v in mix["values"])
+        aggs.append((f"mix.{name}.other", f"COUNTIF({expr} IS NULL OR {expr} NOT IN ({listed}))", "share"))
+    for name, hist in spec.get("histogram", {}).items():
+        expr, buckets = hist["expr"], hist["buckets"]
+        for lo, hi in zip(buckets, buckets[1:]):
+            aggs.append((f"histogram.{name}.{lo}", f"COUNTIF({expr} >= {lo} AND {expr} < {hi})", "share"))
+        aggs.append((f"histogram.{name}.{buckets[-1]}+", f"COUNTIF({expr} >= {buckets[-1]})", "share"))
+    return aggs
+
+
+def metric_names(spec: dict) -> list[str]:
+    names = [metric for metric, _, _ in _aggregates(spec)]
+    if "key" in spec:
+        names.append("duplicate_key_rate")
+    return names + ["row_count_delta"]
+
+
+def load_gates(path: Path | str = DEFAULT_GATES_PATH) -> dict[str, dict]:
+    """Table -> metric declaration and gates. Raises ValueError on a malformed declaration."""
+    tables = json.loads(Path(path).read_text())["tables"]
+    for table, spec in tables.items():
+        unknown = set(spec) - _SPEC_KEYS
+        if unknown:
+            raise ValueError(f"{table}: unknown keys {sorted(unknown)}")
+        for name, mix in spec.get("mix", {}).items():
+            for v in mix["values"]:
+                if not isinstance(v, str) or "'" in v or "\\" in v:
+                    raise ValueError(f"{table}: mix {name} value {v!r} must be a string without quotes")
+        for name, hist in spec.get("histogram", {}).items():
+            buckets = hist["buckets"]
+            if not buckets or not all(isinstance(b, int) for b in buckets) or buckets != sorted(set(buckets)):
+                raise ValueError(f"{table}: histogram {name} buckets must be increasing integers")
+        names = set(metric_names(spec))
+        for metric, gate in spec.get("gates", {}).items():
+            if metric not in names:
+                raise ValueError(f"{table}: gate on unknown metric {metric!r}")
+            if set(gate) - _GATE_KEYS or not {"min", "max"} & set(gate):
+                raise ValueError(f"{table}: gate {metric} needs min and/or max (and optionally warn)")
+    return tables
+
+
+def gate_sql(table_ref: str, spec: dict) -> str:
+    """The one aggregate SELECT computing every metric of a table (BigQuery SQL)."""
+    columns = ",\n  ".join(f"{expr} AS m{i}" for i, (_, expr, _) in enumerate(_aggregates(spec)))
+    where = f"\nWHERE {spec['where']}" if "where" in spec else ""
+    return f"SELECT\n  {columns}\nFROM `{table_ref}`{where}"
+
+
+def compute_metrics(spec: dict, row, previous: dict | None = None) -> dict:
+    """Metric -> value from the gate query's row (and the previous passing run's metrics)."""
+    rows = row["m0"]
+    metrics = {}
+    for i, (metric, _, kind) in enumerate(_aggregates(spec)):
+        value = row[f"m{i}"]
+        metrics[metric] = value if kind == "count" else (value / rows if rows else None)
+    if "key" in spec:
+        metrics["duplicate_key_rate"] = metrics["duplicate_keys"] / rows if rows else None
+    before = (previous or {}).get("row_count")
+    metrics["row_count_delta"] = (rows - before) / before if before else None
+    return metrics
+
+
+def format_metric(metric: str, value) -> str:
+    if value is None:
+        return NOT_AVAILABLE
+    if metric in _COUNTS:
+        return f"{value:,}"
+    if metric == "row_count_delta":
+        return f"{value:+.1%}"
+    return f"{value:.2%}"
+
+
+def evaluate(metrics: dict, gates: dict[str, dict]) -> tuple[Check, ...]:
+    checks = []
+    for metric, gate in gates.items():
+        value = metrics.get(metric)
+        threshold = " ".join(f"{bound} {format_metric(metric, gate[bound])}"
+                             for bound in ("min", "max") if bound in gate)
+        if value is None:
+            status = NOT_AVAILABLE
+        elif ("min" in gate and value < gate["min"]) or ("max" in gate and value > gate["max"]):
+            status = WARN if gate.get("warn") else FAIL
+        else:
+            status = PASS
+        checks.append(Check(metric, value, status, threshold + (" (warn)" if gate.get("warn") else "")))
+    return tuple(checks)
+
+
+def check_table(run_query, table: str, spec: dict, table_ref: str,
+                previous: dict | None = None) -> TableResult:
+    """Scan table_ref once (run_query(sql) -> finished job) and evaluate the table's gates."""
+    row = next(iter(run_query(gate_sql(table_ref, spec)).result()))
+    metrics = compute_metrics(spec, row, previous)
+    return TableResult(table, metrics, evaluate(metrics, spec.get("gates", {})))
+
+
+def print_result(result: TableResult, log=print):
+    """Every metric of the table, with the status and threshold of the gated ones."""
+    rows = result.metrics["row_count"]
+    log(f"  {result.table}: {rows:,} rows -- {'passed' if result.passed else 'FAILED'}")
+    checks = {c.metric: c for c in result.checks}
+    for metric, value in result.metrics.items():
+        check = checks.get(metric)
+        status, threshold = (check.status, check.threshold) if check else ("", "")
+        log(f"    {status:<4} {metric:<44} {format_metric(metric, value):>10}  {threshold}")
+
+
+class GateHistory:
+    """Metrics and outcome per run and table, in the run history SQLite file."""
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60)
+        try:
+            with conn:  # commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def save(self, run_id: str, target: str, result: TableResult):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO quality_metrics (run_id, target, table_name, checked_at, passed, metrics) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, target, result.table, datetime.now(timezone.utc).isoformat(),
+                 int(result.passed), json.dumps(result.metrics)),
+            )
+
+    def previous(self, target: str, table: str, before_run: str) -> dict | None:
+        """Metrics of the last passing check of table on target (other than before_run)."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT metrics FROM quality_metrics WHERE target = ? AND table_name = ? AND passed = 1 "
+                "AND run_id != ? ORDER BY checked_at DESC LIMIT 1",
+                (target, table, before_run),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Single-scan declarative quality gates")
+    parser.add_argument("--gates", default=str(DEFAULT_GATES_PATH), help="Gate declarations (JSON)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sql = sub.add_parser("sql", help="Print the gate query of a table")
+    sql.add_argument("table")
+    check = sub.add_parser("check", help="Check local Parquet tables with DuckDB")
+    check.add_argument("--table", action="append", required=True, metavar="NAME=DIR",
+                       help="A gated table and its Parquet directory (repeatable)")
+    check.add_argument("--history", default=DEFAULT_HISTORY_PATH,
+                       help="SQLite history for row_count_delta baselines ('' for none)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    gates = load_gates(args.gates)
+
+    if args.command == "sql":
+        if args.table not in gates:
+            print(f"No gates for {args.table} (gated: {', '.join(gates)})", file=sys.stderr)
+            return 2
+        print(gate_sql(args.table, gates[args.table]))
+        return 0
+
+    from duckdb_backend import DuckDBClient
+
+    tables = [item.partition("=")[::2] for item in args.table]
+    for name, path in tables:
+        if name not in gates or not path:
+            print(f"Invalid --table {name}={path} (gated: {', '.join(gates)})", file=sys.stderr)
+            return 2
+    client = DuckDBClient()
+    history = GateHistory(args.history) if args.history else None
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+
+    print("="*60)
+    print("Quality Gates (local Parquet)")
+    print("="*60)
+    passed = True
+    for name, path in tables:
+        client.load_parquet(name, path)
+        target = f"parquet:{Path(path).resolve()}"
+        previous = history.previous(target, name, run_id) if history else None
+        result = check_table(client.query, name, gates[name], name, previous)
+        print_result(result)
+        if history:
+            history.save(run_id, target, result)
+        passed = passed and result.passed
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""
+Random record sampling through byte-range reads.
+
+Taking the first N lines of Source 1 biases the sample towards whatever
+order the export was written in, and sampling a Source 2 file by downloading
+it whole reads ~40MB to keep a few hundred records. Here each sample is one
+small ranged read at a random byte offset:
+
+- JSONL: skip to the first line boundary after the offset and parse the
+  next line.
+- JSON arrays: scan forward from the offset for '{' candidates and accept
+  the first one that decodes to a record (a dict containing the key field)
+  followed by ',' or ']' - i.e. a top-level array element, not a nested
+  object.
+
+A record is selected with probability proportional to the length of the
+record before it, which does not depend on the sampled record's own content
+(unlike first-N, which depends on export order). Reads start at PROBE_BYTES
+and are extended only when a record straddles the end of the window, so
+total bytes read are a small multiple of the bytes sampled.
+
+All reads go through one AsyncObjectStore, so probes into many files are in
+flight at once (bounded by --concurrency) instead of one file at a time. Works
+on gs:// objects and local files alike.
+
+Usage:
+    python3 scripts/range_sampling.py /path/to/source1.jsonl --n 1000
+    python3 scripts/range_sampling.py gs://coffeespace-sandbox-source-2/ --kind array --stratified
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from object_store import ASYNC_MAX_CONCURRENCY, AsyncObjectStore, ObjectInfo, list_objects
+
+PROBE_BYTES = 64 * 1024
+MAX_PROBE_BYTES = 16 * 1024 * 1024
+MAX_ATTEMPTS_PER_SAMPLE = 8  # probes landing past the last record, duplicates, ...
+CALIBRATION_PROBES = 16  # first-round probes per object, at PROBE_BYTES
+SOURCE_2_KEY = "linkedin_id"
+
+_decoder = json.JSONDecoder()
+
+
+class _Window:
+    """A growable byte window of one object starting at `offset`."""
+
+    def __init__(self, store: AsyncObjectStore, obj: ObjectInfo, offset: int):
+        self.store = store
+        self.obj = obj
+        self.offset = offset
+        self.data = b""
+        self.bytes_read = 0
+        self._text = None
+
+    async def fill(self, probe_bytes: int):
+        self.data = await self.store.read_range(
+            self.obj.uri, self.offset, min(self.obj.size, self.offset + probe_bytes))
+        self.bytes_read = len(self.data)
+        self._text = None
+        return self
+
+    @property
+    def at_eof(self) -> bool:
+        return self.offset + len(self.data) >= self.obj.size
+
+    def text(self) -> tuple[str, int]:
+        """Decoded window and the number of leading bytes skipped to reach a character boundary."""
+        if self._text is None:
+            lead = 0
+            while lead < len(self.data) and 0x80 <= self.data[lead] < 0xC0:
+                lead += 1  # offset landed inside a multi-byte character
+            # errors="ignore" only ever drops a character cut off at the window end
+            self._text = (self.data[lead:].decode("utf-8", errors="ignore"), lead)
+        return self._text
+
+    async def grow(self) -> bool:
+        """Double the window; False once at EOF or MAX_PROBE_BYTES."""
+        if self.at_eof or len(self.data) >= MAX_PROBE_BYTES:
+            return False
+        start = self.offset + len(self.data)
+        more = await self.store.read_range(
+            self.obj.uri, start, min(self.obj.size, start + len(self.data)))
+        self.data += more
+        self.bytes_read += len(more)
+        self._text = None
+        return True
+
+
+async def probe_jsonl(store: AsyncObjectStore, obj: ObjectInfo, offset: int,
+                      probe_bytes: int = PROBE_BYTES):
+    """Sample the first line after `offset`.
+
+    Returns (absolute line start, record, bytes read, bytes needed), where
+    bytes needed is how far past `offset` the record ended.
+    """
+    win = await _Window(store, obj, offset).fill(probe_bytes)
+    if offset == 0:
+        start = 0
+    else:
+        while (nl := win.data.find(b"\n")) < 0:
+            if not await win.grow():
+                return None, None, win.bytes_read, win.bytes_read
+        start = nl + 1
+    while (end := win.data.find(b"\n", start)) < 0:
+        if win.at_eof and start < len(win.data):
+            end = len(win.data)  # last line without a trailing newline
+            break
+        if not await win.grow():
+            return None, None, win.bytes_read, win.bytes_read
+    line = win.data[start:end].strip()
+    if not line:
+        return None, None, win.bytes_read, end
+    return offset + start, json.loads(line), win.bytes_read, end
+
+
+async def probe_json_array(store: AsyncObjectStore, obj: ObjectInfo, offset: int,
+                           probe_bytes: int = PROBE_BYTES, key: str = SOURCE_2_KEY):
+    """Sample the first top-level array element after `offset` (same return as probe_jsonl)."""
+    win = await _Window(store, obj, offset).fill(probe_bytes)
+    search = 0
+    while True:
+        text, lead = win.text()
+        idx = text.find("{", search)
+        if idx < 0:
+            search = max(0, len(text) - 1)
+            if await win.grow():
+                continue
+            return None, None, win.bytes_read, win.bytes_read
+        try:
+            record, end = _decoder.raw_decode(text, idx)
+        except json.JSONDecodeError as e:
+            truncated = e.pos >= len(text) - 1 or e.msg.startswith("Unterminated string")
+            if truncated and await win.grow():
+                search = idx  # candidate runs past the window: read more and retry it
+            else:
+                search = idx + 1
+            continue
+        if isinstance(record, dict) and key in record:
+            tail = end
+            while tail < len(text) and text[tail] in " \t\r\n":
+                tail += 1
+            if tail == len(text) and await win.grow():
+                search = idx
+                continue
+            if text[tail:tail + 1] in (",", "]"):
+                byte_start = lead + len(text[:idx].encode("utf-8"))
+                needed = byte_start + len(text[idx:end].encode("utf-8"))
+                return offset + byte_start, record, win.bytes_read, needed
+        search = idx + 1
+
+
+def allocate(objects: list[ObjectInfo], n: int, rng: random.Random,
+             stratified: bool) -> dict[str, int]:
+    """Samples per object, proportional to size.
+
+    Stratified: deterministic proportional quotas (largest remainder), so
+    every file is represented in proportion. Otherwise each sample picks a
+    file at random weighted by size (a uniform byte offset over all files).
+    """
+    total = sum(o.size for o in objects)
+    if not total or n <= 0:
+        return {}
+    if not stratified:
+        counts: dict[str, int] = {}
+        for obj in rng.choices(objects, weights=[o.size for o in objects], k=n):
+            counts[obj.uri] = counts.get(obj.uri, 0) + 1
+        return counts
+    exact = {o.uri: n * o.size / total for o in objects}
+    counts = {uri: int(share) for uri, share in exact.items()}
+    short = n - sum(counts.values())
+    for uri in sorted(exact, key=lambda u: exact[u] - counts[u], reverse=True)[:short]:
+        counts[uri] += 1
+    return {uri: c for uri, c in counts.items() if c}
+
+
+async def sample_object(store: AsyncObjectStore, obj: ObjectInfo, n: int, rng: random.Random,
+                        kind: str, probe_bytes: int = PROBE_BYTES):
+    """Sample up to n distinct records from one object. Returns (records, bytes read).
+
+    The first round of probes calibrates the window: later probes read about
+    1.5x the bytes a probe typically needed, so small records do not pay for
+    a large fixed window and large ones rarely need a second read.
+    """
+    probe = probe_jsonl if kind == "jsonl" else probe_json_array
+    seen: set[int] = set()
+    records: list = []
+    bytes_read = 0
+    attempts = 0
+    needed: list[int] = []
+
+    while len(records) < n and attempts < n * MAX_ATTEMPTS_PER_SAMPLE and obj.size:
+        wanted = n - len(records) if needed else min(n, CALIBRATION_PROBES)
+        if needed:
+            probe_bytes = min(MAX_PROBE_BYTES, max(4096, int(1.5 * sum(needed) / len(needed))))
+        offsets = [rng.randrange(obj.size) for _ in range(wanted)]
+        attempts += wanted
+        results = await asyncio.gather(*(probe(store, obj, o, probe_bytes) for o in offsets))
+        for start, record, nbytes, used in results:
+            bytes_read += nbytes
+            needed.append(used)
+            if record is None or start in seen or len(records) >= n:
+                continue
+            seen.add(start)
+            records.append(record)
+    return records, bytes_read
+
+
+def sample_each(objects: list[ObjectInfo], quotas: dict[str, int], rngs: list[random.Random],
+                kind: str, max_concurrency: int = ASYNC_MAX_CONCURRENCY,
+                probe_bytes: int = PROBE_BYTES) -> list[tuple[list, int]]:
+    """Sample quotas[obj.uri] records from every object concurrently.
+
+    Returns one (records, bytes read) per object, in order.
+    """
+    async def run():
+        store = AsyncObjectStore(max_concurrency)
+        try:
+            return await asyncio.gather(*(
+                sample_object(store, obj, quotas.get(obj.uri, 0), rng, kind, probe_bytes)
+                for obj, rng in zip(objects, rngs)
+            ))
+        finally:
+            store.close()
+
+    return asyncio.run(run())
+
+
+def sample_records(objects: list[ObjectInfo], n: int, rng: random.Random, kind: str,
+                   stratified: bool = False, max_concurrency: int = ASYNC_MAX_CONCURRENCY,
+                   probe_bytes: int = PROBE_BYTES):
+    """Sample about n records across objects. Returns (records, bytes read)."""
+    quotas = allocate(objects, n, rng, stratified)
+    # One generator per object, drawn up front: results do not depend on I/O timing
+    rngs = [random.Random(rng.getrandbits(64)) for _ in objects]
+    results = sample_each(objects, quotas, rngs, kind, max_concurrency, probe_bytes)
+    return [r for records, _ in results for r in records], sum(b for _, b in results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sample records via ranged reads")
+    parser.add_argument("uri", help="gs:// or local file / directory")
+    parser.add_argument("--kind", choices=["jsonl", "array"], default="jsonl")
+    parser.add_argument("--pattern", default="*")
+    parser.add_argument("--n", type=int, default=1000)
+    parser.add_argument("--stratified", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=ASYNC_MAX_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    objects = list_objects(args.uri, args.pattern)
+    total = sum(o.size for o in objects)
+    started = time.time()
+    records, bytes_read = sample_records(objects, args.n, random.Random(args.seed),
+                                         args.kind, args.stratified, args.concurrency)
+    elapsed = time.time() - started
+    sampled = sum(len(json.dumps(r)) for r in records)
+    print(f"Sampled {len(records):,} records from {len(objects)} objects ({total / 1e6:.1f} MB)")
+    print(f"Read {bytes_read / 1e6:.1f} MB "
+          f"({bytes_read / sampled if sampled else 0:.1f}x the sampled records' size, "
+          f"{bytes_read / total * 100 if total else 0:.1f}% of the data) in {elapsed:.2f}s")
+    return 0 if records else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+"""
+Mergeable, bounded-memory accumulators for full-dataset profiling.
+
+Every accumulator supports add(), merge() and to_state()/from_state() (JSON
+serializable), so shards can be profiled in separate processes, cached per
+file, and combined afterwards with results independent of shard boundaries
+(up to the sketches' stated error).
+
+    RunningStats     count / mean / variance / min / max (Welford + Chan merge)
+    QuantileSketch   KLL-style compactor sketch, ~1-2% rank error
+    ReservoirSample  uniform sample of k values
+    HyperLogLog      distinct-count estimate, ~1.04/sqrt(2^p) relative error
+    TopK             Misra-Gries heavy hitters
+    KeySet           exact distinct/duplicate count via 64-bit key hashes
+                     (8 bytes per key; only used for designated key fields)
+"""
+
+import base64
+import hashlib
+import math
+import random
+import zlib
+from array import array
+
+
+def hash64(value) -> int:
+    """Stable 64-bit hash (Python's hash() is salted per process)."""
+    data = value.encode("utf-8") if isinstance(value, str) else repr(value).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+class RunningStats:
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, x: float):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+
+    def merge(self, other: "RunningStats"):
+        if not other.count:
+            return
+        if not self.count:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.variance)
+
+    def to_state(self) -> list:
+        return [self.count, self.mean, self.m2, self.min, self.max]
+
+    @classmethod
+    def from_state(cls, state: list) -> "RunningStats":
+        obj = cls()
+        obj.count, obj.mean, obj.m2, obj.min, obj.max = state
+        return obj
+
+
+class QuantileSketch:
+    """KLL-style sketch: level h holds items of weight 2^h, each level <= k items."""
+
+    __slots__ = ("k", "levels", "count")
+
+    def __init__(self, k: int = 128):
+        self.k = k
+        self.levels: list[list] = [[]]
+        self.count = 0
+
+    def add(self, x: float):
+        self.count += 1
+        self.levels[0].append(x)
+        if len(self.levels[0]) >= self.k:
+            self._compress()
+
+    def _compress(self):
+        # Every full level, not only a full run from level 0: merge() can fill any of them
+        h = 0
+        while h < len(self.levels):
+            if len(self.levels[h]) < self.k:
+                h += 1
+                continue
+            level = sorted(self.levels[h])
+            if len(level) % 2:
+                # Odd item stays behind so total weight is preserved exactly
+                self.levels[h] = [level.pop()]
+            else:
+                self.levels[h] = []
+            promoted = level[random.getrandbits(1)::2]
+            if h + 1 == len(self.levels):
+                self.levels.append([])
+            self.levels[h + 1].extend(promoted)
+            h += 1
+
+    def merge(self, other: "QuantileSketch"):
+        self.count += other.count
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for h, items in enumerate(other.levels):
+            self.levels[h].extend(items)
+        self._compress()
+
+    def quantile(self, q: float):
+        weighted = sorted(
+            (x, 1 << h) for h, items in enumerate(self.levels) for x in items
+        )
+        if not weighted:
+            return None
+        total = sum(w for _, w in weighted)
+        target = q * total
+        running = 0
+        for x, w in weighted:
+            running += w
+            if running >= target:
+                return x
+        return weighted[-1][0]
+
+    def to_state(self) -> dict:
+        return {"k": self.k, "levels": self.levels, "count": self.count}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "QuantileSketch":
+        obj = cls(state["k"])
+        obj.levels = [list(level) for level in state["levels"]]
+        obj.count = state["count"]
+        return obj
+
+
+class ReservoirSample:
+    """Uniform random sample of up to k values (Algorithm R, weighted merge)."""
+
+    __slots__ = ("k", "items", "seen")
+
+    def __init__(self, k: int = 5):
+        self.k = k
+        self.items: list = []
+        self.seen = 0
+
+    def offer(self) -> int | None:
+        """Count one value; return the slot it should occupy, or None to drop it.
+
+        Lets callers skip building an expensive display value for the ~all
+        values that are not kept.
+        """
+        self.seen += 1
+        if len(self.items) < self.k:
+            return len(self.items)
+        j = random.randrange(self.seen)
+        return j if j < self.k else None
+
+    def place(self, slot: int, value):
+        if slot == len(self.items):
+            self.items.append(value)
+        else:
+            self.items[slot] = value
+
+    def add(self, value):
+        slot = self.offer()
+        if slot is not None:
+            self.place(slot, value)
+
+    def merge(self, other: "ReservoirSample"):
+        if not other.seen:
+            return
+        ours, theirs = list(self.items), list(other.items)
+        random.shuffle(ours)
+        random.shuffle(theirs)
+        a, b = self.seen, other.seen
+        merged = []
+        while len(merged) < self.k and (ours or theirs):
+            # Each slot draws from a side in proportion to the records it represents
+            if theirs and (not ours or random.random() < b / (a + b)):
+                merged.append(theirs.pop())
+            else:
+                merged.append(ours.pop())
+        self.items = merged
+        self.seen = a + b
+
+    def to_state(self) -> dict:
+        return {"k": self.k, "items": self.items, "seen": self.seen}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "ReservoirSample":
+        obj = cls(state["k"])
+        obj.items = list(state["items"])
+        obj.seen = state["seen"]
+        return obj
+
+
+class HyperLogLog:
+    __slots__ = ("p", "registers")
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.registers = bytearray(1 << p)
+
+    def add(self, value):
+        self.add_hash(hash64(value))
+
+    def add_hash(self, h: int):
+        idx = h >> (64 - self.p)
+        rest = (h << self.p) & 0xFFFFFFFFFFFFFFFF
+        rank = (64 - self.p + 1) if rest == 0 else (65 - rest.bit_length())
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        regs = self.registers
+        for i, r in enumerate(other.registers):
+            if r > regs[i]:
+                regs[i] = r
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            return round(m * math.log(m / zeros))  # linear counting
+        return round(raw)
+
+    def to_state(self) -> dict:
+        # Per-file sketches are mostly zero registers; compress for the cache
+        packed = zlib.compress(bytes(self.registers))
+        return {"p": self.p, "registers": base64.b64encode(packed).decode()}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "HyperLogLog":
+        obj = cls(state["p"])
+        obj.registers = bytearray(zlib.decompress(base64.b64decode(state["registers"])))
+        return obj
+
+
+class TopK:
+    """Misra-Gries heavy hitters; counts are lower bounds within n/k."""
+
+    __slots__ = ("k", "counts")
+
+    def __init__(self, k: int = 20):
+        self.k = k
+        self.counts: dict = {}
+
+    def add(self, value, n: int = 1):
+        self.counts[value] = self.counts.get(value, 0) + n
+        if len(self.counts) > 2 * self.k:
+            self._prune()
+
+    def _prune(self):
+        if len(self.counts) <= self.k:
+            return
+        cut = sorted(self.counts.values(), reverse=True)[self.k]
+        self.counts = {v: c - cut for v, c in self.counts.items() if c > cut}
+
+    def merge(self, other: "TopK"):
+        for value, n in other.counts.items():
+            self.counts[value] = self.counts.get(value, 0) + n
+        self._prune()
+
+    def top(self, n: int = 10) -> list:
+        return sorted(self.counts.items(), key=lambda kv: -kv[1])[:n]
+
+    def to_state(self) -> dict:
+        return {"k": self.k, "counts": list(self.counts.items())}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "TopK":
+        obj = cls(state["k"])
+        obj.counts = {v: c for v, c in state["counts"]}
+        return obj
+
+
+class KeySet:
+    """Exact distinct/duplicate counting for key fields via 64-bit hashes."""
+
+    __slots__ = ("hashes",)
+
+    def __init__(self):
+        self.hashes = array("Q")
+
+    def add(self, value):
+        self.hashes.append(hash64(value))
+
+    def merge(self, other: "KeySet"):
+        self.hashes.extend(other.hashes)
+
+    def distinct(self) -> int:
+        return len(set(self.hashes))
+
+    def to_state(self) -> str:
+        return base64.b64encode(self.hashes.tobytes()).decode()
+
+    @classmethod
+    def from_state(cls, state: str) -> "KeySet":
+        obj = cls()
+        obj.hashes.frombytes(base64.b64decode(state))
+        return obj
@@ -0,0 +1,110 @@
+"""
+Checksum-validated cache of per-file outputs across quarterly snapshots.
+
+Most Source 2 files (and often Source 1) are byte-identical between quarterly
+deliveries. Each stage that processes input files records, per file, the
+object's content checksum (see ObjectInfo.checksum) and the output it
+produced. On the next run the stage asks the cache which inputs are unchanged,
+reuses their outputs and only reprocesses the rest.
+
+Stages and their outputs:
+    bronze:source_2:<dest>:v<schema>
+                          bronze + quarantine Parquet part URIs, row counts
+    bronze:source_1:<dest>:v<schema>
+                          the same for the Source 1 JSONL, plus its snapshot_date
+    profile:<source>      serialized DataProfiler accumulator (per file, or
+                          per Source 1 byte range with --full)
+
+The bronze parts are loaded by load_bronze_source_2.py, whose manifest keeps
+its own per-file checksums. The cache is a single SQLite file (same
+conventions as load_manifest.py).
+"""
+
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+
+DEFAULT_CACHE_PATH = "snapshot_cache.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    stage TEXT NOT NULL,
+    name TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    output TEXT NOT NULL,
+    updated_at REAL,
+    PRIMARY KEY (stage, name)
+);
+"""
+
+
+class SnapshotCache:
+    """Per-(stage, file) outputs, valid only while the file checksum matches."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60)
+        try:
+            with conn:  # commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, stage: str, name: str, checksum: str) -> dict | None:
+        """Cached output for this file, or None if missing or stale."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT checksum, output FROM outputs WHERE stage = ? AND name = ?",
+                (stage, name),
+            ).fetchone()
+        if row is None or row[0] != checksum:
+            return None
+        return json.loads(row[1])
+
+    def previous(self, stage: str, name: str) -> dict | None:
+        """Last recorded output regardless of checksum (to clean up stale outputs)."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT output FROM outputs WHERE stage = ? AND name = ?", (stage, name),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, stage: str, name: str, checksum: str, output: dict):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO outputs (stage, name, checksum, output, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (stage, name, checksum, json.dumps(output), time.time()),
+            )
+
+    def names(self, stage: str) -> set[str]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT name FROM outputs WHERE stage = ?", (stage,)).fetchall()
+        return {r[0] for r in rows}
+
+    def forget(self, stage: str, names=None):
+        """Drop entries for a stage (all of them when names is None)."""
+        with self._connect() as conn:
+            if names is None:
+                conn.execute("DELETE FROM outputs WHERE stage = ?", (stage,))
+            else:
+                conn.executemany("DELETE FROM outputs WHERE stage = ? AND name = ?",
+                                 [(stage, n) for n in names])
+
+    def partition(self, stage: str, objects: list) -> tuple[list, list, set[str]]:
+        """Split objects into (unchanged [(obj, output)], changed [obj], removed names)."""
+        unchanged, changed = [], []
+        for obj in objects:
+            output = self.get(stage, obj.name, obj.checksum)
+            if output is None:
+                changed.append(obj)
+            else:
+                unchanged.append((obj, output))
+        removed = self.names(stage) - {o.name for o in objects}
+        return unchanged, changed, removed
@@ -0,0 +1,266 @@
+"""
+Snapshot versioning, promotion and rollback for people_canonical.
+
+Each pipeline run that changes people_canonical ends (step 07) by freezing
+it as a BigQuery table snapshot, `people_canonical_<snapshot_id>`. A snapshot
+is zero-copy: storage is billed only for blocks that later differ from the
+base table, so an unchanged quarter costs nothing. Each snapshot gets its
+own export view, `firestore_export_<snapshot_id>`, which is 07's projection
+over that snapshot. The projection each snapshot was served with is kept
+with it.
+
+`firestore_export`, the view Part 4 syncs from, is only ever
+`SELECT * FROM firestore_export_<promoted id>`. Promotion and rollback
+first move the statuses in `snapshot_metadata`, the logbook from
+docs/part-5/part-5-writeup.md, in a single UPDATE, then replace that one
+view definition, an atomic metadata-only DDL:
+
+    snapshot_id      snapshot_table / export_view, created_at, run_id,
+                     row_count, validation_status, promoted_at, notes,
+                     export_sql_hash
+
+The metadata is the record of what is served: firestore_sync.py and
+changelog.py read the promoted id from it and query that snapshot's own
+view. If the view swap fails after the UPDATE, promoting the same id again
+re-points the view and leaves the metadata as it is.
+
+A run whose merge changed nothing does not take a new snapshot: when
+people_canonical has no row merged or tombstoned since the newest snapshot
+was taken, from the same export SQL (export_sql_hash), that snapshot is
+current (`unchanged_since`).
+
+validation_status: validated (gates passed, not serving), promoted (serving),
+superseded (replaced by a newer promotion), rolled_back (replaced by a
+rollback), pruned (snapshot dropped, row kept for the record).
+
+Retention keeps the newest `keep` snapshots and always the promoted one.
+The rest have their view and snapshot dropped.
+
+Usage:
+    python3 scripts/snapshot_versions.py list
+    python3 scripts/snapshot_versions.py rollback               # to the previous promotion
+    python3 scripts/snapshot_versions.py rollback --to 20260601_120000
+    python3 scripts/snapshot_versions.py promote 20260901_120000  # e.g. after a --hold run
+    python3 scripts/snapshot_versions.py prune --keep 4
+    python3 scripts/snapshot_versions.py --backend duckdb --database ./pipeline.duckdb list
+"""
+
+import argparse
+import hashlib
+import re
+import sys
+from datetime import datetime
+
+SOURCE_TABLE = "people_canonical"
+SERVING_VIEW = "firestore_export"
+METADATA_TABLE = "snapshot_metadata"
+DEFAULT_KEEP = 4  # one year of quarterly snapshots
+
+VALIDATED, PROMOTED, SUPERSEDED, ROLLED_BACK, PRUNED = (
+    "validated", "promoted", "superseded", "rolled_back", "pruned")
+
+_ID = re.compile(r"\d{8}_\d{6}")
+
+
+def snapshot_id_for(ts: datetime) -> str:
+    return ts.strftime("%Y%m%d_%H%M%S")
+
+
+def export_sql_hash(export_sql: str) -> str:
+    return hashlib.md5(export_sql.strip().encode("utf-8")).hexdigest()
+
+
+def _check_id(snapshot_id: str) -> str:
+    if not _ID.fullmatch(snapshot_id):
+        raise ValueError(f"Invalid snapshot id {snapshot_id!r} (expected YYYYMMDD_HHMMSS)")
+    return snapshot_id
+
+
+class SnapshotStore:
+    """Snapshots of SOURCE_TABLE in one dataset ("project.dataset").
+
+    run(statement) -> finished job executes each statement. The pipeline
+    passes its telemetry so the statements are recorded with step 07.
+    """
+
+    def __init__(self, client, dataset: str, run=None):
+        self.client = client
+        self.dataset = dataset
+        self._run = run or self._query
+
+    def _query(self, statement: str):
+        job = self.client.query(statement)
+        job.result()
+        return job
+
+    def _ref(self, name: str) -> str:
+        return f"`{self.dataset}.{name}`"
+
+    def _rows(self, statement: str) -> list:
+        return list(self._run(statement).result())
+
+    def ensure_metadata(self):
+        self._run(f"""CREATE TABLE IF NOT EXISTS {self._ref(METADATA_TABLE)} (
+  snapshot_id STRING NOT NULL,
+  snapshot_table STRING NOT NULL,
+  export_view STRING NOT NULL,
+  created_at TIMESTAMP NOT NULL,
+  run_id STRING,
+  row_count INT64,
+  validation_status STRING NOT NULL,
+  promoted_at TIMESTAMP,
+  notes STRING,
+  export_sql_hash STRING
+)""")
+        self._run(f"ALTER TABLE {self._ref(METADATA_TABLE)} ADD COLUMN IF NOT EXISTS export_sql_hash STRING")
+
+    def create(self, snapshot_id: str, export_sql: str, run_id: str, notes: str | None = None):
+        """Snapshot SOURCE_TABLE and define its export view from 07's SQL (status validated)."""
+        _check_id(snapshot_id)
+        table, view = f"{SOURCE_TABLE}_{snapshot_id}", f"{SERVING_VIEW}_{snapshot_id}"
+        view_sql = export_sql
+        for name, versioned in ((SERVING_VIEW, view), (SOURCE_TABLE, table)):
+            if view_sql.count(f"{self.dataset}.{name}`") != 1:
+                raise ValueError(f"Export view SQL must reference {self.dataset}.{name} exactly once")
+            view_sql = view_sql.replace(f"{self.dataset}.{name}`", f"{self.dataset}.{versioned}`")
+
+        self.ensure_metadata()
+        self._run(f"CREATE SNAPSHOT TABLE {self._ref(table)} CLONE {self._ref(SOURCE_TABLE)}")
+        self._run(view_sql.strip().rstrip(";"))
+        note = "NULL" if notes is None else "'" + notes.replace("\\", "\\\\").replace("'", "\\'") + "'"
+        self._run(f"""INSERT INTO {self._ref(METADATA_TABLE)}
+  (snapshot_id, snapshot_table, export_view, created_at, run_id, row_count, validation_status,
+   promoted_at, notes, export_sql_hash)
+SELECT '{snapshot_id}', '{table}', '{view}', CURRENT_TIMESTAMP(), '{run_id}', COUNT(*), '{VALIDATED}',
+  CAST(NULL AS TIMESTAMP), {note}, '{export_sql_hash(export_sql)}'
+FROM {self._ref(table)}""")
+
+    def unchanged_since(self, export_sql: str) -> str | None:
+        """The newest snapshot, if it was taken from this export SQL and no row of
+        SOURCE_TABLE has been merged or tombstoned since. None if a new one is due."""
+        self.ensure_metadata()
+        rows = self._rows(f"""SELECT m.snapshot_id
+FROM {self._ref(METADATA_TABLE)} m
+WHERE m.snapshot_id = (SELECT MAX(snapshot_id) FROM {self._ref(METADATA_TABLE)}
+                       WHERE validation_status != '{PRUNED}')
+  AND m.export_sql_hash = '{export_sql_hash(export_sql)}'
+  AND NOT EXISTS (
+    SELECT 1 FROM {self._ref(SOURCE_TABLE)} c
+    WHERE c.provenance.last_merged_at >= m.created_at OR c.provenance.deleted_at >= m.created_at
+  )""")
+        return rows[0].snapshot_id if rows else None
+
+    def snapshots(self) -> list:
+        return self._rows(f"""SELECT snapshot_id, row_count, validation_status,
+  CAST(created_at AS STRING) AS created_at, CAST(promoted_at AS STRING) AS promoted_at, run_id, notes
+FROM {self._ref(METADATA_TABLE)}
+ORDER BY snapshot_id DESC""")
+
+    def status(self, snapshot_id: str) -> str | None:
+        rows = self._rows(f"SELECT validation_status FROM {self._ref(METADATA_TABLE)} "
+                          f"WHERE snapshot_id = '{_check_id(snapshot_id)}'")
+        return rows[0].validation_status if rows else None
+
+    def promoted(self) -> str | None:
+        rows = self._rows(f"SELECT snapshot_id FROM {self._ref(METADATA_TABLE)} "
+                          f"WHERE validation_status = '{PROMOTED}'")
+        return rows[0].snapshot_id if rows else None
+
+    def promote(self, snapshot_id: str, replaced_status: str = SUPERSEDED):
+        """Record the snapshot as promoted in one UPDATE, then point SERVING_VIEW at its
+        export view. Promoting the promoted snapshot only re-points the view."""
+        status = self.status(snapshot_id)
+        if status is None or status == PRUNED:
+            raise ValueError(f"Snapshot {snapshot_id} is {status or 'unknown'}, cannot promote it")
+        if status != PROMOTED:
+            self._run(f"""UPDATE {self._ref(METADATA_TABLE)}
+SET validation_status = IF(snapshot_id = '{snapshot_id}', '{PROMOTED}', '{replaced_status}'),
+  promoted_at = IF(snapshot_id = '{snapshot_id}', CURRENT_TIMESTAMP(), promoted_at)
+WHERE snapshot_id = '{snapshot_id}' OR validation_status = '{PROMOTED}'""")
+        self._run(f"CREATE OR REPLACE VIEW {self._ref(SERVING_VIEW)} AS "
+                  f"SELECT * FROM {self._ref(f'{SERVING_VIEW}_{snapshot_id}')}")
+
+    def rollback(self, to: str | None = None) -> str:
+        """Serve `to`, by default the last snapshot a promotion superseded. Returns its id."""
+        if to is None:
+            rows = self._rows(f"SELECT snapshot_id FROM {self._ref(METADATA_TABLE)} "
+                              f"WHERE validation_status = '{SUPERSEDED}' ORDER BY promoted_at DESC LIMIT 1")
+            if not rows:
+                raise ValueError("No superseded snapshot to roll back to")
+            to = rows[0].snapshot_id
+        self.promote(to, replaced_status=ROLLED_BACK)
+        return to
+
+    def prune(self, keep: int = DEFAULT_KEEP) -> list[str]:
+        """Drop all but the newest `keep` snapshots (never the promoted one). Returns the pruned ids."""
+        rows = self._rows(f"SELECT snapshot_id, validation_status FROM {self._ref(METADATA_TABLE)} "
+                          f"WHERE validation_status != '{PRUNED}' ORDER BY snapshot_id DESC")
+        doomed = [r.snapshot_id for r in rows[keep:] if r.validation_status != PROMOTED]
+        for snapshot_id in doomed:
+            self._run(f"DROP VIEW IF EXISTS {self._ref(f'{SERVING_VIEW}_{snapshot_id}')}")
+            self._run(f"DROP SNAPSHOT TABLE IF EXISTS {self._ref(f'{SOURCE_TABLE}_{snapshot_id}')}")
+        if doomed:
+            listed = ", ".join(f"'{s}'" for s in doomed)
+            self._run(f"UPDATE {self._ref(METADATA_TABLE)} SET validation_status = '{PRUNED}' "
+                      f"WHERE snapshot_id IN ({listed})")
+        return doomed
+
+
+def print_snapshots(rows: list):
+    print(f"  {'snapshot_id':<16} {'status':<12} {'rows':>12}  {'created_at':<26} {'promoted_at':<26} notes")
+    for r in rows:
+        rows_text = f"{r.row_count:,}" if r.row_count is not None else "n/a"
+        print(f"  {r.snapshot_id:<16} {r.validation_status:<12} {rows_text:>12}  {(r.created_at or '')[:26]:<26} "
+              f"{(r.promoted_at or '')[:26]:<26} {r.notes or ''}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="people_canonical snapshots: list, promote, rollback, prune")
+    parser.add_argument("--backend", choices=["bigquery", "duckdb"], default="bigquery")
+    parser.add_argument("--database", default=None, help="DuckDB database file (duckdb backend)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Snapshots and their status, newest first")
+    promote = sub.add_parser("promote", help="Serve a snapshot (e.g. one held with --hold)")
+    promote.add_argument("snapshot_id")
+    rollback = sub.add_parser("rollback", help="Serve the previously promoted snapshot again")
+    rollback.add_argument("--to", default=None, metavar="SNAPSHOT_ID", help="Serve this snapshot instead")
+    prune = sub.add_parser("prune", help="Drop old snapshots")
+    prune.add_argument("--keep", type=int, default=DEFAULT_KEEP, help="Newest snapshots to keep")
+    args = parser.parse_args(argv)
+    if args.backend == "duckdb" and not args.database:
+        parser.error("--backend duckdb needs --database")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from part3_pipeline import DATASET_ID, PROJECT_ID
+
+    if args.backend == "duckdb":
+        from duckdb_backend import DuckDBClient
+        client = DuckDBClient(args.database)
+    else:
+        from google.cloud import bigquery
+        client = bigquery.Client(project=PROJECT_ID)
+    store = SnapshotStore(client, f"{PROJECT_ID}.{DATASET_ID}")
+
+    try:
+        if args.command == "promote":
+            store.promote(args.snapshot_id)
+            print(f"Promoted {args.snapshot_id}: {SERVING_VIEW} now serves it")
+        elif args.command == "rollback":
+            current = store.promoted()
+            target = store.rollback(args.to)
+            print(f"Rolled back {current} -> {target}: {SERVING_VIEW} now serves {target}")
+        elif args.command == "prune":
+            pruned = store.prune(args.keep)
+            print(f"Pruned {len(pruned)} snapshot(s): {', '.join(pruned) or '-'}")
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    print_snapshots(store.snapshots())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Byte-offset sidecar index for the Source 1 JSONL.
+
+Looking at one Source 1 person used to mean downloading or scanning the whole
+11GB file. `build` makes one pass (split at newline boundaries across a
+process pool) and writes a compact, memory-mapped sidecar; every lookup after
+that is a single ranged read of the source object.
+
+Sidecar layout (little-endian):
+    header     MAGIC, record count, hash-table slots, source size, source checksum
+    table      open-addressing hash table, one slot per (hash64(linkedinID), offset, length);
+               hash 0 marks an empty slot; O(1) expected probes
+    offsets    file-order line offsets (records + 1), so record i is
+               bytes [offsets[i], offsets[i + 1]) - ranges and samples by ordinal
+
+Distinct ids whose 64-bit hashes collide share a probe chain; lookups read
+each candidate and compare linkedinID, so a collision never returns the
+wrong person.
+
+A line that is not a JSON object (truncated write, stray text) does not
+abort the build: it keeps its ordinal, so every other record's byte range
+stays exact, but gets no slot. `build` reports how many there were, and
+`range` / `sample` skip them.
+
+Usage:
+    python3 scripts/source_1_index.py build --workers 16
+    python3 scripts/source_1_index.py get chris-craft-461a6b6
+    python3 scripts/source_1_index.py range 1000 5
+    python3 scripts/source_1_index.py sample 20 --seed 7
+    python3 scripts/source_1_index.py --source ./s1.jsonl --index ./s1.idx build   # offline
+"""
+
+import argparse
+import asyncio
+import json
+import mmap
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from json_stream import split_byte_ranges
+from object_store import AsyncObjectStore, list_objects, open_stream, read_range
+from sketches import hash64
+
+SOURCE_1_URI = "gs://coffeespace-sandbox-source-1/CoffeeSpaceTestDatav4.jsonl"
+DEFAULT_INDEX_PATH = "source_1.idx"
+ID_FIELD = "linkedinID"
+RANGE_MB = 256  # build: bytes of source per worker task
+
+MAGIC = b"S1IDX\x00\x01\x00"
+_HEADER = struct.Struct("<8sQQQ64s")
+_SLOT = struct.Struct("<QQQ")  # hash64, offset, length
+_OFFSET = struct.Struct("<Q")
+
+
+def parse_record(line: bytes) -> dict | None:
+    """The line's JSON object, or None if the line is malformed."""
+    try:
+        record = json.loads(line)
+    except ValueError:  # JSONDecodeError, UnicodeDecodeError
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def index_range(uri: str, start: int, end: int) -> tuple[bytes, bytes, int]:
+    """Index lines starting in [start, end) (runs in a worker process).
+
+    Returns (line offsets, hashes) as packed uint64 arrays, hash 0 meaning
+    the line has no usable id, and the number of malformed lines.
+    """
+    offsets, hashes = array("Q"), array("Q")
+    malformed = 0
+    with open_stream(uri, end_hint=end) as f:
+        if start > 0:
+            f.seek(start - 1)
+            f.readline()  # finish the line that began before `start`
+        pos = f.tell()
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                offsets.append(pos)
+                record = parse_record(line)
+                malformed += record is None
+                record_id = record.get(ID_FIELD) if record else None
+                hashes.append((hash64(record_id) or 1) if isinstance(record_id, str) and record_id else 0)
+            pos += len(line)
+    return offsets.tobytes(), hashes.tobytes(), malformed
+
+
+def build_index(source: str, index_path: str, workers: int) -> dict:
+    """One parallel pass over the source; writes the sidecar atomically."""
+    obj = list_objects(source)[0]
+    parts = max(workers, -(-obj.size // (RANGE_MB * 1024 * 1024)))
+    ranges = split_byte_ranges(obj.size, parts)
+    print(f"Indexing {obj.uri} ({obj.size / 1e9:.2f} GB) in {len(ranges)} ranges, {workers} workers")
+
+    started = time.time()
+    offsets, hashes = array("Q"), array("Q")
+    malformed = 0
+    # spawn: never fork a process that already holds a GCS client
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = [pool.submit(index_range, obj.uri, start, end) for start, end in ranges]
+        for i, future in enumerate(futures, 1):  # in file order
+            part_offsets, part_hashes, part_malformed = future.result()
+            offsets.frombytes(part_offsets)
+            hashes.frombytes(part_hashes)
+            malformed += part_malformed
+            print(f"  {i}/{len(ranges)} ranges, {len(offsets):,} records")
+    offsets.append(obj.size)
+
+    n = len(hashes)
+    slots = 1 << max(4, (2 * n - 1).bit_length())  # load factor <= 0.5
+    mask = slots - 1
+    table = array("Q", bytes(_SLOT.size * slots))
+    indexed = 0
+    for i, h in enumerate(hashes):
+        if not h:
+            continue
+        slot = h & mask
+        while table[slot * 3]:
+            slot = (slot + 1) & mask
+        table[slot * 3] = h
+        table[slot * 3 + 1] = offsets[i]
+        table[slot * 3 + 2] = offsets[i + 1] - offsets[i]
+        indexed += 1
+
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, n, slots, obj.size, obj.checksum.encode()[:64]))
+        f.write(table.tobytes())
+        f.write(offsets.tobytes())
+    os.replace(tmp_path, index_path)
+
+    return {
+        "records": n,
+        "indexed": indexed,
+        "malformed": malformed,
+        "slots": slots,
+        "index_mb": os.path.getsize(index_path) / 1e6,
+        "elapsed_s": time.time() - started,
+    }
+
+
+class Source1Index:
+    """Memory-mapped sidecar; every fetch is one ranged read of the source."""
+
+    def __init__(self, index_path: str, source: str):
+        self.source = source
+        self._file = open(index_path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.slots, self.source_size, checksum = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{index_path} is not a Source 1 index")
+        self.source_checksum = checksum.rstrip(b"\0").decode()
+        self._table_at = _HEADER.size
+        self._offsets_at = self._table_at + _SLOT.size * self.slots
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def check_fresh(self):
+        """Raise if the source object changed since the index was built."""
+        obj = list_objects(self.source)[0]
+        if (obj.size, obj.checksum) != (self.source_size, self.source_checksum):
+            raise ValueError(f"Index is stale for {self.source}; rebuild it")
+
+    def _offset(self, i: int) -> int:
+        return _OFFSET.unpack_from(self._mm, self._offsets_at + 8 * i)[0]
+
+    def span(self, i: int) -> tuple[int, int]:
+        """Byte range [start, end) of record i in file order."""
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return self._offset(i), self._offset(i + 1)
+
+    def candidates(self, record_id: str):
+        """(offset, length) of every slot whose hash matches the id."""
+        h = hash64(record_id) or 1
+        mask = self.slots - 1
+        slot = h & mask
+        while True:
+            slot_hash, offset, length = _SLOT.unpack_from(self._mm, self._table_at + _SLOT.size * slot)
+            if not slot_hash:
+                return
+            if slot_hash == h:
+                yield offset, length
+            slot = (slot + 1) & mask
+
+    def get(self, record_id: str) -> dict | None:
+        for offset, length in self.candidates(record_id):
+            record = json.loads(read_range(self.source, offset, offset + length))
+            if record.get(ID_FIELD) == record_id:  # 64-bit hash collision guard
+                return record
+        return None
+
+    def range(self, start: int, count: int) -> list[dict]:
+        """Records [start, start + count) in file order, in one ranged read."""
+        stop = min(self.count, start + count)
+        if start >= stop:
+            return []
+        data = read_range(self.source, self.span(start)[0], self.span(stop - 1)[1])
+        records = (parse_record(line) for line in data.splitlines() if line.strip())
+        return [r for r in records if r is not None]
+
+    def sample(self, n: int, rng: random.Random) -> list[dict]:
+        """n distinct random lines: one ranged read each, fetched concurrently.
+        Malformed ones are dropped, so fewer than n records may come back."""
+        picks = rng.sample(range(self.count), min(n, self.count))
+
+        async def fetch():
+            store = AsyncObjectStore()
+            try:
+                return await asyncio.gather(*(
+                    store.read_range(self.source, *self.span(i)) for i in picks
+                ))
+            finally:
+                store.close()
+
+        records = (parse_record(data) for data in asyncio.run(fetch()))
+        return [r for r in records if r is not None]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Source 1 byte-offset index")
+    parser.add_argument("--source", default=SOURCE_1_URI, help="gs:// URI or local JSONL path")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="Sidecar index path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Build the index in one parallel pass")
+    build.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+
+    get = sub.add_parser("get", help="Fetch records by linkedinID")
+    get.add_argument("ids", nargs="+")
+
+    rng = sub.add_parser("range", help="Fetch records by file-order position")
+    rng.add_argument("start", type=int)
+    rng.add_argument("count", type=int, nargs="?", default=1)
+
+    sample = sub.add_parser("sample", help="Fetch random records")
+    sample.add_argument("n", type=int)
+    sample.add_argument("--seed", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.command == "build":
+        print("=" * 60)
+        print("Source 1 Index Build")
+        print("=" * 60)
+        stats = build_index(args.source, args.index, args.workers)
+        print(f"\nRecords: {stats['records']:,} ({stats['indexed']:,} with {ID_FIELD})")
+        if stats["malformed"]:
+            print(f"WARNING: {stats['malformed']:,} malformed lines skipped (not JSON objects)")
+        print(f"Index: {args.index} ({stats['index_mb']:.1f} MB, {stats['slots']:,} slots)")
+        print(f"Elapsed: {stats['elapsed_s']:.1f}s")
+        return 0
+
+    index = Source1Index(args.index, args.source)
+    try:
+        index.check_fresh()
+        if args.command == "get":
+            missing = 0
+            for record_id in args.ids:
+                record = index.get(record_id)
+                if record is None:
+                    print(f"Not found: {record_id}", file=sys.stderr)
+                    missing += 1
+                else:
+                    print(json.dumps(record, indent=2, ensure_ascii=False))
+            return 1 if missing else 0
+        if args.command == "range":
+            records = index.range(args.start, args.count)
+        else:
+            records = index.sample(args.n, random.Random(args.seed))
+        for record in records:
+            print(json.dumps(record, ensure_ascii=False))
+        return 0
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+-- Step 1: Source 1 Snapshot (Bronze Layer)
+-- Source 1 is converted once per delivery by scripts/load_source_1.sh into
+-- bronze_source_1: typed columnar storage with an explicit schema,
+-- partitioned by snapshot_date and clustered by linkedinID.
+-- raw_source_1 is the latest snapshot, so 02 and 03 read only the columns
+-- they reference instead of re-parsing the 11GB JSONL on every run.
+-- raw_source_1_quarantine is the same snapshot's partition of
+-- bronze_source_1_quarantine (also partitioned by snapshot_date).
+-- Note: Uses linkedinID (URL slug) as the join key, not linkedinNumID
+-- Source 2 is loaded by scripts/load_source_2.sh (JSON arrays, not JSONL)
+
+CREATE OR REPLACE VIEW `coffeespace-sandbox.coffeespace_canonical.raw_source_1` AS
+SELECT *
+FROM `coffeespace-sandbox.coffeespace_canonical.bronze_source_1`
+WHERE snapshot_date = (
+  SELECT MAX(snapshot_date)
+  FROM `coffeespace-sandbox.coffeespace_canonical.bronze_source_1`
+);
+
+CREATE OR REPLACE VIEW `coffeespace-sandbox.coffeespace_canonical.raw_source_1_quarantine` AS
+SELECT *
+FROM `coffeespace-sandbox.coffeespace_canonical.bronze_source_1_quarantine`
+WHERE snapshot_date = (
+  SELECT MAX(snapshot_date)
+  FROM `coffeespace-sandbox.coffeespace_canonical.bronze_source_1`
+);
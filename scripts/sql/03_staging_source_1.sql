@@ -2,15 +2,33 @@
 -- Normalizes to canonical schema with error tracking
 -- Join key: linkedinID (URL slug like "john-doe-123")
 --
--- NOTE: lastUpdated is already a TIMESTAMP (BigQuery autodetected it)
+-- NOTE: raw_source_1 is the latest bronze_source_1 snapshot (typed Parquet from
+-- scripts/bronze.py): lastUpdated and the experience/education dates are
+-- TIMESTAMPs, locationDetails is a STRUCT. Values that did not fit their
+-- column were loaded as NULL and recorded in bronze_source_1_quarantine,
+-- which keeps every snapshot: only the current snapshot's rows are joined.
 
 CREATE OR REPLACE TABLE `coffeespace-sandbox.coffeespace_canonical.stg_source_1` AS
 
-WITH parsed AS (
+WITH quarantined AS (
   SELECT
-    *,
-    ARRAY<STRUCT<field STRING, error STRING, raw_value STRING>>[] AS _errors
-  FROM `coffeespace-sandbox.coffeespace_canonical.raw_source_1`
+    snapshot_date,
+    _source_file,
+    _record_index,
+    ARRAY_AGG(STRUCT(field, 'COERCION_FAILED' AS error, raw_value) ORDER BY field) AS errors
+  FROM `coffeespace-sandbox.coffeespace_canonical.raw_source_1_quarantine`
+  GROUP BY snapshot_date, _source_file, _record_index
+),
+
+parsed AS (
+  SELECT
+    r.*,
+    ARRAY<STRUCT<field STRING, error STRING, raw_value STRING>>[] AS _errors,
+    COALESCE(q.errors, []) AS _coercion_errors
+  FROM `coffeespace-sandbox.coffeespace_canonical.raw_source_1` r
+  LEFT JOIN quarantined q
+    ON q.snapshot_date = r.snapshot_date
+    AND q._source_file = r._source_file AND q._record_index = r._record_index
 ),
 
 with_errors AS (
@@ -23,7 +41,8 @@ with_errors AS (
          []),
       IF(lastUpdated IS NULL,
          [STRUCT('last_updated' AS field, 'NULL_VALUE' AS error, '' AS raw_value)],
-         [])
+         []),
+      p._coercion_errors
     ) AS normalization_errors
   FROM parsed p
 )
@@ -53,9 +72,9 @@ SELECT
   -- Location (canonical struct with hierarchy)
   STRUCT(
     location AS display_string,
-    JSON_VALUE(TO_JSON_STRING(locationDetails), '$.country.name') AS country,
-    JSON_VALUE(TO_JSON_STRING(locationDetails), '$.region.name') AS region,
-    JSON_VALUE(TO_JSON_STRING(locationDetails), '$.locality.name') AS locality,
+    locationDetails.country.name AS country,
+    locationDetails.region.name AS region,
+    locationDetails.locality.name AS locality,
     CAST(NULL AS STRING) AS country_code,
     locationIDList AS location_ids
   ) AS location,
@@ -68,7 +87,7 @@ SELECT
   ) AS social_metrics,
 
   -- Experience array with deterministic IDs
-  -- Note: startDate/endDate may be TIMESTAMP (autodetected), cast to STRING for hashing
+  -- Note: startDate/endDate are TIMESTAMP, cast to STRING for hashing
   ARRAY(
     SELECT AS STRUCT
       TO_HEX(MD5(CONCAT(
@@ -1,141 +1,169 @@
 -- Step 5: Merge to Canonical (Gold Layer)
 -- FULL OUTER JOIN on linkedin_id (URL slug) handles A-only, B-only, and A+B cases
+--
+-- Incremental: people_canonical (partitioned by last_merged_date, clustered on
+-- linkedin_id) is created once and then MERGEd into. Each candidate row carries a content hash over everything
+-- that comes from the sources, excluding CURRENT_TIMESTAMP() columns (Source 2
+-- last_updated / metrics_as_of). Only new ids are inserted and only rows whose
+-- hash changed are rewritten, unchanged rows are not touched. Updated rows keep
+-- first_seen_at and last_synced_at, take the new sync hashes and bump
+-- record_version. Ids that left both sources are tombstoned, not deleted:
+-- provenance.deleted_at is set and record_version bumped, so first_seen_at and
+-- the version history survive. 07 leaves tombstones out of the export, so 08
+-- records them as deletes. An id that comes back is revived (deleted_at
+-- cleared, first_seen_at kept). For a full rebuild, or once after a change to
+-- this table's schema, run part3_pipeline.py --full-refresh.
+--
+-- Cost: the write side is incremental, the read side is not. 03/04 rebuild
+-- stg_source_1/stg_source_2 in full each run, so the candidates view joins and
+-- hashes every staged row, and the MERGE reads people_canonical's linkedin_id,
+-- hash and provenance columns to match them. Bytes processed by this step stay
+-- about the size of both staging tables plus those columns whatever changed.
+-- What drops to the delta is DML: only inserted, changed and tombstoned rows
+-- are written, and only the partitions of the dates they were last merged on.
+-- Job telemetry records the step's bytes processed and rows affected per run
+-- (part3_history.sqlite), and the verification prints the share of rows the
+-- run wrote. Pruning the read side needs incremental staging upstream.
+--
+-- sync_metadata carries per-field-group hashes and the sync_hash over them
+-- (grouped CTE below), so the export view reads them instead of rehashing.
+--
+-- Derived fields are computed here, in the same pass. They are not in
+-- content_hash.
+-- A new taxonomy version changes computation_method, which rewrites every row
+-- once. years_of_experience counts open positions up to the row's last merge.
+--
+-- Arrays are aggregated in a fixed order so an unchanged person hashes the same.
+-- Duplicate linkedin_ids within a source keep one row (most recent Source 1).
 
-CREATE OR REPLACE TABLE `coffeespace-sandbox.coffeespace_canonical.people_canonical` AS
+CREATE OR REPLACE VIEW `coffeespace-sandbox.coffeespace_canonical.people_canonical_candidates` AS
 
-SELECT
-  -- Primary key (deterministic hash of linkedin_id)
-  TO_HEX(MD5(COALESCE(s1.linkedin_id, s2.linkedin_id))) AS canonical_id,
-  COALESCE(s1.linkedin_id, s2.linkedin_id) AS linkedin_id,
+WITH merged AS (
+  SELECT
+    -- Primary key (deterministic hash of linkedin_id)
+    TO_HEX(MD5(COALESCE(s1.linkedin_id, s2.linkedin_id))) AS canonical_id,
+    COALESCE(s1.linkedin_id, s2.linkedin_id) AS linkedin_id,
 
-  -- Identity: prefer Source 1 (higher completeness per Part 1 profiling)
-  STRUCT(
-    COALESCE(s1.identity.full_name, s2.identity.full_name) AS full_name,
-    COALESCE(s1.identity.first_name, s2.identity.first_name) AS first_name,
-    COALESCE(s1.identity.last_name, s2.identity.last_name) AS last_name,
-    COALESCE(s1.identity.headline, s2.identity.headline) AS headline,
-    COALESCE(s1.identity.about, s2.identity.about) AS about
-  ) AS identity,
-
-  -- Identity sources: preserve BOTH for provenance (never lose data)
-  ARRAY_CONCAT(
-    COALESCE(s1.identity_sources, []),
-    COALESCE(s2.identity_sources, [])
-  ) AS identity_sources,
-
-  -- Location: prefer Source 1 (has hierarchy + location_ids)
-  STRUCT(
-    COALESCE(s1.location.display_string, s2.location.display_string) AS display_string,
-    s1.location.country AS country,
-    s1.location.region AS region,
-    COALESCE(s1.location.locality, s2.location.locality) AS locality,
-    COALESCE(s1.location.country_code, s2.location.country_code) AS country_code,
-    s1.location.location_ids AS location_ids
-  ) AS location,
-
-  -- Social metrics: prefer most recent
-  STRUCT(
-    CASE
-      WHEN s1.social_metrics.metrics_as_of >= COALESCE(s2.social_metrics.metrics_as_of, TIMESTAMP('1970-01-01'))
-      THEN s1.social_metrics.connections
-      ELSE COALESCE(s2.social_metrics.connections, s1.social_metrics.connections)
-    END AS connections,
-    CASE
-      WHEN s1.social_metrics.metrics_as_of >= COALESCE(s2.social_metrics.metrics_as_of, TIMESTAMP('1970-01-01'))
-      THEN s1.social_metrics.followers
-      ELSE COALESCE(s2.social_metrics.followers, s1.social_metrics.followers)
-    END AS followers,
-    GREATEST(
-      COALESCE(s1.social_metrics.metrics_as_of, TIMESTAMP('1970-01-01')),
-      COALESCE(s2.social_metrics.metrics_as_of, TIMESTAMP('1970-01-01'))
-    ) AS metrics_as_of
-  ) AS social_metrics,
-
-  -- Experience: UNION from both sources, dedupe by experience_id
-  (
-    SELECT ARRAY_AGG(STRUCT(
-      experience_id,
-      company_name,
-      company_linkedin_id,
-      title,
-      start_date,
-      end_date,
-      location,
-      description,
-      is_current,
-      source_system
-    ))
-    FROM (
-      SELECT DISTINCT
-        exp.experience_id,
-        exp.company_name,
-        exp.company_linkedin_id,
-        exp.title,
-        exp.start_date,
-        exp.end_date,
-        exp.location,
-        exp.description,
-        exp.is_current,
-        exp.source_system
-      FROM UNNEST(ARRAY_CONCAT(
-        COALESCE(s1.experience, []),
-        COALESCE(s2.experience, [])
-      )) AS exp
-    )
-  ) AS experience,
-
-  -- Education: UNION from both sources, dedupe by education_id
-  (
-    SELECT ARRAY_AGG(STRUCT(
-      education_id,
-      institution_name,
-      degree,
-      field_of_study,
-      start_date,
-      end_date,
-      source_system
-    ))
-    FROM (
-      SELECT DISTINCT
-        edu.education_id,
-        edu.institution_name,
-        edu.degree,
-        edu.field_of_study,
-        edu.start_date,
-        edu.end_date,
-        edu.source_system
+    -- Identity: prefer Source 1 (higher completeness per Part 1 profiling)
+    STRUCT(
+      COALESCE(s1.identity.full_name, s2.identity.full_name) AS full_name,
+      COALESCE(s1.identity.first_name, s2.identity.first_name) AS first_name,
+      COALESCE(s1.identity.last_name, s2.identity.last_name) AS last_name,
+      COALESCE(s1.identity.headline, s2.identity.headline) AS headline,
+      COALESCE(s1.identity.about, s2.identity.about) AS about
+    ) AS identity,
+
+    -- Identity sources: preserve BOTH for provenance (never lose data)
+    ARRAY_CONCAT(
+      COALESCE(s1.identity_sources, []),
+      COALESCE(s2.identity_sources, [])
+    ) AS identity_sources,
+
+    -- Location: prefer Source 1 (has hierarchy + location_ids)
+    STRUCT(
+      COALESCE(s1.location.display_string, s2.location.display_string) AS display_string,
+      s1.location.country AS country,
+      s1.location.region AS region,
+      COALESCE(s1.location.locality, s2.location.locality) AS locality,
+      COALESCE(s1.location.country_code, s2.location.country_code) AS country_code,
+      s1.location.location_ids AS location_ids
+    ) AS location,
+
+    -- Social metrics: prefer most recent
+    STRUCT(
+      CASE
+        WHEN s1.social_metrics.metrics_as_of >= COALESCE(s2.social_metrics.metrics_as_of, TIMESTAMP('1970-01-01'))
+        THEN s1.social_metrics.connections
+        ELSE COALESCE(s2.social_metrics.connections, s1.social_metrics.connections)
+      END AS connections,
+      CASE
+        WHEN s1.social_metrics.metrics_as_of >= COALESCE(s2.social_metrics.metrics_as_of, TIMESTAMP('1970-01-01'))
+        THEN s1.social_metrics.followers
+        ELSE COALESCE(s2.social_metrics.followers, s1.social_metrics.followers)
+      END AS followers,
+      GREATEST(
+        COALESCE(s1.social_metrics.metrics_as_of, TIMESTAMP('1970-01-01')),
+        COALESCE(s2.social_metrics.metrics_as_of, TIMESTAMP('1970-01-01'))
+      ) AS metrics_as_of
+    ) AS social_metrics,
+
+    -- Experience: UNION from both sources, dedupe by experience_id
+    (
+      SELECT ARRAY_AGG(STRUCT(
+        experience_id,
+        company_name,
+        company_linkedin_id,
+        title,
+        start_date,
+        end_date,
+        location,
+        description,
+        is_current,
+        source_system
+      ) ORDER BY experience_id, source_system, title, start_date, end_date)
+      FROM (
+        SELECT DISTINCT
+          exp.experience_id,
+          exp.company_name,
+          exp.company_linkedin_id,
+          exp.title,
+          exp.start_date,
+          exp.end_date,
+          exp.location,
+          exp.description,
+          exp.is_current,
+          exp.source_system
+        FROM UNNEST(ARRAY_CONCAT(
+          COALESCE(s1.experience, []),
+          COALESCE(s2.experience, [])
+        )) AS exp
+      )
+    ) AS experience,
+
+    -- Education: UNION from both sources, dedupe by education_id
+    (
+      SELECT ARRAY_AGG(STRUCT(
+        education_id,
+        institution_name,
+        degree,
+        field_of_study,
+        start_date,
+        end_date,
+        source_system
+      ) ORDER BY education_id, source_system, start_date, end_date)
+      FROM (
+        SELECT DISTINCT
+          edu.education_id,
+          edu.institution_name,
+          edu.degree,
+          edu.field_of_study,
+          edu.start_date,
+          edu.end_date,
+          edu.source_system
+        FROM UNNEST(ARRAY_CONCAT(
+          COALESCE(s1.education, []),
+          COALESCE(s2.education, [])
+        )) AS edu
+      )
+    ) AS education,
+
+    -- Certifications: Source 2 only
+    COALESCE(s2.certifications, []) AS certifications,
+
+    -- Skills: UNION and dedupe
+    (
+      SELECT ARRAY_AGG(DISTINCT skill ORDER BY skill)
       FROM UNNEST(ARRAY_CONCAT(
-        COALESCE(s1.education, []),
-        COALESCE(s2.education, [])
-      )) AS edu
-    )
-  ) AS education,
-
-  -- Certifications: Source 2 only
-  COALESCE(s2.certifications, []) AS certifications,
-
-  -- Skills: UNION and dedupe
-  (
-    SELECT ARRAY_AGG(DISTINCT skill)
-    FROM UNNEST(ARRAY_CONCAT(
-      COALESCE(s1.skills, []),
-      COALESCE(s2.skills, [])
-    )) AS skill
-    WHERE skill IS NOT NULL
-  ) AS skills,
-
-  -- Computed signals: Source 1 only
-  s1.computed_signals,
-
-  -- Derived fields (placeholder, computed in Step 6)
-  STRUCT(
-    CAST(NULL AS STRING) AS primary_portfolio,
-    CAST(NULL AS FLOAT64) AS years_of_experience,
-    CAST(NULL AS STRING) AS computation_method
-  ) AS derived_fields,
+        COALESCE(s1.skills, []),
+        COALESCE(s2.skills, [])
+      )) AS skill
+      WHERE skill IS NOT NULL
+    ) AS skills,
 
-  -- Provenance
-  STRUCT(
+    -- Computed signals: Source 1 only
+    s1.computed_signals,
+
+    -- Provenance (first_seen_at / record_version are set by the MERGE below)
     CASE
       WHEN s1.linkedin_id IS NOT NULL AND s2.linkedin_id IS NOT NULL
         THEN ['source_1', 'source_2']
@@ -147,24 +175,250 @@ SELECT
     s2.source_id AS source_2_id,
     s1.last_updated AS source_1_last_updated,
     s2.last_updated AS source_2_last_updated,
-    CURRENT_TIMESTAMP() AS first_seen_at,
-    CURRENT_TIMESTAMP() AS last_merged_at,
-    1 AS record_version
-  ) AS provenance,
 
-  -- Sync metadata (for Part 4)
+    -- Normalization errors: UNION from both sources
+    ARRAY_CONCAT(
+      COALESCE(s1.normalization_errors, []),
+      COALESCE(s2.normalization_errors, [])
+    ) AS normalization_errors
+
+  FROM `coffeespace-sandbox.coffeespace_canonical.stg_source_1` s1
+  FULL OUTER JOIN `coffeespace-sandbox.coffeespace_canonical.stg_source_2` s2
+    ON s1.linkedin_id = s2.linkedin_id
+),
+
+hashed AS (
+  SELECT
+    m.*,
+    TO_HEX(MD5(TO_JSON_STRING(STRUCT(
+      m.identity,
+      ARRAY(
+        SELECT AS STRUCT src.source_system, src.full_name, src.headline, src.about
+        FROM UNNEST(m.identity_sources) AS src
+      ) AS identity_sources,
+      m.location,
+      m.social_metrics.connections AS connections,
+      m.social_metrics.followers AS followers,
+      m.experience,
+      m.education,
+      m.certifications,
+      m.skills,
+      m.computed_signals,
+      m.source_systems,
+      m.source_1_id,
+      m.source_2_id,
+      m.source_1_last_updated,
+      m.normalization_errors
+    )))) AS content_hash,
+    LOWER(m.identity.headline) AS headline_lc
+  FROM merged m
+),
+
+canonical AS (
+  SELECT
+    canonical_id,
+    linkedin_id,
+    identity,
+    identity_sources,
+    location,
+    social_metrics,
+    experience,
+    education,
+    certifications,
+    skills,
+    computed_signals,
+    -- Derived fields: primary_portfolio from scripts/portfolio_taxonomy.json
+    -- BEGIN derived_fields (rendered by scripts/derived_fields.py from portfolio_taxonomy.json v1, do not edit by hand)
+    STRUCT(
+      CASE
+        WHEN REGEXP_CONTAINS(headline_lc, r'software|engineer|developer|swe|backend|frontend|full stack|fullstack') THEN 'Software Engineering'
+        WHEN REGEXP_CONTAINS(headline_lc, r'data scien|machine learning|ml engineer|data analyst|analytics') THEN 'Data Science'
+        WHEN REGEXP_CONTAINS(headline_lc, r'product manag|product lead|product owner') THEN 'Product Management'
+        WHEN REGEXP_CONTAINS(headline_lc, r'design|ux|ui|creative') THEN 'Design'
+        WHEN REGEXP_CONTAINS(headline_lc, r'sales|account exec|business develop|bdr') THEN 'Sales'
+        WHEN REGEXP_CONTAINS(headline_lc, r'marketing|growth|brand|content') THEN 'Marketing'
+        WHEN REGEXP_CONTAINS(headline_lc, r'finance|accounting|fp&a|controller') THEN 'Finance'
+        WHEN REGEXP_CONTAINS(headline_lc, r'hr |human resources|recruiter|talent|people ops') THEN 'Human Resources'
+        WHEN REGEXP_CONTAINS(headline_lc, r'operations|ops manager|logistics|supply chain') THEN 'Operations'
+        WHEN REGEXP_CONTAINS(headline_lc, r'ceo|cto|cfo|coo|founder|co-founder|vp |vice president|director|head of') THEN 'Executive'
+        ELSE 'Other'
+      END AS primary_portfolio,
+      (
+        SELECT ROUND(SUM(
+          DATE_DIFF(COALESCE(exp.end_date, CURRENT_DATE()), exp.start_date, DAY) / 365.25
+        ), 1)
+        FROM UNNEST(experience) AS exp
+        WHERE exp.start_date IS NOT NULL
+      ) AS years_of_experience,
+      'v1: headline_keywords + experience_date_math' AS computation_method
+    ) AS derived_fields,
+    -- END derived_fields
+    STRUCT(
+      source_systems,
+      source_1_id,
+      source_2_id,
+      source_1_last_updated,
+      source_2_last_updated,
+      content_hash,
+      CURRENT_TIMESTAMP() AS first_seen_at,
+      CURRENT_TIMESTAMP() AS last_merged_at,
+      1 AS record_version,
+      CAST(NULL AS TIMESTAMP) AS deleted_at
+    ) AS provenance,
+    normalization_errors
+  FROM hashed
+  WHERE TRUE
+  QUALIFY ROW_NUMBER() OVER (
+    PARTITION BY linkedin_id
+    ORDER BY source_1_last_updated DESC, content_hash
+  ) = 1
+),
+
+-- Sync hashes (for Part 4): one MD5 per field group of sql/field_groups.json,
+-- over its canonical_paths and in its order, computed once per merged row.
+-- sync_hash is the MD5 of the group hashes, so it changes iff a group does
+-- and firestore_sync.py writes only the groups that changed.
+grouped AS (
+  SELECT
+    c.*,
+    -- BEGIN field_hashes (rendered by scripts/field_groups.py from field_groups.json, do not edit by hand)
+    STRUCT(
+      TO_HEX(MD5(TO_JSON_STRING(STRUCT(
+        c.identity.full_name AS full_name,
+        c.identity.first_name AS first_name,
+        c.identity.last_name AS last_name,
+        c.identity.headline AS headline,
+        c.identity.about AS about
+      )))) AS identity,
+      TO_HEX(MD5(TO_JSON_STRING(STRUCT(
+        c.location.display_string AS display_string,
+        c.location.country AS country,
+        c.location.country_code AS country_code
+      )))) AS location,
+      TO_HEX(MD5(TO_JSON_STRING(STRUCT(
+        c.social_metrics.connections AS connections,
+        c.social_metrics.followers AS followers
+      )))) AS social_metrics,
+      TO_HEX(MD5(TO_JSON_STRING(STRUCT(
+        c.derived_fields.primary_portfolio AS primary_portfolio,
+        c.derived_fields.years_of_experience AS years_of_experience
+      )))) AS derived_fields,
+      TO_HEX(MD5(TO_JSON_STRING(STRUCT(c.experience AS experience)))) AS experience,
+      TO_HEX(MD5(TO_JSON_STRING(STRUCT(c.education AS education)))) AS education,
+      TO_HEX(MD5(TO_JSON_STRING(STRUCT(c.certifications AS certifications)))) AS certifications,
+      TO_HEX(MD5(TO_JSON_STRING(STRUCT(c.skills AS skills)))) AS skills
+    ) AS field_hashes
+    -- END field_hashes
+  FROM canonical c
+)
+
+SELECT
+  canonical_id,
+  linkedin_id,
+  identity,
+  identity_sources,
+  location,
+  social_metrics,
+  experience,
+  education,
+  certifications,
+  skills,
+  computed_signals,
+  derived_fields,
+  provenance,
   STRUCT(
-    COALESCE(s1.linkedin_id, s2.linkedin_id) AS firestore_doc_id,
+    linkedin_id AS firestore_doc_id,
     CAST(NULL AS TIMESTAMP) AS last_synced_at,
-    CAST(NULL AS STRING) AS sync_hash
+    -- BEGIN sync_hash (rendered by scripts/field_groups.py from field_groups.json, do not edit by hand)
+    TO_HEX(MD5(CONCAT(
+      field_hashes.identity,
+      field_hashes.location,
+      field_hashes.social_metrics,
+      field_hashes.derived_fields,
+      field_hashes.experience,
+      field_hashes.education,
+      field_hashes.certifications,
+      field_hashes.skills
+    ))) AS sync_hash,
+    -- END sync_hash
+    field_hashes
   ) AS sync_metadata,
+  normalization_errors,
+  -- Partitioning column: the rows a run wrote sit in that run's partition
+  CURRENT_DATE() AS last_merged_date
+FROM grouped;
 
-  -- Normalization errors: UNION from both sources
-  ARRAY_CONCAT(
-    COALESCE(s1.normalization_errors, []),
-    COALESCE(s2.normalization_errors, [])
-  ) AS normalization_errors
+-- First run (or after --full-refresh): empty table with the candidate schema
+CREATE TABLE IF NOT EXISTS `coffeespace-sandbox.coffeespace_canonical.people_canonical`
+PARTITION BY last_merged_date
+CLUSTER BY linkedin_id
+AS SELECT * FROM `coffeespace-sandbox.coffeespace_canonical.people_canonical_candidates` WHERE FALSE;
 
-FROM `coffeespace-sandbox.coffeespace_canonical.stg_source_1` s1
-FULL OUTER JOIN `coffeespace-sandbox.coffeespace_canonical.stg_source_2` s2
-  ON s1.linkedin_id = s2.linkedin_id;
+MERGE INTO `coffeespace-sandbox.coffeespace_canonical.people_canonical` AS T
+USING `coffeespace-sandbox.coffeespace_canonical.people_canonical_candidates` AS S
+ON T.linkedin_id = S.linkedin_id
+
+-- Changed person, new taxonomy version or returning tombstone: rewrite the row,
+-- keep first_seen_at and last_synced_at
+WHEN MATCHED AND (
+  T.provenance.content_hash IS DISTINCT FROM S.provenance.content_hash
+  OR T.derived_fields.computation_method IS DISTINCT FROM S.derived_fields.computation_method
+  OR T.provenance.deleted_at IS NOT NULL
+) THEN UPDATE SET
+  identity = S.identity,
+  identity_sources = S.identity_sources,
+  location = S.location,
+  social_metrics = S.social_metrics,
+  experience = S.experience,
+  education = S.education,
+  certifications = S.certifications,
+  skills = S.skills,
+  computed_signals = S.computed_signals,
+  derived_fields = S.derived_fields,
+  provenance = STRUCT(
+    S.provenance.source_systems AS source_systems,
+    S.provenance.source_1_id AS source_1_id,
+    S.provenance.source_2_id AS source_2_id,
+    S.provenance.source_1_last_updated AS source_1_last_updated,
+    S.provenance.source_2_last_updated AS source_2_last_updated,
+    S.provenance.content_hash AS content_hash,
+    T.provenance.first_seen_at AS first_seen_at,
+    CURRENT_TIMESTAMP() AS last_merged_at,
+    T.provenance.record_version + 1 AS record_version,
+    CAST(NULL AS TIMESTAMP) AS deleted_at
+  ),
+  sync_metadata = STRUCT(
+    T.sync_metadata.firestore_doc_id AS firestore_doc_id,
+    T.sync_metadata.last_synced_at AS last_synced_at,
+    S.sync_metadata.sync_hash AS sync_hash,
+    S.sync_metadata.field_hashes AS field_hashes
+  ),
+  normalization_errors = S.normalization_errors,
+  last_merged_date = CURRENT_DATE()
+
+-- New person
+WHEN NOT MATCHED THEN INSERT (
+  canonical_id, linkedin_id, identity, identity_sources, location, social_metrics,
+  experience, education, certifications, skills, computed_signals, derived_fields,
+  provenance, sync_metadata, normalization_errors, last_merged_date
+) VALUES (
+  S.canonical_id, S.linkedin_id, S.identity, S.identity_sources, S.location, S.social_metrics,
+  S.experience, S.education, S.certifications, S.skills, S.computed_signals, S.derived_fields,
+  S.provenance, S.sync_metadata, S.normalization_errors, S.last_merged_date
+)
+
+-- Left both sources: tombstone the row, keeping its data and history
+WHEN NOT MATCHED BY SOURCE AND T.provenance.deleted_at IS NULL THEN UPDATE SET
+  provenance = STRUCT(
+    T.provenance.source_systems AS source_systems,
+    T.provenance.source_1_id AS source_1_id,
+    T.provenance.source_2_id AS source_2_id,
+    T.provenance.source_1_last_updated AS source_1_last_updated,
+    T.provenance.source_2_last_updated AS source_2_last_updated,
+    T.provenance.content_hash AS content_hash,
+    T.provenance.first_seen_at AS first_seen_at,
+    CURRENT_TIMESTAMP() AS last_merged_at,
+    T.provenance.record_version + 1 AS record_version,
+    CURRENT_TIMESTAMP() AS deleted_at
+  ),
+  last_merged_date = CURRENT_DATE();
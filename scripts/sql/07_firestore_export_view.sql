@@ -1,5 +1,8 @@
 -- Step 7: Firestore Export View
--- Lean projection with sync_hash for Part 4 delta detection
+-- Lean projection with 05's sync hashes for Part 4 delta detection
+-- part3_pipeline.py does not run this as is: snapshot_versions.py points it
+-- at a snapshot (firestore_export_<id> over people_canonical_<id>) and
+-- firestore_export is swapped to that view on promotion
 
 CREATE OR REPLACE VIEW `coffeespace-sandbox.coffeespace_canonical.firestore_export` AS
 SELECT
@@ -47,20 +50,13 @@ SELECT
     provenance.last_merged_at
   ) AS last_modified_at,
 
-  -- Sync hash for O(1) change detection in Part 4
-  TO_HEX(MD5(CONCAT(
-    COALESCE(identity.full_name, ''),
-    COALESCE(identity.headline, ''),
-    COALESCE(identity.about, ''),
-    COALESCE(location.display_string, ''),
-    CAST(COALESCE(social_metrics.connections, 0) AS STRING),
-    CAST(COALESCE(social_metrics.followers, 0) AS STRING),
-    COALESCE(derived_fields.primary_portfolio, ''),
-    CAST(COALESCE(derived_fields.years_of_experience, 0) AS STRING),
-    TO_JSON_STRING(experience),
-    TO_JSON_STRING(education),
-    TO_JSON_STRING(certifications),
-    ARRAY_TO_STRING(COALESCE(skills, []), ',')
-  ))) AS sync_hash
+  -- Sync hashes for Part 4, computed once by 05's merge: sync_hash for
+  -- change detection, field_hashes (one per sql/field_groups.json group) to
+  -- write only the groups that changed
+  sync_metadata.sync_hash,
+  sync_metadata.field_hashes
 
-FROM `coffeespace-sandbox.coffeespace_canonical.people_canonical`;
+FROM `coffeespace-sandbox.coffeespace_canonical.people_canonical`
+-- Tombstones (people who left both sources, see 05) are not exported, so 08
+-- and the Firestore sync see them as deletes
+WHERE provenance.deleted_at IS NULL;
@@ -0,0 +1,228 @@
+"""
+Dependency-aware step scheduler for part3_pipeline.py.
+
+Each Step declares the tables it reads and the tables it writes. A step
+depends on every step that writes one of its inputs, so the graph comes from
+the declarations, not from list order. A step can also list steps it must
+run `after` without reading their outputs (a quality gate that has to pass
+first). The two stagings (03, 04) and the source gate (02) run concurrently,
+and 05 starts as soon as all three finish. Ready steps go to a thread pool. The warehouse does the work, and a
+thread only waits on its jobs.
+
+Skip-if-unchanged: when a step succeeds, StepState records the SHA-256 of its
+SQL file together with its `sources` (the modules that turn a config file
+such as quality_gates.json into SQL) and the last-modified time of each
+input table. A later run skips
+the step when both still match and every output exists. Input times are read
+when the step becomes ready, after its upstream steps have finished, so any
+step downstream of one that ran is never skipped. A rerun with nothing
+changed only reads table metadata. A rerun after a change takes as long as
+the critical path of the steps that actually changed.
+
+--from KEY reruns KEY and every step downstream of it. The cache is ignored
+for that subgraph, and steps outside it are left alone.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+RAN, SKIPPED, FAILED, BLOCKED, CANCELLED, NOT_SELECTED = (
+    "ran", "skipped", "failed", "blocked", "cancelled", "not selected")
+
+
+@dataclass(frozen=True)
+class Step:
+    """One SQL file (or config) and the tables it reads and writes (unqualified names)."""
+    key: str
+    sql_file: str
+    description: str
+    inputs: tuple[str, ...] = ()
+    outputs: tuple[str, ...] = ()
+    after: tuple[str, ...] = ()  # step keys that must succeed first (no table between them)
+    sources: tuple[str, ...] = ()  # modules generating its SQL from sql_file, fingerprinted with it
+
+
+@dataclass
+class StepResult:
+    status: str
+    started: float = 0.0  # seconds after the scheduler started
+    elapsed: float = 0.0
+    log: list[str] = field(default_factory=list)
+    result: dict | None = None  # what the executor returned
+
+
+def dependencies(steps: list[Step]) -> dict[str, set[str]]:
+    """key -> keys of the steps writing its inputs, plus its `after` steps.
+
+    Raises ValueError on a cycle or an unknown `after` key.
+    """
+    writers: dict[str, str] = {}
+    for step in steps:
+        for table in step.outputs:
+            if table in writers:
+                raise ValueError(f"{table} is written by both {writers[table]} and {step.key}")
+            writers[table] = step.key
+    deps = {s.key: {writers[t] for t in s.inputs if t in writers and writers[t] != s.key} | set(s.after)
+            for s in steps}
+    for key, d in deps.items():
+        if d - deps.keys():
+            raise ValueError(f"Step {key} runs after unknown step(s) {sorted(d - deps.keys())}")
+
+    done: set[str] = set()
+    while len(done) < len(deps):
+        ready = [k for k, d in deps.items() if k not in done and d <= done]
+        if not ready:
+            raise ValueError(f"Dependency cycle among steps {sorted(set(deps) - done)}")
+        done.update(ready)
+    return deps
+
+
+def downstream(steps: list[Step], key: str) -> set[str]:
+    """key and every step that (transitively) reads what it writes."""
+    deps = dependencies(steps)
+    if key not in deps:
+        raise KeyError(f"Unknown step {key!r} (steps: {', '.join(deps)})")
+    selected = {key}
+    changed = True
+    while changed:
+        changed = False
+        for k, d in deps.items():
+            if k not in selected and d & selected:
+                selected.add(k)
+                changed = True
+    return selected
+
+
+def sql_hash(*paths: Path) -> str:
+    """SHA-256 over the contents of a step's SQL file and its sources, in order."""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(Path(path).read_bytes())
+    return digest.hexdigest()
+
+
+class StepState:
+    """Last successful fingerprint per step, kept in a JSON file per target.
+
+    One file can serve several targets (a BigQuery dataset, DuckDB files),
+    keyed by `target`. path=None keeps nothing (e.g. an in-memory database).
+    """
+
+    def __init__(self, path: str | None, target: str):
+        self.path = Path(path) if path else None
+        self.target = target
+        self._lock = threading.Lock()
+        self._all: dict = {}
+        if self.path and self.path.exists():
+            self._all = json.loads(self.path.read_text())
+        self.steps: dict[str, dict] = self._all.setdefault(target, {})
+
+    def matches(self, key: str, fingerprint: dict) -> bool:
+        last = self.steps.get(key)
+        return (last is not None
+                and last["sql_sha256"] == fingerprint["sql_sha256"]
+                and last["inputs"] == fingerprint["inputs"])
+
+    def record(self, key: str, fingerprint: dict):
+        with self._lock:
+            self.steps[key] = {**fingerprint, "succeeded_at": datetime.now(timezone.utc).isoformat()}
+            if self.path:
+                tmp = self.path.with_name(self.path.name + ".tmp")
+                tmp.write_text(json.dumps(self._all, indent=2, sort_keys=True))
+                os.replace(tmp, self.path)
+
+    def forget(self, key: str):
+        with self._lock:
+            self.steps.pop(key, None)
+
+
+def run_dag(steps: list[Step], execute, fingerprint, state: StepState, *,
+            selected: set[str] | None = None, force: bool = False,
+            max_parallel: int = 4, fail_fast: bool = False, emit=print) -> dict[str, StepResult]:
+    """Run steps in dependency order, independent ones concurrently.
+
+    execute(step, log) -> dict with "success" runs a step, logging through
+    log(line). fingerprint(step) -> {"sql_sha256", "inputs": {table: mtime},
+    "outputs_exist"}. An unknown mtime (None) never matches. Steps outside
+    `selected` count as done. `selected` and `force` bypass the cache. A
+    failed step whose result has "abort" set stops the run even without
+    fail_fast. Each step's log is emitted in one block when it finishes.
+    """
+    deps = dependencies(steps)
+    by_key = {s.key: s for s in steps}
+    results: dict[str, StepResult] = {}
+    for key in deps:
+        if selected is not None and key not in selected:
+            results[key] = StepResult(NOT_SELECTED)
+    clock = time.monotonic()
+
+    def one(step: Step) -> StepResult:
+        started = time.monotonic()
+        log: list[str] = []
+        current = fingerprint(step)
+        cacheable = (not force and selected is None and current["outputs_exist"]
+                     and None not in current["inputs"].values())
+        if cacheable and state.matches(step.key, current):
+            last = state.steps[step.key]["succeeded_at"]
+            log.append(f"\nStep {step.key}: {step.description} -- skipped, "
+                       f"unchanged since {last}")
+            return StepResult(SKIPPED, started - clock, time.monotonic() - started, log)
+        outcome = execute(step, log.append)
+        status = RAN if outcome["success"] else FAILED
+        if outcome["success"]:
+            state.record(step.key, {"sql_sha256": current["sql_sha256"], "inputs": current["inputs"]})
+        else:
+            state.forget(step.key)
+        return StepResult(status, started - clock, time.monotonic() - started, log, outcome)
+
+    pending = [key for key in deps if key not in results]
+    stop = False
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        running = {}
+        while pending or running:
+            progressed = True
+            while progressed:
+                progressed = False
+                for key in list(pending):
+                    upstream = [results[d].status for d in deps[key] if d in results]
+                    if {FAILED, BLOCKED, CANCELLED} & set(upstream):
+                        results[key] = StepResult(BLOCKED)
+                    elif stop:
+                        results[key] = StepResult(CANCELLED)
+                    elif len(upstream) == len(deps[key]) and len(running) < max_parallel:
+                        running[pool.submit(one, by_key[key])] = key
+                    else:
+                        continue
+                    pending.remove(key)
+                    progressed = True
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = running.pop(future)
+                results[key] = future.result()
+                for line in results[key].log:
+                    emit(line)
+                # An executor result with "abort" (e.g. a byte budget) stops the run regardless
+                if results[key].status == FAILED and (fail_fast or (results[key].result or {}).get("abort")):
+                    stop = True
+    return {key: results[key] for key in deps}
+
+
+def print_schedule(steps: list[Step], results: dict[str, StepResult], wall: float, emit=print):
+    """Per-step status and timing, and wall-clock against the serial sum."""
+    emit(f"  {'step':<6} {'status':<13} {'start':>7} {'seconds':>8}  description")
+    for step in steps:
+        r = results[step.key]
+        timing = f"{r.started:>7.1f} {r.elapsed:>8.1f}" if r.status in (RAN, SKIPPED, FAILED) \
+            else f"{'':>7} {'':>8}"
+        emit(f"  {step.key:<6} {r.status:<13} {timing}  {step.description}")
+    serial = sum(r.elapsed for r in results.values())
+    emit(f"  Wall-clock {wall:.1f}s for {serial:.1f}s of step time")
@@ -0,0 +1,293 @@
+"""
+Persisted Firestore sync state: doc_id -> (sync_hash, field group hashes, synced_at), local only.
+
+firestore_sync.py decides what to write by merge-joining the export, read
+in key order, against this index. It never reads a Firestore document. The
+key is MD5(doc_id) (the export's key_hash, as 16 raw bytes), so both sides
+come in the same order and a shard's key range is one contiguous slice of
+each. The field group hashes (05's sync_metadata.field_hashes, first 8 bytes
+of each) say which groups of a changed document differ from what Firestore
+holds, so only those are written.
+
+Two files:
+
+    <path>          sorted base, memory-mapped (little-endian)
+        header      MAGIC, record count, MD5 of the sync target, MD5 of the
+                    field group names, group count
+        records     one per document, sorted by key: key (16 bytes),
+                    sync_hash (16 raw bytes), synced_at (us since epoch),
+                    doc_id offset and length in the blob, then 8 bytes per
+                    field group
+        blob        doc_ids, UTF-8
+    <path>.journal  appended after each committed batch
+        block       payload length, CRC32, then the field groups' MD5 and
+                    count, and per entry: key, sync_hash (all zero for a
+                    deleted document), synced_at, doc_id, group hashes
+
+A batch is recorded by appending one journal block and fsyncing it. A block
+cut short by a crash fails its length or CRC check and is dropped on load,
+so the index never holds half a batch and never holds a write that was not
+committed. The journal is replayed over the base into memory when the index
+opens. compact() merges the two into a new base, replaces the base
+atomically (os.replace), and only then empties the journal. Replaying a
+journal twice over the same base gives the same result, so a crash between
+those two steps is harmless.
+
+Group hashes recorded under other field groups (sql/field_groups.json
+changed), or all zero, are unknown: such a document is rewritten whole the
+next time its sync_hash changes. compact() keeps them unknown under the
+current groups.
+
+~56 bytes per document, plus 8 per field group and its doc_id: 1.3M
+documents with 8 groups are ~180 MB, and the OS pages in only the key
+ranges a sync touches.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+
+MAGIC = b"FSIDX\x00\x02\x00"
+_HEADER = struct.Struct("<8sQ16s16sH6x")  # magic, records, MD5(target), MD5(group names), groups
+_RECORD = struct.Struct("<16s16sqQI4x")  # key, sync_hash, synced_at_us, doc offset, doc length (+ groups)
+_BLOCK = struct.Struct("<II")  # payload length, CRC32
+_GROUPS = struct.Struct("<16sH")  # MD5(group names), groups (once per block)
+_ENTRY = struct.Struct("<16s16sqH")  # key, sync_hash (zero: deleted), synced_at_us, doc_id length
+GROUP_HASH_BYTES = 8
+_DELETED = bytes(16)
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def key_of(key_hash: str) -> bytes:
+    """The export's key_hash (TO_HEX(MD5(doc_id))) -> index key."""
+    return bytes.fromhex(key_hash)
+
+
+def key_hash_of(doc_id: str) -> str:
+    return hashlib.md5(doc_id.encode("utf-8")).hexdigest()
+
+
+def changed_groups(indexed: dict[str, str] | None, field_hashes: dict[str, str]) -> list[str] | None:
+    """Groups whose hash differs from the indexed one, in field_hashes order. None if the index cannot tell."""
+    if indexed is None:
+        return None
+    return [name for name, h in field_hashes.items()
+            if indexed.get(name) != h[:2 * GROUP_HASH_BYTES]]
+
+
+def _micros(ts: datetime) -> int:
+    return (ts - _EPOCH) // datetime.resolution
+
+
+def _timestamp(micros: int) -> datetime:
+    return _EPOCH + micros * datetime.resolution
+
+
+def _groups_digest(groups: list[str]) -> bytes:
+    return hashlib.md5("\n".join(groups).encode("utf-8")).digest()
+
+
+class SyncIndex:
+    """Sorted mmap base plus journal. Safe to record() from several threads."""
+
+    def __init__(self, path: str, target: str, groups: list[str] | tuple[str, ...] = ()):
+        self.path = Path(path)
+        self.journal_path = Path(f"{path}.journal")
+        self.groups = list(groups)
+        self._target = hashlib.md5(target.encode("utf-8")).digest()
+        self._groups_digest = _groups_digest(self.groups)
+        self._unknown = bytes(GROUP_HASH_BYTES * len(self.groups))
+        self._lock = threading.Lock()
+        self._file = self._mm = None
+        self.count = 0
+        self._open_base()
+        # key -> (doc_id, sync_hash, synced_at_us, group hashes), or None once deleted
+        self._pending: dict[bytes, tuple[str, bytes, int, bytes] | None] = {}
+        self._replay_journal()
+
+    def _open_base(self):
+        if not self.path.exists():
+            return
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, target, digest, groups = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a sync index of this version "
+                             f"(remove it, and its journal, to rebuild it with a --full sync)")
+        if target != self._target:
+            self.close()
+            raise ValueError(f"{self.path} belongs to another sync target")
+        self._base_groups = GROUP_HASH_BYTES * groups
+        self._base_groups_known = digest == self._groups_digest
+        self._record_size = _RECORD.size + self._base_groups
+        self._blob_at = _HEADER.size + self._record_size * self.count
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._file = self._mm = None
+
+    def _replay_journal(self):
+        if not self.journal_path.exists():
+            return
+        data = self.journal_path.read_bytes()
+        pos = 0
+        while pos + _BLOCK.size <= len(data):
+            length, crc = _BLOCK.unpack_from(data, pos)
+            payload = data[pos + _BLOCK.size:pos + _BLOCK.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break  # torn tail of an interrupted append
+            self._apply(payload)
+            pos += _BLOCK.size + length
+        if pos < len(data):
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(pos)
+
+    def _apply(self, payload: bytes):
+        digest, groups = _GROUPS.unpack_from(payload, 0)
+        width = GROUP_HASH_BYTES * groups
+        known = digest == self._groups_digest
+        at = _GROUPS.size
+        while at < len(payload):
+            key, sync_hash, synced_at, length = _ENTRY.unpack_from(payload, at)
+            at += _ENTRY.size
+            doc_id = payload[at:at + length].decode("utf-8")
+            group_hashes = payload[at + length:at + length + width] if known else self._unknown
+            at += length + width
+            self._pending[key] = None if sync_hash == _DELETED else (doc_id, sync_hash, synced_at, group_hashes)
+
+    # -- reads ---------------------------------------------------------------
+
+    def _base_key(self, i: int) -> bytes:
+        return self._mm[_HEADER.size + self._record_size * i:_HEADER.size + self._record_size * i + 16]
+
+    def _base_entry(self, i: int) -> tuple[bytes, str, bytes, int, bytes]:
+        at = _HEADER.size + self._record_size * i
+        key, sync_hash, synced_at, offset, length = _RECORD.unpack_from(self._mm, at)
+        doc_id = self._mm[self._blob_at + offset:self._blob_at + offset + length].decode("utf-8")
+        if self._base_groups_known:
+            group_hashes = self._mm[at + _RECORD.size:at + self._record_size]
+        else:
+            group_hashes = self._unknown
+        return key, doc_id, sync_hash, synced_at, group_hashes
+
+    def _base_from(self, key: bytes) -> int:
+        """First base record with a key >= key (binary search on the mapped records)."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._base_key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _group_dict(self, group_hashes: bytes) -> dict[str, str] | None:
+        if group_hashes == self._unknown:
+            return None
+        return {name: group_hashes[i * GROUP_HASH_BYTES:(i + 1) * GROUP_HASH_BYTES].hex()
+                for i, name in enumerate(self.groups)}
+
+    def scan(self, low: bytes = b"", high: bytes | None = None):
+        """(key, doc_id, sync_hash hex, synced_at, group hashes or None) of every indexed document
+        with low <= key < high, in order."""
+        for key, doc_id, sync_hash, synced_at, group_hashes in self._entries(low, high):
+            yield key, doc_id, sync_hash.hex(), _timestamp(synced_at), self._group_dict(group_hashes)
+
+    def _entries(self, low: bytes, high: bytes | None):
+        with self._lock:
+            pending = sorted((k, v) for k, v in self._pending.items() if k >= low and (high is None or k < high))
+        return self._merged(pending, low, high)
+
+    def _merged(self, pending: list, low: bytes, high: bytes | None):
+        i = self._base_from(low) if self.count else 0
+        j = 0
+        while True:
+            base = self._base_entry(i) if i < self.count else None
+            if base is not None and high is not None and base[0] >= high:
+                base = None
+            journal = pending[j] if j < len(pending) else None
+            if base is None and journal is None:
+                return
+            if journal is not None and (base is None or journal[0] <= base[0]):
+                if base is not None and journal[0] == base[0]:
+                    i += 1  # the journal entry replaces the base record
+                j += 1
+                if journal[1] is not None:
+                    yield (journal[0], *journal[1])
+            else:
+                i += 1
+                yield base
+
+    def get(self, doc_id: str) -> tuple[str, datetime, dict[str, str] | None] | None:
+        """(sync_hash, synced_at, group hashes) of one document."""
+        key = key_of(key_hash_of(doc_id))
+        for found_key, found, sync_hash, synced_at, groups in self.scan(key):
+            if found_key != key:
+                return None
+            if found == doc_id:
+                return sync_hash, synced_at, groups
+        return None
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    # -- writes --------------------------------------------------------------
+
+    def _pack_groups(self, field_hashes: dict[str, str] | None) -> bytes:
+        if not field_hashes:
+            return self._unknown
+        return b"".join(bytes.fromhex(field_hashes[name])[:GROUP_HASH_BYTES] for name in self.groups)
+
+    def record(self, entries: list[tuple[str, str, str | None, dict[str, str] | None]], synced_at: datetime):
+        """Durably record one committed batch: (key_hash, doc_id, sync_hash or None if deleted,
+        field group hashes or None if unknown)."""
+        micros = _micros(synced_at)
+        parts = [_GROUPS.pack(self._groups_digest, len(self.groups))]
+        for key_hash, doc_id, sync_hash, field_hashes in entries:
+            encoded = doc_id.encode("utf-8")
+            parts.append(_ENTRY.pack(key_of(key_hash), bytes.fromhex(sync_hash) if sync_hash else _DELETED,
+                                     micros, len(encoded)))
+            parts.append(encoded)
+            parts.append(self._pack_groups(field_hashes if sync_hash else None))
+        payload = b"".join(parts)
+        with self._lock:
+            with open(self.journal_path, "ab") as f:
+                f.write(_BLOCK.pack(len(payload), zlib.crc32(payload)) + payload)
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(payload)
+
+    def compact(self) -> int:
+        """Fold the journal into a new base (atomic replace), then empty the journal. Returns the count."""
+        with self._lock:
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            blob = bytearray()
+            count = 0
+            with open(tmp, "wb") as f:
+                f.write(bytes(_HEADER.size))
+                for key, doc_id, sync_hash, synced_at, group_hashes in self._merged(
+                        sorted(self._pending.items()), b"", None):
+                    encoded = doc_id.encode("utf-8")
+                    f.write(_RECORD.pack(key, sync_hash, synced_at, len(blob), len(encoded)) + group_hashes)
+                    blob += encoded
+                    count += 1
+                f.write(blob)
+                f.seek(0)
+                f.write(_HEADER.pack(MAGIC, count, self._target, self._groups_digest, len(self.groups)))
+                f.flush()
+                os.fsync(f.fileno())
+            self.close()
+            os.replace(tmp, self.path)
+            if self.journal_path.exists():
+                os.truncate(self.journal_path, 0)
+            self._pending = {}
+            self._open_base()
+            return self.count
@@ -0,0 +1,63 @@
+"""The AIMD limiter and retry budget settle near a fake endpoint's capacity without failing calls."""
+
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from adaptive_concurrency import AIMDLimiter, RetryBudget, call_with_retries, start_fake_endpoint
+
+
+@pytest.fixture
+def endpoint():
+    servers = []
+
+    def start(capacity, base_latency_s=0.01, error_rate=0.0):
+        server = start_fake_endpoint(capacity, base_latency_s, error_rate)
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def drive(url, limiter, budget, requests, workers):
+    """Issue `requests` calls from `workers` threads; returns (failures, limits seen)."""
+    limits, failures = [], []
+
+    def one(_):
+        try:
+            call_with_retries(lambda: urllib.request.urlopen(url, timeout=10).read(),
+                              limiter, budget, base_delay_s=0.01, max_delay_s=0.2)
+        except Exception as e:
+            failures.append(e)
+        limits.append(limiter.limit)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(one, range(requests)))
+    return failures, limits
+
+
+def test_limit_settles_below_capacity_throttling(endpoint):
+    capacity = 8
+    url = endpoint(capacity, error_rate=0.01)
+    limiter = AIMDLimiter(initial=2, max_limit=32, latency_target_s=0.05)
+    budget = RetryBudget()
+    failures, limits = drive(url, limiter, budget, requests=300, workers=32)
+
+    assert failures == []
+    assert budget.spent > 0  # 429s above capacity and injected 503s were retried
+    assert 1 <= limiter.limit <= 32
+    assert sum(limits) / len(limits) < 2 * capacity
+
+
+def test_latency_target_cuts_the_limit(endpoint):
+    # Every call is slower than the target: each success counts as congestion
+    url = endpoint(capacity=64, base_latency_s=0.02)
+    limiter = AIMDLimiter(initial=16, max_limit=32, latency_target_s=0.01)
+    failures, _ = drive(url, limiter, RetryBudget(), requests=60, workers=16)
+
+    assert failures == []
+    assert limiter.limit < 16
+    assert limiter.rtt_s > 0.01
@@ -0,0 +1,34 @@
+"""bronze.convert_source_1 reuses cached parts only while dest still holds that JSONL's conversion."""
+
+from pathlib import Path
+
+import pyarrow.dataset as ds
+
+import bronze
+from snapshot_cache import SnapshotCache
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def ids(dest: Path) -> set[str]:
+    prefix, _ = bronze.source_1_parts(str(dest), "2026-01-01")
+    return set(ds.dataset(prefix, format="parquet").to_table(columns=["linkedinID"])["linkedinID"].to_pylist())
+
+
+def test_switching_back_to_a_cached_jsonl_reconverts(tmp_path):
+    cache = SnapshotCache(str(tmp_path / "cache.sqlite"))
+    dest = tmp_path / "bronze"
+    original = FIXTURES / "source_1.jsonl"
+    other = tmp_path / "other.jsonl"
+    other.write_text("".join(original.read_text().splitlines(keepends=True)[1:]))
+
+    bronze.convert_source_1(str(original), str(dest), 1, "2026-01-01", cache)
+    everyone = ids(dest)
+    assert bronze.convert_source_1(str(original), str(dest), 1, "2026-01-01", cache)["converted_files"] == 0
+
+    bronze.convert_source_1(str(other), str(dest), 1, "2026-01-01", cache)
+    assert len(ids(dest)) == len(everyone) - 1
+
+    summary = bronze.convert_source_1(str(original), str(dest), 1, "2026-01-01", cache)
+    assert summary["converted_files"] == 1
+    assert ids(dest) == everyone
@@ -0,0 +1,56 @@
+"""Source 1 quarantine is kept per snapshot_date, and 03 joins only the current snapshot's."""
+
+import json
+from pathlib import Path
+
+import bronze
+from duckdb_backend import DuckDBClient
+from part3_pipeline import SQL_DIR, run_sql_file
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def with_bad_connections(tmp_path: Path) -> Path:
+    """The fixture with user-1's linkedinConnections not an INT64."""
+    lines = []
+    for line in (FIXTURES / "source_1.jsonl").read_text().splitlines():
+        record = json.loads(line)
+        if record["linkedinID"] == "user-1":
+            record["linkedinConnections"] = "500+"
+        lines.append(json.dumps(record) + "\n")
+    path = tmp_path / "source_1_bad.jsonl"
+    path.write_text("".join(lines))
+    return path
+
+
+def stage(tmp_path: Path) -> tuple[list, list]:
+    """Run 01 and 03 over the bronze dir: (quarantine rows by snapshot, user-1's coercion errors)."""
+    client = DuckDBClient(str(tmp_path / "pipeline.duckdb"), source_1=str(tmp_path / "bronze"),
+                          source_2=str(tmp_path / "bronze"))
+    try:
+        for sql_file in ("01_source_1_snapshot.sql", "03_staging_source_1.sql"):
+            assert run_sql_file(client, SQL_DIR / sql_file, sql_file, log=lambda *_: None)["success"]
+        quarantine = client.conn.execute("""
+            SELECT CAST(snapshot_date AS VARCHAR), linkedin_id, field FROM bronze_source_1_quarantine
+            ORDER BY 1""").fetchall()
+        errors = client.conn.execute("""
+            SELECT e.field FROM stg_source_1, UNNEST(normalization_errors) AS t(e)
+            WHERE linkedin_id = 'user-1' AND e.error = 'COERCION_FAILED'""").fetchall()
+    finally:
+        client.close()
+    return quarantine, errors
+
+
+def test_new_snapshot_keeps_the_old_quarantine(tmp_path):
+    dest = str(tmp_path / "bronze")
+    bronze.convert_source_2(str(FIXTURES / "source_2"), dest, 1)
+    bronze.convert_source_1(str(with_bad_connections(tmp_path)), dest, 1, "2026-01-01")
+    quarantine, errors = stage(tmp_path)
+    assert quarantine == [("2026-01-01", "user-1", "linkedinConnections")]
+    assert errors == [("linkedinConnections",)]
+
+    # The next delivery is clean: its conversion leaves January's quarantine alone
+    bronze.convert_source_1(str(FIXTURES / "source_1.jsonl"), dest, 1, "2026-04-01")
+    quarantine, errors = stage(tmp_path)
+    assert quarantine == [("2026-01-01", "user-1", "linkedinConnections")]
+    assert errors == []
@@ -0,0 +1,70 @@
+"""A person who leaves both sources is tombstoned by 05, shows up in 08 as a delete and can come back."""
+
+import json
+from pathlib import Path
+
+import duckdb
+
+import part3_pipeline
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def run_pipeline(tmp_path: Path, source_1: Path) -> int:
+    return part3_pipeline.main([
+        "--backend", "duckdb",
+        "--source-1", str(source_1),
+        "--source-2", str(FIXTURES / "source_2"),
+        "--bronze-dir", str(tmp_path / "bronze"),
+        "--database", str(tmp_path / "pipeline.duckdb"),
+        "--state-file", str(tmp_path / "state.json"),
+        "--history", str(tmp_path / "history.sqlite"),
+        "--report-dir", str(tmp_path / "reports"),
+        "--changelog-uri", str(tmp_path / "changelog"),
+    ])
+
+
+def query(tmp_path: Path, sql: str) -> list:
+    conn = duckdb.connect(str(tmp_path / "pipeline.duckdb"), read_only=True)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def user_1(tmp_path: Path) -> tuple:
+    """(first_seen_at, record_version, tombstoned) of user-1."""
+    return query(tmp_path, """
+        SELECT CAST(provenance.first_seen_at AS VARCHAR), provenance.record_version,
+               provenance.deleted_at IS NOT NULL
+        FROM people_canonical WHERE linkedin_id = 'user-1'""")[0]
+
+
+def events(tmp_path: Path) -> list:
+    """(change_type, linkedin_id) of the latest diff."""
+    return query(tmp_path, """
+        SELECT change_type, linkedin_id FROM people_changelog
+        WHERE to_snapshot = (SELECT MAX(to_snapshot) FROM people_changelog)
+          AND from_snapshot IS NOT NULL
+        ORDER BY linkedin_id""")
+
+
+def test_dropped_person_is_tombstoned_and_a_delete_event(tmp_path):
+    assert run_pipeline(tmp_path, FIXTURES / "source_1.jsonl") == 0
+    first_seen, version, tombstoned = user_1(tmp_path)
+    assert (version, tombstoned) == (1, False)
+
+    # user-1 is only in Source 1
+    lines = (FIXTURES / "source_1.jsonl").read_text().splitlines(keepends=True)
+    dropped = tmp_path / "source_1_dropped.jsonl"
+    dropped.write_text("".join(line for line in lines if json.loads(line)["linkedinID"] != "user-1"))
+    assert run_pipeline(tmp_path, dropped) == 0
+
+    assert user_1(tmp_path) == (first_seen, 2, True)
+    assert events(tmp_path) == [("delete", "user-1")]
+    assert query(tmp_path, "SELECT COUNT(*) FROM firestore_export WHERE linkedin_id = 'user-1'") == [(0,)]
+
+    # Back in Source 1: revived with its history, an insert for consumers
+    assert run_pipeline(tmp_path, FIXTURES / "source_1.jsonl") == 0
+    assert user_1(tmp_path) == (first_seen, 3, False)
+    assert events(tmp_path) == [("insert", "user-1")]
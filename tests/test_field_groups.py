@@ -0,0 +1,80 @@
+"""05's hash blocks are rendered from field_groups.json, and the changelog names groups from the stored hashes."""
+
+import copy
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+import field_groups
+import local_merge
+import local_staging
+from changelog import INSERT, UPDATE, Changelog, local_diff
+from duckdb_backend import DuckDBClient
+from field_groups import MERGE_SQL_PATH, field_hashes, load_field_groups, render
+
+
+def test_05_is_rendered():
+    assert render(load_field_groups(), MERGE_SQL_PATH.read_text()) == MERGE_SQL_PATH.read_text()
+    assert field_groups.main(["check"]) == 0
+
+
+def test_new_group_rerenders_both_blocks(tmp_path):
+    groups = load_field_groups()
+    groups["signals"] = {"firestore_fields": ["seniority"], "canonical_paths": ["computed_signals.seniority"]}
+    sql = render(groups, MERGE_SQL_PATH.read_text())
+    assert "TO_HEX(MD5(TO_JSON_STRING(STRUCT(c.computed_signals.seniority AS seniority)))) AS signals" in sql
+    assert "field_hashes.skills,\n      field_hashes.signals\n    ))) AS sync_hash," in sql
+    assert render(groups, sql) == sql
+
+    path = tmp_path / "field_groups.json"
+    path.write_text(json.dumps({"groups": groups}))
+    assert field_groups.main(["--groups", str(path), "check"]) == 1
+
+
+def test_malformed_path_is_rejected(tmp_path):
+    path = tmp_path / "field_groups.json"
+    path.write_text(json.dumps({"groups": {"x": {"firestore_fields": ["a"], "canonical_paths": ["a) --"]}}}))
+    with pytest.raises(ValueError, match="not a column path"):
+        load_field_groups(path)
+
+
+def test_local_hashes_move_only_the_changed_group():
+    groups = load_field_groups()
+    row = {"identity": {"full_name": "Ada"}, "social_metrics": {"followers": 1}, "skills": ["sql"]}
+    moved = copy.deepcopy(row)
+    moved["social_metrics"]["followers"] = 2
+    (sync_a, a), (sync_b, b) = field_hashes(row, groups), field_hashes(moved, groups)
+    assert sync_a != sync_b
+    assert [name for name in groups if a[name] != b[name]] == ["social_metrics"]
+
+
+def test_diff_names_groups_from_stored_hashes(tmp_path):
+    """The export views' field_hashes decide changed_groups, whatever the fields themselves hold."""
+    client = DuckDBClient(str(tmp_path / "p.duckdb"))
+    try:
+        for snapshot, followers_hash in (("20260101_000000", "f1"), ("20260401_000000", "f2")):
+            client.conn.execute(f"""CREATE VIEW firestore_export_{snapshot} AS
+                SELECT 'user-1' AS linkedin_id, 'sync-{followers_hash}' AS sync_hash,
+                       {{'identity': 'i', 'social_metrics': '{followers_hash}'}} AS field_hashes""")
+        groups = {name: load_field_groups()[name] for name in ("identity", "social_metrics")}
+        counts = Changelog(client, "coffeespace-sandbox.coffeespace_canonical").diff(
+            "20260101_000000", "20260401_000000", groups, str(tmp_path / "changelog"), "json")
+        assert counts[UPDATE] == 1
+        events = client.conn.execute("SELECT change_type, changed_groups FROM people_changelog").fetchall()
+        assert events == [(UPDATE, ["social_metrics"])]
+    finally:
+        client.close()
+
+
+def test_local_diff_reads_stored_hashes(tmp_path):
+    fixtures = Path(__file__).parent / "fixtures"
+    run_ts = datetime.now(timezone.utc)
+    local_staging.stage_table("stg_source_1", str(fixtures / "source_1.jsonl"), str(tmp_path / "staging"), 1, run_ts)
+    local_staging.stage_table("stg_source_2", str(fixtures / "source_2"), str(tmp_path / "staging"), 1, run_ts)
+    rows = local_merge.merge(str(tmp_path / "staging"), str(tmp_path / "canonical"), 1, partitions=2)["rows"]
+
+    stats = local_diff(None, str(tmp_path / "canonical" / "people_canonical"), str(tmp_path / "changelog"),
+                       None, "q1", "json", 1, partitions=2)
+    assert stats[INSERT] == rows > 0
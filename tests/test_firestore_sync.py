@@ -0,0 +1,228 @@
+"""firestore_sync.py: merge-join decisions, partial writes, deletes, resume from checkpoints and the ramp."""
+
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+import firestore_sync
+from adaptive_concurrency import AIMDLimiter, RetryBudget
+from firestore_sync import RampLimiter, ShardWriter, SyncState, merge_join, update_mask
+from sync_index import SyncIndex, key_hash_of, key_of
+
+FIXTURES = Path(__file__).parent / "fixtures"
+TARGET = "test->fake/people"
+GROUPS = {
+    "identity": {"firestore_fields": ["full_name"]},
+    "social_metrics": {"firestore_fields": ["followers"]},
+}
+
+
+def md5(value: str) -> str:
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def row(doc_id: str, full_name: str = "Ada", followers: int = 1) -> dict:
+    """A firestore_sync_source row: key and hashes plus the document fields."""
+    return {
+        "key_hash": key_hash_of(doc_id),
+        "sync_snapshot": "s1",
+        "doc_id": doc_id,
+        "field_hashes": {"identity": md5(full_name), "social_metrics": md5(str(followers))},
+        "sync_hash": md5(f"{full_name}|{followers}"),
+        "full_name": full_name,
+        "followers": followers,
+    }
+
+
+def in_key_order(rows: list[dict]) -> list[dict]:
+    return sorted(rows, key=lambda r: r["key_hash"])
+
+
+class Contention(Exception):
+    code = 409  # ABORTED
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.ops = []
+
+    def set(self, doc_id, data, merge=None):
+        self.ops.append(("set", doc_id, data, merge))
+
+    def delete(self, doc_id):
+        self.ops.append(("delete", doc_id, None, None))
+
+    def commit(self, retry=None):
+        failure = self.db.failures.pop(0) if self.db.failures else None
+        if failure is not None:
+            raise failure
+        self.db.commits.append(self.ops)
+        for op, doc_id, data, merge in self.ops:
+            if op == "delete":
+                self.db.docs.pop(doc_id, None)
+            elif merge is None:
+                self.db.docs[doc_id] = dict(data)
+            else:
+                self.db.docs.setdefault(doc_id, {}).update({f: data[f] for f in merge})
+
+
+class FakeCollection:
+    def document(self, doc_id):
+        return doc_id
+
+
+class FakeDB:
+    """Firestore stand-in: documents by id, committed batches, and errors (or None) for the next commits."""
+
+    def __init__(self):
+        self.docs = {}
+        self.commits = []
+        self.failures = []
+
+    def collection(self, name):
+        return FakeCollection()
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+@pytest.fixture
+def sync_env(tmp_path):
+    state = SyncState(str(tmp_path / "state.sqlite"))
+    index = SyncIndex(str(tmp_path / "people.idx"), TARGET, list(GROUPS))
+    db = FakeDB()
+    yield state, index, db
+    index.close()
+
+
+def run_shard(state, index, db, rows, run_id="r1", after=None, full=False):
+    """Write one single-shard run of rows, in key order, resuming after `after`."""
+    if not state.shards(run_id):
+        state.start(run_id, TARGET, None, "s1", 1)
+    writer = ShardWriter(db, "people", state, index, GROUPS, run_id, RampLimiter(start_rate=1e6),
+                         AIMDLimiter(), RetryBudget(), threading.Event())
+    rows = [r for r in in_key_order(rows) if after is None or r["key_hash"] > after]
+    return writer.run(0, 1, rows, after, full)
+
+
+def test_merge_join_yields_writes_deletes_and_unchanged():
+    rows = {doc_id: row(doc_id) for doc_id in "abcd"}
+    groups = {"identity": "00", "social_metrics": "11"}
+    indexed = sorted([
+        (key_of(rows["a"]["key_hash"]), "a", rows["a"]["sync_hash"], None, groups),  # unchanged
+        (key_of(rows["b"]["key_hash"]), "b", md5("old"), None, groups),  # changed
+        (key_of(rows["c"]["key_hash"]), "c", rows["c"]["sync_hash"], None, groups),  # left the export
+    ])
+    exported = in_key_order([rows["a"], rows["b"], rows["d"]])  # d is new
+
+    out = {doc_id: (r if r in (None, False) else r["doc_id"], g)
+           for _, doc_id, r, g in merge_join(iter(exported), iter(indexed))}
+    assert out == {"a": (False, None), "b": ("b", groups), "c": (None, None), "d": ("d", None)}
+
+    full = list(merge_join(iter(exported), iter(indexed), full=True))
+    assert sorted(doc_id for _, doc_id, r, _ in full if r) == ["a", "b", "d"]
+    keys = [key_hash for key_hash, _, _, _ in full]
+    assert keys == sorted(keys)
+
+
+def test_update_mask_is_changed_groups_plus_ungrouped_fields():
+    data = {"sync_hash": "h", "full_name": "Ada", "followers": 2, "last_modified_at": "t"}
+    assert update_mask(data, ["social_metrics"], GROUPS) == ["sync_hash", "last_modified_at", "followers"]
+    assert update_mask(data, [], GROUPS) == ["sync_hash", "last_modified_at"]
+
+
+def test_partial_writes_and_deletes(sync_env):
+    state, index, db = sync_env
+    stats = run_shard(state, index, db, [row("a"), row("b"), row("c")])
+    assert (stats["written"], stats["partial"], stats["deleted"]) == (3, 0, 0)
+
+    # a gains a follower, b leaves the export, c is unchanged
+    stats = run_shard(state, index, db, [row("a", followers=2), row("c")], run_id="r2")
+    assert (stats["written"], stats["partial"], stats["deleted"], stats["unchanged"]) == (1, 1, 1, 1)
+    ops = {doc_id: (op, merge) for op, doc_id, _, merge in db.commits[-1]}
+    assert ops == {"a": ("set", ["sync_hash", "followers"]), "b": ("delete", None)}
+    assert db.docs["a"]["followers"] == 2 and db.docs["a"]["full_name"] == "Ada"
+    assert sorted(db.docs) == ["a", "c"]
+    assert index.get("b") is None and index.get("a")[0] == row("a", followers=2)["sync_hash"]
+
+
+def test_contention_is_retried(sync_env):
+    state, index, db = sync_env
+    db.failures = [Contention("ABORTED")]
+    stats = run_shard(state, index, db, [row("a")])
+    assert stats["commits"] == 1 and sorted(db.docs) == ["a"]
+
+
+def test_resume_from_last_key(sync_env, monkeypatch):
+    state, index, db = sync_env
+    monkeypatch.setattr(firestore_sync, "MAX_BATCH_WRITES", 2)
+    rows = [row(f"user-{i}") for i in range(5)]
+    keys = [r["key_hash"] for r in in_key_order(rows)]
+
+    # The first batch commits, the second fails for good
+    db.failures = [None, RuntimeError("PERMISSION_DENIED")]
+    with pytest.raises(RuntimeError):
+        run_shard(state, index, db, rows)
+    shard = state.shards("r1")[0]
+    assert (shard["last_key"], shard["written"], shard["done"]) == (keys[1], 2, 0)
+
+    run_shard(state, index, db, rows, after=shard["last_key"])
+    written = [doc_id for ops in db.commits for _, doc_id, _, _ in ops]
+    assert sorted(written) == sorted(r["doc_id"] for r in rows)  # each document once
+    assert state.shards("r1")[0]["done"] == 1
+    assert len(list(index.scan())) == 5
+
+
+def test_ramp_limiter_throttles_and_grows(monkeypatch):
+    ramp = RampLimiter(start_rate=200, growth=1.5, period_s=60)
+    started = time.monotonic()
+    ramp.acquire(20)  # empty bucket: 20 writes at 200/s
+    assert time.monotonic() - started >= 0.09
+    assert ramp.rate() == 200
+
+    ramp._started -= 2 * 60  # two periods later
+    assert ramp.rate() == pytest.approx(200 * 1.5 ** 2)
+
+
+@pytest.mark.emulator
+@pytest.mark.skipif(not os.environ.get("FIRESTORE_EMULATOR_HOST"), reason="FIRESTORE_EMULATOR_HOST is not set")
+def test_sync_to_emulator(tmp_path, capsys):
+    firestore = pytest.importorskip("google.cloud.firestore")
+    import part3_pipeline
+
+    database = tmp_path / "pipeline.duckdb"
+    assert part3_pipeline.main([
+        "--backend", "duckdb",
+        "--source-1", str(FIXTURES / "source_1.jsonl"),
+        "--source-2", str(FIXTURES / "source_2"),
+        "--bronze-dir", str(tmp_path / "bronze"),
+        "--database", str(database),
+        "--state-file", str(tmp_path / "state.json"),
+        "--history", str(tmp_path / "history.sqlite"),
+        "--report-dir", str(tmp_path / "reports"),
+        "--changelog-uri", str(tmp_path / "changelog"),
+    ]) == 0
+
+    collection = f"people_{tmp_path.name}"
+    args = ["--backend", "duckdb", "--database", str(database), "--collection", collection,
+            "--state", str(tmp_path / "sync.sqlite"), "--index", str(tmp_path / "sync.idx")]
+    assert firestore_sync.main(args) == 0
+
+    import duckdb
+    conn = duckdb.connect(str(database), read_only=True)
+    try:
+        expected = {doc_id for (doc_id,) in conn.execute("SELECT doc_id FROM firestore_export").fetchall()}
+    finally:
+        conn.close()
+    db = firestore.Client(project=part3_pipeline.PROJECT_ID)
+    assert {doc.id for doc in db.collection(collection).stream()} == expected
+
+    # Nothing changed: the second sync writes nothing
+    capsys.readouterr()
+    assert firestore_sync.main(args) == 0
+    assert "nothing to sync" in capsys.readouterr().out
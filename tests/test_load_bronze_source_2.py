@@ -0,0 +1,128 @@
+"""load_bronze_source_2.py loads only new or changed files, cleans up before reloading and never loads a part twice."""
+
+import shutil
+from pathlib import Path
+
+import pyarrow.parquet as pq
+import pytest
+
+import bronze
+from adaptive_concurrency import AIMDLimiter, RetryBudget, call_with_retries
+from load_bronze_source_2 import load_one_file, worker_loop
+from load_manifest import LoadManifest
+from object_store import list_objects
+
+FIXTURES = Path(__file__).parent / "fixtures"
+TABLES = ("bronze_source_2", "bronze_source_2_quarantine")
+
+
+class NotFound(Exception):
+    code = 404
+
+
+class FakeJob:
+    def __init__(self, rows):
+        self.output_rows = rows
+        self.error_result = None
+
+    def result(self):
+        return self
+
+
+class FakeBackend:
+    """Records load jobs by job_id and deletes; a table is a list of source file loads.
+
+    fail_first: files whose quarantine load job fails once.
+    lose_response: files whose first bronze submission runs but whose response is lost.
+    """
+
+    def __init__(self, fail_first=(), lose_response=()):
+        self.client = self
+        self.tables = {t: [] for t in TABLES}
+        self.jobs = {}
+        self.submissions = 0
+        self.fail_first = set(fail_first)
+        self.lose_response = set(lose_response)
+        self.limiter = AIMDLimiter()
+        self.budget = RetryBudget()
+
+    def call(self, fn):
+        return call_with_retries(fn, self.limiter, self.budget, base_delay_s=0.001)
+
+    def load_table_from_file(self, f, table_ref, job_id=None, job_config=None):
+        assert job_id not in self.jobs, f"job {job_id} submitted twice"
+        self.submissions += 1
+        name = Path(f.name).stem.removeprefix("part-") + ".json"
+        if name in self.fail_first and table_ref == TABLES[1]:
+            self.fail_first.discard(name)
+            raise RuntimeError("invalid part")
+        self.tables[table_ref].append(name)
+        self.jobs[job_id] = FakeJob(pq.read_metadata(f.name).num_rows)
+        if name in self.lose_response and table_ref == TABLES[0]:
+            self.lose_response.discard(name)
+            raise ConnectionError("connection reset")
+        return self.jobs[job_id]
+
+    def get_job(self, job_id):
+        if job_id not in self.jobs:
+            raise NotFound(job_id)
+        return self.jobs[job_id]
+
+    def delete_rows(self, name):
+        for table in self.tables.values():
+            table[:] = [n for n in table if n != name]
+
+
+@pytest.fixture
+def source(tmp_path):
+    shutil.copytree(FIXTURES / "source_2", tmp_path / "source_2")
+    return tmp_path / "source_2"
+
+
+def drain(manifest, backend, source, dest):
+    objects = list_objects(str(source), "*.json")
+    manifest.register(objects)
+    removed = manifest.names() - {o.name for o in objects}
+    for name in removed:
+        backend.delete_rows(name)
+    manifest.forget(removed)
+    bronze.convert_source_2(str(source), dest, 1)
+    worker_loop("w", manifest, lambda obj, claim: load_one_file(obj, claim, backend, dest, TABLES, None),
+                backend.delete_rows, lambda obj, result: None)
+
+
+def test_reload_only_changed_files(source, tmp_path):
+    manifest = LoadManifest(str(tmp_path / "manifest.sqlite"))
+    backend = FakeBackend()
+    dest = str(tmp_path / "bronze")
+    drain(manifest, backend, source, dest)
+    assert sorted(backend.tables[TABLES[0]]) == ["part-0.json", "part-1.json"]
+    assert manifest.counts()["done"]["rows"] == 8
+
+    # part-0 changes, part-1 leaves the source, part-2 is new
+    (source / "part-0.json").write_text((source / "part-0.json").read_text().replace("user-2", "user-20"))
+    (source / "part-1.json").rename(source / "part-2.json")
+    drain(manifest, backend, source, dest)
+    for table in TABLES:
+        assert sorted(backend.tables[table]) == ["part-0.json", "part-2.json"]
+    assert manifest.counts() == {"done": {"files": 2, "rows": 8}}
+
+
+def test_failed_attempt_is_cleaned_before_retry(source, tmp_path):
+    manifest = LoadManifest(str(tmp_path / "manifest.sqlite"))
+    # The bronze part of part-0 loads, its quarantine part fails once
+    backend = FakeBackend(fail_first={"part-0.json"})
+    drain(manifest, backend, source, str(tmp_path / "bronze"))
+    assert sorted(backend.tables[TABLES[0]]) == ["part-0.json", "part-1.json"]
+    assert manifest.counts()["done"]["files"] == 2
+
+
+def test_lost_response_is_fetched_not_resubmitted(source, tmp_path):
+    manifest = LoadManifest(str(tmp_path / "manifest.sqlite"))
+    # part-0's bronze job is accepted, but the client only sees a reset connection
+    backend = FakeBackend(lose_response={"part-0.json"})
+    drain(manifest, backend, source, str(tmp_path / "bronze"))
+    assert sorted(backend.tables[TABLES[0]]) == ["part-0.json", "part-1.json"]
+    assert backend.submissions == 4
+    assert backend.budget.spent == 1
+    assert manifest.counts() == {"done": {"files": 2, "rows": 8}}
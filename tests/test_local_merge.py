@@ -0,0 +1,60 @@
+"""local_merge.py merges into its previous output the way 05's MERGE does."""
+
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pyarrow.dataset as ds
+
+import local_merge
+import local_staging
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def stage(staging: Path, source_1: Path):
+    run_ts = datetime.now(timezone.utc)
+    local_staging.stage_table("stg_source_1", str(source_1), str(staging), 1, run_ts)
+    local_staging.stage_table("stg_source_2", str(FIXTURES / "source_2"), str(staging), 1, run_ts)
+
+
+def user_1(out: Path) -> dict:
+    table = ds.dataset(out / "people_canonical", format="parquet").to_table()
+    return next(row["provenance"] for row in table.to_pylist() if row["linkedin_id"] == "user-1")
+
+
+def merge(staging: Path, out: Path, **kwargs) -> dict:
+    return local_merge.merge(str(staging), str(out), 1, partitions=4, **kwargs)
+
+
+def test_incremental_merge_keeps_history(tmp_path):
+    staging, out = tmp_path / "staging", tmp_path / "canonical"
+    stage(staging, FIXTURES / "source_1.jsonl")
+    first = merge(staging, out)
+    assert first["inserted"] == first["rows"] and first["updated"] == first["tombstoned"] == 0
+    first_seen = user_1(out)["first_seen_at"]
+
+    again = merge(staging, out)
+    assert again["unchanged"] == first["rows"] and again["rows"] == first["rows"]
+    assert user_1(out)["record_version"] == 1
+
+    # user-1 is only in Source 1
+    lines = (FIXTURES / "source_1.jsonl").read_text().splitlines(keepends=True)
+    dropped = tmp_path / "source_1_dropped.jsonl"
+    dropped.write_text("".join(line for line in lines if json.loads(line)["linkedinID"] != "user-1"))
+    stage(staging, dropped)
+    gone = merge(staging, out)
+    assert (gone["tombstoned"], gone["rows"]) == (1, first["rows"])
+    provenance = user_1(out)
+    assert provenance["deleted_at"] is not None
+    assert (provenance["first_seen_at"], provenance["record_version"]) == (first_seen, 2)
+
+    stage(staging, FIXTURES / "source_1.jsonl")
+    back = merge(staging, out)
+    assert back["updated"] == 1
+    provenance = user_1(out)
+    assert provenance["deleted_at"] is None
+    assert (provenance["first_seen_at"], provenance["record_version"]) == (first_seen, 3)
+
+    rebuilt = merge(staging, out, full_refresh=True)
+    assert rebuilt["inserted"] == first["rows"]
@@ -0,0 +1,27 @@
+"""DataProfiler only reports paths that recorded a value, and caps distinct paths in deep mode."""
+
+from profile_sources import OVERFLOW_PATH, DataProfiler
+
+RECORD = {"linkedinID": "user-1", "experienceList": [{"title": "CTO"}, {"title": "CEO"}]}
+
+
+def test_shallow_walk_has_no_empty_array_entry():
+    profiler = DataProfiler([RECORD], "s", deep=False)
+    fields = profiler.profile()["fields"]
+    assert "experienceList[]" not in fields
+    assert "experienceList[].title" in fields
+
+
+def test_deep_walk_records_array_elements():
+    profiler = DataProfiler([RECORD], "s", deep=True)
+    profiler.profile()
+    assert profiler.field_stats["experienceList[]"].present_count == 2
+    assert profiler.field_stats["experienceList[].title"].present_count == 2
+
+
+def test_cap_counts_admitted_paths():
+    profiler = DataProfiler([RECORD, {"a": 1, "b": 2}], "s", deep=False, max_paths=3)
+    profiler.profile()
+    # linkedinID, experienceList and experienceList[] (no stats) fill the cap
+    assert set(profiler.field_stats) == {"linkedinID", "experienceList", OVERFLOW_PATH}
+    assert profiler.overflow_paths.estimate() >= 2
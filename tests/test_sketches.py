@@ -0,0 +1,32 @@
+import math
+import random
+
+from sketches import QuantileSketch
+
+
+def _rank_error(sketch: QuantileSketch, values: list[float], q: float) -> float:
+    estimate = sketch.quantile(q)
+    rank = sum(1 for v in values if v <= estimate) / len(values)
+    return abs(rank - q)
+
+
+def test_quantile_sketch_stays_bounded_after_many_merges():
+    random.seed(7)
+    k = 128
+    merged = QuantileSketch(k)
+    values = []
+    for _ in range(800):
+        shard = QuantileSketch(k)
+        # 256 adds leave levels 0 and 1 empty, so only upper levels fill up
+        for _ in range(256):
+            x = random.random()
+            shard.add(x)
+            values.append(x)
+        merged.merge(QuantileSketch.from_state(shard.to_state()))
+
+    n = len(values)
+    assert merged.count == n
+    assert all(len(level) < k for level in merged.levels)
+    assert sum(len(level) for level in merged.levels) <= k * (math.log2(n / k) + 2)
+    for q in (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99):
+        assert _rank_error(merged, values, q) < 0.03
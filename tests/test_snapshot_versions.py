@@ -0,0 +1,93 @@
+"""Promotion writes the metadata before the view swap, and a run whose merge changed nothing reuses its snapshot."""
+
+from pathlib import Path
+
+import pytest
+
+import part3_pipeline
+from duckdb_backend import DuckDBClient
+from part3_pipeline import DATASET_ID, PROJECT_ID
+from snapshot_versions import PROMOTED, SERVING_VIEW, SUPERSEDED, SnapshotStore
+
+FIXTURES = Path(__file__).parent / "fixtures"
+DATASET = f"{PROJECT_ID}.{DATASET_ID}"
+EXPORT_SQL = (f"CREATE OR REPLACE VIEW `{DATASET}.{SERVING_VIEW}` AS\n"
+              f"SELECT linkedin_id FROM `{DATASET}.people_canonical`")
+
+
+@pytest.fixture
+def client(tmp_path):
+    client = DuckDBClient(str(tmp_path / "pipeline.duckdb"))
+    client.query(f"""CREATE TABLE `{DATASET}.people_canonical` AS
+SELECT 'user-1' AS linkedin_id,
+  STRUCT(CURRENT_TIMESTAMP() AS last_merged_at, CAST(NULL AS TIMESTAMP) AS deleted_at) AS provenance""").result()
+    yield client
+    client.close()
+
+
+def serving(client) -> list[str]:
+    return [r.linkedin_id for r in client.query(f"SELECT * FROM `{DATASET}.{SERVING_VIEW}`").result()]
+
+
+def test_failed_view_swap_is_repaired_by_promoting_again(client):
+    store = SnapshotStore(client, DATASET)
+    store.create("20260101_000000", EXPORT_SQL, "run-1")
+    store.promote("20260101_000000")
+    store.create("20260201_000000", EXPORT_SQL, "run-2")
+
+    def swap_fails(statement):
+        if statement.startswith(f"CREATE OR REPLACE VIEW `{DATASET}.{SERVING_VIEW}` "):
+            raise RuntimeError("view swap failed")
+        return store._query(statement)
+
+    with pytest.raises(RuntimeError):
+        SnapshotStore(client, DATASET, swap_fails).promote("20260201_000000")
+    # The metadata already records the new promotion, which readers follow
+    assert store.promoted() == "20260201_000000"
+    assert store.status("20260101_000000") == SUPERSEDED
+
+    store.promote("20260201_000000")
+    assert store.status("20260201_000000") == PROMOTED
+    assert store.status("20260101_000000") == SUPERSEDED
+    view_sql = client.conn.execute(f"SELECT sql FROM duckdb_views() WHERE view_name = '{SERVING_VIEW}'").fetchone()
+    assert f"{SERVING_VIEW}_20260201_000000" in view_sql[0]
+    assert serving(client) == ["user-1"]
+
+
+def test_unchanged_since_newest_snapshot(client):
+    store = SnapshotStore(client, DATASET)
+    assert store.unchanged_since(EXPORT_SQL) is None
+    store.create("20260101_000000", EXPORT_SQL, "run-1")
+    assert store.unchanged_since(EXPORT_SQL) == "20260101_000000"
+    # A new projection needs its own snapshot and view
+    assert store.unchanged_since(EXPORT_SQL + ", 1 AS extra") is None
+
+    client.query(f"""UPDATE `{DATASET}.people_canonical`
+SET provenance = STRUCT(CURRENT_TIMESTAMP() AS last_merged_at, CAST(NULL AS TIMESTAMP) AS deleted_at)""").result()
+    assert store.unchanged_since(EXPORT_SQL) is None
+
+
+def run_pipeline(tmp_path: Path, *extra: str) -> int:
+    return part3_pipeline.main([
+        "--backend", "duckdb",
+        "--source-1", str(FIXTURES / "source_1.jsonl"),
+        "--source-2", str(FIXTURES / "source_2"),
+        "--bronze-dir", str(tmp_path / "bronze"),
+        "--database", str(tmp_path / "pipeline.duckdb"),
+        "--state-file", str(tmp_path / "state.json"),
+        "--report-dir", str(tmp_path / "reports"),
+        "--changelog-uri", str(tmp_path / "changelog"),
+        *extra,
+    ])
+
+
+def test_rerun_without_changes_takes_no_snapshot(tmp_path):
+    assert run_pipeline(tmp_path) == 0
+    assert run_pipeline(tmp_path, "--from", "05") == 0
+
+    client = DuckDBClient(str(tmp_path / "pipeline.duckdb"))
+    try:
+        snapshots = SnapshotStore(client, DATASET).snapshots()
+    finally:
+        client.close()
+    assert [r.validation_status for r in snapshots] == [PROMOTED]
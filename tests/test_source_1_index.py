@@ -0,0 +1,31 @@
+"""A malformed Source 1 line is counted and skipped by the index build, and its neighbours keep exact byte ranges."""
+
+import json
+from pathlib import Path
+
+from source_1_index import Source1Index, build_index
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def test_malformed_lines_are_skipped(tmp_path):
+    lines = (FIXTURES / "source_1.jsonl").read_text().splitlines(keepends=True)
+    source = tmp_path / "source_1.jsonl"
+    # a truncated record and a line that is JSON but not an object
+    source.write_text("".join(lines[:3]) + lines[3][:40] + "\n" + "".join(lines[4:6]) + "[1, 2]\n"
+                      + "".join(lines[6:]))
+
+    stats = build_index(str(source), str(tmp_path / "source_1.idx"), 2)
+    assert (stats["records"], stats["indexed"], stats["malformed"]) == (len(lines) + 1, len(lines) - 1, 2)
+
+    index = Source1Index(str(tmp_path / "source_1.idx"), str(source))
+    try:
+        index.check_fresh()
+        for line in lines[:3] + lines[4:]:
+            record_id = json.loads(line)["linkedinID"]
+            assert index.get(record_id)["linkedinID"] == record_id
+        assert index.get(json.loads(lines[3])["linkedinID"]) is None
+        assert [r["linkedinID"] for r in index.range(2, 6)] == [
+            json.loads(line)["linkedinID"] for line in (lines[2], lines[4], lines[5], lines[6])]
+    finally:
+        index.close()
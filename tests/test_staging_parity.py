@@ -0,0 +1,45 @@
+"""local_staging.py produces the same staging rows as 03/04 on the DuckDB backend.
+
+fixtures/staging holds edge cases for the parsers both sides mirror: padded,
+unicode, empty and NULL names, missing or malformed lastUpdated, open-ended
+and partial dates ('2024', 'Present', ''), and values bronze quarantines.
+"""
+
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+import bronze
+import local_staging
+from duckdb_backend import DuckDBClient
+from part3_pipeline import SQL_DIR, run_sql_file
+
+FIXTURES = Path(__file__).parent / "fixtures" / "staging"
+
+
+@pytest.fixture(scope="module")
+def staged(tmp_path_factory):
+    """Both stagings of the fixture: local Parquet dir and DuckDB NDJSON export per table."""
+    out = tmp_path_factory.mktemp("staging")
+    run_ts = datetime.now(timezone.utc)
+    local_staging.stage_table("stg_source_1", str(FIXTURES / "source_1.jsonl"), str(out / "local"), 1, run_ts)
+    local_staging.stage_table("stg_source_2", str(FIXTURES / "source_2"), str(out / "local"), 1, run_ts)
+
+    bronze.convert_source_1(str(FIXTURES / "source_1.jsonl"), str(out / "bronze"), 1, "2026-01-01")
+    bronze.convert_source_2(str(FIXTURES / "source_2"), str(out / "bronze"), 1)
+    client = DuckDBClient(str(out / "pipeline.duckdb"), source_1=str(out / "bronze"),
+                          source_2=str(out / "bronze"))
+    try:
+        for sql_file in ("01_source_1_snapshot.sql", "03_staging_source_1.sql", "04_staging_source_2.sql"):
+            assert run_sql_file(client, SQL_DIR / sql_file, sql_file, log=lambda *_: None)["success"]
+        for table in ("stg_source_1", "stg_source_2"):
+            client.conn.execute(f"COPY {table} TO '{out / table}.json' (FORMAT JSON)")
+    finally:
+        client.close()
+    return out
+
+
+@pytest.mark.parametrize("table", ["stg_source_1", "stg_source_2"])
+def test_local_staging_matches_duckdb(staged, table):
+    assert local_staging.parity(table, str(staged / f"{table}.json"), str(staged / "local" / table)) == 0
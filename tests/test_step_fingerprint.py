@@ -0,0 +1,33 @@
+"""A step's fingerprint covers the modules that generate its SQL, not only its SQL or config file."""
+
+from dataclasses import replace
+
+from duckdb_backend import DuckDBClient
+import part3_pipeline
+from part3_pipeline import SCRIPTS_DIR, SQL_DIR, STEPS, step_fingerprint
+
+
+def test_config_steps_name_their_generators():
+    for step in STEPS:
+        assert (SQL_DIR / step.sql_file).exists()
+        assert all((SCRIPTS_DIR / source).exists() for source in step.sources)
+        if not step.sql_file.endswith(".sql"):
+            assert step.sources, f"step {step.key} runs {step.sql_file} through code it does not fingerprint"
+
+
+def test_changed_generator_changes_the_fingerprint(tmp_path, monkeypatch):
+    (tmp_path / "sql").mkdir()
+    (tmp_path / "sql" / "gates.json").write_text("{}")
+    (tmp_path / "gates.py").write_text("VERSION = 1\n")
+    monkeypatch.setattr(part3_pipeline, "SCRIPTS_DIR", tmp_path)
+    monkeypatch.setattr(part3_pipeline, "SQL_DIR", tmp_path / "sql")
+    step = replace(STEPS[1], sql_file="gates.json", sources=("gates.py",))
+
+    client = DuckDBClient(str(tmp_path / "p.duckdb"))
+    try:
+        before = step_fingerprint(client, step)
+        assert step_fingerprint(client, step) == before
+        (tmp_path / "gates.py").write_text("VERSION = 2\n")
+        assert step_fingerprint(client, step) != before
+    finally:
+        client.close()
@@ -0,0 +1,122 @@
+"""SyncIndex survives reopening, compaction and a torn journal, and forgets group hashes it cannot trust."""
+
+import hashlib
+from datetime import datetime, timezone
+
+import pytest
+
+from sync_index import SyncIndex, key_hash_of
+
+TARGET = "test->fake/people"
+GROUPS = ["identity", "social_metrics"]
+SYNCED_AT = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def md5(value: str) -> str:
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def entry(doc_id: str, version: str = "v1", deleted: bool = False) -> tuple:
+    """(key_hash, doc_id, sync_hash or None, field group hashes) as record() takes them."""
+    if deleted:
+        return key_hash_of(doc_id), doc_id, None, None
+    return (key_hash_of(doc_id), doc_id, md5(f"{doc_id}|{version}"),
+            {name: md5(f"{name}|{version}") for name in GROUPS})
+
+
+def docs(index: SyncIndex) -> dict:
+    """doc_id -> (sync_hash, group hashes) of every indexed document, checking key order."""
+    scanned = list(index.scan())
+    assert [key for key, *_ in scanned] == sorted(key for key, *_ in scanned)
+    return {doc_id: (sync_hash, groups) for _, doc_id, sync_hash, _, groups in scanned}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "people.idx")
+
+
+def test_record_then_reopen(path):
+    index = SyncIndex(path, TARGET, GROUPS)
+    index.record([entry("a"), entry("b")], SYNCED_AT)
+    index.record([entry("a", "v2")], SYNCED_AT)
+    before = docs(index)
+    index.close()
+
+    reopened = SyncIndex(path, TARGET, GROUPS)
+    assert docs(reopened) == before
+    sync_hash, synced_at, groups = reopened.get("a")
+    assert sync_hash == entry("a", "v2")[2] and synced_at == SYNCED_AT
+    assert groups == {name: h[:16] for name, h in entry("a", "v2")[3].items()}
+    assert reopened.pending() == 2
+    reopened.close()
+
+
+def test_compact_folds_the_journal_into_the_base(path, tmp_path):
+    index = SyncIndex(path, TARGET, GROUPS)
+    index.record([entry(f"user-{i}") for i in range(10)], SYNCED_AT)
+    before = docs(index)
+    assert index.compact() == 10
+    assert index.pending() == 0
+    assert (tmp_path / "people.idx.journal").stat().st_size == 0
+    assert docs(index) == before
+    index.close()
+
+    reopened = SyncIndex(path, TARGET, GROUPS)
+    assert reopened.count == 10 and docs(reopened) == before
+    reopened.close()
+
+
+def test_torn_journal_tail_is_dropped(path, tmp_path):
+    index = SyncIndex(path, TARGET, GROUPS)
+    index.record([entry("a")], SYNCED_AT)
+    index.record([entry("b"), entry("c")], SYNCED_AT)
+    index.close()
+    journal = tmp_path / "people.idx.journal"
+    data = journal.read_bytes()
+    journal.write_bytes(data[:-5])  # a crash in the middle of the second append
+
+    reopened = SyncIndex(path, TARGET, GROUPS)
+    assert list(docs(reopened)) == ["a"]  # never half a batch
+    # The torn bytes are cut off, so the next block appends cleanly
+    reopened.record([entry("d")], SYNCED_AT)
+    reopened.close()
+    again = SyncIndex(path, TARGET, GROUPS)
+    assert sorted(docs(again)) == ["a", "d"]
+    again.close()
+
+
+def test_journal_delete_over_the_base(path):
+    index = SyncIndex(path, TARGET, GROUPS)
+    index.record([entry("a"), entry("b"), entry("c")], SYNCED_AT)
+    index.compact()
+    index.record([entry("b", deleted=True)], SYNCED_AT)
+    assert sorted(docs(index)) == ["a", "c"]
+    assert index.get("b") is None
+    assert index.compact() == 2
+    assert sorted(docs(index)) == ["a", "c"]
+    index.close()
+
+
+def test_changed_field_groups_are_unknown(path):
+    index = SyncIndex(path, TARGET, GROUPS)
+    index.record([entry("a")], SYNCED_AT)
+    index.compact()
+    index.record([entry("b")], SYNCED_AT)
+    index.close()
+
+    # sql/field_groups.json gained a group: base and journal hashes are both unknown
+    regrouped = SyncIndex(path, TARGET, GROUPS + ["skills"])
+    assert docs(regrouped) == {"a": (entry("a")[2], None), "b": (entry("b")[2], None)}
+    regrouped.compact()
+    assert docs(regrouped) == {"a": (entry("a")[2], None), "b": (entry("b")[2], None)}
+    regrouped.close()
+
+
+def test_other_target_is_rejected(path):
+    index = SyncIndex(path, TARGET, GROUPS)
+    index.record([entry("a")], SYNCED_AT)
+    index.compact()
+    index.close()
+    with pytest.raises(ValueError, match="another sync target"):
+        SyncIndex(path, "other->fake/people", GROUPS)